@@ -197,6 +197,43 @@ CELERY_TASK_TIME_LIMIT = 600  # 10 minutes
 CELERY_RESULT_EXPIRES = 3600  # 1 hour
 CELERY_RESULT_PERSISTENT = True
 
+# Periodic tasks (picked up by celery beat / django_celery_beat)
+from celery.schedules import crontab
+CELERY_BEAT_SCHEDULE = {
+    'build-storefront-rails': {
+        'task': 'ecommerce.product.tasks.build_storefront_rails',
+        'schedule': crontab(minute='*/15'),
+    },
+    'cleanup-old-tasks': {
+        'task': 'task_management.tasks.cleanup_old_tasks',
+        'schedule': crontab(hour=2, minute=30),
+    },
+    'monthly-asset-depreciation': {
+        'task': 'assets.tasks.run_monthly_depreciation',
+        'schedule': crontab(day_of_month=1, hour=1, minute=0),
+    },
+    'nightly-invoice-overdue-sweep': {
+        'task': 'finance.invoicing.tasks.sweep_overdue_invoices',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    'retry-pending-mpesa-callbacks': {
+        'task': 'finance.payment.tasks.retry_pending_mpesa_callbacks',
+        'schedule': crontab(minute='*/5'),
+    },
+    'dispatch-webhooks': {
+        'task': 'integrations.tasks.dispatch_webhooks',
+        'schedule': 30.0,
+    },
+    'submit-etims-outbox': {
+        'task': 'integrations.tasks.submit_etims_outbox',
+        'schedule': crontab(minute='*'),
+    },
+}
+
+# Task bookkeeping: write-behind flush interval (seconds) and task log retention (days)
+TASK_BUFFER_FLUSH_INTERVAL = float(os.environ.get('TASK_BUFFER_FLUSH_INTERVAL', 2.0))
+TASK_LOG_RETENTION_DAYS = int(os.environ.get('TASK_LOG_RETENTION_DAYS', 14))
+
 # Cache settings
 CACHES = {
     'default': {
@@ -213,6 +250,10 @@ CACHES = {
     }
 }
 
+# Cached token authentication (authmanagement.backends.CachedTokenAuthentication)
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 300))  # Shared (Redis) principal cache
+AUTH_TOKEN_LOCAL_TTL = int(os.environ.get('AUTH_TOKEN_LOCAL_TTL', 5))  # In-process copy; bounds staleness without pub/sub
+
 # Use Redis cache for sessions
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
@@ -527,7 +568,7 @@ MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'authmanagement.backends.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ),
@@ -0,0 +1,92 @@
+"""
+Approval inbox: the approvals waiting on a user, and their badge count.
+
+An approval is in a user's inbox while it is pending with them as approver,
+or delegated to them. Inbox pages are keyset paginated on
+(created_at, id) - served by the idx_approval_*_inbox indexes - and the
+objects being approved are prefetched once per content type.
+
+Pending counts are cached per user and kept current incrementally: saving or
+deleting an Approval moves one unit between the previous and the new inbox
+owner when the transaction commits (see approvals.signals). Bulk updates
+that bypass signals call invalidate_pending_counts; a missing count is
+recounted on the next read.
+"""
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from core.pagination import KeysetPagination
+from .models import Approval
+
+logger = logging.getLogger(__name__)
+
+PENDING_COUNT_TIMEOUT = 60 * 60
+
+
+def pending_count_key(user_id):
+    return f"approvals:pending:{user_id}"
+
+
+def inbox_filter(user):
+    user_id = getattr(user, 'pk', user)
+    return Q(approver_id=user_id, status='pending') | Q(delegated_to_id=user_id, status='delegated')
+
+
+def inbox_queryset(user):
+    """Approvals awaiting the user, newest first, with their targets prefetched per content type"""
+    return (
+        Approval.objects.filter(inbox_filter(user))
+        .select_related('workflow', 'step')
+        .prefetch_related('content_object')
+        .order_by('-created_at', '-id')
+    )
+
+
+def pending_count(user):
+    """Number of approvals awaiting the user; a cache read once counted"""
+    user_id = getattr(user, 'pk', user)
+    key = pending_count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Approval.objects.filter(inbox_filter(user_id)).count()
+        cache.set(key, count, PENDING_COUNT_TIMEOUT)
+    return max(count, 0)
+
+
+def _adjust_pending_count(user_id, delta):
+    try:
+        cache.incr(pending_count_key(user_id), delta)
+    except ValueError:
+        # Not cached: the next read counts from the database
+        pass
+
+
+def move_pending_item(from_user_id, to_user_id):
+    """Move one pending approval between inbox owners once the transaction commits"""
+    if from_user_id == to_user_id:
+        return
+
+    def apply():
+        if from_user_id:
+            _adjust_pending_count(from_user_id, -1)
+        if to_user_id:
+            _adjust_pending_count(to_user_id, 1)
+
+    transaction.on_commit(apply)
+
+
+def invalidate_pending_counts(user_ids):
+    """Drop cached counts after writes that bypass signals (queryset.update and the like)"""
+    keys = [pending_count_key(user_id) for user_id in set(user_ids) if user_id]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class ApprovalInboxPagination(KeysetPagination):
+    """Keyset pages over (created_at, id); the count comes from pending_count"""
+    page_size = 25
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('approvals', '0002_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='approval',
+            index=models.Index(fields=['approver', 'status', 'created_at'], name='idx_approval_inbox'),
+        ),
+        migrations.AddIndex(
+            model_name='approval',
+            index=models.Index(fields=['delegated_to', 'status', 'created_at'], name='idx_approval_delegate_inbox'),
+        ),
+    ]
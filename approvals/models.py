@@ -150,14 +150,38 @@ class Approval(models.Model):
             models.Index(fields=['status'], name='idx_approval_status'),
             models.Index(fields=['requested_at'], name='idx_approval_submitted_at'),
             models.Index(fields=['approved_at'], name='idx_approval_approved_at'),
+            models.Index(fields=['approver', 'status', 'created_at'], name='idx_approval_inbox'),
+            models.Index(fields=['delegated_to', 'status', 'created_at'], name='idx_approval_delegate_inbox'),
         ]
 
+    # Marks an instance loaded without the fields that decide its inbox owner
+    UNKNOWN_OWNER = object()
+
     def __str__(self):
         return f"Approval for {self.content_object} by {self.approver} - {self.status}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = instance.__dict__
+        if {'status', 'approver_id', 'delegated_to_id'} <= loaded.keys():
+            instance._loaded_inbox_owner_id = instance.inbox_owner_id
+        else:
+            instance._loaded_inbox_owner_id = cls.UNKNOWN_OWNER
+        return instance
+
+    @property
+    def inbox_owner_id(self):
+        """User whose inbox this approval is waiting in, if any"""
+        if self.status == 'pending':
+            return self.approver_id
+        if self.status == 'delegated':
+            return self.delegated_to_id
+        return None
+
     def approve(self, notes=None, comments=None):
         """Approve this approval"""
-        if self.status == 'pending':
+        if self.can_be_approved:
             self.status = 'approved'
             self.approved_at = timezone.now()
             if notes:
@@ -168,7 +192,7 @@ class Approval(models.Model):
 
     def reject(self, notes=None, comments=None):
         """Reject this approval"""
-        if self.status == 'pending':
+        if self.can_be_rejected:
             self.status = 'rejected'
             self.rejected_at = timezone.now()
             if notes:
@@ -204,13 +228,17 @@ class Approval(models.Model):
 
     @property
     def can_be_approved(self):
-        """Check if approval can be approved"""
-        return self.status == 'pending'
+        """Check if approval can be approved (by its inbox owner, see can_act)"""
+        return self.status in ('pending', 'delegated')
 
     @property
     def can_be_rejected(self):
-        """Check if approval can be rejected"""
-        return self.status == 'pending'
+        """Check if approval can be rejected (by its inbox owner, see can_act)"""
+        return self.status in ('pending', 'delegated')
+
+    def can_act(self, user):
+        """Only the approver may act on a pending approval; once delegated, only the delegate"""
+        return user.pk is not None and user.pk == self.inbox_owner_id
 
 
 class ApprovalRequest(models.Model):
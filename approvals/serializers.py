@@ -90,6 +90,31 @@ class ApprovalSerializer(serializers.ModelSerializer):
         return "Unknown"
 
 
+class ApprovalInboxSerializer(serializers.ModelSerializer):
+    """Inbox rows; expects workflow and step selected and content_object prefetched (approvals.inbox)"""
+    workflow_name = serializers.CharField(source='workflow.name', read_only=True)
+    step_name = serializers.CharField(source='step.name', read_only=True)
+    content_type = serializers.SerializerMethodField()
+    target = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Approval
+        fields = [
+            'id', 'workflow', 'workflow_name', 'step', 'step_name', 'content_type', 'object_id',
+            'target', 'status', 'approval_amount', 'delegated_to', 'requested_at', 'created_at'
+        ]
+        read_only_fields = fields
+
+    def get_content_type(self, obj):
+        # get_for_id is served from ContentType's in-process cache
+        content_type = ContentType.objects.get_for_id(obj.content_type_id)
+        return f"{content_type.app_label}.{content_type.model}"
+
+    def get_target(self, obj):
+        target = obj.content_object
+        return str(target) if target is not None else None
+
+
 class ApprovalRequestSerializer(serializers.ModelSerializer):
     requester = UserSerializer(read_only=True)
     workflow = ApprovalWorkflowSerializer(read_only=True)
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .inbox import invalidate_pending_counts, move_pending_item
+from .models import Approval
+
+
+@receiver(post_save, sender=Approval)
+def track_inbox_on_save(sender, instance, created, **kwargs):
+    """Keep cached pending counts in step as approvals are created, acted on or delegated"""
+    current = instance.inbox_owner_id
+    previous = None if created else getattr(instance, '_loaded_inbox_owner_id', Approval.UNKNOWN_OWNER)
+    if previous is Approval.UNKNOWN_OWNER:
+        invalidate_pending_counts([current])
+    else:
+        move_pending_item(previous, current)
+    instance._loaded_inbox_owner_id = current
+
+
+@receiver(post_delete, sender=Approval)
+def track_inbox_on_delete(sender, instance, **kwargs):
+    move_pending_item(instance.inbox_owner_id, None)
@@ -1,3 +1,79 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .inbox import pending_count
+from .models import Approval, ApprovalStep, ApprovalWorkflow
+
+User = get_user_model()
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ApprovalInboxTests(TestCase):
+    url = '/api/v1/approvals/requests/my_pending_approvals/'
+
+    def setUp(self):
+        cache.clear()
+        self.approver = User.objects.create_user(username='approver', email='approver@example.com', password='pass')
+        self.deputy = User.objects.create_user(username='deputy', email='deputy@example.com', password='pass')
+        self.workflow = ApprovalWorkflow.objects.create(name='Expenses', workflow_type='expense')
+        self.step = ApprovalStep.objects.create(workflow=self.workflow, step_number=1, name='Manager', can_delegate=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.approver)
+
+    def approval(self, target):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Approval.objects.create(
+                content_type=ContentType.objects.get_for_model(target), object_id=target.pk,
+                workflow=self.workflow, step=self.step, approver=self.approver,
+            )
+
+    def test_inbox_pages_by_keyset_with_targets_prefetched(self):
+        targets = [self.deputy, self.workflow, self.step]
+        approvals = [self.approval(target) for target in targets]
+        self.approval(self.approver).approve()
+
+        response = self.client.get(self.url, {'page_size': 2})
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([row['id'] for row in response.data['results']], [approvals[2].id, approvals[1].id])
+        self.assertEqual(response.data['results'][0]['target'], str(self.step))
+
+        with self.assertNumQueries(3):  # page, the content type left on it, request metrics row - no COUNT
+            response = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results']], [approvals[0].id])
+
+    def test_counts_follow_approve_reject_and_delegate(self):
+        first, second, third = (self.approval(target) for target in (self.deputy, self.workflow, self.step))
+        self.assertEqual((pending_count(self.approver), pending_count(self.deputy)), (3, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/v1/approvals/approvals/{first.id}/approve/')
+            self.client.post(f'/api/v1/approvals/approvals/{second.id}/delegate/', {'delegated_to': self.deputy.id})
+        with self.assertNumQueries(0):
+            self.assertEqual((pending_count(self.approver), pending_count(self.deputy)), (1, 1))
+
+        # The delegate can act on it from their own inbox
+        self.client.force_authenticate(self.deputy)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/v1/approvals/approvals/{second.id}/reject/')
+            third.delete()
+        response = self.client.get('/api/v1/approvals/requests/my_pending_approvals/count/')
+        self.assertEqual(response.data['count'], 0)
+        self.assertEqual((pending_count(self.approver), Approval.objects.get(pk=second.pk).status), (0, 'rejected'))
+
+    def test_only_the_delegate_can_act_once_delegated(self):
+        approval = self.approval(self.deputy)
+        self.client.post(f'/api/v1/approvals/approvals/{approval.id}/delegate/', {'delegated_to': self.deputy.id})
+
+        for verb in ('approve', 'reject'):
+            response = self.client.post(f'/api/v1/approvals/approvals/{approval.id}/{verb}/')
+            self.assertEqual(response.status_code, 403)
+        self.assertEqual(Approval.objects.get(pk=approval.pk).status, 'delegated')
+
+        self.client.force_authenticate(self.deputy)
+        self.assertEqual(self.client.post(f'/api/v1/approvals/approvals/{approval.id}/approve/').status_code, 200)
+        self.assertEqual(Approval.objects.get(pk=approval.pk).status, 'approved')
@@ -7,10 +7,11 @@ from django_filters import rest_framework as filters
 from django.db.models import Q
 from django.contrib.contenttypes.models import ContentType
 from .models import ApprovalWorkflow, ApprovalStep, Approval, ApprovalRequest
+from .inbox import ApprovalInboxPagination, inbox_queryset, pending_count
 from .serializers import (
     ApprovalWorkflowSerializer, ApprovalWorkflowListSerializer,
     ApprovalStepSerializer, ApprovalSerializer, ApprovalRequestSerializer,
-    ApprovalRequestListSerializer
+    ApprovalRequestListSerializer, ApprovalInboxSerializer
 )
 from django.contrib.auth import get_user_model
 from django.db import models
@@ -120,32 +121,49 @@ class ApprovalViewSet(viewsets.ModelViewSet):
         queryset = super().get_queryset()
         user = self.request.user
         
-        # If user is not superuser, only show their approvals
+        # If user is not superuser, only show their approvals and those delegated to them
         if not user.is_superuser:
-            queryset = queryset.filter(approver=user)
+            queryset = queryset.filter(Q(approver=user) | Q(delegated_to=user))
         
         return queryset.select_related('workflow', 'step', 'approver', 'content_type')
+
+    def _open_request(self, approval):
+        """The submitted/in-progress ApprovalRequest this approval belongs to, if any"""
+        return ApprovalRequest.objects.filter(
+            content_type_id=approval.content_type_id,
+            object_id=approval.object_id,
+            workflow_id=approval.workflow_id,
+            status__in=['submitted', 'in_progress'],
+        ).first()
     
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """Approve an approval request"""
         approval = self.get_object()
         
-        if approval.status != 'pending':
+        if not approval.can_act(request.user):
+            return Response(
+                {'error': 'Only the current approver can approve this approval'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if not approval.can_be_approved:
             return Response(
                 {'error': 'Approval is not in pending status'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        approval.status = 'approved'
-        approval.notes = request.data.get('notes', '')
-        approval.save()
+        approval.approve(notes=request.data.get('notes', ''))
         
         # Check if all approvals in the request are complete
-        request_obj = approval.approval_request
+        request_obj = self._open_request(approval)
         if request_obj:
-            pending_approvals = request_obj.approvals.filter(status='pending').count()
-            if pending_approvals == 0:
+            pending_approvals = Approval.objects.filter(
+                content_type_id=approval.content_type_id,
+                object_id=approval.object_id,
+                workflow_id=approval.workflow_id,
+                status__in=['pending', 'delegated'],
+            ).exists()
+            if not pending_approvals:
                 request_obj.status = 'approved'
                 request_obj.save()
         
@@ -156,24 +174,49 @@ class ApprovalViewSet(viewsets.ModelViewSet):
         """Reject an approval request"""
         approval = self.get_object()
         
-        if approval.status != 'pending':
+        if not approval.can_act(request.user):
+            return Response(
+                {'error': 'Only the current approver can reject this approval'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if not approval.can_be_rejected:
             return Response(
                 {'error': 'Approval is not in pending status'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        approval.status = 'rejected'
-        approval.notes = request.data.get('notes', '')
-        approval.save()
+        approval.reject(notes=request.data.get('notes', ''))
         
         # Mark the entire request as rejected
-        request_obj = approval.approval_request
+        request_obj = self._open_request(approval)
         if request_obj:
             request_obj.status = 'rejected'
             request_obj.save()
         
         return Response({'status': 'Approval rejected'})
 
+    @action(detail=True, methods=['post'])
+    def delegate(self, request, pk=None):
+        """Delegate a pending approval to another user"""
+        approval = self.get_object()
+        delegated_to = get_user_model().objects.filter(pk=request.data.get('delegated_to')).first()
+        
+        if approval.status == 'pending' and not approval.can_act(request.user):
+            return Response(
+                {'error': 'Only the current approver can delegate this approval'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        if delegated_to is None:
+            return Response({'error': 'delegated_to must be a valid user'}, status=status.HTTP_400_BAD_REQUEST)
+        if approval.status != 'pending' or not approval.step.can_delegate:
+            return Response(
+                {'error': 'Approval cannot be delegated'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        approval.delegate(delegated_to, notes=request.data.get('notes'))
+        return Response({'status': 'Approval delegated'})
+
 
 class ApprovalRequestFilter(filters.FilterSet):
     """Filter for ApprovalRequest"""
@@ -250,15 +293,21 @@ class ApprovalRequestViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def my_pending_approvals(self, request):
-        """Get pending approvals for the current user"""
-        user = request.user
-        pending_approvals = Approval.objects.filter(
-            approver=user,
-            status='pending'
-        ).select_related('workflow', 'approval_request', 'content_type')
-        
-        serializer = ApprovalSerializer(pending_approvals, many=True)
-        return Response(serializer.data)
+        """Get pending approvals for the current user (keyset paginated, newest first)"""
+        paginator = ApprovalInboxPagination()
+        page = paginator.paginate_queryset(inbox_queryset(request.user), request, view=self)
+        serializer = ApprovalInboxSerializer(page, many=True, context={'request': request})
+        return Response({
+            'count': pending_count(request.user),
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': serializer.data
+        })
+
+    @action(detail=False, methods=['get'], url_path='my_pending_approvals/count')
+    def my_pending_approvals_count(self, request):
+        """Inbox badge count for the current user, served from cache"""
+        return Response({'count': pending_count(request.user)})
 
     @action(detail=True, methods=['get'])
     def audit(self, request, pk=None):
@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
-from decimal import Decimal, InvalidOperation
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from business.models import Branch
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
@@ -134,19 +134,25 @@ class Asset(models.Model):
 
         super().save(*args, **kwargs)
 
-    def calculate_depreciation(self, period_months=1):
-        """Calculate depreciation for a given period"""
+    def calculate_depreciation(self, period_months=1, book_value=None):
+        """
+        Calculate depreciation for a given period, using the same rules as the
+        period-close run (assets.services.depreciation): declining balance
+        depreciates the book value, and the book value never falls below salvage.
+        """
         if not self.purchase_cost or not self.depreciation_rate:
             return Decimal('0.00')
+        if book_value is None:
+            book_value = self.current_value - (self.accumulated_depreciation or Decimal('0.00'))
 
+        rate = self.depreciation_rate / Decimal('100') * Decimal(period_months) / 12
         if self.depreciation_method == 'straight_line':
-            depreciation_rate_decimal = self.depreciation_rate / Decimal('100')
-            annual_depreciation = (self.purchase_cost - self.salvage_value) * depreciation_rate_decimal
-            return annual_depreciation * (period_months / 12)
+            depreciation = (self.purchase_cost - self.salvage_value) * rate
         else:
             # Declining balance method
-            rate = self.depreciation_rate / Decimal('100')
-            return self.current_value * rate * (period_months / 12)
+            depreciation = book_value * rate
+        depreciation = min(max(depreciation, Decimal('0.00')), max(book_value - self.salvage_value, Decimal('0.00')))
+        return depreciation.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
     def get_depreciation_schedule(self, years=None):
         """Get depreciation schedule for the asset"""
@@ -158,7 +164,7 @@ class Asset(models.Model):
         accumulated = Decimal('0.00')
 
         for year in range(1, years + 1):
-            depreciation = self.calculate_depreciation(12)
+            depreciation = self.calculate_depreciation(12, book_value=current_value)
             accumulated += depreciation
             current_value -= depreciation
 
@@ -0,0 +1,132 @@
+"""
+Period-close depreciation run.
+
+Posts one AssetDepreciation row per eligible asset for a period and rolls
+each asset's accumulated depreciation and book value forward. Eligible
+assets are loaded in a single query and the amounts are computed in integer
+cents across numpy arrays:
+
+- straight line:      (purchase cost - salvage) x rate x months / 12
+- declining balance:  book value x rate x months / 12
+
+rounded half-up to the cent and capped so the book value never falls below
+the salvage value; the same rules back Asset.calculate_depreciation.
+
+A run is idempotent per period: assets that already have a record starting
+on period_start are skipped, so re-running a period (or resuming a failed
+run) only posts what is missing.
+"""
+from calendar import monthrange
+from datetime import date
+from decimal import Decimal
+import logging
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from assets.models import Asset, AssetDepreciation
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000
+CENTS = Decimal('0.01')
+
+
+def month_bounds(year, month):
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+def previous_month(today=None):
+    """(first day, last day) of the month before today"""
+    today = today or date.today()
+    year, month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+    return month_bounds(year, month)
+
+
+def period_months(period_start, period_end):
+    return max((period_end.year - period_start.year) * 12 + period_end.month - period_start.month + 1, 1)
+
+
+def compute_depreciation(cost, current, salvage, accumulated, rate_bp, declining, months):
+    """
+    Vectorised depreciation in integer cents. rate_bp is the annual rate in
+    basis points (12.5% -> 1250). Returns (amount, accumulated, book value) arrays.
+    """
+    book = current - accumulated
+    base = np.where(declining, book, cost - salvage).clip(min=0)
+    denominator = 12 * 10000
+    # Half-up rounding of base * rate * months / (12 * 10000) without leaving integers
+    amount = (base * rate_bp * months * 2 + denominator) // (2 * denominator)
+    amount = np.minimum(amount, (book - salvage).clip(min=0))
+    accumulated = accumulated + amount
+    return amount, accumulated, current - accumulated
+
+
+def _cents(values):
+    return np.fromiter((int(value * 100) for value in values), dtype=np.int64, count=len(values))
+
+
+def eligible_assets(period_start, period_end, business_id=None, branch_id=None):
+    assets = Asset.objects.filter(
+        Q(purchase_date__isnull=True) | Q(purchase_date__lte=period_end),
+        status='active', is_active=True, depreciation_rate__gt=0, purchase_cost__gt=0,
+    ).exclude(
+        Exists(AssetDepreciation.objects.filter(asset=OuterRef('pk'), period_start=period_start))
+    )
+    if business_id:
+        assets = assets.filter(branch__business_id=business_id)
+    if branch_id:
+        assets = assets.filter(branch_id=branch_id)
+    return assets
+
+
+def run_depreciation(period_start, period_end=None, business_id=None, branch_id=None):
+    """
+    Post depreciation for every eligible asset for the period (a calendar month
+    by default). Returns {'period_start', 'period_end', 'assets', 'total'}.
+    """
+    if period_end is None:
+        period_end = month_bounds(period_start.year, period_start.month)[1]
+    rows = list(eligible_assets(period_start, period_end, business_id, branch_id).order_by().values_list(
+        'id', 'purchase_cost', 'current_value', 'salvage_value', 'accumulated_depreciation',
+        'depreciation_rate', 'depreciation_method',
+    ))
+    summary = {'period_start': period_start, 'period_end': period_end, 'assets': 0, 'total': Decimal('0.00')}
+    if not rows:
+        return summary
+
+    ids, cost, current, salvage, accumulated, rate, method = zip(*rows)
+    amount, accumulated, book = compute_depreciation(
+        _cents(cost), _cents(current), _cents(salvage), _cents([value or 0 for value in accumulated]),
+        _cents(rate), np.array(method) == 'declining_balance', period_months(period_start, period_end),
+    )
+    posted = np.flatnonzero(amount > 0)
+    records = [
+        AssetDepreciation(
+            asset_id=ids[i], period_start=period_start, period_end=period_end,
+            depreciation_amount=Decimal(int(amount[i])) * CENTS,
+            accumulated_depreciation=Decimal(int(accumulated[i])) * CENTS,
+            book_value=Decimal(int(book[i])) * CENTS,
+        )
+        for i in posted
+    ]
+    posted_ids = [ids[i] for i in posted]
+
+    record = AssetDepreciation.objects.filter(asset=OuterRef('pk'), period_start=period_start)
+    with transaction.atomic():
+        AssetDepreciation.objects.bulk_create(records, batch_size=BATCH_SIZE)
+        # Absolute values from this period's record, so repeating the update is harmless
+        for offset in range(0, len(posted_ids), BATCH_SIZE):
+            Asset.objects.filter(id__in=posted_ids[offset:offset + BATCH_SIZE]).update(
+                accumulated_depreciation=Subquery(record.values('accumulated_depreciation')[:1]),
+                book_value=Subquery(record.values('book_value')[:1]),
+            )
+
+    summary['assets'] = len(records)
+    summary['total'] = Decimal(int(amount.sum())) * CENTS
+    logger.info(
+        f"Depreciation {period_start} to {period_end}: {summary['assets']} assets, total {summary['total']}"
+        f"{f' (business {business_id})' if business_id else ''}"
+    )
+    return summary
@@ -0,0 +1,30 @@
+"""
+Celery tasks for fixed assets.
+"""
+from datetime import date
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def run_monthly_depreciation(period_start=None, business_id=None):
+    """
+    Post depreciation for a month (ISO date of any day in it; the previous
+    month by default) across every business, or one business when given.
+    Safe to re-run: assets already posted for the month are skipped.
+    """
+    from assets.services.depreciation import month_bounds, previous_month, run_depreciation
+
+    if period_start:
+        day = date.fromisoformat(str(period_start))
+        start, end = month_bounds(day.year, day.month)
+    else:
+        start, end = previous_month()
+    summary = run_depreciation(start, end, business_id=business_id)
+    return {
+        'period_start': start.isoformat(), 'period_end': end.isoformat(),
+        'assets': summary['assets'], 'total': str(summary['total']),
+    }
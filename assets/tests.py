@@ -1,3 +1,80 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from assets.models import Asset, AssetDepreciation
+from assets.services.depreciation import run_depreciation
+from business.models import Branch, BusinessLocation, Bussiness
+
+User = get_user_model()
+
+
+class DepreciationRunTests(TestCase):
+    def setUp(self):
+        self.user = user = User.objects.create_user(username='assets', email='assets@example.com', password='pass')
+        location = BusinessLocation.objects.create(city='Nairobi')
+        business = Bussiness.objects.create(name='Asset Biz', owner=user, location=location)
+        self.branch = Branch.objects.create(name='HQ', business=business, location=location, branch_code='AST01')
+        self.business = business
+
+    def asset(self, tag, cost, rate, method='straight_line', salvage=0, **fields):
+        return Asset.objects.create(
+            asset_tag=tag, name=tag, branch=self.branch, purchase_cost=cost, current_value=cost,
+            salvage_value=salvage, depreciation_rate=rate, depreciation_method=method,
+            purchase_date=date(2025, 1, 1), **fields,
+        )
+
+    def test_posts_each_method_once_per_period(self):
+        straight = self.asset('SL-1', Decimal('12000'), Decimal('10'), salvage=Decimal('2000'))
+        declining = self.asset('DB-1', Decimal('10000'), Decimal('25'), method='declining_balance')
+        self.asset('RETIRED', Decimal('5000'), Decimal('10'), status='retired')
+
+        with self.assertNumQueries(5):
+            summary = run_depreciation(date(2026, 1, 1), business_id=self.business.id)
+        self.assertEqual((summary['assets'], summary['total']), (2, Decimal('291.66')))
+        straight.refresh_from_db()
+        self.assertEqual((straight.accumulated_depreciation, straight.book_value), (Decimal('83.33'), Decimal('11916.67')))
+
+        # Re-running the period posts nothing; the next period compounds on the book value
+        self.assertEqual(run_depreciation(date(2026, 1, 1))['assets'], 0)
+        run_depreciation(date(2026, 2, 1))
+        record = AssetDepreciation.objects.get(asset=declining, period_start=date(2026, 2, 1))
+        self.assertEqual((record.depreciation_amount, record.book_value), (Decimal('203.99'), Decimal('9587.68')))
+        declining.refresh_from_db()
+        self.assertEqual(declining.calculate_depreciation(), Decimal('199.74'))
+
+    def test_book_value_never_falls_below_salvage(self):
+        asset = self.asset('NEAR-END', Decimal('1000'), Decimal('50'), salvage=Decimal('900'))
+        Asset.objects.filter(pk=asset.pk).update(accumulated_depreciation=Decimal('60'))
+        run_depreciation(date(2026, 1, 1), date(2026, 12, 31))
+        asset.refresh_from_db()
+        self.assertEqual((asset.accumulated_depreciation, asset.book_value), (Decimal('100.00'), Decimal('900.00')))
+        self.assertEqual(run_depreciation(date(2027, 1, 1))['assets'], 0)
+
+    def test_run_endpoint_is_limited_to_the_callers_business(self):
+        other_owner = User.objects.create_user(username='other', email='other@example.com', password='pass')
+        other = Bussiness.objects.create(name='Other Biz', owner=other_owner, location=self.branch.location)
+        other_branch = Branch.objects.create(name='Other HQ', business=other, location=self.branch.location, branch_code='AST02')
+        self.asset('MINE', Decimal('12000'), Decimal('10'))
+        Asset.objects.create(
+            asset_tag='THEIRS', name='THEIRS', branch=other_branch, purchase_cost=Decimal('12000'), current_value=Decimal('12000'),
+            depreciation_rate=Decimal('10'), depreciation_method='straight_line', purchase_date=date(2025, 1, 1),
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = '/api/v1/assets/assets/run-depreciation/'
+
+        self.assertEqual(client.post(url, {'period': '2026-01'}, format='json').status_code, 403)
+        self.user.user_permissions.add(Permission.objects.get(codename='add_assetdepreciation'))
+        self.user = User.objects.get(pk=self.user.pk)
+        client.force_authenticate(self.user)
+        self.assertEqual(client.post(url, {'period': '2026-01', 'business': other.id}, format='json').status_code, 403)
+        self.assertEqual(client.post(url, {'period': '2026-01', 'branch': other_branch.id}, format='json').status_code, 403)
 
-# Create your tests here.
+        response = client.post(url, {'period': '2026-01'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(list(AssetDepreciation.objects.values_list('asset__asset_tag', flat=True)), ['MINE'])
@@ -43,6 +43,7 @@ class AssetViewSet(BaseModelViewSet):
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['category', 'status', 'branch', 'assigned_to', 'custodian', 'condition']
+    rbac_actions = {'run_depreciation': ('add', AssetDepreciation)}
 
     def get_queryset(self):
         """Optimize queries with select_related for related objects."""
@@ -250,6 +251,97 @@ class AssetViewSet(BaseModelViewSet):
                 correlation_id=get_correlation_id(request)
             )
 
+    def _depreciation_scope(self, request):
+        """
+        (business_id, branch_id, error response) for a depreciation run: the body's
+        business/branch, else the request's business/branch context. Only superusers
+        may run it across every business; others are limited to businesses they own
+        or work for.
+        """
+        from business.models import Branch
+        from core.utils import get_branch_id_from_request, get_business_id_from_request, get_user_business_ids
+
+        correlation_id = get_correlation_id(request)
+        try:
+            business_id = request.data.get('business') or get_business_id_from_request(request)
+            branch_id = request.data.get('branch') or get_branch_id_from_request(request)
+            business_id = int(business_id) if business_id else None
+            branch_id = int(branch_id) if branch_id else None
+        except (TypeError, ValueError):
+            return None, None, APIResponse.bad_request(message='business and branch must be IDs', correlation_id=correlation_id)
+
+        if branch_id:
+            branch_business = Branch.objects.filter(pk=branch_id).values_list('business_id', flat=True).first()
+            if branch_business is None:
+                return None, None, APIResponse.not_found(message='Branch not found', correlation_id=correlation_id)
+            if business_id and business_id != branch_business:
+                return None, None, APIResponse.bad_request(message='Branch does not belong to the business', correlation_id=correlation_id)
+            business_id = branch_business
+
+        user = request.user
+        if user.is_superuser:
+            return business_id, branch_id, None
+        allowed = get_user_business_ids(user)
+        if business_id is None:
+            if len(allowed) != 1:
+                return None, None, APIResponse.bad_request(message='business is required', correlation_id=correlation_id)
+            business_id = next(iter(allowed))
+        if business_id not in allowed:
+            return None, None, APIResponse.forbidden(message='You cannot run depreciation for this business', correlation_id=correlation_id)
+        return business_id, branch_id, None
+
+    @action(detail=False, methods=['post'], url_path='run-depreciation')
+    def run_depreciation(self, request):
+        """
+        Post depreciation for every eligible asset for a month.
+        Body: period (YYYY-MM, defaults to last month), optional business/branch
+        (defaults to the request's business/branch context).
+        Re-running a month only posts assets that were missed.
+        """
+        from assets.services.depreciation import month_bounds, previous_month, run_depreciation
+        try:
+            correlation_id = get_correlation_id(request)
+            business_id, branch_id, error = self._depreciation_scope(request)
+            if error is not None:
+                return error
+            period = request.data.get('period')
+            if period:
+                try:
+                    year, month = (int(part) for part in str(period).split('-')[:2])
+                    start, end = month_bounds(year, month)
+                except (TypeError, ValueError):
+                    return APIResponse.bad_request(
+                        message='period must be in YYYY-MM format',
+                        correlation_id=correlation_id
+                    )
+            else:
+                start, end = previous_month()
+
+            summary = run_depreciation(start, end, business_id=business_id, branch_id=branch_id)
+
+            AuditTrail.log(
+                operation=AuditTrail.CREATE,
+                module='assets',
+                entity_type='AssetDepreciation',
+                entity_id=start.strftime('%Y-%m'),
+                user=request.user,
+                reason=f"Depreciation run {start} to {end}: {summary['assets']} assets",
+                request=request
+            )
+
+            return APIResponse.success(
+                data=summary,
+                message='Depreciation run completed',
+                correlation_id=correlation_id
+            )
+        except Exception as e:
+            logger.error(f'Error running depreciation: {str(e)}', exc_info=True)
+            return APIResponse.server_error(
+                message='Error running depreciation',
+                error_id=str(e),
+                correlation_id=get_correlation_id(request)
+            )
+
 class AssetDepreciationViewSet(viewsets.ModelViewSet):
     queryset = AssetDepreciation.objects.all()
     serializer_class = AssetDepreciationSerializer
@@ -5,3 +5,7 @@ class AuthmanagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authmanagement'
     verbose_name="User Management"
+
+    def ready(self):
+        # Cached token principals are revoked from model signals
+        import authmanagement.signals  # noqa: F401
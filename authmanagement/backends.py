@@ -1,9 +1,52 @@
-#email backend
-from django.contrib.auth.backends import ModelBackend
+"""
+Authentication backends: login by email, and cached token authentication
+for API calls.
+
+DRF's TokenAuthentication joins authtoken_token and the user table on every
+API call. CachedTokenAuthentication resolves the token from a short-lived
+in-process cache, then the shared (Redis) cache, and only falls back to the
+database on a miss. What is cached is a slim principal - the user's id,
+profile and status flags, group names, permission codenames and any active
+lockout - from which a user instance is rebuilt without a query; fields that
+are not part of the principal load lazily on first access.
+
+Revocation (logout, password change/reset, lockout, role changes) deletes the
+shared entry and publishes the token keys on REVOCATION_CHANNEL so every
+process drops its local copy immediately. Without pub/sub the local copy
+still expires after AUTH_TOKEN_LOCAL_TTL seconds.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_TTL = getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 300)
+LOCAL_TOKEN_TTL = getattr(settings, 'AUTH_TOKEN_LOCAL_TTL', 5)
+LOCAL_CACHE_MAX_ENTRIES = 10000
+REVOCATION_CHANNEL = 'bengo_erp:auth:revocations'
+PRINCIPAL_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'middle_name',
+    'is_active', 'is_staff', 'is_superuser', 'must_change_password',
+)
+
+_local_principals = {}
+_subscriber_started = False
+_subscriber_lock = threading.Lock()
+
 
 class EmailBackend(ModelBackend):
     def authenticate(self, request, username=None, password=None, **kwargs):
@@ -31,4 +74,194 @@ class EmailBackend(ModelBackend):
                 return user
             return None  # Explicit return on password failure
         except User.DoesNotExist:
-            return None  # User doesn't exist
\ No newline at end of file
+            return None  # User doesn't exist
+
+
+def _token_cache_key(key):
+    return f'auth:token:{key}'
+
+
+def _generation_key(user_id):
+    return f'auth:generation:{user_id}'
+
+
+def build_principal(user):
+    """Slim, picklable snapshot of what authentication and permission checks need"""
+    from authmanagement.security import AccountLockout
+
+    locked_until = None
+    for until in AccountLockout.objects.filter(user=user, is_locked=True).values_list('locked_until', flat=True):
+        if until is None:
+            locked_until = float('inf')
+        elif until > timezone.now():
+            locked_until = max(locked_until or 0, until.timestamp())
+    return {
+        'fields': {field: getattr(user, User._meta.get_field(field).attname) for field in PRINCIPAL_FIELDS},
+        'groups': list(user.groups.values_list('id', 'name')),
+        'permissions': sorted(ModelBackend().get_all_permissions(user)),
+        'locked_until': locked_until,
+    }
+
+
+def user_from_principal(principal):
+    """User instance with the principal's fields loaded and the rest deferred"""
+    fields = principal['fields']
+    attnames = {User._meta.get_field(field).attname: value for field, value in fields.items()}
+    values = [attnames[f.attname] for f in User._meta.concrete_fields if f.attname in attnames]
+    user = User.from_db('default', list(attnames), values)
+    permissions = set(principal['permissions'])
+    # ModelBackend reads these before querying
+    user._perm_cache = permissions
+    user._user_perm_cache = permissions
+    user._group_perm_cache = permissions
+    # A real queryset, so user.groups.filter(...) still queries; only .all() is served from the principal
+    groups = Group.objects.filter(pk__in=[pk for pk, _ in principal['groups']])
+    groups._result_cache = [Group(id=pk, name=name) for pk, name in principal['groups']]
+    groups._prefetch_done = True
+    user._prefetched_objects_cache = {'groups': groups}
+    # The principal can be TOKEN_CACHE_TTL old; see refresh_principal_fields
+    user._principal_values = dict(attnames)
+    return user
+
+
+def refresh_principal_fields(user, update_fields=None):
+    """
+    Before a user rebuilt from a principal is saved, reload the principal
+    fields the caller has not changed, so a save never writes cached values
+    back over newer ones.
+    """
+    original = user.__dict__.get('_principal_values')
+    if not original or user.pk is None:
+        return
+    stale = [
+        attname for attname, value in original.items()
+        if attname != 'id' and getattr(user, attname) == value
+        and (update_fields is None or attname in update_fields or User._meta.get_field(attname).name in update_fields)
+    ]
+    current = User.objects.filter(pk=user.pk).values(*stale).first() if stale else None
+    for attname, value in (current or {}).items():
+        setattr(user, attname, value)
+        original[attname] = value
+
+
+def _remember_locally(key, principal):
+    if len(_local_principals) >= LOCAL_CACHE_MAX_ENTRIES:
+        _local_principals.clear()
+    _local_principals[key] = (time.monotonic() + LOCAL_TOKEN_TTL, principal)
+
+
+def _forget_locally(keys):
+    for key in keys:
+        _local_principals.pop(key, None)
+
+
+def get_principal(key):
+    """Principal for a token key: local cache, then shared cache, then the database"""
+    local = _local_principals.get(key)
+    if local and local[0] > time.monotonic():
+        return local[1]
+
+    principal = cache.get(_token_cache_key(key))
+    if principal is None:
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            return None
+        generation = cache.get(_generation_key(token.user_id))
+        principal = build_principal(token.user)
+        cache.set(_token_cache_key(key), principal, TOKEN_CACHE_TTL)
+        if cache.get(_generation_key(token.user_id)) != generation:
+            # Revoked while the principal was being built
+            cache.delete(_token_cache_key(key))
+    _remember_locally(key, principal)
+    return principal
+
+
+def _publish_revocation(keys):
+    if 'django_redis' not in settings.CACHES['default']['BACKEND']:
+        return
+    try:
+        from django_redis import get_redis_connection
+        get_redis_connection('default').publish(REVOCATION_CHANNEL, ','.join(keys))
+    except Exception as e:
+        logger.debug(f"Token revocation not published: {e}")
+
+
+def _listen_for_revocations():
+    from django_redis import get_redis_connection
+
+    while True:
+        try:
+            pubsub = get_redis_connection('default').pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(REVOCATION_CHANNEL)
+            for message in pubsub.listen():
+                data = message.get('data')
+                if isinstance(data, bytes):
+                    data = data.decode()
+                if data:
+                    _forget_locally(data.split(','))
+        except Exception as e:
+            logger.debug(f"Token revocation listener reconnecting: {e}")
+            # Anything published while disconnected is missed; expire local copies instead
+            _local_principals.clear()
+            time.sleep(LOCAL_TOKEN_TTL)
+
+
+def start_revocation_listener():
+    """Subscribe this process to revocations (once, on first authentication)"""
+    global _subscriber_started
+    if _subscriber_started or not getattr(settings, 'AUTH_TOKEN_PUBSUB', True):
+        return
+    with _subscriber_lock:
+        if _subscriber_started:
+            return
+        _subscriber_started = True
+        if 'django_redis' not in settings.CACHES['default']['BACKEND']:
+            return
+        threading.Thread(target=_listen_for_revocations, name='token-revocations', daemon=True).start()
+
+
+def revoke_tokens(keys, user_ids=()):
+    """Drop cached principals for token keys everywhere"""
+    keys = [key for key in keys if key]
+    for user_id in user_ids:
+        cache.set(_generation_key(user_id), time.time_ns(), TOKEN_CACHE_TTL)
+    if not keys:
+        return
+    cache.delete_many([_token_cache_key(key) for key in keys])
+    _forget_locally(keys)
+    _publish_revocation(keys)
+
+
+def revoke_user_tokens(user_ids):
+    """Drop cached principals for every token of the given users (the tokens stay valid)"""
+    user_ids = list(user_ids)
+    revoke_tokens(Token.objects.filter(user_id__in=user_ids).values_list('key', flat=True), user_ids=user_ids)
+
+
+def revoke_user_tokens_on_commit(user_ids):
+    """revoke_user_tokens once the current transaction commits, so no request re-caches the old principal"""
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: revoke_user_tokens(user_ids))
+
+
+def rotate_user_token(user):
+    """Delete the user's token and issue a new one, signing out every other client"""
+    Token.objects.filter(user=user).delete()
+    return Token.objects.create(user=user)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement for TokenAuthentication backed by the principal cache"""
+
+    def authenticate_credentials(self, key):
+        start_revocation_listener()
+        principal = get_principal(key)
+        if principal is None:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if not principal['fields']['is_active']:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        if principal['locked_until'] and principal['locked_until'] > time.time():
+            raise exceptions.AuthenticationFailed('Account is temporarily locked.')
+        user = user_from_principal(principal)
+        return user, Token(key=key, user=user)
@@ -0,0 +1,74 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from authmanagement.backends import CachedTokenAuthentication
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request authentication overhead of DRF token auth vs the cached principal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=1000)
+        parser.add_argument('--email', help='Benchmark an existing user instead of a throwaway one')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, options):
+        if options['email']:
+            user = User.objects.get(email=options['email'])
+        else:
+            user = User.objects.create(
+                email=f'bench-{uuid.uuid4().hex[:8]}@example.com', first_name='Bench', last_name='User'
+            )
+            group = Group.objects.create(name=f'bench-{uuid.uuid4().hex[:8]}')
+            group.permissions.set(Permission.objects.all()[:50])
+            user.groups.add(group)
+        token, _ = Token.objects.get_or_create(user=user)
+        factory = RequestFactory()
+        permission = next(iter(Permission.objects.filter(group__user=user).values_list(
+            'content_type__app_label', 'codename'
+        )[:1]), ('core', 'view_anything'))
+        permission = '.'.join(permission)
+
+        iterations = options['iterations']
+        self.stdout.write(f'{iterations} authenticated requests for {user.email}, checking {permission}')
+        for label, backend in (('TokenAuthentication', TokenAuthentication()),
+                               ('CachedTokenAuthentication', CachedTokenAuthentication())):
+            def request_once():
+                request = Request(factory.get('/', HTTP_AUTHORIZATION=f'Token {token.key}'))
+                authenticated_user, _ = backend.authenticate(request)
+                authenticated_user.has_perm(permission)
+                list(authenticated_user.groups.all())
+
+            request_once()  # Warm caches
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(iterations):
+                    request_once()
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{label:<28} {elapsed / iterations * 1e6:9.1f} us/request  '
+                f'{len(queries) / iterations:5.2f} queries/request'
+            )
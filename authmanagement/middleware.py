@@ -4,13 +4,17 @@ from authmanagement.models import CustomUser
 from django.utils import timezone
 from django.contrib.auth.hashers import make_password
 from django.db import IntegrityError
+from django.db.models import Q
 import logging
+import time
 
 from business.models import BusinessLocation, Branch
 from crm.contacts.models import Contact
 
 logger = logging.getLogger(__name__)
 
+ADMIN_CHECK_INTERVAL = 300  # seconds
+
 class SiteWideConfigs:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -20,14 +24,15 @@ class SiteWideConfigs:
         self._walkin_users_initialized = False
         self._ess_permissions_assigned = False
         self._ess_settings_initialized = False
+        self._admin_checked_at = time.monotonic()
 
     def __call__(self, request):
         # Only run non-RBAC initialization logic once per server startup
         if not self._admin_user_initialized:
             self._initialize_admin_user()
         
-        # Always check if admin user exists, even if marked as initialized
-        if self._admin_user_initialized:
+        # Re-check that the admin user still exists, at most every ADMIN_CHECK_INTERVAL seconds
+        if self._admin_user_initialized and time.monotonic() - self._admin_checked_at > ADMIN_CHECK_INTERVAL:
             self._ensure_admin_user_exists()
         
         if not self._walkin_users_initialized:
@@ -105,8 +110,9 @@ class SiteWideConfigs:
 
     def _ensure_admin_user_exists(self):
         """Ensure admin user exists, reset flag if not"""
+        self._admin_checked_at = time.monotonic()
         try:
-            if not CustomUser.objects.filter(username='admin').exists() and not CustomUser.objects.filter(email='admin@codevertexitsolutions.com').exists():
+            if not CustomUser.objects.filter(Q(username='admin') | Q(email='admin@codevertexitsolutions.com')).exists():
                 logger.warning("Admin user not found despite being marked as initialized. Resetting flag.")
                 self._admin_user_initialized = False
         except Exception as e:
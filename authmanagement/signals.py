@@ -0,0 +1,67 @@
+"""
+Drop cached token principals whenever what they snapshot changes:
+token deletion (logout, password change), user flags, group and
+permission membership, and account lockouts.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .backends import refresh_principal_fields, revoke_tokens, revoke_user_tokens_on_commit
+from .security import AccountLockout
+
+User = get_user_model()
+
+M2M_ACTIONS = ('post_add', 'post_remove', 'post_clear')
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    # After commit, so no request re-caches the token before the deletion is visible
+    key, user_id = instance.key, instance.user_id
+    transaction.on_commit(lambda: revoke_tokens([key], user_ids=[user_id]))
+
+
+@receiver(pre_save, sender=User)
+def refresh_cached_principal_fields(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        refresh_principal_fields(instance, update_fields)
+
+
+@receiver(post_save, sender=User)
+def revoke_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    revoke_user_tokens_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=AccountLockout)
+def revoke_on_lockout_change(sender, instance, **kwargs):
+    revoke_user_tokens_on_commit([instance.user_id])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def revoke_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in M2M_ACTIONS:
+        return
+    if not reverse:
+        revoke_user_tokens_on_commit([instance.pk])
+    elif pk_set is not None:
+        revoke_user_tokens_on_commit(pk_set)
+    else:
+        # A clear from the group/permission side does not report the affected users
+        revoke_user_tokens_on_commit(Token.objects.values_list('user_id', flat=True))
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def revoke_on_group_permission_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in M2M_ACTIONS:
+        return
+    if reverse:
+        groups = Group.objects.filter(permissions__in=pk_set) if pk_set is not None else Group.objects.all()
+    else:
+        groups = [instance]
+    revoke_user_tokens_on_commit(User.objects.filter(groups__in=groups).values_list('id', flat=True).distinct())
@@ -1,3 +1,109 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from authmanagement import backends
+from authmanagement.backends import CachedTokenAuthentication
+from authmanagement.security import AccountLockout
+
+User = get_user_model()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   AUTH_TOKEN_PUBSUB=False)
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        backends._local_principals.clear()
+        self.user = User.objects.create_user(
+            username='auth', email='auth@example.com', password='Secret#123', first_name='Auth', last_name='User'
+        )
+        self.group = Group.objects.create(name='auth-testers')
+        self.permission = Permission.objects.get(codename='view_group')
+        self.group.permissions.add(self.permission)
+        self.user.groups.add(self.group)
+        self.token = Token.objects.create(user=self.user)
+        self.factory = RequestFactory()
+
+    def _authenticate(self, key=None):
+        request = Request(self.factory.get('/', HTTP_AUTHORIZATION=f'Token {key or self.token.key}'))
+        return CachedTokenAuthentication().authenticate(request)[0]
+
+    def test_repeat_requests_use_cached_principal(self):
+        self._authenticate()
+        for clear_local in (False, True):
+            if clear_local:
+                backends._local_principals.clear()  # Served from the shared cache instead
+            with CaptureQueriesContext(connection) as queries:
+                user = self._authenticate()
+                self.assertTrue(user.has_perm('auth.view_group'))
+                self.assertEqual([group.name for group in user.groups.all()], ['auth-testers'])
+            self.assertEqual(len(queries), 0)
+        self.assertEqual((user.pk, user.email), (self.user.pk, 'auth@example.com'))
+        # Fields outside the principal still load on access
+        self.assertTrue(user.check_password('Secret#123'))
+
+    def test_cached_groups_still_query(self):
+        user = self._authenticate()
+        self.assertTrue(user.groups.filter(name='auth-testers').exists())
+        self.assertFalse(user.groups.filter(name='other').exists())
+
+    def test_save_does_not_write_back_cached_fields(self):
+        user = self._authenticate()
+        User.objects.filter(pk=self.user.pk).update(is_staff=True, last_name='Renamed')
+        user.first_name = 'Changed'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.first_name, self.user.last_name, self.user.is_staff), ('Changed', 'Renamed', True))
+
+    def test_role_change_is_visible_immediately(self):
+        self.assertTrue(self._authenticate().has_perm('auth.view_group'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.remove(self.permission)
+        self.assertFalse(self._authenticate().has_perm('auth.view_group'))
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+    def test_lockout_rejects_cached_token(self):
+        self._authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            AccountLockout.objects.create(
+                user=self.user, ip_address='10.0.0.1', user_agent='test', failed_attempts=5,
+                is_locked=True, locked_until=timezone.now() + timedelta(minutes=30),
+            )
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+    def test_logout_revokes_token(self):
+        self._authenticate()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.post('/api/v1/auth/logout/').status_code, 200)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+    def test_password_change_rotates_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.put('/api/v1/auth/change-password/', {
+                'old_password': 'Secret#123', 'new_password': 'Changed#456',
+            }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+        self.assertEqual(self._authenticate(response.json()['token']).pk, self.user.pk)
@@ -38,6 +38,7 @@ import threading
 from rest_framework import viewsets
 from .serializers import UserSerializer
 from core.base_viewsets import BaseModelViewSet
+from .backends import rotate_user_token
 from core.response import APIResponse, get_correlation_id
 from core.audit import AuditTrail
 import logging
@@ -191,6 +192,8 @@ class PasswordResetConfirmView(APIView):
                     except Exception:
                         pass
                     user.save()
+                    # Sign out every client still holding the old token
+                    Token.objects.filter(user=user).delete()
                 else:
                     return Response({"detail":"New password cannot be null!"}, status=status.HTTP_400_BAD_REQUEST)
                 return Response({"detail": "Password reset successfully."}, status=status.HTTP_200_OK)
@@ -226,8 +229,10 @@ class ChangePasswordView(UpdateAPIView):
                 pass
             self.object.save()
             update_session_auth_hash(request, self.object)  # Important to keep the user logged in
+            # Other clients lose the old token; this one continues with the new one
+            token = rotate_user_token(self.object)
 
-            return Response({"detail": "Password changed successfully."}, status=status.HTTP_200_OK)
+            return Response({"detail": "Password changed successfully.", "token": token.key}, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -242,6 +247,10 @@ class LogOutApiView(APIView):
     
     def post(self, request,):
         logout(request)
+        # Revoke the API token; deleting it drops the cached principal in every process
+        auth = authentication.get_authorization_header(request).split()
+        if len(auth) == 2 and auth[0].lower() == b'token':
+            Token.objects.filter(key=auth[1].decode(errors='ignore')).delete()
         return Response({"Logout Success!"}, status=status.HTTP_200_OK)
 
         
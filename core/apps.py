@@ -5,3 +5,7 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     verbose_name="Core Settings"
+
+    def ready(self):
+        # Invalidate the compiled RBAC index on permission changes
+        import core.signals  # noqa: F401
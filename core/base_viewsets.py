@@ -32,6 +32,7 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.http import Http404
 import logging
 
+from . import rbac
 from .response import APIResponse, get_correlation_id
 from .audit import AuditTrail
 from .validators import validate_non_negative_decimal
@@ -53,6 +54,8 @@ class BaseModelViewSet(viewsets.ModelViewSet):
     """
     
     permission_classes = [IsAuthenticated]
+    # {view action: (rbac action, module)} enforced by check_permissions; module None means the ViewSet's model
+    rbac_actions = {}
     
     def get_correlation_id(self):
         """Extract correlation ID from request headers or generate new one."""
@@ -78,6 +81,19 @@ class BaseModelViewSet(viewsets.ModelViewSet):
                 return serializer.Meta.model.__name__
         return self.__class__.__name__.replace('ViewSet', '')
     
+    def user_can(self, action, module=None):
+        """RBAC check against the compiled permission index; module defaults to the ViewSet's model."""
+        if module is None:
+            module = self.queryset.model if self.queryset is not None else self.get_queryset().model
+        return rbac.user_can(self.request.user, module, action)
+    
+    def check_permissions(self, request):
+        """permission_classes first, then the RBAC action this view action requires (see rbac_actions)."""
+        super().check_permissions(request)
+        required = self.rbac_actions.get(self.action)
+        if required and not self.user_can(*required):
+            self.permission_denied(request, message='You do not have permission to perform this action')
+    
     def get_entity_id(self, obj):
         """Get entity ID from object."""
         return getattr(obj, 'pk', None) or getattr(obj, 'id', None)
@@ -344,6 +360,8 @@ class BaseReadOnlyViewSet(viewsets.ReadOnlyModelViewSet):
     """
     
     permission_classes = [IsAuthenticated]
+    # {view action: (rbac action, module)} enforced by check_permissions; module None means the ViewSet's model
+    rbac_actions = {}
     
     def get_correlation_id(self):
         """Extract correlation ID from request headers or generate new one."""
@@ -360,6 +378,19 @@ class BaseReadOnlyViewSet(viewsets.ReadOnlyModelViewSet):
             return self.queryset.model.__name__
         return self.__class__.__name__.replace('ViewSet', '')
     
+    def user_can(self, action, module=None):
+        """RBAC check against the compiled permission index; module defaults to the ViewSet's model."""
+        if module is None:
+            module = self.queryset.model if self.queryset is not None else self.get_queryset().model
+        return rbac.user_can(self.request.user, module, action)
+    
+    def check_permissions(self, request):
+        """permission_classes first, then the RBAC action this view action requires (see rbac_actions)."""
+        super().check_permissions(request)
+        required = self.rbac_actions.get(self.action)
+        if required and not self.user_can(*required):
+            self.permission_denied(request, message='You do not have permission to perform this action')
+    
     def list(self, request, *args, **kwargs):
         """List with standardized error handling."""
         try:
@@ -0,0 +1,310 @@
+"""
+Streaming import framework shared by the bulk upload endpoint.
+
+Files are read in fixed-size chunks (pandas chunksize for CSV, openpyxl
+read-only mode for XLSX) so memory stays flat regardless of file size.
+Each chunk goes through column mapping, vectorised validation and a bulk
+upsert inside its own transaction; progress is reported after every chunk
+so a failed run can resume from the last committed row.
+
+Importers subclass ChunkedImporter and are registered in IMPORTERS by the
+``fileType`` sent to the upload endpoint.
+"""
+from abc import ABC, abstractmethod
+import logging
+import re
+import uuid
+
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils.module_loading import import_string
+from django.utils.text import slugify
+
+try:
+    from openpyxl import load_workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+IMPORTERS = {
+    'employees': 'hrm.employees.services.employee_import.EmployeeBulkImport',
+    'products': 'ecommerce.product.importers.ProductImporter',
+    'contacts': 'crm.contacts.importers.ContactImporter',
+}
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+BLANK_VALUES = ('', 'nan', 'nat', 'none', 'null', '-', '--')
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+
+
+class ImportFileError(ValueError):
+    """The uploaded file cannot be imported at all (wrong type, missing columns)"""
+
+
+def get_importer(file_type):
+    """Importer class registered for an upload ``fileType``"""
+    try:
+        return import_string(IMPORTERS[file_type])
+    except KeyError:
+        raise ImportFileError(f"Unsupported import type: {file_type}")
+
+
+def normalise_header(header):
+    return re.sub(r'[^a-z0-9]', '', str(header).lower())
+
+
+def iter_chunks(path, chunk_size, skip_rows=0):
+    """
+    Yield DataFrames of at most chunk_size rows (all values as strings).
+    The index of each chunk is the 0-based data row number in the file.
+    """
+    path_lower = str(path).lower()
+    if path_lower.endswith('.csv'):
+        reader = pd.read_csv(
+            path, dtype=str, keep_default_na=False, chunksize=chunk_size, skiprows=range(1, skip_rows + 1)
+        )
+        start = skip_rows
+        for chunk in reader:
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            start += len(chunk)
+            yield chunk
+    elif path_lower.endswith('.xlsx'):
+        if not OPENPYXL_AVAILABLE:
+            raise ImportFileError("Excel import requires openpyxl to be installed")
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = ['' if value is None else str(value).strip() for value in next(rows, ())]
+            batch, start = [], skip_rows
+            for position, values in enumerate(rows):
+                if position < skip_rows:
+                    continue
+                batch.append(['' if value is None else str(value) for value in values[:len(header)]])
+                if len(batch) == chunk_size:
+                    yield pd.DataFrame(batch, columns=header, index=pd.RangeIndex(start, start + len(batch)))
+                    start += len(batch)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header, index=pd.RangeIndex(start, start + len(batch)))
+        finally:
+            workbook.close()
+    elif path_lower.endswith('.xls'):
+        # Legacy workbooks cannot be streamed; load once and slice
+        df = pd.read_excel(path, dtype=str).fillna('')
+        for start in range(skip_rows, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    else:
+        raise ImportFileError("Unsupported file type. Please upload a .csv, .xls, or .xlsx file.")
+
+
+def count_rows(path):
+    """Cheap data-row count used as the progress total (None when unknown)"""
+    path_lower = str(path).lower()
+    try:
+        if path_lower.endswith('.csv'):
+            with open(path, 'rb') as handle:
+                return max(sum(1 for line in handle if line.strip()) - 1, 0)
+        if path_lower.endswith('.xlsx') and OPENPYXL_AVAILABLE:
+            workbook = load_workbook(path, read_only=True)
+            try:
+                max_row = workbook.active.max_row
+            finally:
+                workbook.close()
+            return max(max_row - 1, 0) if max_row else None
+    except Exception as e:
+        logger.warning(f"Could not count rows in {path}: {e}")
+    return None
+
+
+def unique_usernames(emails):
+    """Unique usernames for accounts created in bulk (CustomUser.save is bypassed by bulk_create)"""
+    User = get_user_model()
+    bases = {email: slugify(email.split('@')[0])[:140] or 'user' for email in emails}
+    taken = set(User.objects.filter(username__in=set(bases.values())).values_list('username', flat=True))
+    usernames = {}
+    for email, base in bases.items():
+        username = base if base not in taken else f"{base}-{uuid.uuid4().hex[:6]}"
+        taken.add(username)
+        usernames[email] = username
+    return usernames
+
+
+def resolve_lookup(model, field, values, build):
+    """
+    {value: pk} for a lookup table in one query, bulk-creating missing values
+    with build(value). The lowest id wins when the table already holds duplicates.
+    """
+    values = sorted(set(values))
+    found = {}
+    for pk, value in model.objects.filter(**{f'{field}__in': values}).order_by('-id').values_list('pk', field):
+        found[value] = pk
+    missing = [value for value in values if value not in found]
+    if missing:
+        model.objects.bulk_create([build(value) for value in missing], ignore_conflicts=True)
+        for pk, value in model.objects.filter(**{f'{field}__in': missing}).order_by('-id').values_list('pk', field):
+            found[value] = pk
+    return found
+
+
+def upsert_one_per_parent(model, parent_field, values_by_parent, on_create=None):
+    """
+    Update the newest existing row per parent and bulk-create the rest.
+    values_by_parent maps parent id -> field values (same keys for every parent).
+    """
+    if not values_by_parent:
+        return
+    existing = {}
+    for instance in model.objects.filter(**{f'{parent_field}__in': values_by_parent.keys()}).order_by('id'):
+        existing[getattr(instance, parent_field)] = instance
+    to_update, to_create = [], []
+    for parent_id, values in values_by_parent.items():
+        instance = existing.get(parent_id)
+        if instance is None:
+            instance = model(**{parent_field: parent_id}, **values)
+            if on_create:
+                on_create(instance)
+            to_create.append(instance)
+        else:
+            for field, value in values.items():
+                setattr(instance, field, value)
+            to_update.append(instance)
+    if to_create:
+        model.objects.bulk_create(to_create)
+    if to_update:
+        model.objects.bulk_update(to_update, list(next(iter(values_by_parent.values())).keys()))
+
+
+class ChunkedImporter(ABC):
+    """
+    Base class for streaming imports.
+
+    Subclasses declare ``columns`` ({canonical name: [accepted headers]}) and
+    implement ``prepare`` (normalise + validate one chunk, returning the valid
+    rows) and ``write`` (bulk upsert the valid rows). ``on_complete`` runs once
+    after the whole file has been imported; ``get_state``/``set_state`` carry any
+    extra bookkeeping across a resumed run.
+    """
+    columns = {}
+    required_columns = ()
+    chunk_size = DEFAULT_CHUNK_SIZE
+
+    def __init__(self, path, business, user=None, chunk_size=None, start_row=0, report=None, state=None,
+                 progress_callback=None):
+        self.path = path
+        self.business = business
+        self.user = user
+        self.chunk_size = chunk_size or self.chunk_size
+        self.start_row = start_row
+        self.processed = start_row
+        self.progress_callback = progress_callback
+        report = report or {}
+        self.imported = report.get('imported', 0)
+        self.failed = report.get('failed', 0)
+        self.error_count = report.get('error_count', 0)
+        self.errors = list(report.get('errors', []))
+        self._chunk_errors = []
+        self._resume_state = state or {}
+        self._aliases = {
+            normalise_header(alias): canonical
+            for canonical, aliases in self.columns.items()
+            for alias in (canonical, *aliases)
+        }
+
+    # Chunk helpers -------------------------------------------------------
+    def map_columns(self, chunk):
+        """Rename recognised headers to canonical names and add blanks for absent ones"""
+        renamed = {}
+        for header in chunk.columns:
+            canonical = self._aliases.get(normalise_header(header))
+            if canonical and canonical not in renamed.values():
+                renamed[header] = canonical
+        missing = [column for column in self.required_columns if column not in renamed.values()]
+        if missing:
+            raise ImportFileError(f"Missing required column(s): {', '.join(missing)}")
+        frame = chunk[list(renamed)].rename(columns=renamed)
+        for column in self.columns:
+            if column not in frame:
+                frame[column] = ''
+        frame['row'] = chunk.index + 2  # Spreadsheet row number (header is row 1)
+        return frame
+
+    @staticmethod
+    def text(frame, column, default=''):
+        """Stripped string column with blank-like values replaced by default"""
+        values = frame[column].fillna('').astype(str).str.strip()
+        return values.mask(values.str.lower().isin(BLANK_VALUES), default)
+
+    @staticmethod
+    def money(values):
+        """Numeric column from strings like 'KSh 1,200.50'; unparseable values become NaN"""
+        return pd.to_numeric(values.str.replace(r'[^\d.\-]', '', regex=True), errors='coerce')
+
+    def flag(self, frame, mask, column, message):
+        """Record an error for every row of frame selected by mask"""
+        for row in frame.loc[mask, 'row']:
+            self._chunk_errors.append({'row': int(row), 'column': column, 'error': message})
+
+    # Subclass hooks ------------------------------------------------------
+    @abstractmethod
+    def prepare(self, frame):
+        """Normalise and validate one chunk; returns the rows to write"""
+
+    @abstractmethod
+    def write(self, frame):
+        """Bulk upsert the valid rows of one chunk"""
+
+    def on_complete(self):
+        pass
+
+    def get_state(self):
+        return {}
+
+    def set_state(self, state):
+        pass
+
+    # Driver --------------------------------------------------------------
+    def report(self):
+        return {
+            'total_rows': self.processed,
+            'imported': self.imported,
+            'failed': self.failed,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+    def checkpoint(self):
+        """State needed to resume after the last committed chunk"""
+        return {'resume_from': self.processed, 'report': self.report(), 'state': self.get_state()}
+
+    def run(self):
+        self.set_state(self._resume_state)
+        total = count_rows(self.path)
+        for chunk in iter_chunks(self.path, self.chunk_size, skip_rows=self.start_row):
+            self._chunk_errors = []
+            frame = self.prepare(self.map_columns(chunk))
+            try:
+                if not frame.empty:
+                    with transaction.atomic():
+                        self.write(frame)
+                imported = len(frame)
+            except (OperationalError, InterfaceError):
+                raise  # Infrastructure failure: let the caller retry from the checkpoint
+            except Exception as e:
+                logger.error(f"{self.__class__.__name__} chunk at row {int(chunk.index[0]) + 2} failed: {e}")
+                self.flag(frame, frame['row'].notna(), None, f"Could not save row: {e}")
+                imported = 0
+
+            self.imported += imported
+            self.failed += len({error['row'] for error in self._chunk_errors})
+            self.error_count += len(self._chunk_errors)
+            self.errors += self._chunk_errors[:max(MAX_REPORTED_ERRORS - len(self.errors), 0)]
+            self.processed += len(chunk)
+            if self.progress_callback:
+                self.progress_callback(self.processed, max(total or 0, self.processed))
+
+        self.errors.sort(key=lambda error: error['row'])
+        return self.report()
@@ -1,5 +1,14 @@
+import csv
+import tempfile
+import uuid
+from itertools import chain, islice
+
 import polars as pl
-from django.http import HttpResponse
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import QuerySet
+from django.db.models.query import ValuesIterable
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -11,7 +20,8 @@ import logging
 
 try:
     from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, NamedStyle, Side
     from openpyxl.utils import get_column_letter
     OPENPYXL_AVAILABLE = True
 except ImportError:
@@ -19,198 +29,258 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
-def export_report_to_csv(data, filename='report.csv', include_summary=False, summary_data=None):
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+STREAM_CHUNK_SIZE = 2000
+CSV_CHUNK_ROWS = 500
+XLSX_WIDTH_SAMPLE_ROWS = 200
+EXPORT_STORAGE_PREFIX = 'exports'
+
+class _Echo:
+    """File-like object for csv.writer that hands each row back instead of buffering it"""
+    def write(self, value):
+        return value
+
+
+def _report_rows(data):
     """
-    Export a list of dicts or a polars DataFrame to CSV with formatting.
-    
-    Args:
-        data: list[dict] | pl.DataFrame
-        filename: output filename
-        include_summary: whether to include summary rows
-        summary_data: dict with summary information (totals, counts, etc.)
+    Columns and a row iterator (dicts) for any supported report source:
+    a polars DataFrame, a list of dicts, a QuerySet (read with a chunked
+    server-side cursor) or any iterable of dicts.
     """
-    if not isinstance(data, pl.DataFrame):
-        df = pl.DataFrame(data)
-    else:
-        df = data
-    
-    # Format numeric columns
-    for col in df.columns:
-        if df[col].dtype in [pl.Float32, pl.Float64]:
-            df = df.with_columns(pl.col(col).cast(pl.Utf8).map_elements(lambda x: f"{float(x) if x else 0:,.2f}" if isinstance(x, (int, float)) else x, return_dtype=pl.Utf8))
-    
-    csv_bytes = df.write_csv()
+    if isinstance(data, pl.DataFrame):
+        return list(data.columns), data.iter_rows(named=True)
+    if isinstance(data, QuerySet):
+        if not issubclass(data._iterable_class, ValuesIterable):
+            data = data.values()
+        data = data.iterator(chunk_size=STREAM_CHUNK_SIZE)
+    if data is None:
+        return [], iter(())
+    if isinstance(data, (list, tuple)):
+        columns = {}
+        for row in data:
+            columns.update(dict.fromkeys(row))
+        return list(columns), iter(data)
+    rows = iter(data)
+    first = next(rows, None)
+    if first is None:
+        return [], iter(())
+    return list(first), chain([first], rows)
+
+
+def iter_report_csv(data, include_summary=False, summary_data=None):
+    """Yield the CSV export in chunks of about CSV_CHUNK_ROWS rows"""
+    columns, rows = _report_rows(data)
+    writer = csv.writer(_Echo())
+    chunk = []
+    if columns:
+        chunk.append(writer.writerow(columns))
+        for data_row in rows:
+            chunk.append(writer.writerow([_format_csv_cell(data_row.get(col)) for col in columns]))
+            if len(chunk) >= CSV_CHUNK_ROWS:
+                yield ''.join(chunk)
+                chunk = []
     
     # Append summary if provided
     if include_summary and summary_data:
-        summary_csv = "\n\nSummary\n"
+        chunk.append("\n\nSummary\n")
         for key, value in summary_data.items():
-            if isinstance(value, float):
-                summary_csv += f"{key},{value:,.2f}\n"
-            else:
-                summary_csv += f"{key},{value}\n"
-        csv_bytes = csv_bytes + summary_csv.encode('utf-8')
-    
-    response = HttpResponse(csv_bytes, content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+            chunk.append(writer.writerow([key, f"{value:,.2f}" if isinstance(value, float) else value]))
+    if chunk:
+        yield ''.join(chunk)
 
 
-def export_report_to_xlsx(data, filename='report.xlsx', title=None, company=None, include_summary=False, summary_data=None):
+def export_report_to_csv(data, filename='report.csv', include_summary=False, summary_data=None):
     """
-    Export a list of dicts or polars DataFrame to Excel with professional formatting.
+    Stream a report to CSV without materialising it.
     
     Args:
-        data: list[dict] | pl.DataFrame
+        data: list[dict] | pl.DataFrame | QuerySet | iterable of dicts
         filename: output filename
-        title: optional document title
-        company: optional dict with company details
-        include_summary: whether to include summary row
-        summary_data: dict with summary information
-    
-    Returns:
-        HttpResponse with Excel file
+        include_summary: whether to include summary rows
+        summary_data: dict with summary information (totals, counts, etc.)
     """
-    if not OPENPYXL_AVAILABLE:
-        logger.error("openpyxl not available, falling back to CSV export")
-        return export_report_to_csv(data, filename.replace('.xlsx', '.csv'))
-    
-    # Normalize to polars DataFrame
-    if not isinstance(data, pl.DataFrame):
-        try:
-            df = pl.DataFrame(data or [])
-        except Exception:
-            df = pl.DataFrame([])
-    else:
-        df = data
-    
-    if df.is_empty():
-        df = pl.DataFrame([])
-    
-    workbook = Workbook()
-    ws = workbook.active
-    ws.title = "Report"
-    
-    # Styling
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    title_font = Font(bold=True, size=14)
-    company_font = Font(size=10)
+    response = StreamingHttpResponse(
+        iter_report_csv(data, include_summary, summary_data), content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _register_styles(workbook):
+    """Named styles are stored once in the workbook instead of per cell"""
     border = Border(
         left=Side(style='thin'),
         right=Side(style='thin'),
         top=Side(style='thin'),
         bottom=Side(style='thin')
     )
-    center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    right_align = Alignment(horizontal='right', vertical='center')
+    totals_fill = PatternFill(start_color="DCE6F1", end_color="DCE6F1", fill_type="solid")
+    styles = [
+        NamedStyle(name='report_title', font=Font(bold=True, size=14)),
+        NamedStyle(name='report_caption', font=Font(size=10)),
+        NamedStyle(
+            name='report_header', font=Font(bold=True, color="FFFFFF", size=11), border=border,
+            fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+            alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+        ),
+        NamedStyle(name='report_text', border=border, alignment=Alignment(horizontal='left', vertical='center')),
+        NamedStyle(name='report_integer', border=border, number_format='#,##0', alignment=Alignment(horizontal='right', vertical='center')),
+        NamedStyle(name='report_decimal', border=border, number_format='#,##0.00', alignment=Alignment(horizontal='right', vertical='center')),
+        NamedStyle(name='report_total', font=Font(bold=True), fill=totals_fill),
+        NamedStyle(name='report_total_integer', font=Font(bold=True), fill=totals_fill, number_format='#,##0'),
+        NamedStyle(name='report_total_decimal', font=Font(bold=True), fill=totals_fill, number_format='#,##0.00'),
+    ]
+    for style in styles:
+        workbook.add_named_style(style)
+
+
+def _styled(ws, value, style):
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+
+def write_report_xlsx(target, data, title=None, company=None, include_summary=False, summary_data=None):
+    """
+    Write a formatted report workbook to a path or binary file object.
+    
+    Uses openpyxl's write-only mode, so rows are serialised as they are
+    produced and memory stays flat however long the report is. Column widths
+    are sized from the first XLSX_WIDTH_SAMPLE_ROWS rows.
+    """
+    workbook = Workbook(write_only=True)
+    _register_styles(workbook)
+    ws = workbook.create_sheet("Report")
+    columns, rows = _report_rows(data)
+    
+    # Widths must be set before the first row is written
+    sample = list(islice(rows, XLSX_WIDTH_SAMPLE_ROWS))
+    rows = chain(sample, rows)
+    for col_idx, col_name in enumerate(columns, 1):
+        max_length = len(str(col_name))
+        for data_row in sample:
+            max_length = max(max_length, len(str(data_row.get(col_name) or '')))
+        ws.column_dimensions[get_column_letter(col_idx)].width = min(max_length + 2, 50)
     
     # Header section
-    row = 1
+    row = 0
+    
+    def banner(value, style):
+        nonlocal row
+        row += 1
+        ws.append([_styled(ws, value, style)])
+        ws.merged_cells.add(f'A{row}:F{row}')
     
     # Company details
     if company:
-        company_name = company.get('name', 'BengoERP')
-        ws.merge_cells(f'A{row}:F{row}')
-        cell = ws[f'A{row}']
-        cell.value = company_name
-        cell.font = title_font
-        row += 1
-        
-        company_details = []
-        for key in ['address', 'email', 'phone']:
-            val = company.get(key)
-            if val:
-                company_details.append(str(val))
-        
+        banner(company.get('name', 'BengoERP'), 'report_title')
+        company_details = [str(company[key]) for key in ['address', 'email', 'phone'] if company.get(key)]
         if company_details:
-            ws.merge_cells(f'A{row}:F{row}')
-            cell = ws[f'A{row}']
-            cell.value = ' | '.join(company_details)
-            cell.font = company_font
-            row += 1
+            banner(' | '.join(company_details), 'report_caption')
     
     # Title and date
     if title:
-        ws.merge_cells(f'A{row}:F{row}')
-        cell = ws[f'A{row}']
-        cell.value = title
-        cell.font = title_font
-        row += 1
+        banner(title, 'report_title')
+    banner(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 'report_caption')
+    ws.append([])  # Add spacing
     
-    ws.merge_cells(f'A{row}:F{row}')
-    cell = ws[f'A{row}']
-    cell.value = f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    cell.font = company_font
-    row += 2  # Add spacing
-    
-    # Column headers
-    if not df.is_empty():
-        columns = df.columns
-        header_row = row
-        
-        for col_idx, col_name in enumerate(columns, 1):
-            cell = ws.cell(row=header_row, column=col_idx)
-            cell.value = col_name
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = center_align
-            cell.border = border
+    if columns:
+        # Column headers
+        ws.append([_styled(ws, col_name, 'report_header') for col_name in columns])
         
         # Data rows
-        row += 1
-        for data_row in df.iter_rows(named=True):
-            for col_idx, col_name in enumerate(columns, 1):
-                cell = ws.cell(row=row, column=col_idx)
+        for data_row in rows:
+            cells = []
+            for col_name in columns:
                 value = data_row.get(col_name)
-                cell.value = _format_excel_cell(value)
-                cell.border = border
-                
-                # Right-align numbers
-                if isinstance(value, (int, float)):
-                    cell.alignment = right_align
-                    cell.number_format = '#,##0.00' if isinstance(value, float) else '#,##0'
+                if isinstance(value, float):
+                    style = 'report_decimal'
+                elif isinstance(value, int):
+                    style = 'report_integer'
                 else:
-                    cell.alignment = Alignment(horizontal='left', vertical='center')
-            
-            row += 1
+                    style = 'report_text'
+                cells.append(_styled(ws, _format_excel_cell(value), style))
+            ws.append(cells)
         
         # Summary row if provided
         if include_summary and summary_data:
-            row += 1
-            summary_col = 1
-            ws.merge_cells(f'A{row}:B{row}')
-            cell = ws[f'A{row}']
-            cell.value = "TOTALS"
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="DCE6F1", end_color="DCE6F1", fill_type="solid")
-            
-            for col_idx, col_name in enumerate(columns, 1):
-                if col_name in summary_data:
-                    cell = ws.cell(row=row, column=col_idx)
-                    cell.value = summary_data[col_name]
-                    cell.font = Font(bold=True)
-                    cell.fill = PatternFill(start_color="DCE6F1", end_color="DCE6F1", fill_type="solid")
-                    cell.number_format = '#,##0.00' if isinstance(summary_data[col_name], float) else '#,##0'
-        
-        # Auto-adjust column widths
-        for col_idx, col_name in enumerate(columns, 1):
-            max_length = len(str(col_name))
-            for data_row in df.iter_rows(named=True):
-                cell_len = len(str(data_row.get(col_name) or ''))
-                max_length = max(max_length, cell_len)
-            
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[get_column_letter(col_idx)].width = adjusted_width
+            ws.append([])
+            cells = [_styled(ws, "TOTALS", 'report_total')]
+            for col_name in columns[1:]:
+                value = summary_data.get(col_name)
+                if value is None:
+                    cells.append(None)
+                else:
+                    cells.append(_styled(ws, value, 'report_total_decimal' if isinstance(value, float) else 'report_total_integer'))
+            ws.append(cells)
     
-    # Generate file
-    buffer = BytesIO()
-    workbook.save(buffer)
-    buffer.seek(0)
+    workbook.save(target)
+
+
+def export_report_to_xlsx(data, filename='report.xlsx', title=None, company=None, include_summary=False, summary_data=None):
+    """
+    Export a report to Excel with professional formatting.
     
-    response = HttpResponse(buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+    The workbook is written to a temporary file in constant memory and
+    streamed back from there.
+    
+    Args:
+        data: list[dict] | pl.DataFrame | QuerySet | iterable of dicts
+        filename: output filename
+        title: optional document title
+        company: optional dict with company details
+        include_summary: whether to include summary row
+        summary_data: dict with summary information
+    
+    Returns:
+        FileResponse with Excel file
+    """
+    if not OPENPYXL_AVAILABLE:
+        logger.error("openpyxl not available, falling back to CSV export")
+        return export_report_to_csv(data, filename.replace('.xlsx', '.csv'))
+    
+    output = tempfile.TemporaryFile()
+    try:
+        write_report_xlsx(output, data, title, company, include_summary, summary_data)
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
+    # FileResponse closes the file once it has been streamed
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def save_report_export(data, filename, export_fmt, title=None, company=None, include_summary=False, summary_data=None):
+    """
+    Write a CSV or XLSX export to default storage for later download.
+    Returns (storage path, download url).
+    """
+    with tempfile.TemporaryFile() as output:
+        if export_fmt == 'csv':
+            for chunk in iter_report_csv(data, include_summary, summary_data):
+                output.write(chunk.encode('utf-8'))
+        elif export_fmt == 'xlsx':
+            write_report_xlsx(output, data, title, company, include_summary, summary_data)
+        else:
+            raise ValueError(f"Unsupported export format: {export_fmt}")
+        output.seek(0)
+        path = default_storage.save(
+            f"{EXPORT_STORAGE_PREFIX}/{datetime.now():%Y/%m/%d}/{uuid.uuid4().hex}/{filename}", File(output)
+        )
+    return path, default_storage.url(path)
+
+
+def queue_report_export(source, args, export_fmt, filename, title=None, company=None, user_id=None):
+    """
+    Build an export in a Celery task (core.tasks.export_report_file) and store it.
+    
+    source is the dotted path of a callable that, called with args, returns
+    the report rows or a report dict ({'data', 'totals', 'title'}); args must
+    be JSON-serialisable. Progress and the download link are reported through
+    task_management under the returned task id.
+    """
+    from core.tasks import export_report_file
+    return export_report_file.delay(source, list(args), export_fmt, filename, title, company, user_id)
 
 
 def export_report_to_pdf(data, filename='report.pdf', title=None, company=None, footer_text=None):
@@ -323,6 +393,13 @@ def _format_cell(value):
     return str(value)
 
 
+def _format_csv_cell(value):
+    """Format a cell value for CSV."""
+    if value is None:
+        return ''
+    return value
+
+
 def _format_excel_cell(value):
     """Format a cell value for Excel."""
     if value is None:
@@ -8,8 +8,21 @@ All API responses that return array-based data must use this pagination format:
     "results": [...]
 }
 """
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+import logging
+import operator
+from decimal import Decimal
+from functools import reduce
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+logger = logging.getLogger(__name__)
 
 
 class StandardResultPagination(PageNumberPagination):
@@ -39,6 +52,185 @@ class StandardResultPagination(PageNumberPagination):
         })
 
 
+def estimate_count(queryset):
+    """
+    Row count from the planner's statistics instead of COUNT(*), or None when
+    no estimate is available (non-PostgreSQL databases, never-analysed tables).
+    Unfiltered querysets read pg_class.reltuples; filtered ones the row
+    estimate of their EXPLAIN plan.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+                estimate = row[0] if row else None
+            else:
+                sql, params = queryset.order_by().query.sql_with_params()
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                estimate = plan[0]['Plan']['Plan Rows']
+    except Exception as e:
+        logger.warning(f"Could not estimate count for {queryset.model.__name__}: {e}")
+        return None
+    return int(estimate) if estimate is not None and estimate >= 0 else None
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination for large, append-heavy tables.
+
+    Pages are fetched with WHERE (ordering columns) beyond the last row seen,
+    ORDER BY ... LIMIT - no OFFSET scan and no COUNT(*) per page, so page
+    1,000 costs what page 1 does. Select it per viewset:
+
+        pagination_class = KeysetPagination
+        keyset_ordering = ('-transaction_date',)   # indexed, non-null columns
+
+    id is appended as the tie-breaker. The response keeps the standard
+    count/next/previous/results envelope; count is the planner's estimate on
+    large tables (count_is_estimate tells which) unless the client passes
+    ?count=exact. Clients follow the next/previous links; there are no page
+    numbers.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering = ('-created_at',)
+    # Below this many (estimated) rows an exact COUNT(*) is cheap enough to run
+    exact_count_threshold = 10000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, view):
+        ordering = tuple(getattr(view, 'keyset_ordering', None) or self.ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering += ('-id' if ordering[-1].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.keyset = self.get_ordering(view)
+        self.queryset = queryset.order_by(*self.keyset)
+        reverse, position = self.decode_cursor(request)
+
+        page = self.queryset
+        if position is not None:
+            page = page.filter(self._beyond(position, reverse))
+        if reverse:
+            page = page.order_by(*(self._flip(field) for field in self.keyset))
+        rows = list(page[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = True if reverse else has_more
+        self.has_previous = has_more if reverse else position is not None
+        self.page = rows
+        return rows
+
+    def get_count(self):
+        """(count, is_estimate) for the filtered queryset"""
+        if self.request.query_params.get(self.count_query_param) == 'exact':
+            return self.queryset.count(), False
+        estimate = estimate_count(self.queryset)
+        if estimate is None or estimate < self.exact_count_threshold:
+            return self.queryset.count(), False
+        return estimate, True
+
+    def get_paginated_response(self, data):
+        count, is_estimate = self.get_count()
+        return Response({
+            'count': count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+            'page_size': self.page_size,
+            'count_is_estimate': is_estimate
+        })
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        """(reverse, position values) from the request, or (False, None) on the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = cursor['p']
+            if len(position) != len(self.keyset):
+                raise ValueError(position)
+            return bool(cursor.get('r')), position
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverse):
+        position = [self._json_value(self._value(obj, field.lstrip('-'))) for field in self.keyset]
+        cursor = {'p': position, 'r': 1} if reverse else {'p': position}
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def _beyond(self, position, reverse):
+        """Rows after position in keyset order (before it when reverse), as OR-ed column prefixes"""
+        conditions = []
+        equal = Q()
+        for field, value in zip(self.keyset, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            conditions.append(equal & Q(**{f"{name}__{'lt' if descending else 'gt'}": value}))
+            equal &= Q(**{name: value})
+        return reduce(operator.or_, conditions)
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _value(obj, path):
+        if isinstance(obj, dict):
+            return obj[path]
+        for attr in path.split('__'):
+            obj = getattr(obj, attr)
+        return obj
+
+    @staticmethod
+    def _json_value(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+
 def paginated_response(queryset, serializer_class, request, view):
     """
     Helper function to create paginated responses
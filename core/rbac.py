@@ -0,0 +1,139 @@
+"""
+Compiled RBAC permission index.
+
+Django's ModelBackend loads a user's permissions with two joins the first
+time has_perm() is called on each request's user object. This module
+compiles them once into a bitset instead:
+
+- a global ordinal table gives every Permission a bit position and
+  precomputes a mask for each (app_label, action) and (app_label.model, action);
+- each user's permissions become one integer with those bits set.
+
+Both are cached in the shared cache under a global RBAC version and memoised
+per process, so a check is a dict lookup and a bitwise AND. Any change to
+permissions, group permissions or user memberships bumps the version
+(see core.signals), which retires every compiled entry at once.
+
+    from core.rbac import user_can
+
+    user_can(request.user, 'leave', 'view')              # any view_* permission in the app
+    user_can(request.user, 'leave.leaverequest', 'change')
+    user_can(request.user, LeaveRequest, 'delete')
+"""
+import time
+
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.db.models import Model, Q
+
+VERSION_KEY = 'rbac:version'
+INDEX_TTL = 60 * 60 * 24
+ACTIONS = ('view', 'add', 'change', 'delete')
+LOCAL_MAX_ENTRIES = 10000
+
+_local_tables = {}
+_local_bits = {}
+
+
+def current_version():
+    """Global RBAC version, initialised on first use (None when the cache is unavailable)"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """Retire every compiled table and user bitset"""
+    cache.set(VERSION_KEY, time.time_ns(), None)
+    _local_tables.clear()
+    _local_bits.clear()
+
+
+def build_table():
+    """
+    Ordinal table: {'ordinals': {permission id: bit}, 'masks': {(module, action): mask}}
+    where module is an app label or 'app_label.model'.
+    """
+    ordinals, masks = {}, {}
+    permissions = Permission.objects.order_by('id').values_list('id', 'codename', 'content_type__app_label', 'content_type__model')
+    for bit, (pk, codename, app_label, model) in enumerate(permissions):
+        ordinals[pk] = bit
+        action = codename.partition('_')[0]
+        if action not in ACTIONS:
+            # Custom permissions are addressable by their full codename
+            masks[(app_label, codename)] = masks.get((app_label, codename), 0) | (1 << bit)
+            continue
+        for module in (app_label, f'{app_label}.{model}'):
+            masks[(module, action)] = masks.get((module, action), 0) | (1 << bit)
+    return {'ordinals': ordinals, 'masks': masks}
+
+
+def get_table(version):
+    if version is None:
+        return build_table()
+    table = _local_tables.get(version)
+    if table is None:
+        key = f'rbac:table:{version}'
+        table = cache.get(key)
+        if table is None:
+            table = build_table()
+            cache.set(key, table, INDEX_TTL)
+        _local_tables.clear()
+        _local_tables[version] = table
+    return table
+
+
+def compile_user_bits(user_id, table):
+    bits = 0
+    ordinals = table['ordinals']
+    for pk in Permission.objects.filter(Q(user__id=user_id) | Q(group__user__id=user_id)).values_list('id', flat=True).distinct():
+        if pk in ordinals:
+            bits |= 1 << ordinals[pk]
+    return bits
+
+
+def get_user_bits(user_id, version, table):
+    if version is None:
+        return compile_user_bits(user_id, table)
+    bits = _local_bits.get((user_id, version))
+    if bits is None:
+        key = f'rbac:user:{user_id}:{version}'
+        bits = cache.get(key)
+        if bits is None:
+            bits = compile_user_bits(user_id, table)
+            cache.set(key, bits, INDEX_TTL)
+        if len(_local_bits) >= LOCAL_MAX_ENTRIES:
+            _local_bits.clear()
+        _local_bits[(user_id, version)] = bits
+    return bits
+
+
+def _module_label(module):
+    if isinstance(module, str):
+        return module.lower()
+    if isinstance(module, Model) or (isinstance(module, type) and issubclass(module, Model)):
+        return f'{module._meta.app_label}.{module._meta.model_name}'
+    raise TypeError(f"Unsupported RBAC module: {module!r}")
+
+
+def user_can(user, module, action):
+    """
+    Whether the user holds the action permission on module. Module is an app
+    label (any model in the app), 'app_label.model', or a model class/instance.
+    Superusers can do everything; inactive and anonymous users nothing.
+    """
+    if user is None or not getattr(user, 'is_authenticated', False) or not user.is_active:
+        return False
+    if user.is_superuser:
+        return True
+    # The compiled index is memoised on the user object for the rest of the request
+    compiled = getattr(user, '_rbac_compiled', None)
+    if compiled is None:
+        version = current_version()
+        table = get_table(version)
+        compiled = (table['masks'], get_user_bits(user.pk, version, table))
+        user._rbac_compiled = compiled
+    masks, bits = compiled
+    return bool(bits & masks.get((_module_label(module), action), 0))
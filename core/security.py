@@ -10,7 +10,10 @@ This module provides comprehensive security features including:
 
 import re
 import html
+import json
 import logging
+import threading
+import time
 from typing import Dict, Any, Optional, List, Set
 from django.http import HttpRequest, HttpResponse
 from django.conf import settings
@@ -417,6 +420,152 @@ class SecurityAudit:
         
         logger.error(f"SUSPICIOUS_ACTIVITY: {log_data}")
 
+def _is_json(request: HttpRequest) -> bool:
+    return (request.META.get('CONTENT_TYPE') or '').split(';')[0].strip().lower() == 'application/json'
+
+
+class RequestScanner:
+    """
+    Single-pass scanner for request payloads.
+
+    All suspicious patterns are compiled once into one alternation with a named
+    group per pattern, so each value is searched once instead of once per
+    pattern. Values without any of the MARKERS every pattern needs are rejected
+    with plain substring checks before the regex runs. JSON bodies are walked
+    with size, depth and value budgets so the cost per request stays bounded.
+    """
+    PATTERNS = {
+        'script_tag': r'<script[^>]*>',
+        'javascript_uri': r'javascript:',
+        'vbscript_uri': r'vbscript:',
+        'event_handler': r'on\w+\s*=',
+        'iframe_tag': r'<iframe[^>]*>',
+        'object_tag': r'<object[^>]*>',
+        'embed_tag': r'<embed[^>]*>',
+    }
+    MARKERS = ('<', 'script:', '=')  # Every pattern needs one of these
+    MAX_BODY_BYTES = 256 * 1024
+    MAX_DEPTH = 20
+    MAX_VALUES = 20000
+    MAX_VALUE_LENGTH = 200  # Excerpt kept in the audit log
+
+    def __init__(self):
+        self.regex = re.compile(
+            '|'.join(f'(?P<{name}>{pattern})' for name, pattern in self.PATTERNS.items()), re.IGNORECASE
+        )
+
+    def match(self, value: str) -> Optional[str]:
+        """Name of the first pattern found in value, if any"""
+        lowered = value.lower()
+        if not any(marker in lowered for marker in self.MARKERS):
+            return None
+        found = self.regex.search(value)
+        return found.lastgroup if found else None
+
+    def scan_items(self, source: str, items) -> List[Dict[str, str]]:
+        findings = []
+        for name, value in items:
+            if isinstance(value, str):
+                pattern = self.match(value)
+                if pattern:
+                    findings.append({'source': source, 'parameter': name, 'pattern': pattern,
+                                     'value': value[:self.MAX_VALUE_LENGTH]})
+        return findings
+
+    def scan_json(self, data) -> List[Dict[str, str]]:
+        """Walk a decoded JSON document iteratively within the depth and value budgets"""
+        findings = []
+        if isinstance(data, str):
+            data = [data]
+        if not isinstance(data, (dict, list)):
+            return findings
+        # Paths are kept as (parent, key) links and only rendered for findings
+        stack = [(data, None, 0)]
+        clean_keys = set()  # Object keys repeat across list items; check each once
+        budget = self.MAX_VALUES
+        while stack and budget > 0:
+            node, path, depth = stack.pop()
+            is_dict = isinstance(node, dict)
+            for key, value in (node.items() if is_dict else enumerate(node)):
+                budget -= 1
+                if is_dict and key not in clean_keys:
+                    if self.match(key):
+                        findings.append(self._finding((path, key), key))
+                    else:
+                        clean_keys.add(key)
+                if isinstance(value, str):
+                    if self.match(value):
+                        findings.append(self._finding((path, key), value))
+                elif isinstance(value, (dict, list)) and depth < self.MAX_DEPTH:
+                    stack.append((value, (path, key), depth + 1))
+        return findings
+
+    def _finding(self, path, value):
+        keys = []
+        while path is not None:
+            path, key = path
+            keys.append(f'[{key}]' if isinstance(key, int) else f'.{key}')
+        return {'source': 'json', 'parameter': '$' + ''.join(reversed(keys)), 'pattern': self.match(value),
+                'value': value[:self.MAX_VALUE_LENGTH]}
+
+    def scan_json_body(self, request: HttpRequest) -> List[Dict[str, str]]:
+        if request.method not in ('POST', 'PUT', 'PATCH') or not _is_json(request):
+            return []
+        try:
+            if int(request.META.get('CONTENT_LENGTH') or 0) > self.MAX_BODY_BYTES:
+                return []
+            data = json.loads(request.body)
+        except Exception:
+            # Malformed bodies are the view's problem; an unreadable stream is skipped
+            return []
+        return self.scan_json(data)
+
+
+class SuspiciousActivityThrottle:
+    """
+    Batches a request's findings into one audit entry and caps entries per
+    client IP per window; suppressed findings are counted and reported with
+    the next entry that gets through.
+    """
+    WINDOW_SECONDS = 60
+    MAX_EVENTS_PER_WINDOW = 20
+    MAX_FINDINGS_PER_EVENT = 20
+    MAX_TRACKED_CLIENTS = 10000
+
+    def __init__(self):
+        self._windows: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, request: HttpRequest, findings: List[Dict[str, str]]):
+        ip_address = request.META.get('REMOTE_ADDR') or 'unknown'
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(ip_address)
+            if window is None or now - window[0] >= self.WINDOW_SECONDS:
+                if len(self._windows) >= self.MAX_TRACKED_CLIENTS:
+                    self._windows.clear()
+                window = self._windows[ip_address] = [now, 0, 0]  # start, events logged, findings suppressed
+            if window[1] >= self.MAX_EVENTS_PER_WINDOW:
+                window[2] += len(findings)
+                return
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+        SecurityAudit.log_suspicious_activity(
+            'suspicious_request_payload',
+            {
+                'path': request.path,
+                'method': request.method,
+                'finding_count': len(findings),
+                'findings': findings[:self.MAX_FINDINGS_PER_EVENT],
+                'suppressed_since_last_event': suppressed,
+            },
+            request
+        )
+
+
+REQUEST_SCANNER = RequestScanner()
+SUSPICIOUS_ACTIVITY_THROTTLE = SuspiciousActivityThrottle()
+
 class SecurityMiddleware:
     """Django middleware for enhanced security."""
     
@@ -436,6 +585,9 @@ class SecurityMiddleware:
                 # Do not block requests if RBAC provisioning fails; just log
                 logger.error(f"RBAC provisioning error: {str(e)}", exc_info=True)
 
+        # JSON bodies must be read before the view consumes the stream
+        json_findings = REQUEST_SCANNER.scan_json_body(request)
+
         response = self.get_response(request)
         
         # Add security headers
@@ -481,7 +633,7 @@ class SecurityMiddleware:
             response["Content-Security-Policy"] = "; ".join(csp_parts)
         
         # Log suspicious activities
-        self._check_suspicious_activity(request)
+        self._check_suspicious_activity(request, json_findings)
         
         return response
     
@@ -580,45 +732,11 @@ class SecurityMiddleware:
                 perms = Permission.objects.filter(content_type__in=ct_qs).filter(q)
                 assign_perms(group, perms)
 
-    def _check_suspicious_activity(self, request: HttpRequest):
-        """Check for suspicious activities in the request."""
-        suspicious_patterns = [
-            r'<script[^>]*>',
-            r'javascript:',
-            r'vbscript:',
-            r'on\w+\s*=',
-            r'<iframe[^>]*>',
-            r'<object[^>]*>',
-            r'<embed[^>]*>'
-        ]
-        
-        # Check URL parameters
-        for param_name, param_value in request.GET.items():
-            if isinstance(param_value, str):
-                for pattern in suspicious_patterns:
-                    if re.search(pattern, param_value, re.IGNORECASE):
-                        SecurityAudit.log_suspicious_activity(
-                            'suspicious_url_parameter',
-                            {
-                                'parameter': param_name,
-                                'value': param_value,
-                                'pattern': pattern
-                            },
-                            request
-                        )
-        
-        # Check POST data
-        if request.method == 'POST':
-            for param_name, param_value in request.POST.items():
-                if isinstance(param_value, str):
-                    for pattern in suspicious_patterns:
-                        if re.search(pattern, param_value, re.IGNORECASE):
-                            SecurityAudit.log_suspicious_activity(
-                                'suspicious_post_data',
-                                {
-                                    'parameter': param_name,
-                                    'value': param_value,
-                                    'pattern': pattern
-                                },
-                                request
-                            )
+    def _check_suspicious_activity(self, request: HttpRequest, findings: Optional[List[Dict[str, str]]] = None):
+        """Scan query and form parameters (plus any JSON findings) and log them as one batched event."""
+        findings = list(findings or [])
+        findings += REQUEST_SCANNER.scan_items('query', request.GET.items())
+        if request.method == 'POST' and not _is_json(request):
+            findings += REQUEST_SCANNER.scan_items('form', request.POST.items())
+        if findings:
+            SUSPICIOUS_ACTIVITY_THROTTLE.record(request, findings)
@@ -0,0 +1,34 @@
+"""
+Keep the compiled RBAC index (core.rbac) in step with permission changes
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .rbac import bump_version
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_delete, sender=Group)
+def permission_table_changed(sender, **kwargs):
+    # After commit, so no request recompiles from the old rows before the change is visible
+    transaction.on_commit(bump_version)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def permission_membership_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(bump_version)
+
+
+@receiver(post_migrate)
+def permissions_migrated(sender, **kwargs):
+    # Permissions created by migrate are bulk-inserted without post_save
+    transaction.on_commit(bump_version)
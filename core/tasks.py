@@ -168,3 +168,150 @@ def generate_report_async(self, report_type, params, user_id):
             'user_id': user_id
         })
         raise
+
+
+@shared_task(bind=True)
+def export_report_file(self, source, args, export_fmt, filename, title=None, company=None, user_id=None):
+    """
+    Build a large CSV/XLSX report export off the request cycle and store it for download.
+    Queued through core.modules.report_export.queue_report_export.
+    """
+    from django.utils.module_loading import import_string
+    from core.modules.report_export import save_report_export
+    
+    task_id = self.request.id
+    
+    try:
+        create_task(
+            task_id=task_id,
+            task_type='data_export',
+            title=f"Export {filename}",
+            description=f"Exporting {title or filename}",
+            module='core',
+            user_id=user_id
+        )
+        update_task_progress(task_id, progress=10, message="Loading report data")
+        
+        report = import_string(source)(*args)
+        data, totals = report, None
+        if isinstance(report, dict) and report.get('error'):
+            # Report services return their failures instead of raising; don't ship an empty file
+            fail_task(task_id, str(report['error']))
+            return {'error': report['error']}
+        if isinstance(report, dict):
+            data, totals = report.get('data', []), report.get('totals')
+            title = report.get('title') or title
+        
+        update_task_progress(task_id, progress=50, message="Writing export")
+        path, url = save_report_export(
+            data, filename, export_fmt, title=title, company=company,
+            include_summary=bool(totals), summary_data=totals
+        )
+        
+        complete_task(task_id, {'path': path, 'url': url, 'filename': filename}, message=f"Export ready: {url}")
+        return {'path': path, 'url': url}
+        
+    except Exception as e:
+        fail_task(task_id, str(e))
+        handle_error(e, context={
+            'module': 'core',
+            'function_name': 'export_report_file',
+            'source': source,
+            'user_id': user_id
+        })
+        raise
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def import_data_file(self, file_type, file_name, business_id, user_id):
+    """
+    Run a streaming bulk import (employees, products, contacts) for an uploaded file.
+
+    Progress events go out over the task websocket after every chunk. When the
+    database or storage drops out mid-run the last committed row is checkpointed
+    on the Task and the retry resumes from there instead of starting over.
+    """
+    import traceback
+    from django.contrib.auth import get_user_model
+    from django.core.files.storage import default_storage
+    from business.models import Bussiness
+    from django.db import InterfaceError, OperationalError
+    from core.modules.data_import import get_importer
+    from task_management.models import Task, TaskType
+    from task_management.tasks import emit_websocket_event
+
+    task_id = self.request.id
+    finished = True
+    try:
+        task = Task.objects.filter(task_id=task_id).first() or create_task(
+            task_id=task_id,
+            task_type=TaskType.DATA_IMPORT,
+            title=f"Import {file_type}",
+            module='core',
+            user_id=user_id,
+            input_data={'file_type': file_type, 'file_name': file_name, 'business_id': business_id},
+        )
+        checkpoint = task.metadata.get('import_checkpoint', {})
+        if not checkpoint:
+            task.mark_started()
+            emit_websocket_event('task_started', {
+                'task_id': task_id,
+                'task_type': TaskType.DATA_IMPORT,
+                'title': task.title,
+                'module': task.module,
+                'status': task.status,
+                'message': f'Task "{task.title}" started'
+            }, user_id=user_id, task_id=task_id)
+
+        def progress(processed, total):
+            update_task_progress(
+                task_id,
+                progress=int(processed * 100 / total) if total else 100,
+                processed_items=processed,
+                total_items=total,
+                message=f"Processed {processed} of {total} rows",
+            )
+
+        importer = get_importer(file_type)(
+            default_storage.path(file_name),
+            Bussiness.objects.get(id=business_id),
+            user=get_user_model().objects.filter(id=user_id).first(),
+            start_row=checkpoint.get('resume_from', 0),
+            report=checkpoint.get('report'),
+            state=checkpoint.get('state'),
+            progress_callback=progress,
+        )
+        try:
+            report = importer.run()
+        except (OperationalError, InterfaceError, OSError) as e:
+            # Only infrastructure failures are retried; a bad file (ImportFileError) fails straight away
+            if self.request.retries < self.max_retries:
+                task.metadata['import_checkpoint'] = importer.checkpoint()
+                task.save(update_fields=['metadata'])
+                logger.warning(f"Import {task_id} interrupted at row {importer.processed}, retrying: {e}")
+                finished = False
+                raise self.retry(exc=e)
+            raise
+
+        importer.on_complete()
+        complete_task(
+            task_id,
+            output_data=report,
+            message=f"Imported {report['imported']} of {report['total_rows']} rows ({report['failed']} failed)",
+        )
+        return {key: value for key, value in report.items() if key != 'errors'}
+
+    except Exception as e:
+        if not finished:
+            raise
+        logger.error(f"Import {task_id} failed: {e}")
+        fail_task(task_id, str(e), traceback.format_exc())
+        return {'success': False, 'detail': str(e)}
+
+    finally:
+        if finished:
+            try:
+                if default_storage.exists(file_name):
+                    default_storage.delete(file_name)
+            except Exception as cleanup_error:
+                logger.warning(f"Failed to delete uploaded file {file_name}: {cleanup_error}")
@@ -1,3 +1,207 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import connection
+from django.core.files.storage import FileSystemStorage
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from openpyxl import load_workbook
+
+from rest_framework.request import Request
+
+from core import rbac
+from core.models import ApiRequestMetric
+from core.pagination import KeysetPagination
+from core.modules.report_export import export_report_to_csv, export_report_to_xlsx, save_report_export
+from core.rbac import user_can
+from core.security import REQUEST_SCANNER, SecurityMiddleware, SuspiciousActivityThrottle
+
+User = get_user_model()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class UserCanTests(TestCase):
+    def setUp(self):
+        rbac.bump_version()
+        self.user = User.objects.create_user(username='rbac', email='rbac@example.com', password='pass')
+        self.group = Group.objects.create(name='rbac-testers')
+        self.group.permissions.add(Permission.objects.get(codename='view_group'))
+        self.user.groups.add(self.group)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_module_and_model_checks(self):
+        user = self.fresh_user()
+        self.assertTrue(user_can(user, 'auth', 'view'))
+        self.assertTrue(user_can(user, 'auth.group', 'view'))
+        self.assertTrue(user_can(user, Group, 'view'))
+        self.assertFalse(user_can(user, Group, 'change'))
+        self.assertFalse(user_can(user, 'auth.permission', 'view'))
+        self.assertFalse(user_can(user, 'unknown_app', 'view'))
+
+    def test_superuser_and_inactive(self):
+        admin = User.objects.create_superuser(email='root@example.com', password='pass', username='root')
+        self.assertTrue(user_can(admin, Group, 'delete'))
+        self.user.is_active = False
+        self.assertFalse(user_can(self.user, Group, 'view'))
+
+    def test_compiled_index_is_reused_across_requests(self):
+        user_can(self.fresh_user(), Group, 'view')
+        user = self.fresh_user()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(user_can(user, Group, 'view'))
+            self.assertFalse(user_can(user, Group, 'delete'))
+        self.assertEqual(len(queries), 0)
+
+    def test_permission_changes_bump_version(self):
+        self.assertFalse(user_can(self.fresh_user(), Group, 'change'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.add(Permission.objects.get(codename='change_group'))
+        self.assertTrue(user_can(self.fresh_user(), Group, 'change'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.group)
+        self.assertFalse(user_can(self.fresh_user(), Group, 'view'))
+
+
+class RequestScannerTests(SimpleTestCase):
+    def test_match_names_the_pattern(self):
+        self.assertEqual(REQUEST_SCANNER.match('hello <SCRIPT src=x>'), 'script_tag')
+        self.assertEqual(REQUEST_SCANNER.match('JavaScript:alert(1)'), 'javascript_uri')
+        self.assertEqual(REQUEST_SCANNER.match('<img onerror = x>'), 'event_handler')
+        self.assertIsNone(REQUEST_SCANNER.match('Deliver at 10:30, gate <B>'))
+
+    def test_json_walk_reports_paths_within_budget(self):
+        findings = REQUEST_SCANNER.scan_json({
+            'items': [{'note': 'ok'}, {'note': '<iframe src=evil>'}],
+            '<embed>': 1,
+            'deep': [[[['javascript:x']]]],
+        })
+        self.assertEqual(
+            sorted((finding['parameter'], finding['pattern']) for finding in findings),
+            [('$.<embed>', 'embed_tag'), ('$.deep[0][0][0][0]', 'javascript_uri'), ('$.items[1].note', 'iframe_tag')],
+        )
+        nested = 'javascript:x'
+        for _ in range(REQUEST_SCANNER.MAX_DEPTH + 5):
+            nested = [nested]
+        self.assertEqual(REQUEST_SCANNER.scan_json(nested), [])
+
+    def test_middleware_scans_json_body_and_batches_findings(self):
+        middleware = SecurityMiddleware(lambda request: HttpResponse())
+        middleware._rbac_provisioned = True
+        request = RequestFactory().post(
+            '/api/v1/anything/?q=<script>', data=json.dumps({'a': '<object>', 'b': 'javascript:1'}),
+            content_type='application/json',
+        )
+        with mock.patch('core.security.SecurityAudit.log_suspicious_activity') as log:
+            middleware(request)
+        log.assert_called_once()
+        details = log.call_args[0][1]
+        self.assertEqual(details['finding_count'], 3)
+        self.assertEqual({finding['source'] for finding in details['findings']}, {'json', 'query'})
+
+    def test_throttle_caps_events_per_client(self):
+        throttle = SuspiciousActivityThrottle()
+        request = RequestFactory().get('/', REMOTE_ADDR='10.1.1.1')
+        finding = [{'source': 'query', 'parameter': 'q', 'pattern': 'script_tag', 'value': '<script>'}]
+        with mock.patch('core.security.SecurityAudit.log_suspicious_activity') as log:
+            for _ in range(throttle.MAX_EVENTS_PER_WINDOW + 5):
+                throttle.record(request, finding)
+        self.assertEqual(log.call_count, throttle.MAX_EVENTS_PER_WINDOW)
+        self.assertEqual(throttle._windows['10.1.1.1'][2], 5)
+
+
+class ReportExportTests(TestCase):
+    def test_csv_streams_querysets_and_generators(self):
+        response = export_report_to_csv(Group.objects.none())
+        self.assertIsInstance(response, StreamingHttpResponse)
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+        Group.objects.create(name='exporters')
+        response = export_report_to_csv(Group.objects.values('name'))
+        self.assertEqual(b''.join(response.streaming_content), b'name\r\nexporters\r\n')
+
+        rows = ({'item': f'row {index}', 'amount': index} for index in range(1200))
+        content = b''.join(export_report_to_csv(rows, include_summary=True, summary_data={'amount': 1.5}).streaming_content)
+        lines = content.decode().splitlines()
+        self.assertEqual((lines[0], lines[1200], lines[-1]), ('item,amount', 'row 1199,1199', 'amount,1.50'))
+
+    def test_xlsx_is_written_in_write_only_mode_with_named_styles(self):
+        data = [{'name': 'Alice', 'gross': 1000.5, 'days': 22}, {'name': 'Bob', 'gross': 900.0, 'days': 20}]
+        response = export_report_to_xlsx(data, title='Payroll', include_summary=True, summary_data={'gross': 1900.5})
+        ws = load_workbook(io.BytesIO(b''.join(response.streaming_content)))['Report']
+        values = [[cell.value for cell in row] for row in ws.iter_rows()]
+        self.assertEqual(values[3], ['name', 'gross', 'days'] + [None] * 3)
+        self.assertEqual(values[-1][:2], ['TOTALS', 1900.5])
+        self.assertEqual((ws['A4'].style, ws['B5'].style, ws['C5'].number_format), ('report_header', 'report_decimal', '#,##0'))
+        self.assertIn('A2:F2', {str(cell_range) for cell_range in ws.merged_cells.ranges})
+
+    def test_async_exports_are_saved_to_storage(self):
+        with tempfile.TemporaryDirectory() as media_root:
+            storage = FileSystemStorage(location=media_root, base_url='/media/')
+            with mock.patch('core.modules.report_export.default_storage', storage):
+                path, url = save_report_export([{'a': 1}], 'report.csv', 'csv')
+            self.assertTrue(path.startswith('exports/') and url.endswith('report.csv'))
+            with storage.open(path) as stored:
+                self.assertEqual(stored.read(), b'a\r\n1\r\n')
+
+
+    def test_report_errors_fail_the_export_task(self):
+        from core import tasks
+        report = mock.Mock(return_value={'error': 'No payslips for this period', 'data': []})
+        with mock.patch('django.utils.module_loading.import_string', return_value=report), \
+                mock.patch.multiple(tasks, create_task=mock.DEFAULT, update_task_progress=mock.DEFAULT,
+                                    complete_task=mock.DEFAULT, fail_task=mock.DEFAULT) as task_calls, \
+                mock.patch('core.modules.report_export.save_report_export') as save:
+            result = tasks.export_report_file.apply(args=('reports.payroll', [], 'csv', 'payroll.csv')).get()
+
+        self.assertEqual(result, {'error': 'No payslips for this period'})
+        task_calls['fail_task'].assert_called_once()
+        task_calls['complete_task'].assert_not_called()
+        save.assert_not_called()
+
+
+class KeysetPaginationTests(TestCase):
+    class View:
+        keyset_ordering = ('-status_code',)
+
+    def setUp(self):
+        for status_code in (200, 404, 200, 500, 200, 404, 201):
+            ApiRequestMetric.objects.create(method='GET', path='/', status_code=status_code)
+        self.expected = list(ApiRequestMetric.objects.order_by('-status_code', '-id').values_list('id', flat=True))
+
+    def page(self, url):
+        paginator = KeysetPagination()
+        paginator.page_size = 3
+        request = Request(RequestFactory().get(url))
+        rows = paginator.paginate_queryset(ApiRequestMetric.objects.all(), request, view=self.View())
+        return [row.id for row in rows], paginator.get_paginated_response([]).data
+
+    def test_walks_forward_and_back_on_ties_without_offsets(self):
+        seen, url, pages = [], '/metrics/', []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                ids, data = self.page(url)
+                seen += ids
+                pages.append(ids)
+                url = data['next']
+        self.assertEqual(seen, self.expected)
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual((data['count'], data['count_is_estimate']), (7, False))
+
+        self.assertEqual(self.page(data['previous'])[0], pages[-2])
+
+    def test_large_tables_report_the_planner_estimate(self):
+        with mock.patch('core.pagination.estimate_count', return_value=250000):
+            with CaptureQueriesContext(connection) as queries:
+                data = self.page('/metrics/')[1]
+            self.assertEqual((data['count'], data['count_is_estimate']), (250000, True))
+            self.assertFalse(any('COUNT' in query['sql'] for query in queries.captured_queries))
+            self.assertEqual(self.page('/metrics/?count=exact')[1]['count'], 7)
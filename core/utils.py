@@ -105,6 +105,24 @@ def get_business_id_from_request(request):
         return None
 
 
+def get_user_business_ids(user):
+    """
+    IDs of the businesses a user owns or works for.
+    
+    Args:
+        user: Authenticated user
+        
+    Returns:
+        set: Business IDs
+    """
+    from django.db.models import Q
+    from business.models import Bussiness
+    
+    return set(
+        Bussiness.objects.filter(Q(owner=user) | Q(employees__user=user)).values_list('id', flat=True).distinct()
+    )
+
+
 def apply_filters_to_queryset(queryset, filters):
     """
     Apply common filters to a queryset.
@@ -12,7 +12,8 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
 from rest_framework import permissions, authentication
 from rest_framework.response import Response
-from rest_framework.authentication import BasicAuthentication,TokenAuthentication
+from rest_framework.authentication import BasicAuthentication
+from authmanagement.backends import CachedTokenAuthentication
 from rest_framework.parsers import MultiPartParser,FormParser
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
@@ -42,7 +43,7 @@ from rest_framework import status
 
 class UploadData(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = (BasicAuthentication, TokenAuthentication)
+    authentication_classes = (BasicAuthentication, CachedTokenAuthentication)
     parser_classes = (MultiPartParser, FormParser)  # Add parsers for file upload
 
     def post(self, request, format=None):
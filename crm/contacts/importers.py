@@ -0,0 +1,225 @@
+"""
+Bulk contact import on the shared streaming import framework.
+
+Contacts are matched within the business on email first, then phone, so a
+contact list can be re-uploaded without creating duplicates.
+"""
+from datetime import date
+from decimal import Decimal
+import logging
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db.models import Q
+
+from core.modules.data_import import (
+    EMAIL_PATTERN, ChunkedImporter, resolve_lookup, unique_usernames, upsert_one_per_parent,
+)
+from .models import Contact, ContactAccount, CustomerGroup
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+CONTACT_TYPES = {
+    'supplier': 'Suppliers', 'suppliers': 'Suppliers',
+    'customer': 'Customers', 'customers': 'Customers',
+    'both': 'Customers & Suppliers', 'customers & suppliers': 'Customers & Suppliers',
+    'customers and suppliers': 'Customers & Suppliers',
+}
+DESIGNATIONS = ('MR', 'MRS', 'MS', 'MISS', 'DR')
+CONTACT_UPDATE_FIELDS = [
+    'contact_type', 'designation', 'customer_group_id', 'account_type', 'tax_number', 'business_name',
+    'business_address', 'alternative_contact', 'phone', 'credit_limit', 'is_deleted',
+]
+BALANCE_COLUMNS = {
+    'account_balance': 'opening_balance',
+    'advance_balance': 'advance_balance',
+    'total_sale_due': 'total_sale_due',
+    'total_sale_return_due': 'total_sale_return_due',
+}
+
+
+class ContactImporter(ChunkedImporter):
+    """
+    Imports the contact export layout (Contact ID, Contact Type, Name, Business Name,
+    Email, Mobile, Alternative Contact, Tax Number, Business Address, Customer Group,
+    Credit Limit, Added On, Opening Balance, Advance Balance, Total Sale Due,
+    Total Sell Return Due).
+    """
+    columns = {
+        'contact_id': ['Contact ID'],
+        'contact_type': ['Contact Type', 'Type'],
+        'name': ['Name', 'Contact Name'],
+        'business_name': ['Business Name'],
+        'email': ['Email', 'Email Address'],
+        'phone': ['Mobile', 'Phone'],
+        'alternative_contact': ['Alternative Contact'],
+        'tax_number': ['Tax Number', 'PIN'],
+        'business_address': ['Business Address', 'Address'],
+        'customer_group': ['Customer Group'],
+        'credit_limit': ['Credit Limit'],
+        'added_on': ['Added On'],
+        'opening_balance': ['Opening Balance'],
+        'advance_balance': ['Advance Balance'],
+        'total_sale_due': ['Total Sale Due'],
+        'total_sale_return_due': ['Total Sell Return Due', 'Total Sale Return Due'],
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._seen = {'email': set(), 'phone': set()}
+
+    @staticmethod
+    def _phone(values):
+        digits = values.str.replace(r'\D', '', regex=True)
+        digits = digits.mask(digits.str.startswith('0'), '254' + digits.str[1:])
+        digits = digits.mask((digits != '') & ~digits.str.startswith('254'), '254' + digits)
+        return ('+' + digits).mask(digits == '', ''), digits
+
+    def prepare(self, df):
+        frame = df[['row']].copy()
+        name = self.text(df, 'name')
+        business_name = self.text(df, 'business_name')
+        name = name.mask(name == '', business_name)
+        parts = name.str.split()
+        has_designation = parts.str[0].fillna('').str.upper().str.rstrip('.').isin(DESIGNATIONS)
+        frame['designation'] = parts.str[0].where(has_designation, '').fillna('')
+        first = parts.str[1].where(has_designation, parts.str[0])
+        last = parts.str[2].where(has_designation, parts.str[1])
+        frame['first_name'] = first.fillna('').str[:30]
+        frame['last_name'] = last.fillna('').str[:150]
+        frame['account_type'] = np.where(business_name != '', 'Business', 'Individual')
+        frame['business_name'] = business_name.str[:100]
+        frame['business_address'] = self.text(df, 'business_address').str[:100]
+
+        frame['phone'], digits = self._phone(self.text(df, 'phone'))
+        frame['alternative_contact'] = self._phone(self.text(df, 'alternative_contact'))[0]
+        frame['email'] = self.text(df, 'email').str.lower()
+        frame['contact_id'] = self.text(df, 'contact_id')
+        frame['contact_id'] = frame['contact_id'].mask(
+            frame['contact_id'] == '', 'C' + (df['row'] - 1).astype(str).str.zfill(6)
+        )
+        contact_type = self.text(df, 'contact_type', 'Customers')
+        frame['contact_type'] = contact_type.str.lower().map(CONTACT_TYPES).fillna('Customers')
+        frame['tax_number'] = self.text(df, 'tax_number', 'N/A')
+        frame['customer_group'] = self.text(df, 'customer_group')
+
+        credit_limit = self.text(df, 'credit_limit')
+        no_limit = (credit_limit == '') | (credit_limit.str.lower() == 'no limit')
+        frame['credit_limit'] = self.money(credit_limit).where(~no_limit)
+        for column in BALANCE_COLUMNS.values():
+            frame[column] = self.money(self.text(df, column, '0'))
+        added_on = pd.to_datetime(self.text(df, 'added_on'), errors='coerce', dayfirst=True)
+        frame['added_on'] = added_on.dt.date.where(added_on.notna(), date.today())
+
+        email_filled = frame['email'] != ''
+        phone_filled = frame['phone'] != ''
+        checks = [
+            (frame['first_name'] == '', 'Name', 'Name or Business Name is required'),
+            (~email_filled & ~phone_filled, 'Mobile', 'Either Email or Mobile is required'),
+            (email_filled & ~frame['email'].str.match(EMAIL_PATTERN), 'Email', 'Invalid email address'),
+            (phone_filled & (digits.str.len() != 12), 'Mobile', 'Invalid phone number'),
+            (email_filled & (frame['email'].duplicated() | frame['email'].isin(self._seen['email'])), 'Email', 'Duplicate email in file'),
+            (~email_filled & phone_filled & (frame['phone'].duplicated() | frame['phone'].isin(self._seen['phone'])), 'Mobile', 'Duplicate phone in file'),
+            (~no_limit & frame['credit_limit'].isna(), 'Credit Limit', 'Invalid credit limit'),
+        ] + [
+            (frame[column].isna(), column, 'Invalid amount') for column in BALANCE_COLUMNS.values()
+        ]
+        invalid = frame['row'].isna()
+        for mask, column, message in checks:
+            self.flag(frame, mask, column, message)
+            invalid |= mask
+        self._seen['email'].update(frame.loc[email_filled, 'email'])
+        self._seen['phone'].update(frame.loc[phone_filled, 'phone'])
+        return frame[~invalid]
+
+    def _match_existing(self, rows):
+        """{row number: (contact id, user id)} for contacts of this business matched on email, then phone"""
+        emails = [row['email'] for row in rows if row['email']]
+        phones = [row['phone'] for row in rows if row['phone']]
+        by_email, by_phone = {}, {}
+        for contact_id, user_id, email, phone in Contact.objects.filter(
+            Q(user__email__in=emails) | Q(phone__in=phones), business=self.business, is_deleted=False,
+        ).order_by('-id').values_list('id', 'user_id', 'user__email', 'phone'):
+            by_email[email] = (contact_id, user_id)
+            if phone:
+                by_phone[phone] = (contact_id, user_id)
+        matches = {}
+        for row in rows:
+            match = by_email.get(row['email']) if row['email'] else None
+            if match is None and row['phone']:
+                match = by_phone.get(row['phone'])
+            if match:
+                matches[row['row']] = match
+        return matches
+
+    def write(self, frame):
+        groups = resolve_lookup(
+            CustomerGroup, 'group_name', frame.loc[frame['customer_group'] != '', 'customer_group'],
+            lambda name: CustomerGroup(group_name=name, dicount_calculation='Percentage', amount=0),
+        )
+        rows = frame.to_dict('records')
+        matches = self._match_existing(rows)
+
+        # Accounts: real email when given, otherwise a placeholder derived from the phone number.
+        # Existing accounts (staff, other businesses' users) are linked as they are, never modified.
+        for row in rows:
+            row['user_email'] = row['email'] or f"contact{row['phone'].lstrip('+')}@example.com"
+        account_rows = [row for row in rows if row['row'] not in matches]
+        if account_rows:
+            emails = [row['user_email'] for row in account_rows]
+            existing_users = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+            new_rows = [row for row in account_rows if row['user_email'] not in existing_users]
+            usernames = unique_usernames([row['user_email'] for row in new_rows])
+            unusable_password = make_password(None)
+            User.objects.bulk_create([
+                User(
+                    email=row['user_email'], username=usernames.get(row['user_email']), first_name=row['first_name'],
+                    last_name=row['last_name'], phone=row['phone'] or None, is_active=True, password=unusable_password,
+                )
+                for row in new_rows
+            ], ignore_conflicts=True)
+            user_ids = dict(User.objects.filter(email__in=emails).values_list('email', 'id'))
+
+        to_create, to_update = [], {}
+        for row in rows:
+            values = {
+                'contact_type': row['contact_type'], 'designation': row['designation'],
+                'customer_group_id': groups.get(row['customer_group']), 'account_type': row['account_type'],
+                'tax_number': row['tax_number'], 'business_name': row['business_name'] or None,
+                'business_address': row['business_address'] or None,
+                'alternative_contact': row['alternative_contact'] or None, 'phone': row['phone'] or None,
+                'credit_limit': None if pd.isna(row['credit_limit']) else Decimal(str(row['credit_limit'])),
+                'is_deleted': False,
+            }
+            if row['row'] in matches:
+                contact_id, _ = matches[row['row']]
+                to_update[contact_id] = Contact(id=contact_id, **values)
+            else:
+                to_create.append(Contact(
+                    contact_id=row['contact_id'], user_id=user_ids[row['user_email']], business=self.business,
+                    added_on=row['added_on'], created_by=self.user, **values,
+                ))
+        if to_update:
+            Contact.objects.bulk_update(list(to_update.values()), CONTACT_UPDATE_FIELDS)
+        created = Contact.objects.bulk_create(to_create)
+
+        contact_by_row = {row: match[0] for row, match in matches.items()}
+        if created and created[0].pk is None:
+            created = list(Contact.objects.filter(
+                business=self.business, user_id__in=[contact.user_id for contact in to_create]
+            ).order_by('id'))
+        created_by_user = {contact.user_id: contact.pk for contact in created}
+        for row in rows:
+            if row['row'] not in contact_by_row:
+                contact_by_row[row['row']] = created_by_user[user_ids[row['user_email']]]
+
+        upsert_one_per_parent(ContactAccount, 'contact_id', {
+            contact_by_row[row['row']]: {
+                field: Decimal(str(row[column])) for field, column in BALANCE_COLUMNS.items()
+            }
+            for row in rows
+        })
@@ -1,3 +1,76 @@
+import os
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from business.models import Bussiness, BusinessLocation
+from crm.contacts.importers import ContactImporter
+from crm.contacts.models import Contact, ContactAccount
+
+User = get_user_model()
+
+
+class ContactImporterTests(TestCase):
+    HEADER = 'Contact ID,Contact Type,Name,Business Name,Email,Mobile,Tax Number,Customer Group,Credit Limit,Opening Balance\n'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='crm', email='crm@example.com', password='pass')
+        location = BusinessLocation.objects.create(city='Kisumu')
+        self.business = Bussiness.objects.create(name='CRM Biz', owner=self.user, location=location)
+
+    def _import(self, rows):
+        handle = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        handle.write(self.HEADER + ''.join(rows))
+        handle.close()
+        try:
+            return ContactImporter(handle.name, self.business, user=self.user).run()
+        finally:
+            os.unlink(handle.name)
+
+    def test_import_creates_contacts_and_accounts(self):
+        report = self._import([
+            'C1,Customers,MR John Doe,,john@example.com,0712345678,,Retail,No Limit,"1,500"\n',
+            'C2,Suppliers,Jane Supplies,Jane Ltd,,0722000111,P051,,50000,0\n',
+            'C3,Customers,No Contact,,,,,,,0\n',
+        ])
+
+        self.assertEqual((report['imported'], report['failed']), (2, 1))
+        self.assertEqual(report['errors'][0]['row'], 4)
+        john = Contact.objects.get(user__email='john@example.com')
+        self.assertEqual((john.designation, john.user.first_name, john.user.last_name), ('MR', 'John', 'Doe'))
+        self.assertEqual(john.phone, '+254712345678')
+        self.assertEqual(john.customer_group.group_name, 'Retail')
+        self.assertIsNone(john.credit_limit)
+        self.assertEqual(ContactAccount.objects.get(contact=john).account_balance, Decimal('1500'))
+        jane = Contact.objects.get(phone='+254722000111')
+        self.assertEqual((jane.account_type, jane.contact_type, jane.created_by), ('Business', 'Suppliers', self.user))
+
+    def test_reimport_matches_on_email_then_phone(self):
+        self._import([
+            'C1,Customers,John Doe,,john@example.com,0712345678,,,,0\n',
+            'C2,Customers,Mary Wanjiku,,,0722000111,,,,0\n',
+        ])
+        report = self._import([
+            'C1,Customers,John Doe,,john@example.com,0799999999,,,,200\n',
+            'C2,Customers,Mary Wanjiku,,,+254 722 000 111,,,,0\n',
+        ])
+
+        self.assertEqual(report['imported'], 2)
+        self.assertEqual(Contact.objects.filter(business=self.business).count(), 2)
+        john = Contact.objects.get(user__email='john@example.com')
+        self.assertEqual(john.phone, '+254799999999')
+        self.assertEqual(ContactAccount.objects.filter(contact=john).get().account_balance, Decimal('200'))
+
+    def test_existing_account_is_linked_without_changes(self):
+        staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='pass', first_name='Staff', last_name='Member', is_staff=True,
+        )
+        phone = staff.phone
+        report = self._import(['C1,Customers,Some Body,,staff@example.com,0712345678,,,,0\n'])
+
+        self.assertEqual(report['imported'], 1)
+        self.assertEqual(Contact.objects.get(business=self.business).user, staff)
+        staff.refresh_from_db()
+        self.assertEqual((staff.first_name, staff.last_name, staff.phone, staff.is_staff), ('Staff', 'Member', phone, True))
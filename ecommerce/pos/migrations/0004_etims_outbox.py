@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pos', '0003_alter_sales_date_added_alter_sales_date_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sales',
+            name='etims_control_number',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='sales',
+            name='etims_qr_data',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sales',
+            name='fiscalized_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -137,6 +137,10 @@ class Sales(models.Model):
     paymethod = models.CharField(max_length=20,choices=(("Cash","Cash"),("Mpesa","Mpesa"),("Card","Card"),("Bank","Bank"),("Advance","Advance"),("Other","Other")), default="Cash", blank=True, null=True)
     sale_source=models.CharField(max_length=50,choices=[("pos","POS"),("online","Online"),("other","Other")],default='pos')
     delete_status=models.BooleanField(default=False)
+    # KRA eTIMS fiscalization (integrations.etims)
+    etims_control_number = models.CharField(max_length=100, blank=True, null=True)
+    etims_qr_data = models.TextField(blank=True, null=True)
+    fiscalized_at = models.DateTimeField(blank=True, null=True)
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
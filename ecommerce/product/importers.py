@@ -0,0 +1,250 @@
+"""
+Bulk product catalog import on the shared streaming import framework.
+
+Products are upserted on SKU and stock on (product, branch, variation), so a
+catalog file can be re-uploaded to update prices and stock levels.
+"""
+from decimal import Decimal
+import logging
+
+import pandas as pd
+from django.utils import timezone
+
+from business.models import Branch
+from core.modules.data_import import ChunkedImporter, resolve_lookup
+from ecommerce.stockinventory.models import Discounts, StockInventory, StockTransaction, Unit, Variations
+from .models import Category, ProductBrands, ProductImages, Products
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE = 'default.png'
+DEFAULT_UNIT = 'Piece(s)'
+STOCK_PRODUCT_TYPES = ('single', 'variable', 'combo')
+STOCK_UPDATE_FIELDS = ['product_type', 'unit', 'buying_price', 'selling_price', 'stock_level', 'availability', 'updated_at']
+
+
+class ProductImporter(ChunkedImporter):
+    """
+    Imports the product export layout (Product, SKU, SERIAL, Category, Brand,
+    Product Type, Unit, Variation, Unit Purchase Price, Selling Price, Current stock).
+    An optional Branch column holds a branch code; rows without one go to the
+    business's main branch.
+    """
+    columns = {
+        'title': ['Product', 'Product Name', 'Name'],
+        'sku': ['SKU'],
+        'serial': ['SERIAL', 'Serial No'],
+        'category': ['Category'],
+        'brand': ['Brand'],
+        'product_type': ['Product Type'],
+        'unit': ['Unit'],
+        'variation': ['Variation'],
+        'buying_price': ['Unit Purchase Price', 'Buying Price', 'Cost'],
+        'selling_price': ['Selling Price', 'Price'],
+        'stock_level': ['Current stock', 'Stock', 'Quantity'],
+        'branch': ['Branch', 'Branch Code'],
+    }
+    required_columns = ('title', 'sku')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._seen_skus = set()
+        self._seen_serials = set()
+        self._context = None
+
+    def _load_context(self):
+        """Per-run lookups that do not depend on the chunk"""
+        branches = dict(Branch.objects.filter(business=self.business).values_list('branch_code', 'id'))
+        main = Branch.objects.filter(business=self.business).order_by('-is_main_branch', 'id').first()
+        sale_settings = self.business.salesettings.first()
+        discount = None
+        if sale_settings is not None:
+            discount = Discounts.objects.filter(
+                name="Default Sale Discount", discount_amount=Decimal(sale_settings.default_discount)
+            ).first()
+        margin = self.business.default_profit_margin
+        self._context = {
+            'branches': branches,
+            'main_branch_id': main.id if main else None,
+            'discount_id': discount.id if discount else None,
+            'tax_id': sale_settings.default_tax_id if sale_settings else None,
+            'margin': Decimal(margin if margin is not None else 30),
+        }
+
+    @staticmethod
+    def _code(values):
+        # Excel turns numeric codes into floats ("1002.0")
+        return values.str.replace(r'\.0$', '', regex=True)
+
+    def prepare(self, df):
+        if self._context is None:
+            self._load_context()
+        frame = df[['row']].copy()
+        frame['title'] = self.text(df, 'title')
+        frame['sku'] = self._code(self.text(df, 'sku'))
+        frame['serial'] = self._code(self.text(df, 'serial'))
+        frame['category'] = self.text(df, 'category')
+        frame['brand'] = self.text(df, 'brand')
+        frame['unit'] = self.text(df, 'unit', DEFAULT_UNIT)
+        frame['variation'] = self.text(df, 'variation')
+        product_type = self.text(df, 'product_type', 'single').str.lower()
+        frame['product_type'] = product_type.where(product_type.isin(STOCK_PRODUCT_TYPES), 'single')
+
+        buying_raw = self.text(df, 'buying_price', '0')
+        selling_raw = self.text(df, 'selling_price', '0')
+        frame['buying_price'] = self.money(buying_raw)
+        frame['selling_price'] = self.money(selling_raw)
+        stock_level = self.text(df, 'stock_level', '0').str.replace(',', '').str.extract(r'(-?\d+)')[0]
+        frame['stock_level'] = pd.to_numeric(stock_level, errors='coerce').fillna(0).astype(int)
+
+        branch_codes = self.text(df, 'branch')
+        branches = self._context['branches']
+        frame['branch_id'] = branch_codes.map(branches)
+        frame.loc[branch_codes == '', 'branch_id'] = self._context['main_branch_id']
+
+        serial_filled = frame['serial'] != ''
+        checks = [
+            (frame['title'] == '', 'Product', 'Product name is required'),
+            (frame['sku'] == '', 'SKU', 'SKU is required'),
+            ((frame['sku'] != '') & (frame['sku'].duplicated() | frame['sku'].isin(self._seen_skus)), 'SKU', 'Duplicate SKU in file'),
+            (serial_filled & (frame['serial'].duplicated() | frame['serial'].isin(self._seen_serials)), 'SERIAL', 'Duplicate serial in file'),
+            (frame['buying_price'].isna(), 'Unit Purchase Price', 'Invalid purchase price'),
+            (frame['selling_price'].isna(), 'Selling Price', 'Invalid selling price'),
+            ((branch_codes != '') & frame['branch_id'].isna(), 'Branch', 'Unknown branch code'),
+            ((branch_codes == '') & frame['branch_id'].isna(), 'Branch', 'The business has no branch to hold stock'),
+        ]
+        invalid = frame['row'].isna()
+        for mask, column, message in checks:
+            self.flag(frame, mask, column, message)
+            invalid |= mask
+        self._seen_skus.update(frame['sku'])
+        self._seen_serials.update(frame.loc[serial_filled, 'serial'])
+
+        # SKUs are unique across businesses: never update another business's product
+        valid = frame[~invalid]
+        foreign_skus = set(
+            Products.objects.filter(sku__in=valid['sku'].tolist(), business__isnull=False)
+            .exclude(business=self.business).values_list('sku', flat=True)
+        )
+        foreign = ~invalid & frame['sku'].isin(foreign_skus)
+        self.flag(frame, foreign, 'SKU', 'SKU already belongs to another business')
+        invalid |= foreign
+
+        # A serial may only move between rows of the same SKU
+        valid = frame[~invalid]
+        owners = dict(
+            Products.objects.filter(serial__in=valid.loc[valid['serial'] != '', 'serial'].tolist())
+            .values_list('serial', 'sku')
+        )
+        owner = frame['serial'].map(owners)
+        mask = ~invalid & owner.notna() & (owner != frame['sku'])
+        self.flag(frame, mask, 'SERIAL', 'Serial already belongs to another product')
+        return frame[~(invalid | mask)]
+
+    def write(self, frame):
+        categories = self._categories(set(frame.loc[frame['category'] != '', 'category']))
+        brands = resolve_lookup(
+            ProductBrands, 'title', frame.loc[frame['brand'] != '', 'brand'], lambda title: ProductBrands(title=title)
+        )
+        units = resolve_lookup(Unit, 'title', frame['unit'], lambda title: Unit(title=title))
+        rows = frame.to_dict('records')
+        skus = [row['sku'] for row in rows]
+
+        existing_skus = set(Products.objects.filter(sku__in=skus).values_list('sku', flat=True))
+        Products.objects.bulk_create([
+            Products(
+                sku=row['sku'], serial=row['serial'] or None, title=row['title'], business=self.business,
+                category_id=categories.get(row['category']), brand_id=brands.get(row['brand']),
+                description='', status='active', weight='', dimentions='',
+            )
+            for row in rows
+        ], update_conflicts=True, unique_fields=['sku'],
+            update_fields=['title', 'serial', 'category', 'brand', 'status', 'date_updated', 'updated_at'])
+        product_ids = dict(Products.objects.filter(sku__in=skus).values_list('sku', 'id'))
+        ProductImages.objects.bulk_create([
+            ProductImages(product_id=product_ids[sku], image=DEFAULT_IMAGE)
+            for sku in skus if sku not in existing_skus
+        ])
+
+        variations = {}
+        with_variation = [row for row in rows if row['variation']]
+        if with_variation:
+            Variations.objects.bulk_create([
+                Variations(title=f"{row['variation']}{row['unit']}", sku=row['sku'])
+                for row in with_variation
+            ], update_conflicts=True, unique_fields=['sku'], update_fields=['title'])
+            variations = dict(
+                Variations.objects.filter(sku__in=[row['sku'] for row in with_variation]).values_list('sku', 'id')
+            )
+
+        self._write_stock(rows, product_ids, variations, units)
+
+    @staticmethod
+    def _categories(names):
+        found = {}
+        for pk, name in Category.objects.filter(name__in=names).order_by('-id').values_list('pk', 'name'):
+            found[name] = pk
+        for name in names - found.keys():
+            # Category.save maintains the closure table, so new categories are saved one by one
+            found[name] = Category.objects.create(name=name, status='active').pk
+        return found
+
+    def _write_stock(self, rows, product_ids, variations, units):
+        for row in rows:
+            row['product_id'] = product_ids[row['sku']]
+            row['variation_id'] = variations.get(row['sku'])
+        existing = {}
+        for stock in StockInventory.objects.filter(
+            product_id__in={row['product_id'] for row in rows}, branch_id__in={row['branch_id'] for row in rows}
+        ).order_by('id'):
+            existing[(stock.product_id, stock.branch_id, stock.variation_id)] = stock
+
+        now = timezone.now()
+        to_create, to_update, adjustments = [], [], []
+        for row in rows:
+            buying_price = Decimal(str(row['buying_price']))
+            selling_price = Decimal(str(row['selling_price']))
+            if not selling_price:
+                # Mirrors StockInventory.suggest_selling_price
+                selling_price = buying_price * (1 + self._context['margin'] / 100)
+            values = {
+                'product_type': row['product_type'], 'unit_id': units[row['unit']], 'buying_price': buying_price,
+                'selling_price': selling_price, 'stock_level': int(row['stock_level']),
+                'availability': 'In Stock' if row['stock_level'] > 0 else 'Out of Stock', 'updated_at': now,
+            }
+            stock = existing.get((row['product_id'], int(row['branch_id']), row['variation_id']))
+            if stock is None:
+                to_create.append(StockInventory(
+                    product_id=row['product_id'], branch_id=int(row['branch_id']), variation_id=row['variation_id'],
+                    discount_id=self._context['discount_id'], applicable_tax_id=self._context['tax_id'],
+                    reorder_level=2, usage='New', **values,
+                ))
+            else:
+                if values['stock_level'] != stock.stock_level:
+                    # The sheet's count replaces the level; keep the ledger in step with it
+                    adjustments.append(StockTransaction(
+                        transaction_type='ADJUSTMENT', stock_item_id=stock.pk, branch_id=stock.branch_id,
+                        quantity=values['stock_level'] - stock.stock_level, notes='Product import',
+                    ))
+                for field, value in values.items():
+                    setattr(stock, field, value)
+                to_update.append(stock)
+
+        if to_update:
+            StockInventory.objects.bulk_update(to_update, STOCK_UPDATE_FIELDS)
+            StockTransaction.objects.bulk_create(adjustments)
+        if to_create:
+            created = StockInventory.objects.bulk_create(to_create)
+            if created and created[0].pk is None:
+                keys = {(stock.product_id, stock.branch_id, stock.variation_id) for stock in to_create}
+                created = [
+                    stock for stock in StockInventory.objects.filter(
+                        product_id__in={key[0] for key in keys}, branch_id__in={key[1] for key in keys}
+                    ) if (stock.product_id, stock.branch_id, stock.variation_id) in keys
+                ]
+            # bulk_create skips the post_save signal that records the opening stock
+            StockTransaction.objects.bulk_create([
+                StockTransaction(transaction_type='INITIAL', stock_item_id=stock.pk, branch_id=stock.branch_id, quantity=stock.stock_level)
+                for stock in created
+            ])
+
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from ecommerce.product.models import Category, CategoryClosure
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the category ancestry closure table (and category levels) from parent links'
+
+    def handle(self, *args, **options):
+        total = CategoryClosure.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt category closure: {Category.objects.count()} categories, {total} ancestry links'
+        ))
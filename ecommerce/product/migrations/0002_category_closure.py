@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_category_closure(apps, schema_editor):
+    Category = apps.get_model('product', 'Category')
+    CategoryClosure = apps.get_model('product', 'CategoryClosure')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    links = []
+    for category_id in parents:
+        depth = 0
+        current = category_id
+        seen = set()
+        while current is not None and current not in seen:
+            seen.add(current)
+            links.append(CategoryClosure(ancestor_id=current, descendant_id=category_id, depth=depth))
+            current = parents.get(current)
+            depth += 1
+    CategoryClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(default=0, help_text='Distance between ancestor and descendant (0=self)')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='product.category')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='product.category')),
+            ],
+            options={
+                'verbose_name_plural': 'Category Closure',
+                'db_table': 'category_closure',
+                'managed': True,
+                'indexes': [models.Index(fields=['ancestor', 'depth'], name='idx_cat_closure_anc_depth'), models.Index(fields=['descendant', 'depth'], name='idx_cat_closure_desc_depth')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='uniq_category_closure_link')],
+            },
+        ),
+        migrations.RunPython(populate_category_closure, migrations.RunPython.noop),
+    ]
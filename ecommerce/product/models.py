@@ -1,5 +1,6 @@
 from datetime import datetime
-from django.db import models
+from django.db import models, transaction
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from ecommerce.vendor.models import Vendor
@@ -31,12 +32,24 @@ class Category(models.Model):
         return self.name
 
     def save(self, *args, **kwargs):
+        is_new = self.pk is None
+        previous_parent_id = None
+        if not is_new:
+            previous_parent_id = Category.objects.filter(pk=self.pk).values_list('parent_id', flat=True).first()
+            if self.parent_id and CategoryClosure.objects.filter(ancestor_id=self.pk, descendant_id=self.parent_id).exists():
+                raise ValidationError("A category cannot be moved under itself or one of its descendants.")
         # Calculate level based on parent
         if self.parent:
             self.level = self.parent.level + 1
         else:
             self.level = 0
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Keep the ancestry closure in sync with the tree
+            if is_new:
+                CategoryClosure.objects.insert_node(self)
+            elif previous_parent_id != self.parent_id:
+                CategoryClosure.objects.move_subtree(self)
 
     @property
     def is_root(self):
@@ -60,22 +73,23 @@ class Category(models.Model):
 
     @property
     def get_all_children(self):
-        """Get all descendants recursively"""
-        children = []
-        for child in self.children.all():
-            children.append(child)
-            children.extend(child.get_all_children)
-        return children
+        """Get all descendants (any depth) via the closure table"""
+        return list(
+            Category.objects.filter(ancestor_links__ancestor=self, ancestor_links__depth__gt=0)
+            .order_by('ancestor_links__depth', 'order', 'name')
+        )
+
+    def descendant_ids(self, include_self=True):
+        """IDs of this category and everything beneath it, at any depth"""
+        return CategoryClosure.objects.descendant_ids(self.pk, include_self=include_self)
 
     @property
     def get_ancestors(self):
         """Get all ancestors from root to parent"""
-        ancestors = []
-        current = self.parent
-        while current:
-            ancestors.insert(0, current)
-            current = current.parent
-        return ancestors
+        return list(
+            Category.objects.filter(descendant_links__descendant=self, descendant_links__depth__gt=0)
+            .order_by('-descendant_links__depth')
+        )
 
     class Meta:
         db_table = "categories"
@@ -91,6 +105,103 @@ class Category(models.Model):
             models.Index(fields=['created_at'], name='idx_category_created_at'),
         ]
 
+class CategoryClosureManager(models.Manager):
+    """
+    Maintains the (ancestor, descendant, depth) closure of the category tree.
+    Every category has a self link at depth 0 plus one row per ancestor.
+    """
+
+    def descendant_ids(self, category_ids, include_self=True):
+        """Subquery of category IDs under the given category ID(s) at any depth"""
+        if not isinstance(category_ids, (list, tuple, set)):
+            category_ids = [category_ids]
+        qs = self.filter(ancestor_id__in=category_ids)
+        if not include_self:
+            qs = qs.filter(depth__gt=0)
+        return qs.values('descendant_id')
+
+    def insert_node(self, category):
+        """Add closure rows for a newly created (leaf) category"""
+        links = [self.model(ancestor_id=category.pk, descendant_id=category.pk, depth=0)]
+        if category.parent_id:
+            for ancestor_id, depth in self.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth'):
+                links.append(self.model(ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth + 1))
+        self.bulk_create(links, ignore_conflicts=True)
+
+    def move_subtree(self, category):
+        """Re-link a category and all of its descendants under its current parent"""
+        subtree = list(self.filter(ancestor_id=category.pk).values_list('descendant_id', 'depth'))
+        if not subtree:
+            # Category predates the closure table; rebuild its ancestry from scratch
+            self.rebuild()
+            return
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+        # Drop links from outside ancestors into the subtree, keep internal links
+        self.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if category.parent_id:
+            new_ancestors = list(self.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth'))
+            self.bulk_create([
+                self.model(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=a_depth + d_depth + 1)
+                for ancestor_id, a_depth in new_ancestors
+                for descendant_id, d_depth in subtree
+            ], batch_size=1000)
+        # Levels of the moved descendants shift together with the subtree root
+        by_depth = {}
+        for descendant_id, depth in subtree:
+            if depth > 0:
+                by_depth.setdefault(depth, []).append(descendant_id)
+        for depth, ids in by_depth.items():
+            Category.objects.filter(pk__in=ids).update(level=category.level + depth)
+
+    def rebuild(self):
+        """Recompute the whole closure (and category levels) from parent pointers"""
+        parents = dict(Category.objects.values_list('id', 'parent_id'))
+        links = []
+        levels = {}
+        for category_id in parents:
+            depth = 0
+            current = category_id
+            seen = set()
+            while current is not None and current not in seen:
+                seen.add(current)
+                links.append(self.model(ancestor_id=current, descendant_id=category_id, depth=depth))
+                current = parents.get(current)
+                depth += 1
+            levels.setdefault(depth - 1, []).append(category_id)
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(links, batch_size=1000)
+            for level, ids in levels.items():
+                Category.objects.filter(pk__in=ids).exclude(level=level).update(level=level)
+        return len(links)
+
+
+class CategoryClosure(models.Model):
+    """
+    Ancestry closure for Category so that "everything under X at any depth"
+    is a single indexed lookup instead of chained children__ joins.
+    """
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField(default=0, help_text="Distance between ancestor and descendant (0=self)")
+
+    objects = CategoryClosureManager()
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+    class Meta:
+        db_table = "category_closure"
+        managed = True
+        verbose_name_plural = "Category Closure"
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='uniq_category_closure_link'),
+        ]
+        indexes = [
+            models.Index(fields=['ancestor', 'depth'], name='idx_cat_closure_anc_depth'),
+            models.Index(fields=['descendant', 'depth'], name='idx_cat_closure_desc_depth'),
+        ]
+
 class ProductImages(models.Model):
     product=models.ForeignKey("Products",on_delete=models.SET_NULL,related_name='images',null=True,blank=True)
     image = models.FileField(upload_to="products/%Y%m%d/")
@@ -0,0 +1,235 @@
+"""
+Precomputed storefront rails (featured, trending, recommended, flash-sale).
+
+Rails are built per branch and per business by a scheduled task and stored
+in the cache as compact lists of StockInventory IDs, so the rail endpoints
+only need an ID-list fetch plus a single ``in_bulk`` query.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+import logging
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from caching.cache_manager import cache_manager
+from ecommerce.pos.models import salesItems
+from ecommerce.stockinventory.models import Favourites, ProductView, StockInventory
+
+logger = logging.getLogger(__name__)
+
+RAIL_MODULE = 'storefront_rails'
+RAIL_NAMES = ('featured', 'trending', 'recommended', 'flash_sale')
+RAIL_SIZE = 48  # IDs stored per rail; endpoints slice what they need
+RAIL_TIMEOUT = 60 * 60  # Rails are rebuilt every 15 minutes, keep them for an hour
+TRENDING_WINDOW_DAYS = 7
+AFFINITY_WINDOW_DAYS = 90
+SALE_WEIGHT = 5  # One unit sold counts as much as five product views
+CO_PURCHASE_NEIGHBOURS = 12
+CATEGORY_TOP_ITEMS = 12
+
+
+def _rail_key(branch_id=None, business_id=None):
+    if branch_id:
+        return str(branch_id)
+    return f'business:{business_id}' if business_id else 'all'
+
+
+class StorefrontRailBuilder:
+    """
+    Computes every rail for one branch, for one business when only business_id
+    is given, or across all branches when neither is
+    """
+
+    def __init__(self, branch_id=None, now=None, business_id=None):
+        self.branch_id = branch_id
+        self.business_id = business_id
+        self.now = now or timezone.now()
+        self.today = timezone.localdate(self.now) if timezone.is_aware(self.now) else self.now.date()
+
+    def _stock(self):
+        queryset = StockInventory.objects.filter(delete_status=False, product__status='active')
+        if self.branch_id:
+            queryset = queryset.filter(branch_id=self.branch_id)
+        elif self.business_id:
+            queryset = queryset.filter(branch__business_id=self.business_id)
+        return queryset
+
+    def _sales_items(self, days):
+        queryset = salesItems.objects.filter(
+            sale__date_added__gte=self.now - timedelta(days=days),
+            sale__delete_status=False,
+        )
+        if self.branch_id:
+            queryset = queryset.filter(stock_item__branch_id=self.branch_id)
+        elif self.business_id:
+            queryset = queryset.filter(stock_item__branch__business_id=self.business_id)
+        return queryset
+
+    def _ratings(self):
+        """{stock_id: average rating} for reviewed stock"""
+        return {
+            stock_id: float(avg)
+            for stock_id, avg in self._stock().filter(review_count__gt=0).values_list('id', 'avg_rating')
+        }
+
+    def _popularity(self, days):
+        """{stock_id: score} combining recent views and units sold"""
+        since = self.now - timedelta(days=days)
+        views = ProductView.objects.filter(view_date__gte=since)
+        if self.branch_id:
+            views = views.filter(stock__branch_id=self.branch_id)
+        elif self.business_id:
+            views = views.filter(stock__branch__business_id=self.business_id)
+        scores = Counter(dict(views.values('stock_id').annotate(n=Count('id')).values_list('stock_id', 'n')))
+        for stock_id, qty in self._sales_items(days).values('stock_item_id').annotate(
+            qty=Sum('qty')
+        ).values_list('stock_item_id', 'qty'):
+            scores[stock_id] += (qty or 0) * SALE_WEIGHT
+        return scores
+
+    def build_featured(self, ratings):
+        candidates = list(
+            self._stock().filter(Q(is_top_pick=True) | Q(is_new_arrival=True) | Q(id__in=[
+                stock_id for stock_id, avg in ratings.items() if avg is not None and avg >= 4
+            ])).values_list('id', 'is_top_pick', 'created_at')
+        )
+        candidates.sort(key=lambda row: (not row[1], -(ratings.get(row[0]) or 0), -row[2].timestamp() if row[2] else 0))
+        return [row[0] for row in candidates[:RAIL_SIZE]]
+
+    def build_trending(self, popularity):
+        ranked = [stock_id for stock_id, _ in popularity.most_common(RAIL_SIZE)]
+        if len(ranked) < RAIL_SIZE:
+            # Top up with all-time view counts when recent activity is sparse
+            ranked += list(
+                self._stock().exclude(id__in=ranked).order_by('-product__view_count', '-id')
+                .values_list('id', flat=True)[:RAIL_SIZE - len(ranked)]
+            )
+        return ranked
+
+    def build_flash_sale(self):
+        return list(
+            self._stock().filter(
+                Q(discount__percentage__gt=0) | Q(discount__discount_amount__gt=0),
+                discount__is_active=True,
+                discount__start_date__lte=self.today,
+                discount__end_date__gte=self.today,
+            ).order_by('-discount__percentage', '-discount__discount_amount', 'id')
+            .values_list('id', flat=True)[:RAIL_SIZE]
+        )
+
+    def build_recommended(self, ratings, affinity_scores):
+        ranked = sorted(
+            (stock_id for stock_id, avg in ratings.items() if avg is not None and avg >= 4),
+            key=lambda stock_id: (-affinity_scores.get(stock_id, 0), -(ratings.get(stock_id) or 0), stock_id),
+        )
+        if len(ranked) < RAIL_SIZE:
+            ranked += [stock_id for stock_id, _ in affinity_scores.most_common(RAIL_SIZE * 2) if stock_id not in ratings]
+        return ranked[:RAIL_SIZE]
+
+    def build_co_purchase(self, affinity_scores):
+        """{stock_id: [stock ids most often bought in the same sale]} for the popular items"""
+        tracked = {stock_id for stock_id, _ in affinity_scores.most_common(RAIL_SIZE * 10)}
+        baskets = defaultdict(set)
+        for sale_id, stock_id in self._sales_items(AFFINITY_WINDOW_DAYS).values_list('sale_id', 'stock_item_id'):
+            baskets[sale_id].add(stock_id)
+        pairs = defaultdict(Counter)
+        for items in baskets.values():
+            if len(items) < 2:
+                continue
+            for stock_id in items:
+                if stock_id in tracked:
+                    for other in items:
+                        if other != stock_id:
+                            pairs[stock_id][other] += 1
+        return {
+            stock_id: [other for other, _ in counter.most_common(CO_PURCHASE_NEIGHBOURS)]
+            for stock_id, counter in pairs.items()
+        }
+
+    def build_category_top(self, affinity_scores):
+        """{category_id: [best stock ids in that category]}"""
+        by_category = defaultdict(list)
+        rows = self._stock().exclude(product__category__isnull=True).values_list('id', 'product__category_id')
+        for stock_id, category_id in rows:
+            by_category[category_id].append(stock_id)
+        return {
+            category_id: sorted(ids, key=lambda stock_id: (-affinity_scores.get(stock_id, 0), -stock_id))[:CATEGORY_TOP_ITEMS]
+            for category_id, ids in by_category.items()
+        }
+
+    def build(self):
+        ratings = self._ratings()
+        trending_scores = self._popularity(TRENDING_WINDOW_DAYS)
+        affinity_scores = self._popularity(AFFINITY_WINDOW_DAYS)
+        return {
+            'featured': self.build_featured(ratings),
+            'trending': self.build_trending(trending_scores),
+            'recommended': self.build_recommended(ratings, affinity_scores),
+            'flash_sale': self.build_flash_sale(),
+            'co_purchase': self.build_co_purchase(affinity_scores),
+            'category_top': self.build_category_top(affinity_scores),
+            'built_at': self.now.isoformat(),
+        }
+
+
+def store_rails(branch_id, rails, business_id=None):
+    cache_manager.set(_rail_key(branch_id, business_id), rails, timeout=RAIL_TIMEOUT, module=RAIL_MODULE)
+
+
+def rebuild_rails(branch_id=None, business_id=None):
+    """Build and cache the rails for a branch (or a business); returns the rail payload"""
+    rails = StorefrontRailBuilder(branch_id, business_id=business_id).build()
+    store_rails(branch_id, rails, business_id)
+    return rails
+
+
+def get_rails(branch_id=None, business_id=None):
+    """Cached rails for a branch (or a business), building them on a cold cache"""
+    key = _rail_key(branch_id, business_id)
+    rails = cache_manager.get(key, module=RAIL_MODULE)
+    if rails is None:
+        logger.info(f"Storefront rails cache miss for {key}, building inline")
+        rails = rebuild_rails(branch_id, business_id)
+    return rails
+
+
+def get_rail_ids(rail, branch_id=None, user=None, limit=8, business_id=None):
+    """Ordered StockInventory IDs for a rail, personalised for recommended when possible"""
+    rails = get_rails(branch_id, business_id)
+    if rail == 'recommended' and user is not None and user.is_authenticated:
+        personal = personalised_recommendations(rails, user, limit)
+        if personal:
+            return personal
+    return list(rails.get(rail, []))[:limit]
+
+
+def personalised_recommendations(rails, user, limit):
+    """Blend co-purchase neighbours and category affinity of the user's favourites"""
+    favourites = list(Favourites.objects.filter(user=user).values_list('stock_id', 'stock__product__category_id'))
+    if not favourites:
+        return []
+    owned = {stock_id for stock_id, _ in favourites}
+    co_purchase = rails.get('co_purchase', {})
+    category_top = rails.get('category_top', {})
+    picks = []
+    seen = set(owned)
+    sources = [co_purchase.get(stock_id, []) for stock_id, _ in favourites]
+    sources += [category_top.get(category_id, []) for _, category_id in favourites if category_id]
+    sources.append(rails.get('recommended', []))
+    for source in sources:
+        for stock_id in source:
+            if stock_id not in seen:
+                seen.add(stock_id)
+                picks.append(stock_id)
+                if len(picks) >= limit:
+                    return picks
+    return picks
+
+
+def fetch_rail(queryset, ids):
+    """Load rail IDs with one in_bulk query, preserving rail order"""
+    if not ids:
+        return []
+    objects = queryset.in_bulk(ids)
+    return [objects[stock_id] for stock_id in ids if stock_id in objects]
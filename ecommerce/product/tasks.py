@@ -0,0 +1,36 @@
+"""
+Celery tasks for the product catalogue.
+"""
+from celery import shared_task
+import logging
+
+from business.models import Branch
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def build_storefront_rails(branch_id=None):
+    """
+    Rebuild the cached storefront rails for one branch, or for every active
+    branch, every business with one, and the cross-branch ('all') rails when
+    no branch is given.
+    """
+    from ecommerce.product.rails import rebuild_rails
+
+    if branch_id:
+        scopes = [(branch_id, None)]
+    else:
+        branches = list(Branch.objects.filter(is_active=True).values_list('id', 'business_id'))
+        scopes = [(current, None) for current, _ in branches]
+        scopes += [(None, business) for business in sorted({business for _, business in branches if business})]
+        scopes.append((None, None))
+    built = 0
+    for current, business in scopes:
+        try:
+            rebuild_rails(current, business)
+            built += 1
+        except Exception as e:
+            scope = current or (f'business {business}' if business else 'all')
+            logger.error(f"Error building storefront rails for branch {scope}: {str(e)}", exc_info=True)
+    return {'branches': built}
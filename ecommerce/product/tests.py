@@ -1,3 +1,204 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
 from django.test import TestCase
 
-# Create your tests here.
+from ecommerce.product.models import Category, CategoryClosure, Products
+
+
+class CategoryClosureTests(TestCase):
+    def setUp(self):
+        self.root = Category.objects.create(name='Electronics')
+        self.phones = Category.objects.create(name='Phones', parent=self.root)
+        self.android = Category.objects.create(name='Android', parent=self.phones)
+        self.budget = Category.objects.create(name='Budget', parent=self.android)
+        self.fashion = Category.objects.create(name='Fashion')
+
+    def _descendants(self, category):
+        return set(CategoryClosure.objects.descendant_ids(category.pk).values_list('descendant_id', flat=True))
+
+    def test_insert_links_every_ancestor(self):
+        links = dict(CategoryClosure.objects.filter(descendant=self.budget).values_list('ancestor_id', 'depth'))
+        self.assertEqual(links, {self.budget.pk: 0, self.android.pk: 1, self.phones.pk: 2, self.root.pk: 3})
+        self.assertEqual(self._descendants(self.root), {self.root.pk, self.phones.pk, self.android.pk, self.budget.pk})
+
+    def test_move_subtree_relinks_descendants_and_levels(self):
+        self.android.parent = self.fashion
+        self.android.save()
+        self.assertEqual(self._descendants(self.phones), {self.phones.pk})
+        self.assertEqual(self._descendants(self.fashion), {self.fashion.pk, self.android.pk, self.budget.pk})
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.level, 2)
+        self.assertEqual([c.pk for c in self.budget.get_ancestors], [self.fashion.pk, self.android.pk])
+
+    def test_cannot_move_under_own_descendant(self):
+        self.phones.parent = self.budget
+        with self.assertRaises(ValidationError):
+            self.phones.save()
+
+    def test_rebuild_matches_incremental_maintenance(self):
+        expected = set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        CategoryClosure.objects.all().delete()
+        CategoryClosure.objects.rebuild()
+        self.assertEqual(set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')), expected)
+
+    def test_products_filtered_at_any_depth(self):
+        deep = Products.objects.create(title='Deep Phone', category=self.budget)
+        Products.objects.create(title='Shirt', category=self.fashion)
+        ids = set(
+            Products.objects.filter(
+                category_id__in=CategoryClosure.objects.descendant_ids(self.root.pk)
+            ).values_list('id', flat=True)
+        )
+        self.assertEqual(ids, {deep.id})
+
+
+class StorefrontRailTests(TestCase):
+    def setUp(self):
+        from datetime import date, timedelta
+        from django.contrib.auth import get_user_model
+        from business.models import Bussiness, Branch, BusinessLocation, ProductSettings
+        from ecommerce.stockinventory.models import Discounts, Favourites, ProductView, StockInventory
+
+        self.user = get_user_model().objects.create_user(username='rails', email='rails@example.com', password='pass')
+        location = BusinessLocation.objects.create(city='Kisumu')
+        business = Bussiness.objects.create(name='Rails Biz', owner=self.user, location=location)
+        ProductSettings.objects.get_or_create(business=business)
+        self.branch = Branch.objects.create(name='Rails Branch', business=business, location=location, branch_code='RAILS01')
+        self.phones = Category.objects.create(name='Phones')
+        self.stock = []
+        for i in range(3):
+            product = Products.objects.create(title=f'Phone {i}', category=self.phones, business=business)
+            self.stock.append(StockInventory.objects.create(product=product, branch=self.branch, stock_level=5, buying_price=10, selling_price=15))
+        sale = Discounts.objects.create(
+            name='Flash', discount_amount=0, percentage=20,
+            start_date=date.today() - timedelta(days=1), end_date=date.today() + timedelta(days=1),
+        )
+        StockInventory.objects.filter(pk=self.stock[2].pk).update(discount=sale)
+        StockInventory.objects.exclude(pk=self.stock[2].pk).update(discount=None)
+        for _ in range(3):
+            ProductView.objects.create(stock=self.stock[1], viewed_by=self.user)
+        Favourites.objects.create(user=self.user, stock=self.stock[0])
+
+    def test_rails_are_ranked_id_lists(self):
+        from ecommerce.product.rails import StorefrontRailBuilder
+
+        rails = StorefrontRailBuilder(self.branch.id).build()
+        self.assertEqual(rails['flash_sale'], [self.stock[2].id])
+        self.assertEqual(rails['trending'][0], self.stock[1].id)
+        self.assertEqual(set(rails['category_top'][self.phones.id]), {s.id for s in self.stock})
+
+    def test_recommended_excludes_favourites_and_uses_category_affinity(self):
+        from ecommerce.product.rails import fetch_rail, get_rail_ids, rebuild_rails
+        from ecommerce.stockinventory.models import StockInventory
+
+        rebuild_rails(self.branch.id)
+        ids = get_rail_ids('recommended', branch_id=self.branch.id, user=self.user, limit=8)
+        self.assertNotIn(self.stock[0].id, ids)
+        self.assertEqual(set(ids), {self.stock[1].id, self.stock[2].id})
+        self.assertEqual([s.id for s in fetch_rail(StockInventory.objects.all(), ids)], ids)
+
+
+    def test_business_rails_exclude_other_businesses(self):
+        from business.models import Bussiness, Branch, ProductSettings
+        from ecommerce.stockinventory.models import ProductView, StockInventory
+        from rest_framework.test import APIClient
+
+        other = Bussiness.objects.create(name='Other Rails', owner=self.user, location=self.branch.location)
+        ProductSettings.objects.get_or_create(business=other)
+        other_branch = Branch.objects.create(name='Other Branch', business=other, location=self.branch.location, branch_code='RAILS02')
+        product = Products.objects.create(title='Their Phone', category=self.phones, business=other)
+        theirs = StockInventory.objects.create(product=product, branch=other_branch, stock_level=5, buying_price=10, selling_price=15)
+        for _ in range(5):
+            ProductView.objects.create(stock=theirs, viewed_by=self.user)
+
+        response = APIClient().get('/api/v1/ecommerce/product/products/trending/', {'business_id': self.branch.business_id, 'limit': 10})
+        self.assertEqual(response.status_code, 200, response.content)
+        ids = {item['id'] for item in response.json()['data']}
+        self.assertEqual(ids, {stock.id for stock in self.stock})
+
+        # limit/offset paginate the product list, not the rail
+        response = APIClient().get('/api/v1/ecommerce/product/products/trending/', {
+            'business_id': self.branch.business_id, 'limit': 10, 'offset': len(self.stock),
+        })
+        self.assertEqual({item['id'] for item in response.json()['data']}, {stock.id for stock in self.stock})
+
+
+class ProductImporterTests(TestCase):
+    HEADER = 'Product,SKU,SERIAL,Category,Brand,Product Type,Unit,Variation,Unit Purchase Price,Selling Price,Current stock\n'
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from business.models import Bussiness, Branch, BusinessLocation
+
+        user = get_user_model().objects.create_user(username='catalog', email='catalog@example.com', password='pass')
+        location = BusinessLocation.objects.create(city='Kisumu')
+        self.business = Bussiness.objects.create(name='Catalog Biz', owner=user, location=location)
+        self.branch = Branch.objects.create(
+            name='Main', business=self.business, location=location, branch_code='CAT01', is_main_branch=True
+        )
+
+    def _import(self, rows, **kwargs):
+        import os
+        import tempfile
+        from ecommerce.product.importers import ProductImporter
+
+        handle = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        handle.write(self.HEADER + ''.join(rows))
+        handle.close()
+        try:
+            return ProductImporter(handle.name, self.business, **kwargs).run()
+        finally:
+            os.unlink(handle.name)
+
+    def test_import_upserts_products_and_stock_by_sku(self):
+        from ecommerce.stockinventory.models import StockInventory, StockTransaction
+
+        report = self._import([
+            'Phone A,1001,S1,Phones,Acme,Single,Piece(s),,"KSh 1,000",1500,10\n',
+            'Phone B,1002,,Phones,Acme,Single,,,800,0,0 Pieces\n',
+            'Phone C,1001,,Phones,Acme,Single,,,800,900,1\n',
+            ',1003,,Phones,Acme,Single,,,800,900,1\n',
+        ], chunk_size=2)
+
+        self.assertEqual((report['imported'], report['failed']), (2, 2))
+        self.assertEqual([(error['row'], error['column']) for error in report['errors']], [(4, 'SKU'), (5, 'Product')])
+        phone_a = Products.objects.get(sku='1001')
+        self.assertEqual(phone_a.category.name, 'Phones')
+        self.assertTrue(CategoryClosure.objects.filter(descendant=phone_a.category, depth=0).exists())
+        stock = StockInventory.objects.get(product=phone_a)
+        self.assertEqual((stock.buying_price, stock.stock_level, stock.branch_id), (Decimal('1000'), 10, self.branch.id))
+        # Zero selling price falls back to the business profit margin
+        self.assertEqual(StockInventory.objects.get(product__sku='1002').selling_price, Decimal('1000'))
+        self.assertEqual(StockInventory.objects.get(product__sku='1002').availability, 'Out of Stock')
+        self.assertEqual(StockTransaction.objects.filter(transaction_type='INITIAL').count(), 2)
+
+        report = self._import(['Phone A v2,1001,S1,Phones,Acme,Single,,,1000,1600,4\n'])
+        self.assertEqual(report['imported'], 1)
+        self.assertEqual(Products.objects.filter(sku='1001').count(), 1)
+        self.assertEqual(Products.objects.get(sku='1001').title, 'Phone A v2')
+        stock = StockInventory.objects.get(product__sku='1001')
+        self.assertEqual((stock.selling_price, stock.stock_level), (Decimal('1600'), 4))
+        adjustment = StockTransaction.objects.get(transaction_type='ADJUSTMENT')
+        self.assertEqual((adjustment.stock_item_id, adjustment.quantity), (stock.id, -6))
+
+    def test_sku_of_another_business_is_rejected(self):
+        from business.models import Bussiness
+
+        other = Bussiness.objects.create(name='Other Biz', owner=self.business.owner, location=self.business.location)
+        Products.objects.create(title='Theirs', sku='2001', business=other)
+        report = self._import(['Mine,2001,,Phones,,,,,100,150,1\n'])
+
+        self.assertEqual((report['imported'], report['errors'][0]['column']), (0, 'SKU'))
+        product = Products.objects.get(sku='2001')
+        self.assertEqual((product.title, product.business_id), ('Theirs', other.id))
+
+    def test_resume_skips_committed_rows(self):
+        report = self._import([
+            'Phone A,1001,,,,,,,100,150,1\n',
+            'Phone B,1002,,,,,,,100,150,1\n',
+            'Phone C,1003,,,,,,,100,150,1\n',
+        ], start_row=2, report={'imported': 2, 'failed': 0, 'error_count': 0, 'errors': []})
+
+        self.assertEqual(list(Products.objects.values_list('sku', flat=True)), ['1003'])
+        self.assertEqual((report['total_rows'], report['imported']), (3, 3))
@@ -199,15 +199,7 @@ class CategoryViewSet(BaseModelViewSet):
         try:
             correlation_id = get_correlation_id(request)
             category = self.get_object()
-            descendants = []
-            
-            def get_descendants(cat):
-                children = cat.children.all()
-                for child in children:
-                    descendants.append(child)
-                    get_descendants(child)
-            
-            get_descendants(category)
+            descendants = category.get_all_children
             serializer = self.get_serializer(descendants, many=True)
             return APIResponse.success(data=serializer.data, message='Category descendants retrieved successfully', correlation_id=correlation_id)
         except Exception as e:
@@ -9,10 +9,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework import permissions, authentication
 from rest_framework.authentication import SessionAuthentication, TokenAuthentication
 from rest_framework.decorators import action
-from django.db.models import Q,Count
+from django.db.models import Q,Count,F
 from .serializers import *
 from ecommerce.stockinventory.serializers import *
-from ecommerce.stockinventory.models import Review, StockInventory
+from ecommerce.stockinventory.models import Review, StockInventory, ProductView
 from ecommerce.product.models import *
 from business.models import PickupStations
 from .delivery import DeliveryPolicy, RegionalDeliveryPolicy, ProductDeliveryInfo
@@ -166,12 +166,9 @@ class ProductViewSet(BaseModelViewSet):
                 correlation_id=get_correlation_id(request)
             )
 
-    @monitor_performance('product_list_query')
-    def get_queryset(self):
+    def _tenant_queryset(self):
+        """Base queryset restricted to the request's branch/business, before filters and pagination"""
         queryset = super().get_queryset()
-        # Get all query parameters
-        params = self.request.query_params
-        user = self.request.user
         # Enforce multi-tenant context (Business/Branch)
         try:
             from core.utils import get_business_id_from_request, get_branch_id_from_request
@@ -184,6 +181,14 @@ class ProductViewSet(BaseModelViewSet):
         except Exception:
             # If context helpers fail, proceed without restricting, but do not break
             pass
+        return queryset
+
+    @monitor_performance('product_list_query')
+    def get_queryset(self):
+        queryset = self._tenant_queryset()
+        # Get all query parameters
+        params = self.request.query_params
+        user = self.request.user
         
         # Basic pagination parameters
         limit = params.get('limit')
@@ -233,28 +238,23 @@ class ProductViewSet(BaseModelViewSet):
             
             queryset = queryset.filter(product_filter)
         
-        # Direct category ID filtering
-        if category:
+        # Direct category ID filtering (category and all of its descendants, any depth)
+        if category and str(category).isdigit():
             queryset = queryset.filter(
-                Q(product__category_id=category) |
-                Q(product__category__children__id=category) |
-                Q(product__category__children__children__id=category)
-            ).distinct()
+                product__category_id__in=CategoryClosure.objects.descendant_ids(int(category))
+            )
         
         # Multiple categories filtering
         if categories:
             category_ids = [int(c.strip()) for c in categories.split(',') if c.strip().isdigit()]
             if category_ids:
-                category_filter = Q()
-                for cat_id in category_ids:
-                    category_filter |= Q(product__category_id=cat_id) | \
-                                       Q(product__category__children__id=cat_id) | \
-                                       Q(product__category__children__children__id=cat_id)
-                queryset = queryset.filter(category_filter).distinct()
+                queryset = queryset.filter(
+                    product__category_id__in=CategoryClosure.objects.descendant_ids(category_ids)
+                )
         
         # Main category filtering
         if main_category:
-            queryset = queryset.filter(product__category_id=main_category).distinct()
+            queryset = queryset.filter(product__category_id=main_category)
         
         # Single brand filtering
         if brand:
@@ -278,9 +278,8 @@ class ProductViewSet(BaseModelViewSet):
         if min_rating:
             try:
                 min_rating_value = float(min_rating)
-                # Filter products with average rating >= min_rating
-                # This assumes you have a way to calculate average_rating
-                queryset = queryset.filter(reviews__rating__gte=min_rating_value).distinct()
+                # Filter on the denormalized average rating (no review join)
+                queryset = queryset.filter(avg_rating__gte=min_rating_value)
             except (ValueError, TypeError):
                 pass
         
@@ -330,10 +329,7 @@ class ProductViewSet(BaseModelViewSet):
             elif sort == '-price':
                 queryset = queryset.order_by('-selling_price')
             elif sort == '-average_rating':
-                # This would need a way to calculate average rating
-                # For now, using a simple group by and annotate approach
-                from django.db.models import Avg
-                queryset = queryset.annotate(avg_rating=Avg('reviews__rating')).order_by('-avg_rating')
+                queryset = queryset.order_by('-avg_rating', '-review_count')
         elif ordering:  # Legacy ordering parameter
             if ordering in ['selling_price', '-selling_price', 'product__created_at', '-product__created_at']:
                 queryset = queryset.order_by(ordering)
@@ -371,9 +367,10 @@ class ProductViewSet(BaseModelViewSet):
             # Add delivery information
             self.add_delivery_info(data, instance.product, request)
             
-            # Increment view count
-            instance.product.view_count = instance.product.view_count + 1
-            instance.product.save()
+            # Increment view count and record the view for trending rails
+            Products.objects.filter(pk=instance.product_id).update(view_count=F('view_count') + 1)
+            if request.user.is_authenticated:
+                ProductView.objects.create(stock=instance, viewed_by=request.user)
             
             return APIResponse.success(data=data, message='Product retrieved successfully', correlation_id=correlation_id)
         except Exception as e:
@@ -532,99 +529,56 @@ class ProductViewSet(BaseModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    def _rail_response(self, request, rail, label):
+        """Serve a precomputed storefront rail: cached ID list + one in_bulk query"""
+        try:
+            correlation_id = get_correlation_id(request)
+            from core.utils import get_branch_id_from_request, get_business_id_from_request
+            from .rails import get_rail_ids, fetch_rail
+            try:
+                limit = min(int(request.query_params.get('limit', 8)), 48)
+            except (TypeError, ValueError):
+                limit = 8
+            ids = get_rail_ids(
+                rail, branch_id=get_branch_id_from_request(request), user=request.user, limit=limit,
+                business_id=get_business_id_from_request(request),
+            )
+            # Through the tenant-scoped queryset, so a rail never surfaces another business's stock
+            products = fetch_rail(self._tenant_queryset(), ids)
+            serializer = self.get_serializer(products, many=True)
+            return APIResponse.success(data=serializer.data, message=f'{label} products retrieved successfully', correlation_id=correlation_id)
+        except Exception as e:
+            logger.error(f'Error fetching {label.lower()} products: {str(e)}', exc_info=True)
+            return APIResponse.server_error(message=f'Error retrieving {label.lower()} products', error_id=str(e), correlation_id=get_correlation_id(request))
+
     @action(detail=False, methods=['get'],url_path="featured",name="featured")
     def featured(self, request):
         """
         Return featured products (products marked as featured or with high ratings)
         """
-        try:
-            correlation_id = get_correlation_id(request)
-            queryset = self.get_queryset().filter(
-                Q(is_top_pick=True) | Q(is_new_arrival=True) |
-                Q(reviews__rating__gte=4)
-            ).distinct()[:8]
-            
-            serializer = self.get_serializer(queryset, many=True)
-            return APIResponse.success(data=serializer.data, message='Featured products retrieved successfully', correlation_id=correlation_id)
-        except Exception as e:
-            logger.error(f'Error fetching featured products: {str(e)}', exc_info=True)
-            return APIResponse.server_error(message='Error retrieving featured products', error_id=str(e), correlation_id=get_correlation_id(request))
+        return self._rail_response(request, 'featured', 'Featured')
     
     @action(detail=False, methods=['get',],name="trending",url_path="trending")
     def trending(self, request):
         """
-        Return trending products (most viewed or recently popular products)
+        Return trending products (recent views and sales velocity)
         """
-        try:
-            correlation_id = get_correlation_id(request)
-            # You could implement more complex logic based on views or purchases
-            queryset = self.get_queryset().order_by('-product__view_count')[:8]
-            serializer = self.get_serializer(queryset, many=True)
-            return APIResponse.success(data=serializer.data, message='Trending products retrieved successfully', correlation_id=correlation_id)
-        except Exception as e:
-            logger.error(f'Error fetching trending products: {str(e)}', exc_info=True)
-            return APIResponse.server_error(message='Error retrieving trending products', error_id=str(e), correlation_id=get_correlation_id(request))
+        return self._rail_response(request, 'trending', 'Trending')
     
     @action(detail=False, methods=['get'],name="recommended",url_path="recommended")
     def recommended(self, request):
         """
-        Return recommended products for the current user or generally popular products
+        Return recommended products for the current user (co-purchase and category
+        affinity of their favourites) or generally popular, highly rated products
         """
-        try:
-            correlation_id = get_correlation_id(request)
-            user = request.user
-            
-            if user.is_authenticated:
-                # Get user's purchase history categories
-                # This is a simplified version - you'd typically use a more sophisticated algorithm
-                favourites = Favourites.objects.filter(user=user).values_list('stock_id', flat=True)
-                
-                if favourites.exists():
-                    # Get products from similar categories as user's favorites
-                    favorite_products = StockInventory.objects.filter(id__in=favourites)
-                    fav_categories = set()
-                    for product in favorite_products:
-                        fav_categories.add(product.category.id)
-                        
-                    queryset = self.get_queryset().filter(
-                        product__category__id__in=fav_categories
-                    ).exclude(product__id__in=favourites)[:8]
-                    
-                    serializer = self.get_serializer(queryset, many=True)
-                    return APIResponse.success(data=serializer.data, message='Recommended products retrieved successfully', correlation_id=correlation_id)
-            
-            # Default: return highly rated products
-            queryset = self.get_queryset().filter(
-                reviews__rating__gte=4
-            ).distinct().order_by('?')[:8]  # Random selection
-            
-            serializer = self.get_serializer(queryset, many=True)
-            return APIResponse.success(data=serializer.data, message='Recommended products retrieved successfully', correlation_id=correlation_id)
-        except Exception as e:
-            logger.error(f'Error fetching recommended products: {str(e)}', exc_info=True)
-            return APIResponse.server_error(message='Error retrieving recommended products', error_id=str(e), correlation_id=get_correlation_id(request))
+        return self._rail_response(request, 'recommended', 'Recommended')
     
     @action(detail=False, methods=['get'],name="flash_sale",url_path="flash-sale")
     def flash_sale(self, request):
         """
         Return products that are currently part of a flash sale
         """
-        try:
-            correlation_id = get_correlation_id(request)
-            today = date.today()
-            queryset = self.get_queryset().filter(
-                Q(discount__percentage__gt=0) |
-                Q(discount__discount_amount__gt=0),
-                discount__isnull=False,
-                discount__start_date__lte=today,
-                discount__end_date__gte=today
-            ).order_by('-discount__percentage')[:8]
-            
-            serializer = self.get_serializer(queryset, many=True)
-            return APIResponse.success(data=serializer.data, message='Flash sale products retrieved successfully', correlation_id=correlation_id)
-        except Exception as e:
-            logger.error(f'Error fetching flash sale products: {str(e)}', exc_info=True)
-            return APIResponse.server_error(message='Error retrieving flash sale products', error_id=str(e), correlation_id=get_correlation_id(request))
+        return self._rail_response(request, 'flash_sale', 'Flash sale')
 
 class ProductDetail(APIView):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly,]
@@ -0,0 +1,48 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from ecommerce.stockinventory.models import Review, StockInventory
+
+AGGREGATE_FIELDS = ['avg_rating', 'review_count'] + [f'rating_{star}_count' for star in range(1, 6)]
+
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized review aggregates (avg_rating, review_count, rating histogram) on stock inventory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_update batch')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        histograms = {}
+        # One grouped scan over reviews builds every histogram
+        for stock_id, rating, total in Review.objects.values('stock_id', 'rating').annotate(
+            total=Count('id')
+        ).values_list('stock_id', 'rating', 'total'):
+            if rating in range(1, 6):
+                histograms.setdefault(stock_id, [0] * 6)[rating] += total
+
+        with transaction.atomic():
+            StockInventory.objects.exclude(pk__in=list(histograms)).exclude(review_count=0, avg_rating=0).update(
+                avg_rating=Decimal('0.00'), review_count=0,
+                **{f'rating_{star}_count': 0 for star in range(1, 6)}
+            )
+            batch = []
+            for stock in StockInventory.objects.filter(pk__in=list(histograms)).only('id').iterator(chunk_size=batch_size):
+                counts = histograms[stock.id]
+                stock.review_count = sum(counts)
+                for star in range(1, 6):
+                    setattr(stock, f'rating_{star}_count', counts[star])
+                weighted = sum(star * counts[star] for star in range(1, 6))
+                stock.avg_rating = (Decimal(weighted) / stock.review_count).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+                batch.append(stock)
+                if len(batch) >= batch_size:
+                    StockInventory.objects.bulk_update(batch, AGGREGATE_FIELDS)
+                    batch = []
+            if batch:
+                StockInventory.objects.bulk_update(batch, AGGREGATE_FIELDS)
+
+        self.stdout.write(self.style.SUCCESS(f'Review aggregates backfilled for {len(histograms)} stock items'))
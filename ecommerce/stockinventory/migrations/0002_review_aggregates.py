@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:56
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stockinventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockinventory',
+            name='avg_rating',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='stockinventory',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='stockinventory',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='stockinventory',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='stockinventory',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='stockinventory',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='stockinventory',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='stockinventory',
+            index=models.Index(fields=['avg_rating', 'review_count'], name='idx_stock_inv_rating'),
+        ),
+        migrations.AddIndex(
+            model_name='stockinventory',
+            index=models.Index(fields=['branch', 'avg_rating'], name='idx_stock_inv_branch_rating'),
+        ),
+    ]
@@ -8,7 +8,8 @@ from datetime import datetime, timedelta
 from django.db import transaction
 from business.models import Branch,TaxRates
 from .functions import generate_ref_no
-from django.db.models import F,Sum
+from django.db.models import F,Sum,Case,When,Value,ExpressionWrapper
+from django.db.models.functions import Cast
 from django.utils.translation import gettext_lazy as _
 
 # Create your models here.
@@ -158,6 +159,26 @@ class StockInventory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     delete_status=models.BooleanField(default=False)
+    # Denormalized review aggregates, maintained by the Review signals and
+    # never written by save() (see REVIEW_AGGREGATE_FIELDS)
+    avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=Decimal('0.00'), editable=False)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+
+    REVIEW_AGGREGATE_FIELDS = frozenset(
+        ['avg_rating', 'review_count'] + [f'rating_{star}_count' for star in range(1, 6)]
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The row this instance was read from, the only one save() may update field by field
+        instance._loaded_pk = instance.pk
+        return instance
 
     def save(self,*args,**kwargs):
         # Prevent creating stock entries for service-type products
@@ -191,7 +212,15 @@ class StockInventory(models.Model):
         else:
             # For existing objects, we can safely check relationships
             self.profit_margin=self.selling_price-self.manufacturing_cost
+            if kwargs.get('update_fields') is None and not self._state.adding and self.pk == getattr(self, '_loaded_pk', None):
+                # An instance loaded before a review would write stale aggregates back
+                deferred = self.get_deferred_fields()
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred and field.name not in self.REVIEW_AGGREGATE_FIELDS
+                ]
             super(StockInventory,self).save(*args,**kwargs)
+        self._loaded_pk = self.pk
 
     def create_stock_transaction(self, transaction_type, quantity, notes=None):
         """
@@ -232,8 +261,51 @@ class StockInventory(models.Model):
             models.Index(fields=['is_top_pick'], name='idx_stock_inv_top_pick'),
             models.Index(fields=['delete_status'], name='idx_stock_inv_delete_status'),
             models.Index(fields=['created_at'], name='idx_stock_inventory_created_at'),
+            models.Index(fields=['avg_rating', 'review_count'], name='idx_stock_inv_rating'),
+            models.Index(fields=['branch', 'avg_rating'], name='idx_stock_inv_branch_rating'),
         ]
 
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f'rating_{star}_count') for star in range(1, 6)}
+
+    @classmethod
+    def apply_review_delta(cls, stock_id, added=None, removed=None):
+        """
+        Incrementally adjust the review aggregates of one stock item.
+        `added`/`removed` are star ratings (1-5) entering or leaving the item.
+        """
+        if not stock_id or added == removed:
+            return
+        changes = {}
+        delta = 0
+        if removed in range(1, 6):
+            changes[f'rating_{removed}_count'] = F(f'rating_{removed}_count') - 1
+            delta -= 1
+        if added in range(1, 6):
+            changes[f'rating_{added}_count'] = F(f'rating_{added}_count') + 1
+            delta += 1
+        if not changes:
+            return
+        if delta:
+            changes['review_count'] = F('review_count') + delta
+        with transaction.atomic():
+            cls.objects.filter(pk=stock_id).update(**changes)
+            cls.objects.filter(pk=stock_id).update(avg_rating=cls.avg_rating_expression())
+
+    @staticmethod
+    def avg_rating_expression():
+        """SQL expression recomputing avg_rating from the histogram columns"""
+        weighted = sum((F(f'rating_{star}_count') * star for star in range(2, 6)), F('rating_1_count'))
+        return Case(
+            When(review_count__gt=0, then=ExpressionWrapper(
+                Cast(weighted, models.FloatField()) / F('review_count'),
+                output_field=models.DecimalField(max_digits=3, decimal_places=2),
+            )),
+            default=Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=3, decimal_places=2),
+        )
+
 class StockTransaction(models.Model):
     TRANSACTION_TYPES = [
         ('INITIAL', 'Opening Stock'),
@@ -1,4 +1,4 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from .models import *
 from ecommerce.pos.models import *
@@ -99,4 +99,28 @@ def create_stock_transaction(sender, instance, created, **kwargs):
                 
     except Exception as e:
         # Handle the exception here (e.g., log the error)
-        print(f"Error occurred while creating stock transaction: {e}")
\ No newline at end of file
+        print(f"Error occurred while creating stock transaction: {e}")
+
+@receiver(pre_save, sender=Review)
+def remember_previous_review_rating(sender, instance, **kwargs):
+    """Capture the stored rating/stock so post_save can apply an exact delta"""
+    instance._previous_review = None
+    if instance.pk:
+        instance._previous_review = Review.objects.filter(pk=instance.pk).values_list('stock_id', 'rating').first()
+
+@receiver(post_save, sender=Review)
+def update_review_aggregates_on_save(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, '_previous_review', None)
+    if previous is None:
+        StockInventory.apply_review_delta(instance.stock_id, added=instance.rating)
+        return
+    previous_stock_id, previous_rating = previous
+    if previous_stock_id != instance.stock_id:
+        StockInventory.apply_review_delta(previous_stock_id, removed=previous_rating)
+        StockInventory.apply_review_delta(instance.stock_id, added=instance.rating)
+    else:
+        StockInventory.apply_review_delta(instance.stock_id, added=instance.rating, removed=previous_rating)
+
+@receiver(post_delete, sender=Review)
+def update_review_aggregates_on_delete(sender, instance, **kwargs):
+    StockInventory.apply_review_delta(instance.stock_id, removed=instance.rating)
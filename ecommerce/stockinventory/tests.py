@@ -1,3 +1,5 @@
+from io import StringIO
+
 from django.test import TestCase
 
 from ecommerce.stockinventory.models import StockInventory, StockTransaction
@@ -108,3 +110,61 @@ class PurchaseStockTransactionTests(TestCase):
 		data = response.data.get('data', [])
 		# Ensure at least one service with our title is returned
 		self.assertTrue(any('ConsultingSearch' in (p.get('product', {}).get('title', '') or p.get('displayName', '')) for p in data))
+
+
+class ReviewAggregateTests(TestCase):
+	def setUp(self):
+		from business.models import BusinessLocation
+		self.user = User.objects.create_user(username='reviewer', email='reviewer@example.com', password='pass')
+		location = BusinessLocation.objects.create(city='Nakuru')
+		self.biz = Bussiness.objects.create(name='Review Biz', owner=self.user, location=location)
+		ProductSettings.objects.get_or_create(business=self.biz)
+		self.branch = Branch.objects.create(name='Review Branch', business=self.biz, location=location, branch_code='REV01')
+		self.product = Products.objects.create(title='Reviewed Product', business=self.biz)
+		self.stock = StockInventory.objects.create(product=self.product, branch=self.branch, stock_level=1, buying_price=10, selling_price=12)
+
+	def test_aggregates_follow_review_create_update_delete(self):
+		from decimal import Decimal
+		from ecommerce.stockinventory.models import Review
+		five = Review.objects.create(stock=self.stock, user=self.user, text='great', rating=5)
+		Review.objects.create(stock=self.stock, user=self.user, text='ok', rating=3)
+		self.stock.refresh_from_db()
+		self.assertEqual(self.stock.review_count, 2)
+		self.assertEqual(self.stock.avg_rating, Decimal('4.00'))
+		self.assertEqual(self.stock.rating_histogram, {1: 0, 2: 0, 3: 1, 4: 0, 5: 1})
+
+		five.rating = 4
+		five.save()
+		self.stock.refresh_from_db()
+		self.assertEqual(self.stock.avg_rating, Decimal('3.50'))
+		self.assertEqual(self.stock.rating_5_count, 0)
+
+		five.delete()
+		self.stock.refresh_from_db()
+		self.assertEqual((self.stock.review_count, self.stock.avg_rating), (1, Decimal('3.00')))
+
+	def test_stale_instance_save_keeps_aggregates(self):
+		from decimal import Decimal
+		from ecommerce.stockinventory.models import Review
+		stale = StockInventory.objects.get(pk=self.stock.pk)
+		Review.objects.create(stock=self.stock, user=self.user, text='great', rating=5)
+		stale.stock_level = 7
+		stale.save()
+		self.stock.refresh_from_db()
+		self.assertEqual((self.stock.stock_level, self.stock.review_count, self.stock.avg_rating), (7, 1, Decimal('5.00')))
+
+	def test_save_inserts_a_missing_row(self):
+		copy = StockInventory.objects.get(pk=self.stock.pk)
+		copy.pk = StockInventory.objects.order_by('-pk').values_list('pk', flat=True).first() + 100
+		copy.save()
+		self.assertTrue(StockInventory.objects.filter(pk=copy.pk).exists())
+
+	def test_backfill_command_recomputes_aggregates(self):
+		from decimal import Decimal
+		from django.core.management import call_command
+		from ecommerce.stockinventory.models import Review
+		Review.objects.create(stock=self.stock, user=self.user, text='good', rating=4)
+		StockInventory.objects.filter(pk=self.stock.pk).update(review_count=0, avg_rating=0, rating_4_count=0)
+		call_command('backfill_review_aggregates', stdout=StringIO())
+		self.stock.refresh_from_db()
+		self.assertEqual((self.stock.review_count, self.stock.avg_rating, self.stock.rating_4_count), (1, Decimal('4.00'), 1))
@@ -17,6 +17,7 @@ from business.models import BusinessLocation, Branch
 from core.utils import get_branch_id_from_request
 from core.performance import monitor_performance, cache_result, optimize_list_queryset
 from core.base_viewsets import BaseModelViewSet
+from core.pagination import KeysetPagination
 from core.response import APIResponse, get_correlation_id
 from core.audit import AuditTrail
 from django.db import transaction
@@ -268,6 +269,8 @@ class PosInventoryViewSet(viewsets.ModelViewSet):
 class StockTransactionViewSet(viewsets.ModelViewSet):
     queryset = StockTransaction.objects.all()
     serializer_class = StockTransactionSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-transaction_date',)
 
     def get_queryset(self):
         queryset = super().get_queryset()
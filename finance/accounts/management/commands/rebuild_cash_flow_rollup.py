@@ -0,0 +1,23 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.accounts.services.cash_flow import rebuild_daily_cash_flow
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily cash-flow rollup from transactions (all history by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        rows = rebuild_daily_cash_flow(start, end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt daily cash flow: {rows} rows'))
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:46
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_cash_flow(apps, schema_editor):
+    Transaction = apps.get_model('accounts', 'Transaction')
+    DailyCashFlow = apps.get_model('accounts', 'DailyCashFlow')
+    rows = (
+        Transaction.objects.annotate(day=TruncDate('transaction_date'))
+        .values('day', 'account_id', 'transaction_type')
+        .annotate(total=Sum('amount'), transaction_count=Count('id'))
+        .order_by()
+    )
+    DailyCashFlow.objects.bulk_create(
+        (
+            DailyCashFlow(
+                date=row['day'], account_id=row['account_id'], transaction_type=row['transaction_type'],
+                total=row['total'], transaction_count=row['transaction_count'],
+            )
+            for row in rows.iterator(chunk_size=2000)
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCashFlow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expense'), ('transfer', 'Transfer'), ('payment', 'Payment'), ('refund', 'Refund'), ('adjustment', 'Adjustment')], max_length=50)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_cash_flows', to='accounts.paymentaccounts')),
+            ],
+            options={
+                'verbose_name': 'Daily Cash Flow',
+                'verbose_name_plural': 'Daily Cash Flows',
+                'db_table': 'finance_daily_cash_flow',
+                'indexes': [models.Index(fields=['account', 'date'], name='idx_daily_cash_flow_account')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'account', 'transaction_type'), name='uniq_daily_cash_flow')],
+            },
+        ),
+        migrations.RunPython(populate_daily_cash_flow, migrations.RunPython.noop),
+    ]
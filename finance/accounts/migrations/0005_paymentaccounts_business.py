@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_business(apps, schema_editor):
+    """Give accounts already mapped to budget lines of exactly one business that business"""
+    PaymentAccounts = apps.get_model('accounts', 'PaymentAccounts')
+    BudgetLine = apps.get_model('budgets', 'BudgetLine')
+
+    owners = {}
+    for account_id, business_id in BudgetLine.objects.filter(
+        account__isnull=False, budget__business__isnull=False,
+    ).values_list('account_id', 'budget__business_id').distinct():
+        owners.setdefault(account_id, set()).add(business_id)
+    for account_id, business_ids in owners.items():
+        if len(business_ids) == 1:
+            PaymentAccounts.objects.filter(pk=account_id, business__isnull=True).update(business_id=business_ids.pop())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_daily_cash_flow'),
+        ('budgets', '0003_backfill_budget_business'),
+        ('business', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentaccounts',
+            name='business',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payment_accounts', to='business.bussiness'),
+        ),
+        migrations.RunPython(backfill_business, migrations.RunPython.noop),
+    ]
@@ -3,7 +3,10 @@ from django.db import models
 from authmanagement.models import CustomUser
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.translation import gettext_lazy as _
+from datetime import datetime
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
@@ -56,6 +59,8 @@ class PaymentAccounts(models.Model):
     opening_balance = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     description = models.TextField(blank=True, null=True)
+    # Owning business; budget lines may only draw actuals from their own business's accounts
+    business = models.ForeignKey('business.Bussiness', on_delete=models.CASCADE, null=True, blank=True, related_name='payment_accounts')
     
     # Bank-specific fields
     bank_name = models.CharField(max_length=255, blank=True, null=True)
@@ -272,6 +277,27 @@ class Transaction(models.Model):
     
     def __str__(self):
         return f"{self.transaction_type.capitalize()} - {self.amount} - {self.transaction_date.strftime('%Y-%m-%d')}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this row contributed to DailyCashFlow, so a later save can move it
+        instance._loaded_cash_flow = instance.cash_flow_entry()
+        return instance
+
+    def cash_flow_entry(self):
+        """(day, account id, type, amount) this transaction adds to DailyCashFlow, or None if unknown"""
+        fields = self.__dict__
+        if not {'transaction_date', 'account_id', 'transaction_type', 'amount'} <= fields.keys():
+            return None
+        if self.transaction_date is None or self.amount is None:
+            return None
+        day = self.transaction_date
+        if isinstance(day, str):
+            day = parse_datetime(day) or parse_date(day)
+        if isinstance(day, datetime):
+            day = timezone.localtime(day).date() if timezone.is_aware(day) else day.date()
+        return (day, self.account_id, self.transaction_type, Decimal(str(self.amount)))
         
     def is_debit(self):
         """Return True if this transaction decreases the account balance"""
@@ -280,3 +306,33 @@ class Transaction(models.Model):
     def is_credit(self):
         """Return True if this transaction increases the account balance"""
         return self.transaction_type in ['income', 'refund']
+
+
+class DailyCashFlow(models.Model):
+    """
+    Per-day, per-account, per-type totals of Transaction amounts.
+
+    Maintained in the same database transaction as every Transaction save and
+    delete (see finance.accounts.signals); bulk writes that bypass signals are
+    reconciled with `manage.py rebuild_cash_flow_rollup`. Days are local dates.
+    """
+    date = models.DateField()
+    account = models.ForeignKey(PaymentAccounts, on_delete=models.CASCADE, related_name='daily_cash_flows')
+    transaction_type = models.CharField(max_length=50, choices=Transaction.TRANSACTION_TYPES)
+    total = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal('0.00'))
+    transaction_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'finance_daily_cash_flow'
+        verbose_name = 'Daily Cash Flow'
+        verbose_name_plural = 'Daily Cash Flows'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'account', 'transaction_type'], name='uniq_daily_cash_flow'),
+        ]
+        indexes = [
+            models.Index(fields=['account', 'date'], name='idx_daily_cash_flow_account'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.account_id} {self.transaction_type}: {self.total}"
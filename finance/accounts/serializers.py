@@ -27,9 +27,9 @@ class PaymentAccountsSerializer(serializers.ModelSerializer):
             'id', 'name', 'account_number', 'account_type', 'currency',
             'opening_balance', 'status', 'description', 'bank_name', 
             'branch', 'swift_code', 'iban', 'created_at', 'updated_at',
-            'balance', 'last_transaction', 'transaction_count', 'account_type_display'
+            'balance', 'last_transaction', 'transaction_count', 'account_type_display', 'business'
         ]
-        read_only_fields = ['created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at', 'business']
         # account_type_display is computed server-side
         read_only_fields = read_only_fields + ['account_type_display']
 
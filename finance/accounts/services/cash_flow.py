@@ -0,0 +1,102 @@
+"""
+Daily cash-flow rollup.
+
+DailyCashFlow holds one row per (day, account, transaction type) with the
+sum and count of its Transaction amounts. Every Transaction save and delete
+applies its delta in the same database transaction (finance.accounts.signals),
+so cash-flow reports read a few rows per day with one conditional
+aggregation instead of scanning Transaction.
+
+rebuild_daily_cash_flow recomputes a date range (or everything) from
+Transaction; run it after bulk imports that bypass signals, or on deploy:
+
+    python manage.py rebuild_cash_flow_rollup [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from finance.accounts.models import DailyCashFlow, Transaction
+
+logger = logging.getLogger(__name__)
+
+INFLOW_TYPES = ('income', 'refund')
+OUTFLOW_TYPES = ('expense', 'payment', 'transfer')
+BATCH_SIZE = 2000
+
+
+def apply_cash_flow(entry, sign=1):
+    """Add (sign=1) or remove (sign=-1) one transaction's (day, account id, type, amount) from the rollup"""
+    if entry is None:
+        return
+    day, account_id, transaction_type, amount = entry
+    if day is None or account_id is None:
+        return
+    key = {'date': day, 'account_id': account_id, 'transaction_type': transaction_type}
+    delta = {'total': F('total') + amount * sign, 'transaction_count': F('transaction_count') + sign}
+    if DailyCashFlow.objects.filter(**key).update(**delta):
+        return
+    try:
+        with transaction.atomic():
+            DailyCashFlow.objects.create(**key, total=amount * sign, transaction_count=sign)
+    except IntegrityError:
+        # Another writer created the row first
+        DailyCashFlow.objects.filter(**key).update(**delta)
+
+
+def _day_bounds(start, end):
+    """Aware datetimes covering local days start..end (either may be None)"""
+    lower = timezone.make_aware(datetime.combine(start, time.min)) if start else None
+    upper = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)) if end else None
+    return lower, upper
+
+
+def rebuild_daily_cash_flow(start=None, end=None):
+    """Recompute the rollup for local days start..end (all history when omitted); returns rows written"""
+    lower, upper = _day_bounds(start, end)
+    transactions = Transaction.objects.all()
+    rollup = DailyCashFlow.objects.all()
+    if lower:
+        transactions = transactions.filter(transaction_date__gte=lower)
+        rollup = rollup.filter(date__gte=start)
+    if upper:
+        transactions = transactions.filter(transaction_date__lt=upper)
+        rollup = rollup.filter(date__lte=end)
+
+    rows = (
+        transactions.annotate(day=TruncDate('transaction_date'))
+        .values('day', 'account_id', 'transaction_type')
+        .annotate(total=Sum('amount'), transaction_count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        rollup.delete()
+        created = DailyCashFlow.objects.bulk_create(
+            (
+                DailyCashFlow(
+                    date=row['day'], account_id=row['account_id'], transaction_type=row['transaction_type'],
+                    total=row['total'], transaction_count=row['transaction_count'],
+                )
+                for row in rows.iterator(chunk_size=BATCH_SIZE)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    logger.info(f"Rebuilt daily cash flow {start or 'start'} to {end or 'end'}: {len(created)} rows")
+    return len(created)
+
+
+def cash_flow_totals(start_date, end_date, account_ids=None):
+    """{transaction type: total} over local days start_date..end_date, in one query"""
+    rows = DailyCashFlow.objects.filter(date__gte=start_date, date__lte=end_date)
+    if account_ids:
+        rows = rows.filter(account_id__in=account_ids)
+    totals = rows.aggregate(**{
+        transaction_type: Sum('total', filter=Q(transaction_type=transaction_type))
+        for transaction_type, _ in Transaction.TRANSACTION_TYPES
+    })
+    return {transaction_type: total or Decimal('0.00') for transaction_type, total in totals.items()}
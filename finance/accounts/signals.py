@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Transaction
+from .services.cash_flow import apply_cash_flow
+
+
+@receiver(post_save, sender=Transaction)
+def roll_up_transaction(sender, instance, created, **kwargs):
+    """Move the transaction's contribution in DailyCashFlow from its loaded values to its saved ones"""
+    current = instance.cash_flow_entry()
+    previous = None if created else getattr(instance, '_loaded_cash_flow', None)
+    if previous != current:
+        apply_cash_flow(previous, -1)
+        apply_cash_flow(current, 1)
+    instance._loaded_cash_flow = current
+
+
+@receiver(post_delete, sender=Transaction)
+def remove_transaction_roll_up(sender, instance, **kwargs):
+    apply_cash_flow(getattr(instance, '_loaded_cash_flow', instance.cash_flow_entry()), -1)
@@ -2,8 +2,11 @@ from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from business.models import Bussiness, BusinessLocation, Branch
-from finance.accounts.models import PaymentAccounts, Transaction
+from finance.accounts.models import DailyCashFlow, PaymentAccounts, Transaction
+from finance.accounts.services.cash_flow import cash_flow_totals, rebuild_daily_cash_flow
 from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
 
 
 class PaymentAccountsAPITests(APITestCase):
@@ -83,3 +86,47 @@ class PaymentAccountsAPITests(APITestCase):
 from django.test import TestCase
 
 # Create your tests here.
+
+
+class DailyCashFlowTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='cashflow', email='cashflow@example.com', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        self.account = PaymentAccounts.objects.create(name='Till', account_number='ACC200', account_type='cash')
+
+    def transaction(self, amount, transaction_type, when=None):
+        return Transaction.objects.create(
+            account=self.account, transaction_date=when or timezone.now(), amount=amount,
+            transaction_type=transaction_type, description='x', reference_type='test', reference_id='1',
+        )
+
+    def rollup(self):
+        return sorted(DailyCashFlow.objects.values_list('date', 'transaction_type', 'total', 'transaction_count'))
+
+    def test_rollup_follows_transaction_writes_and_matches_a_rebuild(self):
+        today = timezone.localdate()
+        self.transaction(100, 'income')
+        refund = self.transaction(40, 'income')
+        expense = self.transaction(30, 'expense', timezone.now() - timedelta(days=3))
+        refund.transaction_type = 'refund'
+        refund.save()
+        expense.amount = Decimal('35')
+        expense.save()
+        self.transaction(5, 'payment').delete()
+
+        self.assertEqual(self.rollup(), [
+            (today - timedelta(days=3), 'expense', Decimal('35.00'), 1),
+            (today, 'income', Decimal('100.00'), 1),
+            (today, 'payment', Decimal('0.00'), 0),
+            (today, 'refund', Decimal('40.00'), 1),
+        ])
+        incremental = [row for row in self.rollup() if row[3]]
+        rebuild_daily_cash_flow()
+        self.assertEqual(self.rollup(), incremental)
+
+        with self.assertNumQueries(1):
+            totals = cash_flow_totals(today - timedelta(days=7), today)
+        self.assertEqual((totals['income'], totals['refund'], totals['expense']), (Decimal('100.00'), Decimal('40.00'), Decimal('35.00')))
+
+        response = self.client.get('/api/v1/finance/cashflow/summary/', {'start_date': (today - timedelta(days=7)).isoformat()})
+        self.assertEqual((response.data['total_inflows'], response.data['net_cash']), (Decimal('140.00'), Decimal('105.00')))
@@ -5,12 +5,16 @@ from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from datetime import datetime, timedelta
+from django.utils import timezone
 from django.db.models import Sum, Q
 
 from .models import AccountTypes, PaymentAccounts, Transaction, Voucher, VoucherItem
 from .serializers import AccountTypesSerializer, PaymentAccountsSerializer, TransactionSerializer, VoucherSerializer, VoucherItemSerializer
 from core.base_viewsets import BaseModelViewSet
+from core.pagination import KeysetPagination
+from .services.cash_flow import cash_flow_totals
 from core.response import APIResponse, get_correlation_id
+from core.utils import get_business_id_from_request, get_user_business_ids
 from core.audit import AuditTrail
 import logging
 
@@ -44,7 +48,11 @@ class PaymentAccountsViewSet(BaseModelViewSet):
                     correlation_id=correlation_id
                 )
             
-            account = serializer.save()
+            # The account belongs to the request's business, when the user is part of it
+            business_id = get_business_id_from_request(request)
+            if business_id not in get_user_business_ids(request.user):
+                business_id = None
+            account = serializer.save(business_id=business_id)
             AuditTrail.log(
                 operation=AuditTrail.CREATE,
                 module='finance',
@@ -254,6 +262,8 @@ class TransactionViewSet(BaseModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     search_fields = ['description', 'reference_id']
     filterset_fields = ['account', 'transaction_type', 'reference_type']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-transaction_date',)
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -263,21 +273,16 @@ class TransactionViewSet(BaseModelViewSet):
         """Get summary of transactions by type"""
         try:
             correlation_id = get_correlation_id(request)
-            today = datetime.now().date()
+            today = timezone.localdate()
             start_date = request.query_params.get('start_date', (today - timedelta(days=30)).isoformat())
             end_date = request.query_params.get('end_date', today.isoformat())
             
-            # Filter by date range
-            transactions = Transaction.objects.filter(
-                transaction_date__gte=start_date,
-                transaction_date__lte=end_date
-            )
-            
-            # Group by transaction type
-            income_total = transactions.filter(transaction_type='income').aggregate(total=Sum('amount'))['total'] or 0
-            expense_total = transactions.filter(transaction_type='expense').aggregate(total=Sum('amount'))['total'] or 0
-            payment_total = transactions.filter(transaction_type='payment').aggregate(total=Sum('amount'))['total'] or 0
-            refund_total = transactions.filter(transaction_type='refund').aggregate(total=Sum('amount'))['total'] or 0
+            # Totals by type from the daily rollup in one query
+            totals = cash_flow_totals(start_date, end_date)
+            income_total = totals['income']
+            expense_total = totals['expense']
+            payment_total = totals['payment']
+            refund_total = totals['refund']
             
             return APIResponse.success(
                 data={
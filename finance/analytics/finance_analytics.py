@@ -122,19 +122,14 @@ class FinanceAnalyticsService:
                 payment_qs = payment_qs.filter(business_id=business_id)
                 expense_qs = expense_qs.filter(business_id=business_id)
             
-            # Calculate totals
-            total_billing = billing_qs.aggregate(total=Sum('total'))['total'] or 0
-            total_invoice_models = invoice_model_qs.aggregate(total=Sum('total'))['total'] or 0
-            total_invoices = total_billing + total_invoice_models
+            # One conditional aggregate per source table
+            outstanding = Q(balance_due__gt=0)
+            billing = billing_qs.aggregate(total=Sum('total'), outstanding=Sum('balance_due', filter=outstanding))
+            invoices = invoice_model_qs.aggregate(total=Sum('total'), outstanding=Sum('balance_due', filter=outstanding))
+            total_invoices = (billing['total'] or 0) + (invoices['total'] or 0)
             total_payments = payment_qs.aggregate(total=Sum('amount'))['total'] or 0
             total_expenses = expense_qs.aggregate(total=Sum('total_amount'))['total'] or 0
-            outstanding_billing = billing_qs.filter(balance_due__gt=0).aggregate(
-                total=Sum('balance_due')
-            )['total'] or 0
-            outstanding_invoice_models = invoice_model_qs.filter(balance_due__gt=0).aggregate(
-                total=Sum('balance_due')
-            )['total'] or 0
-            outstanding_invoices = outstanding_billing + outstanding_invoice_models
+            outstanding_invoices = (billing['outstanding'] or 0) + (invoices['outstanding'] or 0)
             
             return {
                 'total_invoices': round(total_invoices, 2),
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_daily_cash_flow'),
+        ('budgets', '0001_initial'),
+        ('business', '0001_initial'),
+        ('expenses', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='business',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to='business.bussiness'),
+        ),
+        migrations.AddField(
+            model_name='budgetline',
+            name='account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='budget_lines', to='accounts.paymentaccounts'),
+        ),
+        migrations.AddField(
+            model_name='budgetline',
+            name='expense_category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='budget_lines', to='expenses.expensecategory'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def backfill_business(apps, schema_editor):
+    """Scope existing budgets to their creator's business (owned first, then employer)"""
+    Budget = apps.get_model('budgets', 'Budget')
+    Bussiness = apps.get_model('business', 'Bussiness')
+    Employee = apps.get_model('employees', 'Employee')
+
+    for budget in Budget.objects.filter(business__isnull=True, created_by__isnull=False).only('id', 'created_by_id'):
+        business_id = (
+            Bussiness.objects.filter(owner_id=budget.created_by_id).order_by('id').values_list('id', flat=True).first()
+            or Employee.objects.filter(user_id=budget.created_by_id, organisation__isnull=False).values_list('organisation_id', flat=True).first()
+        )
+        if business_id:
+            Budget.objects.filter(pk=budget.pk).update(business_id=business_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0002_budget_actual_sources'),
+        ('business', '0001_initial'),
+        ('employees', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_business, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils import timezone
 from hrm.employees.models import Employee
+from business.models import Bussiness
 
 
 class Budget(models.Model):
@@ -14,6 +15,8 @@ class Budget(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="draft")
+    # Scopes actuals to one business; actuals are not computed for budgets without one
+    business = models.ForeignKey(Bussiness, on_delete=models.CASCADE, null=True, blank=True, related_name='budgets')
     created_by = models.ForeignKey('authmanagement.CustomUser', on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -38,6 +41,9 @@ class BudgetLine(models.Model):
     name = models.CharField(max_length=255)
     amount = models.DecimalField(max_digits=15, decimal_places=2)
     notes = models.CharField(max_length=255, blank=True, null=True)
+    # Optional source mapping for actuals (finance.budgets.services.actuals)
+    expense_category = models.ForeignKey('expenses.ExpenseCategory', on_delete=models.SET_NULL, null=True, blank=True, related_name='budget_lines')
+    account = models.ForeignKey('accounts.PaymentAccounts', on_delete=models.SET_NULL, null=True, blank=True, related_name='budget_lines')
 
     class Meta:
         db_table = 'finance_budget_lines'
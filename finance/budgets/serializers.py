@@ -1,17 +1,32 @@
 from rest_framework import serializers
+from business.models import Bussiness
 from .models import Budget, BudgetLine
+from core.utils import get_business_id_from_request, get_user_business_ids
 from core.validators import validate_date_range, validate_non_negative_decimal
 
 
+def _allowed_business_ids(serializer):
+    """Businesses the requesting user may budget for (None: any, for superusers)"""
+    user = serializer.context['request'].user
+    return None if user.is_superuser else get_user_business_ids(user)
+
+
 class BudgetLineSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         amount = attrs.get('amount')
         if amount is not None:
             validate_non_negative_decimal(amount, 'amount')
+        budget = attrs.get('budget') or getattr(self.instance, 'budget', None)
+        allowed = _allowed_business_ids(self)
+        if budget is not None and allowed is not None and budget.business_id not in allowed:
+            raise serializers.ValidationError({'budget': 'Budget does not belong to your business'})
+        account = attrs.get('account')
+        if account is not None and (budget is None or account.business_id != budget.business_id):
+            raise serializers.ValidationError({'account': "Account does not belong to the budget's business"})
         return attrs
     class Meta:
         model = BudgetLine
-        fields = ['id', 'budget', 'category', 'name', 'amount', 'notes']
+        fields = ['id', 'budget', 'category', 'name', 'amount', 'notes', 'expense_category', 'account']
 
 
 class BudgetSerializer(serializers.ModelSerializer):
@@ -20,10 +35,26 @@ class BudgetSerializer(serializers.ModelSerializer):
     class Meta:
         model = Budget
         fields = [
-            'id', 'name', 'start_date', 'end_date', 'status',
+            'id', 'name', 'start_date', 'end_date', 'status', 'business',
             'created_by', 'created_at', 'updated_at', 'lines'
         ]
+        read_only_fields = ['created_by']
 
     def validate(self, attrs):
         validate_date_range(attrs.get('start_date'), attrs.get('end_date'))
+        if self.instance is not None and 'business' not in attrs:
+            return attrs
+        allowed = _allowed_business_ids(self)
+        business = attrs.get('business')
+        if business is None and self.instance is None:
+            # New budgets default to the request's business, else the user's only business
+            business_id = get_business_id_from_request(self.context['request'])
+            if business_id is None and allowed is not None and len(allowed) == 1:
+                business_id = next(iter(allowed))
+            business = Bussiness.objects.filter(pk=business_id).first() if business_id else None
+        if business is None:
+            raise serializers.ValidationError({'business': 'business is required'})
+        if allowed is not None and business.pk not in allowed:
+            raise serializers.ValidationError({'business': 'You cannot budget for this business'})
+        attrs['business'] = business
         return attrs
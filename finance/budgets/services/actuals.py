@@ -0,0 +1,312 @@
+"""
+Budget-vs-actual.
+
+Each BudgetLine draws its actuals from one source, chosen by category and
+optional mapping:
+
+    line.account set       -> DailyCashFlow on that account (inflows for
+                              revenue, outflows otherwise)
+    revenue                -> finalised invoice totals, by invoice date
+    expense + category     -> expenses in that ExpenseCategory (refunds net off)
+    expense, unmapped      -> all other expenses
+    capex                  -> asset purchase costs, by purchase date
+    other, unmapped        -> no source
+
+Lines sharing a source split it pro rata to their planned amounts. Each
+source is one grouped aggregate by calendar month over the budget's dates,
+scoped to Budget.business, so a budget costs at most five queries however
+many lines it has. Budgets without a business are refused
+(UnscopedBudgetError) rather than measured across every business.
+
+Results are cached per budget. An invoice, expense, transaction or asset
+write bumps the postings version of the business it belongs to, and
+budget/line edits bump a per-budget one (finance.budgets.signals), so the
+next read of an affected budget recomputes while other tenants' caches stay warm.
+"""
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+import logging
+
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from assets.models import Asset
+from finance.accounts.models import DailyCashFlow
+from finance.accounts.services.cash_flow import INFLOW_TYPES, OUTFLOW_TYPES
+from finance.budgets.models import BudgetLine
+from finance.expenses.models import Expense
+from finance.invoicing.models import Invoice
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0.00')
+CENTS = Decimal('0.01')
+SPEND_CATEGORIES = ('expense', 'capex', 'other')
+EXCLUDED_INVOICE_STATUSES = ('draft', 'cancelled', 'void')
+ACTUALS_CACHE_TIMEOUT = 60 * 60 * 6
+
+
+class UnscopedBudgetError(ValueError):
+    """The budget has no business, so its actuals would span every tenant"""
+
+
+def budget_version_key(budget_id):
+    return f"budgets:version:{budget_id}"
+
+
+def postings_version_key(business_id):
+    return f"budgets:postings:version:{business_id}"
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def invalidate_postings(business_ids):
+    """Cached actuals of the given businesses' budgets are stale after a new posting"""
+    for business_id in business_ids:
+        _bump(postings_version_key(business_id))
+
+
+def invalidate_budget(budget_id):
+    _bump(budget_version_key(budget_id))
+
+
+def _month_starts(start, end):
+    month = start.replace(day=1)
+    while month <= end:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def _month_key(value):
+    # TruncMonth yields a date on DateFields, a datetime on some backends
+    return value.date() if hasattr(value, 'date') and callable(value.date) else value
+
+
+def source_key(line):
+    """Which source a line's actuals come from (lines with equal keys share it)"""
+    if line.account_id:
+        return ('account', line.account_id, 'in' if line.category == 'revenue' else 'out')
+    if line.category == 'revenue':
+        return ('invoices',)
+    if line.category == 'expense':
+        return ('expenses', line.expense_category_id)
+    if line.category == 'capex':
+        return ('assets',)
+    return None
+
+
+class BudgetActuals:
+    def __init__(self, budget, as_of=None):
+        if not budget.business_id:
+            raise UnscopedBudgetError('Assign a business to this budget before computing its actuals')
+        self.budget = budget
+        self.as_of = as_of or timezone.localdate()
+        self.months = list(_month_starts(budget.start_date, budget.end_date))
+
+    def _series(self, rows):
+        """{month: amount} from (month, amount) rows"""
+        series = {}
+        for month, amount in rows:
+            month = _month_key(month)
+            series[month] = series.get(month, ZERO) + (amount or ZERO)
+        return series
+
+    def _scoped(self, queryset, business_path):
+        return queryset.filter(**{business_path: self.budget.business_id})
+
+    def _invoice_series(self):
+        rows = self._scoped(Invoice.objects.filter(
+            invoice_date__gte=self.budget.start_date, invoice_date__lte=self.budget.end_date,
+        ).exclude(status__in=EXCLUDED_INVOICE_STATUSES), 'branch__business_id')
+        return self._series(
+            rows.annotate(month=TruncMonth('invoice_date')).values('month').annotate(amount=Sum('total'))
+            .order_by().values_list('month', 'amount')
+        )
+
+    def _expense_series(self):
+        """{category id: {month: net amount}} in one grouped query"""
+        rows = self._scoped(Expense.objects.filter(
+            date_added__gte=self.budget.start_date, date_added__lte=self.budget.end_date,
+        ), 'branch__business_id')
+        grouped = (
+            rows.annotate(month=TruncMonth('date_added')).values('category_id', 'month')
+            .annotate(
+                spent=Sum('total_amount', filter=Q(is_refund=False)),
+                refunded=Sum('total_amount', filter=Q(is_refund=True)),
+            ).order_by().values_list('category_id', 'month', 'spent', 'refunded')
+        )
+        by_category = {}
+        for category_id, month, spent, refunded in grouped:
+            series = by_category.setdefault(category_id, {})
+            month = _month_key(month)
+            series[month] = series.get(month, ZERO) + (spent or ZERO) - (refunded or ZERO)
+        return by_category
+
+    def _asset_series(self):
+        rows = self._scoped(Asset.objects.filter(
+            purchase_date__gte=self.budget.start_date, purchase_date__lte=self.budget.end_date,
+        ), 'branch__business_id')
+        return self._series(
+            rows.annotate(month=TruncMonth('purchase_date')).values('month').annotate(amount=Sum('purchase_cost'))
+            .order_by().values_list('month', 'amount')
+        )
+
+    def _account_series(self, account_ids):
+        """{(account id, 'in'|'out'): {month: amount}} from the daily cash-flow rollup"""
+        grouped = (
+            DailyCashFlow.objects.filter(
+                account_id__in=account_ids, date__gte=self.budget.start_date, date__lte=self.budget.end_date,
+            ).annotate(month=TruncMonth('date')).values('account_id', 'month')
+            .annotate(
+                inflow=Sum('total', filter=Q(transaction_type__in=INFLOW_TYPES)),
+                outflow=Sum('total', filter=Q(transaction_type__in=OUTFLOW_TYPES)),
+            ).order_by().values_list('account_id', 'month', 'inflow', 'outflow')
+        )
+        by_account = {}
+        for account_id, month, inflow, outflow in grouped:
+            month = _month_key(month)
+            for direction, amount in (('in', inflow), ('out', outflow)):
+                series = by_account.setdefault((account_id, direction), {})
+                series[month] = series.get(month, ZERO) + (amount or ZERO)
+        return by_account
+
+    def source_series(self, keys):
+        """{source key: {month: amount}} for the given keys, one query per source kind"""
+        kinds = {key[0] for key in keys}
+        series = {}
+        if 'invoices' in kinds:
+            series[('invoices',)] = self._invoice_series()
+        if 'assets' in kinds:
+            series[('assets',)] = self._asset_series()
+        if 'expenses' in kinds:
+            by_category = self._expense_series()
+            mapped = {key[1] for key in keys if key[0] == 'expenses' and key[1] is not None}
+            for category_id in mapped:
+                series[('expenses', category_id)] = by_category.get(category_id, {})
+            # Unmapped expense lines take whatever no mapped line claims
+            remainder = {}
+            for category_id, months in by_category.items():
+                if category_id not in mapped:
+                    for month, amount in months.items():
+                        remainder[month] = remainder.get(month, ZERO) + amount
+            series[('expenses', None)] = remainder
+        if 'account' in kinds:
+            by_account = self._account_series({key[1] for key in keys if key[0] == 'account'})
+            for key in keys:
+                if key[0] == 'account':
+                    series[key] = by_account.get((key[1], key[2]), {})
+        return series
+
+    def _elapsed_fraction(self, through):
+        total_days = (self.budget.end_date - self.budget.start_date).days + 1
+        elapsed = (min(through, self.budget.end_date) - self.budget.start_date).days + 1
+        return Decimal(max(0, min(elapsed, total_days))) / Decimal(total_days)
+
+    @staticmethod
+    def _quantize(value):
+        return value.quantize(CENTS, rounding=ROUND_HALF_UP)
+
+    def compute(self):
+        lines = list(BudgetLine.objects.filter(budget_id=self.budget.pk).order_by('category', 'id'))
+        keys = {line.id: source_key(line) for line in lines}
+        series = self.source_series({key for key in keys.values() if key is not None})
+
+        # Lines sharing a source split it by planned amount (equally when nothing is planned)
+        shares = {}
+        for line in lines:
+            shares.setdefault(keys[line.id], []).append(line)
+
+        result_lines = []
+        totals = {}
+        for line in lines:
+            key = keys[line.id]
+            siblings = shares[key]
+            planned_total = sum((sibling.amount for sibling in siblings), ZERO)
+            share = (line.amount / planned_total) if planned_total else Decimal(1) / len(siblings)
+            source = series.get(key, {}) if key else {}
+            monthly = [self._quantize(source.get(month, ZERO) * share) for month in self.months]
+            actual = sum(monthly, ZERO)
+            variance = actual - line.amount
+            spend = line.category in SPEND_CATEGORIES
+            result_lines.append({
+                'id': line.id,
+                'name': line.name,
+                'category': line.category,
+                'source': ':'.join(str(part) for part in key) if key else None,
+                'planned': line.amount,
+                'actual': actual,
+                'variance': variance,
+                'variance_pct': self._quantize(variance * 100 / line.amount) if line.amount else None,
+                'utilisation_pct': self._quantize(actual * 100 / line.amount) if line.amount else None,
+                'favourable': variance <= 0 if spend else variance >= 0,
+                'monthly': monthly,
+            })
+            category_total = totals.setdefault(line.category, {'planned': ZERO, 'actual': ZERO, 'monthly': [ZERO] * len(self.months)})
+            category_total['planned'] += line.amount
+            category_total['actual'] += actual
+            category_total['monthly'] = [a + b for a, b in zip(category_total['monthly'], monthly)]
+        for category_total in totals.values():
+            category_total['variance'] = category_total['actual'] - category_total['planned']
+
+        return {
+            'budget': self.budget.pk,
+            'start_date': self.budget.start_date,
+            'end_date': self.budget.end_date,
+            'as_of': self.as_of,
+            'months': self.months,
+            'lines': result_lines,
+            'totals': totals,
+            'burn': {
+                'spend': self._burn(totals, SPEND_CATEGORIES),
+                'revenue': self._burn(totals, ('revenue',)),
+            },
+        }
+
+    def _burn(self, totals, categories):
+        """Cumulative actual vs straight-line plan per month, with a run-rate projection to the budget end"""
+        selected = [totals[category] for category in categories if category in totals]
+        planned = sum((total['planned'] for total in selected), ZERO)
+        monthly = [sum(values, ZERO) for values in zip(*(total['monthly'] for total in selected))] or [ZERO] * len(self.months)
+
+        series, cumulative = [], ZERO
+        for month, amount in zip(self.months, monthly):
+            month_end = (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            cumulative += amount
+            series.append({
+                'month': month,
+                'actual': amount,
+                'actual_cumulative': cumulative,
+                'planned_cumulative': self._quantize(planned * self._elapsed_fraction(month_end)),
+            })
+        elapsed = self._elapsed_fraction(self.as_of)
+        return {
+            'planned': planned,
+            'actual': cumulative,
+            'elapsed_pct': self._quantize(elapsed * 100),
+            'projected': self._quantize(cumulative / elapsed) if elapsed else None,
+            'series': series,
+        }
+
+
+def _actuals_cache_key(budget, as_of):
+    postings = cache.get(postings_version_key(budget.business_id)) or 0
+    version = cache.get(budget_version_key(budget.pk)) or 0
+    return f"budgets:actuals:{budget.pk}:{postings}:{version}:{as_of}"
+
+
+def budget_actuals(budget, as_of=None, refresh=False):
+    """Budget-vs-actual for every line of a budget, cached until postings or the budget change"""
+    as_of = as_of or timezone.localdate()
+    key = _actuals_cache_key(budget, as_of)
+    report = None if refresh else cache.get(key)
+    if report is None:
+        report = BudgetActuals(budget, as_of).compute()
+        cache.set(key, report, ACTUALS_CACHE_TIMEOUT)
+    return report
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from assets.models import Asset
+from business.models import Branch
+from finance.accounts.models import Transaction
+from finance.expenses.models import Expense
+from finance.invoicing.models import Invoice
+from .models import Budget, BudgetLine
+from .services.actuals import invalidate_budget, invalidate_postings
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+def posting_changed(sender, instance, **kwargs):
+    """Cached budget actuals of the posting's business go stale once it commits"""
+    business_ids = _posting_business_ids(instance)
+    if business_ids:
+        transaction.on_commit(lambda: invalidate_postings(business_ids))
+
+
+def _posting_business_ids(instance):
+    if isinstance(instance, Transaction):
+        # Only budgets with a line on the account read it
+        return set(BudgetLine.objects.filter(account_id=instance.account_id).values_list('budget__business_id', flat=True)) - {None}
+    if not instance.branch_id:
+        return set()
+    branch = type(instance)._meta.get_field('branch')
+    if branch.is_cached(instance):
+        return {instance.branch.business_id}
+    return set(Branch.objects.filter(pk=instance.branch_id).values_list('business_id', flat=True))
+
+
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+def budget_changed(sender, instance, **kwargs):
+    budget_id = instance.pk
+    transaction.on_commit(lambda: invalidate_budget(budget_id))
+
+
+@receiver(post_save, sender=BudgetLine)
+@receiver(post_delete, sender=BudgetLine)
+def budget_line_changed(sender, instance, **kwargs):
+    budget_id = instance.budget_id
+    transaction.on_commit(lambda: invalidate_budget(budget_id))
@@ -0,0 +1,124 @@
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from business.models import Branch, BusinessLocation, Bussiness
+from finance.accounts.models import PaymentAccounts, Transaction
+from finance.budgets.models import Budget, BudgetLine
+from finance.budgets.services.actuals import UnscopedBudgetError, budget_actuals
+from finance.expenses.models import Expense, ExpenseCategory
+
+User = get_user_model()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class BudgetActualsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='budget', email='budget@example.com', password='pass')
+        location = BusinessLocation.objects.create(city='Nairobi')
+        self.business = Bussiness.objects.create(name='Budget Biz', owner=user, location=location)
+        self.branch = Branch.objects.create(name='HQ', business=self.business, location=location, branch_code='BUD01')
+        self.fuel = ExpenseCategory.objects.create(name='Fuel')
+        self.rent = ExpenseCategory.objects.create(name='Rent')
+        self.budget = Budget.objects.create(
+            name='H1 2026', start_date=date(2026, 1, 1), end_date=date(2026, 6, 30), business=self.business,
+        )
+
+    def expense(self, category, day, amount, is_refund=False):
+        return Expense.objects.create(
+            branch=self.branch, category=category, reference_no=f'EXP-{Expense.objects.count()}',
+            date_added=day, total_amount=amount, is_refund=is_refund,
+        )
+
+    def test_lines_share_sources_and_report_monthly_burn(self):
+        fuel = BudgetLine.objects.create(budget=self.budget, category='expense', name='Fuel', amount=Decimal('600'), expense_category=self.fuel)
+        BudgetLine.objects.create(budget=self.budget, category='expense', name='Overheads', amount=Decimal('3000'))
+        BudgetLine.objects.create(budget=self.budget, category='expense', name='Utilities', amount=Decimal('1000'))
+        account = PaymentAccounts.objects.create(name='Sales', account_number='ACC-1')
+        BudgetLine.objects.create(budget=self.budget, category='revenue', name='Sales', amount=Decimal('5000'), account=account)
+        self.expense(self.fuel, date(2026, 1, 10), Decimal('250'))
+        self.expense(self.fuel, date(2026, 2, 3), Decimal('200'))
+        self.expense(self.fuel, date(2026, 2, 4), Decimal('50'), is_refund=True)
+        self.expense(self.rent, date(2026, 1, 1), Decimal('2000'))
+        self.expense(self.rent, date(2026, 7, 1), Decimal('2000'))
+        Transaction.objects.create(
+            account=account, transaction_type='income', amount=Decimal('1200'),
+            transaction_date=datetime(2026, 3, 2, 9, tzinfo=dt_timezone.utc),
+        )
+
+        with self.assertNumQueries(3):
+            report = budget_actuals(self.budget, as_of=date(2026, 3, 31))
+        lines = {line['name']: line for line in report['lines']}
+        self.assertEqual((lines['Fuel']['actual'], lines['Fuel']['monthly'][:2]), (Decimal('400.00'), [Decimal('250.00'), Decimal('150.00')]))
+        self.assertTrue(lines['Fuel']['favourable'])
+        # Rent is unmapped, so the two unmapped expense lines split it 3:1
+        self.assertEqual((lines['Overheads']['actual'], lines['Utilities']['actual']), (Decimal('1500.00'), Decimal('500.00')))
+        self.assertEqual((lines['Sales']['actual'], lines['Sales']['variance']), (Decimal('1200.00'), Decimal('-3800.00')))
+        self.assertFalse(lines['Sales']['favourable'])
+
+        burn = report['burn']['spend']
+        self.assertEqual([point['actual_cumulative'] for point in burn['series'][:3]], [Decimal('2250.00'), Decimal('2400.00'), Decimal('2400.00')])
+        self.assertEqual(burn['series'][-1]['planned_cumulative'], Decimal('4600.00'))
+        self.assertEqual(burn['elapsed_pct'], Decimal('49.72'))
+        self.assertEqual(fuel.pk, lines['Fuel']['id'])
+
+    def test_cached_until_a_posting_commits(self):
+        BudgetLine.objects.create(budget=self.budget, category='expense', name='Fuel', amount=Decimal('600'), expense_category=self.fuel)
+        self.expense(self.fuel, date(2026, 1, 10), Decimal('100'))
+        budget_actuals(self.budget, as_of=date(2026, 3, 31))
+
+        with self.assertNumQueries(0):
+            budget_actuals(self.budget, as_of=date(2026, 3, 31))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.expense(self.fuel, date(2026, 1, 11), Decimal('20'))
+        self.assertEqual(budget_actuals(self.budget, as_of=date(2026, 3, 31))['totals']['expense']['actual'], Decimal('120.00'))
+
+    def test_unscoped_budgets_are_backfilled_or_refused(self):
+        from importlib import import_module
+        from django.apps import apps
+
+        legacy = Budget.objects.create(name='Legacy', start_date=date(2026, 1, 1), end_date=date(2026, 6, 30), created_by=self.business.owner)
+        orphan = Budget.objects.create(name='Orphan', start_date=date(2026, 1, 1), end_date=date(2026, 6, 30))
+        import_module('finance.budgets.migrations.0003_backfill_budget_business').backfill_business(apps, None)
+
+        legacy.refresh_from_db()
+        orphan.refresh_from_db()
+        self.assertEqual((legacy.business, orphan.business), (self.business, None))
+        with self.assertRaises(UnscopedBudgetError):
+            budget_actuals(orphan)
+
+    def test_other_business_postings_keep_the_cache(self):
+        BudgetLine.objects.create(budget=self.budget, category='expense', name='Fuel', amount=Decimal('600'), expense_category=self.fuel)
+        budget_actuals(self.budget, as_of=date(2026, 3, 31))
+        other = Bussiness.objects.create(name='Other Biz', owner=User.objects.create_user(username='other', email='other@example.com', password='pass'), location=self.branch.location)
+        other_branch = Branch.objects.create(name='Other HQ', business=other, location=self.branch.location, branch_code='BUD02')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(branch=other_branch, category=self.fuel, reference_no='EXP-X', date_added=date(2026, 1, 5), total_amount=Decimal('99'))
+        with self.assertNumQueries(0):
+            budget_actuals(self.budget, as_of=date(2026, 3, 31))
+
+    def test_api_rejects_other_businesses_and_their_accounts(self):
+        other = Bussiness.objects.create(name='Other Biz', owner=User.objects.create_user(username='other', email='other@example.com', password='pass'), location=self.branch.location)
+        theirs = PaymentAccounts.objects.create(name='Theirs', account_number='ACC-2', business=other)
+        ours = PaymentAccounts.objects.create(name='Ours', account_number='ACC-3', business=self.business)
+        foreign_budget = Budget.objects.create(name='Theirs', start_date=date(2026, 1, 1), end_date=date(2026, 6, 30), business=other)
+        client = APIClient()
+        client.force_authenticate(self.business.owner)
+        body = {'name': 'FY', 'start_date': '2026-01-01', 'end_date': '2026-12-31'}
+
+        self.assertEqual(client.post('/api/v1/finance/budgets/', {**body, 'business': other.id}, format='json').status_code, 400)
+        response = client.post('/api/v1/finance/budgets/', body, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Budget.objects.get(name='FY').business, self.business)
+        self.assertEqual(client.get(f'/api/v1/finance/budgets/{foreign_budget.id}/actuals/').status_code, 404)
+
+        line = {'budget': self.budget.id, 'category': 'revenue', 'name': 'Sales', 'amount': '100'}
+        self.assertEqual(client.post('/api/v1/finance/budget-lines/', {**line, 'account': theirs.id}, format='json').status_code, 400)
+        self.assertEqual(client.post('/api/v1/finance/budget-lines/', {**line, 'budget': foreign_budget.id}, format='json').status_code, 400)
+        self.assertEqual(client.post('/api/v1/finance/budget-lines/', {**line, 'account': ours.id}, format='json').status_code, 201)
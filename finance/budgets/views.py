@@ -3,10 +3,13 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Budget, BudgetLine
 from .serializers import BudgetSerializer, BudgetLineSerializer
+from .services.actuals import UnscopedBudgetError, budget_actuals
 from core.base_viewsets import BaseModelViewSet
 from core.response import APIResponse, get_correlation_id
+from core.utils import get_user_business_ids
 from core.audit import AuditTrail
 from django.db import transaction
+from django.http import Http404
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,7 +24,15 @@ class BudgetViewSet(BaseModelViewSet):
     ordering_fields = ['start_date', 'end_date', 'created_at']
     throttle_scope = 'user'
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_superuser:
+            queryset = queryset.filter(business_id__in=get_user_business_ids(user))
+        return queryset
+
     def perform_create(self, serializer):
+        # BudgetSerializer.validate resolves and checks the business
         serializer.save(created_by=self.request.user)
 
     @action(detail=True, methods=['post'], url_path='approve')
@@ -35,6 +46,8 @@ class BudgetViewSet(BaseModelViewSet):
             budget.save(update_fields=['status', 'updated_at'])
             AuditTrail.log(operation=AuditTrail.APPROVAL, module='finance', entity_type='Budget', entity_id=budget.id, user=request.user, changes={'status': {'old': old_status, 'new': 'approved'}}, reason='Budget approved', request=request)
             return APIResponse.success(data=self.get_serializer(budget).data, message='Budget approved successfully', correlation_id=correlation_id)
+        except Http404:
+            return APIResponse.not_found(message='Budget not found', correlation_id=get_correlation_id(request))
         except Exception as e:
             logger.error(f'Error approving budget: {str(e)}', exc_info=True)
             return APIResponse.server_error(message='Error approving budget', error_id=str(e), correlation_id=get_correlation_id(request))
@@ -50,11 +63,30 @@ class BudgetViewSet(BaseModelViewSet):
             budget.save(update_fields=['status', 'updated_at'])
             AuditTrail.log(operation=AuditTrail.CANCEL, module='finance', entity_type='Budget', entity_id=budget.id, user=request.user, changes={'status': {'old': old_status, 'new': 'rejected'}}, reason='Budget rejected', request=request)
             return APIResponse.success(data=self.get_serializer(budget).data, message='Budget rejected successfully', correlation_id=correlation_id)
+        except Http404:
+            return APIResponse.not_found(message='Budget not found', correlation_id=get_correlation_id(request))
         except Exception as e:
             logger.error(f'Error rejecting budget: {str(e)}', exc_info=True)
             return APIResponse.server_error(message='Error rejecting budget', error_id=str(e), correlation_id=get_correlation_id(request))
 
 
+    @action(detail=True, methods=['get'], url_path='actuals')
+    def actuals(self, request, pk=None):
+        """Budget vs actual per line, with variance and monthly burn series (?refresh=true skips the cache)"""
+        try:
+            correlation_id = get_correlation_id(request)
+            budget = self.get_object()
+            refresh = str(request.query_params.get('refresh', '')).lower() in ('1', 'true', 'yes')
+            return APIResponse.success(data=budget_actuals(budget, refresh=refresh), message='Budget actuals retrieved successfully', correlation_id=correlation_id)
+        except UnscopedBudgetError as e:
+            return APIResponse.bad_request(message=str(e), correlation_id=get_correlation_id(request))
+        except Http404:
+            return APIResponse.not_found(message='Budget not found', correlation_id=get_correlation_id(request))
+        except Exception as e:
+            logger.error(f'Error computing budget actuals: {str(e)}', exc_info=True)
+            return APIResponse.server_error(message='Error computing budget actuals', error_id=str(e), correlation_id=get_correlation_id(request))
+
+
 class BudgetLineViewSet(BaseModelViewSet):
     queryset = BudgetLine.objects.all().select_related('budget')
     serializer_class = BudgetLineSerializer
@@ -63,3 +95,10 @@ class BudgetLineViewSet(BaseModelViewSet):
     search_fields = ['name', 'category']
     ordering_fields = ['amount']
     throttle_scope = 'user'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_superuser:
+            queryset = queryset.filter(budget__business_id__in=get_user_business_ids(user))
+        return queryset
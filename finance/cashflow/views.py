@@ -3,9 +3,7 @@ from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db import models
-from finance.accounts.models import Transaction
-from django.db import models
+from finance.accounts.services.cash_flow import INFLOW_TYPES, OUTFLOW_TYPES, cash_flow_totals
 
 
 class CashFlowView(APIView):
@@ -15,26 +13,22 @@ class CashFlowView(APIView):
         start = request.query_params.get('start_date')
         end = request.query_params.get('end_date')
         try:
-            start_date = datetime.fromisoformat(start).date() if start else (timezone.now().date().replace(day=1))
+            start_date = datetime.fromisoformat(start).date() if start else (timezone.localdate().replace(day=1))
         except ValueError:
-            start_date = timezone.now().date().replace(day=1)
+            start_date = timezone.localdate().replace(day=1)
         try:
-            end_date = datetime.fromisoformat(end).date() if end else timezone.now().date()
+            end_date = datetime.fromisoformat(end).date() if end else timezone.localdate()
         except ValueError:
-            end_date = timezone.now().date()
+            end_date = timezone.localdate()
 
-        qs = Transaction.objects.filter(transaction_date__date__gte=start_date, transaction_date__date__lte=end_date)
+        # One conditional aggregate over the daily rollup, however long the history
+        account_ids = [int(a) for a in request.query_params.getlist('account') if str(a).isdigit()]
+        totals = cash_flow_totals(start_date, end_date, account_ids)
 
-        inflow_types = ['income', 'refund']
-        outflow_types = ['expense', 'payment', 'transfer']
-
-        total_inflows = qs.filter(transaction_type__in=inflow_types).aggregate(total_amount=models.Sum('amount'))['total_amount'] or 0
-        total_outflows = qs.filter(transaction_type__in=outflow_types).aggregate(total_amount=models.Sum('amount'))['total_amount'] or 0
+        total_inflows = sum(totals[t] for t in INFLOW_TYPES)
+        total_outflows = sum(totals[t] for t in OUTFLOW_TYPES)
         net_cash = total_inflows - total_outflows
-
-        by_type = {}
-        for t in inflow_types + outflow_types:
-            by_type[t] = qs.filter(transaction_type=t).aggregate(total_amount=models.Sum('amount'))['total_amount'] or 0
+        by_type = {t: totals[t] for t in INFLOW_TYPES + OUTFLOW_TYPES}
 
         return Response({
             'start_date': start_date,
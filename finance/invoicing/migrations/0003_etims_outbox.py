@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoicing', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='etims_qr_data',
+            field=models.TextField(blank=True, help_text='eTIMS verification QR content/URL', null=True),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='fiscalized_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -97,6 +97,10 @@ class Invoice(BaseOrder):
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_invoices')
     approved_at = models.DateTimeField(null=True, blank=True)
     
+    # KRA eTIMS fiscalization (control number goes to BaseOrder.tax_reference)
+    etims_qr_data = models.TextField(blank=True, null=True, help_text="eTIMS verification QR content/URL")
+    fiscalized_at = models.DateTimeField(null=True, blank=True)
+    
     # Payment tracking (enhanced)
     payment_gateway_enabled = models.BooleanField(default=False)
     payment_gateway_name = models.CharField(max_length=50, blank=True, help_text="e.g., Stripe, M-Pesa")
@@ -0,0 +1,147 @@
+"""
+Receivables aging and the overdue sweep.
+
+Invoice status only turns overdue when something recalculates that invoice,
+so sweep_overdue_invoices flips every open, unpaid invoice past its due date
+with one UPDATE (run nightly by finance.invoicing.tasks).
+
+receivables_aging buckets open balances by days past due - current, 1-30,
+31-60, 61-90, 91-120 and over 120 - per customer and branch in one grouped
+query. Reports are cached per day and scope; any invoice write, payment or
+sweep bumps a version so the next read recomputes.
+"""
+from datetime import timedelta
+from decimal import Decimal
+import logging
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from core_orders.models import BaseOrder
+from finance.invoicing.models import Invoice
+
+logger = logging.getLogger(__name__)
+
+CLOSED_STATUSES = ('draft', 'paid', 'cancelled', 'void')
+# Unpaid statuses the sweep may move to overdue; partial payment keeps 'partially_paid' (Invoice.recalculate_payments)
+SWEEPABLE_STATUSES = ('sent', 'viewed')
+# (key, label, min days past due, max days past due)
+AGING_BUCKETS = (
+    ('current', 'Current', None, 0),
+    ('days_1_30', '1-30', 1, 30),
+    ('days_31_60', '31-60', 31, 60),
+    ('days_61_90', '61-90', 61, 90),
+    ('days_91_120', '91-120', 91, 120),
+    ('days_over_120', '120+', 121, None),
+)
+AGING_CACHE_TIMEOUT = 60 * 60 * 24
+AGING_VERSION_KEY = 'invoicing:aging:version'
+ZERO = Decimal('0.00')
+
+
+def open_invoices():
+    return Invoice.objects.exclude(status__in=CLOSED_STATUSES).filter(balance_due__gt=0)
+
+
+def invalidate_aging():
+    """Make every cached aging report stale"""
+    try:
+        cache.incr(AGING_VERSION_KEY)
+    except ValueError:
+        cache.set(AGING_VERSION_KEY, 1, None)
+
+
+def sweep_overdue_invoices(as_of=None):
+    """Mark unpaid invoices due before as_of (local today) overdue in one UPDATE; returns the number changed"""
+    as_of = as_of or timezone.localdate()
+    # Filter on the parent table so the UPDATE is a single statement rather than select-then-update
+    updated = BaseOrder.objects.filter(
+        invoice__due_date__lt=as_of, status__in=SWEEPABLE_STATUSES, balance_due__gt=0, amount_paid__lte=0,
+    ).update(status='overdue', updated_at=timezone.now())
+    if updated:
+        invalidate_aging()
+    logger.info(f"Overdue sweep as of {as_of}: {updated} invoices marked overdue")
+    return updated
+
+
+def _bucket_filter(as_of, low, high):
+    """Q for due dates low..high days before as_of (open-ended when None)"""
+    condition = Q()
+    if low is not None:
+        condition &= Q(due_date__lte=as_of - timedelta(days=low))
+    if high is not None:
+        condition &= Q(due_date__gte=as_of - timedelta(days=high))
+    return condition
+
+
+def _aging_cache_key(as_of, business_id, branch_id, customer_id):
+    version = cache.get(AGING_VERSION_KEY) or 0
+    return f"invoicing:aging:{version}:{as_of}:{business_id or 'all'}:{branch_id or 'all'}:{customer_id or 'all'}"
+
+
+def compute_aging(as_of=None, business_id=None, branch_id=None, customer_id=None):
+    """Aging rows per (customer, branch) and grand totals, from one grouped query"""
+    as_of = as_of or timezone.localdate()
+    invoices = open_invoices()
+    if business_id:
+        invoices = invoices.filter(branch__business_id=business_id)
+    if branch_id:
+        invoices = invoices.filter(branch_id=branch_id)
+    if customer_id:
+        invoices = invoices.filter(customer_id=customer_id)
+
+    sums = {
+        key: Sum('balance_due', filter=_bucket_filter(as_of, low, high))
+        for key, _, low, high in AGING_BUCKETS
+    }
+    grouped = (
+        invoices.values('customer_id', 'customer__business_name', 'branch_id', 'branch__name')
+        .annotate(**sums, total=Sum('balance_due'), invoices=Count('pk'))
+        .order_by('customer__business_name', 'customer_id', 'branch_id')
+    )
+
+    keys = [key for key, *_ in AGING_BUCKETS] + ['total']
+    totals = dict.fromkeys(keys, ZERO)
+    rows = []
+    for group in grouped:
+        row = {
+            'customer_id': group['customer_id'],
+            'customer': group['customer__business_name'],
+            'branch_id': group['branch_id'],
+            'branch': group['branch__name'],
+            'invoices': group['invoices'],
+        }
+        for key in keys:
+            row[key] = group[key] or ZERO
+            totals[key] += row[key]
+        rows.append(row)
+    return {
+        'as_of': as_of,
+        'buckets': [{'key': key, 'label': label} for key, label, *_ in AGING_BUCKETS],
+        'rows': rows,
+        'totals': totals,
+    }
+
+
+def receivables_aging(as_of=None, business_id=None, branch_id=None, customer_id=None):
+    """compute_aging, cached per day and scope until the next invoice change"""
+    as_of = as_of or timezone.localdate()
+    key = _aging_cache_key(as_of, business_id, branch_id, customer_id)
+    report = cache.get(key)
+    if report is None:
+        report = compute_aging(as_of, business_id, branch_id, customer_id)
+        cache.set(key, report, AGING_CACHE_TIMEOUT)
+    return report
+
+
+def aging_export_rows(report):
+    """Flat rows of an aging report for the CSV/Excel exporters"""
+    for row in report['rows']:
+        yield {
+            'Customer': row['customer'] or '',
+            'Branch': row['branch'] or '',
+            'Invoices': row['invoices'],
+            **{label: row[key] for key, label, *_ in AGING_BUCKETS},
+            'Total': row['total'],
+        }
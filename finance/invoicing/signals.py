@@ -24,7 +24,7 @@ def invoice_payment_deleted(sender, instance, **kwargs):
 Invoice Signals - Inventory Integration
 Automatically updates stock levels when invoices are finalized
 """
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.db import transaction
 import logging
@@ -119,3 +119,11 @@ def track_invoice_status_change(sender, instance, **kwargs):
         except Invoice.DoesNotExist:
             pass
 
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invalidate_receivables_aging(sender, instance, **kwargs):
+    """Cached aging reports go stale once an invoice write commits"""
+    from .services.aging import invalidate_aging
+    transaction.on_commit(invalidate_aging)
@@ -0,0 +1,18 @@
+"""
+Celery tasks for invoicing.
+"""
+from datetime import date
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def sweep_overdue_invoices(as_of=None):
+    """Mark unpaid invoices past their due date overdue (as of an ISO date; local today by default)"""
+    from finance.invoicing.services.aging import sweep_overdue_invoices as sweep
+
+    updated = sweep(date.fromisoformat(str(as_of)) if as_of else None)
+    return {'updated': updated}
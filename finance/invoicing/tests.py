@@ -1,10 +1,18 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
 from business.models import Bussiness, Branch, BusinessLocation
+from core_orders.models import BaseOrder
 from crm.contacts.models import Contact
 from ecommerce.product.models import Products
+from finance.invoicing.models import Invoice
+from finance.invoicing.services.aging import receivables_aging, sweep_overdue_invoices
 from django.contrib.auth import get_user_model
 
 
@@ -229,6 +237,64 @@ class InvoicePDFRefreshTests(APITestCase):
         self.assertIn(b'Kenya', pdf_bytes)
         self.assertIn(b'procurement@kuraweigh.com', pdf_bytes)
         self.assertIn(b'+254 701 987 654', pdf_bytes)
-from django.test import TestCase
 
-# Tests are intentionally omitted. Please request specific tests if needed.
+
+TODAY = date(2026, 6, 30)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReceivablesAgingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user(username='aging', email='aging@example.com', password='pass')
+        location = BusinessLocation.objects.create(city='Nairobi')
+        self.business = Bussiness.objects.create(name='Aging Biz', owner=user, location=location)
+        self.branch = Branch.objects.create(name='HQ', business=self.business, location=location, branch_code='AGE01')
+        self.acme = Contact.objects.create(contact_id='C1', user=user, business_name='Acme')
+        self.zen = Contact.objects.create(contact_id='C2', user=user, business_name='Zen')
+
+    def invoice(self, customer, days_past_due, total, status='sent', paid=Decimal('0')):
+        invoice = Invoice.objects.create(
+            branch=self.branch, customer=customer, invoice_date=TODAY - timedelta(days=days_past_due + 30),
+            due_date=TODAY - timedelta(days=days_past_due), total=total, subtotal=total,
+        )
+        # Invoice.save derives status from the wall clock; pin the state under test
+        BaseOrder.objects.filter(pk=invoice.pk).update(status=status, amount_paid=paid, balance_due=total - paid)
+        return invoice
+
+    def test_sweep_marks_only_unpaid_past_due_invoices(self):
+        late = self.invoice(self.acme, 5, Decimal('100'))
+        due_today = self.invoice(self.acme, 0, Decimal('100'))
+        partial = self.invoice(self.acme, 5, Decimal('100'), status='partially_paid', paid=Decimal('40'))
+        draft = self.invoice(self.acme, 5, Decimal('100'), status='draft')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(sweep_overdue_invoices(TODAY), 1)
+        statuses = dict(Invoice.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[invoice.pk] for invoice in (late, due_today, partial, draft)],
+            ['overdue', 'sent', 'partially_paid', 'draft'],
+        )
+
+    def test_buckets_per_customer_and_cached_until_invoices_change(self):
+        self.invoice(self.acme, -3, Decimal('100'))
+        self.invoice(self.acme, 30, Decimal('200'), status='overdue')
+        self.invoice(self.acme, 45, Decimal('300'), status='partially_paid', paid=Decimal('50'))
+        self.invoice(self.zen, 150, Decimal('400'), status='overdue')
+        self.invoice(self.zen, 150, Decimal('999'), status='paid', paid=Decimal('999'))
+
+        with self.assertNumQueries(1):
+            report = receivables_aging(TODAY, business_id=self.business.id)
+        acme, zen = report['rows']
+        self.assertEqual(
+            (acme['current'], acme['days_1_30'], acme['days_31_60'], acme['total'], acme['invoices']),
+            (Decimal('100'), Decimal('200'), Decimal('250'), Decimal('550'), 3),
+        )
+        self.assertEqual((zen['days_over_120'], zen['days_91_120']), (Decimal('400'), Decimal('0.00')))
+        self.assertEqual(report['totals']['total'], Decimal('950'))
+
+        with self.assertNumQueries(0):
+            receivables_aging(TODAY, business_id=self.business.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.invoice(self.zen, 10, Decimal('50'))
+        self.assertEqual(receivables_aging(TODAY, business_id=self.business.id)['totals']['total'], Decimal('1000'))
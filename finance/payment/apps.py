@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class PaymentConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'finance.payment'
+
+    def ready(self):
+        import finance.payment.signals
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from finance.payment.references import backfill_payable_references
+
+
+class Command(BaseCommand):
+    help = 'Register payment references of existing orders, sales, billing documents, purchases and employee payables'
+
+    def handle(self, *args, **options):
+        rows = backfill_payable_references()
+        self.stdout.write(self.style.SUCCESS(f'Backfilled payable references: {rows} rows considered'))
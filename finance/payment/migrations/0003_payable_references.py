@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:29
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MpesaCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('receipt_number', models.CharField(blank=True, max_length=50, null=True, unique=True)),
+                ('bill_ref_number', models.CharField(blank=True, default='', max_length=100)),
+                ('result_code', models.IntegerField(default=1)),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('phone_number', models.CharField(blank=True, default='', max_length=20)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('received', 'Received'), ('processed', 'Processed'), ('unmatched', 'Unmatched'), ('failed', 'Failed'), ('ignored', 'Ignored')], default='received', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('message', models.TextField(blank=True, default='')),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'finance_mpesa_callbacks',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='idx_mpesa_callback_status'), models.Index(fields=['bill_ref_number'], name='idx_mpesa_callback_bill_ref')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PayableReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(max_length=100)),
+                ('entity_type', models.CharField(choices=[('order', 'Order'), ('pos_sale', 'POS Sale'), ('invoice', 'Billing Document'), ('purchase', 'Purchase'), ('employee_advance', 'Employee Advance'), ('employee_loan', 'Employee Loan'), ('employee_expense', 'Employee Expense Claim')], max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'finance_payable_references',
+                'constraints': [models.UniqueConstraint(fields=('reference', 'entity_type'), name='uniq_payable_reference')],
+            },
+        ),
+    ]
@@ -452,6 +452,71 @@ class PaymentRefund(BaseModel):
         return f"Refund for {self.payment.reference_number} - {self.amount}"
 
 
+class PayableReference(models.Model):
+    """
+    Index of payment references (order ids, sale ids, document numbers...) to
+    the entity they pay, so an M-Pesa BillRefNumber resolves with one lookup.
+    Kept in step with payable documents by finance.payment.signals.
+    """
+    ENTITY_TYPES = (
+        ('order', 'Order'),
+        ('pos_sale', 'POS Sale'),
+        ('invoice', 'Billing Document'),
+        ('purchase', 'Purchase'),
+        ('employee_advance', 'Employee Advance'),
+        ('employee_loan', 'Employee Loan'),
+        ('employee_expense', 'Employee Expense Claim'),
+    )
+    reference = models.CharField(max_length=100)
+    entity_type = models.CharField(max_length=30, choices=ENTITY_TYPES)
+    object_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'finance_payable_references'
+        constraints = [
+            models.UniqueConstraint(fields=['reference', 'entity_type'], name='uniq_payable_reference'),
+        ]
+
+    def __str__(self):
+        return f"{self.reference} -> {self.entity_type}#{self.object_id}"
+
+
+class MpesaCallback(BaseModel):
+    """
+    Inbox of M-Pesa payment callbacks. The webhook stores and acknowledges;
+    finance.payment.tasks applies them. The unique receipt number makes
+    Safaricom retries of the same payment no-ops.
+    """
+    STATUS_CHOICES = (
+        ('received', 'Received'),
+        ('processed', 'Processed'),
+        ('unmatched', 'Unmatched'),
+        ('failed', 'Failed'),
+        ('ignored', 'Ignored'),
+    )
+    receipt_number = models.CharField(max_length=50, unique=True, null=True, blank=True)
+    bill_ref_number = models.CharField(max_length=100, blank=True, default='')
+    result_code = models.IntegerField(default=1)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    phone_number = models.CharField(max_length=20, blank=True, default='')
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='received')
+    attempts = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True, default='')
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'finance_mpesa_callbacks'
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='idx_mpesa_callback_status'),
+            models.Index(fields=['bill_ref_number'], name='idx_mpesa_callback_bill_ref'),
+        ]
+
+    def __str__(self):
+        return f"{self.receipt_number or self.pk} ({self.status})"
+
+
 # Ensure that when a Payment is completed and associated to a payment account we
 # create a matching Transaction record on that account so account balances are
 # tracked from the transactions themselves. Using a post_save receiver keeps the
@@ -0,0 +1,181 @@
+"""
+Payable references and M-Pesa callback ingestion.
+
+PayableReference maps every payment reference customers can quote (order
+ids, POS sale ids, billing document numbers, purchase ids, employee
+advance/loan/claim ids) to its entity, so a BillRefNumber resolves with one
+indexed lookup instead of probing each table in turn. Rows follow documents
+as they are created, renumbered and deleted (finance.payment.signals); a
+reference that is not registered yet (older data, bulk imports) is probed once
+and then registered.
+Backfill existing data with:
+
+    python manage.py backfill_payable_references
+
+M-Pesa callbacks are stored in MpesaCallback and acknowledged at once; the
+payment is applied by finance.payment.tasks.process_mpesa_callback after the
+insert commits. The unique receipt number turns Safaricom retries into
+no-ops, and retry_pending_mpesa_callbacks picks up anything left unqueued.
+"""
+from decimal import Decimal, InvalidOperation
+import logging
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import MpesaCallback, PayableReference
+
+logger = logging.getLogger(__name__)
+
+# entity type -> (model, reference field), in the order a shared reference resolves
+PAYABLE_SOURCES = {
+    'order': ('order.Order', 'order_id'),
+    'pos_sale': ('pos.Sales', 'sale_id'),
+    'invoice': ('payment.BillingDocument', 'document_number'),
+    'purchase': ('purchases.Purchase', 'purchase_id'),
+    'employee_advance': ('payroll.Advances', 'pk'),
+    'employee_loan': ('payroll.EmployeLoans', 'pk'),
+    'employee_expense': ('payroll.ExpenseClaims', 'pk'),
+}
+PRIORITY = {entity_type: position for position, entity_type in enumerate(PAYABLE_SOURCES)}
+BATCH_SIZE = 2000
+
+
+def source_model(entity_type):
+    label, field = PAYABLE_SOURCES[entity_type]
+    return apps.get_model(label), field
+
+
+def register_payable(entity_type, reference, object_id):
+    """Record that reference pays entity_type#object_id (no-op when already registered)"""
+    if reference in (None, ''):
+        return
+    PayableReference.objects.bulk_create(
+        [PayableReference(reference=str(reference), entity_type=entity_type, object_id=object_id)],
+        ignore_conflicts=True,
+    )
+
+
+def unregister_payable(entity_type, object_id, keep=None):
+    """Drop the references that pay entity_type#object_id, except keep"""
+    stale = PayableReference.objects.filter(entity_type=entity_type, object_id=object_id)
+    if keep not in (None, ''):
+        stale = stale.exclude(reference=str(keep))
+    stale.delete()
+
+
+def _probe(reference):
+    """Legacy lookup across every source; registers the hit"""
+    for entity_type in PAYABLE_SOURCES:
+        model, field = source_model(entity_type)
+        if field == 'pk' and not str(reference).isdigit():
+            continue
+        object_id = model.objects.filter(**{field: reference}).values_list('pk', flat=True).first()
+        if object_id is not None:
+            register_payable(entity_type, reference, object_id)
+            return entity_type, object_id
+    return None
+
+
+def resolve_payable(reference):
+    """(entity type, object id) a payment reference pays, or None"""
+    if not reference:
+        return None
+    matches = PayableReference.objects.filter(reference=str(reference)).values_list('entity_type', 'object_id')
+    if matches:
+        return min(matches, key=lambda match: PRIORITY.get(match[0], len(PRIORITY)))
+    return _probe(reference)
+
+
+def backfill_payable_references():
+    """Register references of every existing payable document; returns rows considered"""
+    total = 0
+    for entity_type in PAYABLE_SOURCES:
+        model, field = source_model(entity_type)
+        rows = model.objects.order_by('pk').values_list('pk', field)
+        if field != 'pk':
+            rows = rows.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+        batch = []
+        for object_id, reference in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(PayableReference(reference=str(reference), entity_type=entity_type, object_id=object_id))
+            if len(batch) >= BATCH_SIZE:
+                PayableReference.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+                batch = []
+        if batch:
+            PayableReference.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+        logger.info(f"Payable references backfilled for {entity_type}")
+    return total
+
+
+def _callback_fields(data):
+    """Normalise flat STK-style and C2B confirmation payloads"""
+    receipt = data.get('MpesaReceiptNumber') or data.get('TransID') or None
+    try:
+        amount = Decimal(str(data.get('Amount', data.get('TransAmount', 0)) or 0))
+    except (InvalidOperation, ValueError):
+        amount = Decimal('0.00')
+    result_code = data.get('ResultCode', 0 if data.get('TransID') else 1)
+    try:
+        result_code = int(result_code)
+    except (TypeError, ValueError):
+        result_code = 1
+    return {
+        'receipt_number': receipt,
+        'bill_ref_number': str(data.get('BillRefNumber', '') or ''),
+        'result_code': result_code,
+        'amount': amount,
+        'phone_number': str(data.get('PhoneNumber', data.get('MSISDN', '')) or ''),
+    }
+
+
+def ingest_mpesa_callback(data):
+    """
+    Store a callback and queue it for processing; returns (callback, created).
+    A receipt number seen before returns the stored callback untouched.
+    """
+    data = data.dict() if hasattr(data, 'dict') else dict(data)
+    fields = _callback_fields(data)
+    status = 'received' if fields['result_code'] == 0 else 'ignored'
+    try:
+        with transaction.atomic():
+            callback = MpesaCallback.objects.create(payload=data, status=status, **fields)
+    except IntegrityError:
+        logger.info(f"Duplicate M-Pesa callback for receipt {fields['receipt_number']}")
+        return MpesaCallback.objects.get(receipt_number=fields['receipt_number']), False
+    if status == 'received':
+        transaction.on_commit(lambda: enqueue_mpesa_callback(callback.pk))
+    return callback, True
+
+
+def enqueue_mpesa_callback(callback_id):
+    from .tasks import process_mpesa_callback
+    try:
+        process_mpesa_callback.delay(callback_id)
+    except Exception as e:
+        # Broker unavailable: retry_pending_mpesa_callbacks picks it up
+        logger.warning(f"Could not queue M-Pesa callback {callback_id}: {str(e)}")
+
+
+def process_callback(callback_id):
+    """Apply a stored callback once; returns its final status"""
+    from .services import get_payment_service
+
+    with transaction.atomic():
+        callback = MpesaCallback.objects.select_for_update().filter(pk=callback_id).first()
+        if callback is None or callback.status not in ('received', 'failed'):
+            return getattr(callback, 'status', None)
+        callback.attempts += 1
+        success, message, _ = get_payment_service().verify_mpesa_callback(callback.payload)
+        if success:
+            callback.status = 'processed'
+        elif message and message.startswith('No matching'):
+            callback.status = 'unmatched'
+        else:
+            callback.status = 'failed'
+        callback.message = message or ''
+        callback.processed_at = timezone.now()
+        callback.save(update_fields=['status', 'attempts', 'message', 'processed_at', 'updated_at'])
+    return callback.status
@@ -1122,125 +1122,29 @@ class PaymentOrchestrationService:
         """
         try:
             # For Safaricom M-Pesa
-            result_code = callback_data.get("ResultCode", 1)
-            mpesa_receipt = callback_data.get("MpesaReceiptNumber", "")
-            amount = Decimal(str(callback_data.get("Amount", 0)))
-            phone = callback_data.get("PhoneNumber", "")
+            result_code = callback_data.get("ResultCode", 0 if callback_data.get("TransID") else 1)
+            mpesa_receipt = callback_data.get("MpesaReceiptNumber") or callback_data.get("TransID", "")
+            amount = Decimal(str(callback_data.get("Amount", callback_data.get("TransAmount", 0))))
+            phone = callback_data.get("PhoneNumber") or callback_data.get("MSISDN", "")
             bill_ref_number = callback_data.get("BillRefNumber", "")
             
             # If successful payment
-            if result_code == 0:
-                # Try to match with an order first
-                # Dynamic import to avoid circular imports
-                from ecommerce.order.models import Order
-                order = Order.objects.filter(order_id=bill_ref_number).first()
-                if order:
+            if str(result_code) == '0':
+                # One indexed lookup in the payable reference registry (finance.payment.references)
+                from finance.payment.references import resolve_payable
+                resolved = resolve_payable(bill_ref_number)
+                if resolved:
+                    entity_type, _ = resolved
                     return self.process_mpesa_payment(
                         phone_number=phone,
                         amount=amount,
                         reference_id=bill_ref_number,
                         mpesa_receipt=mpesa_receipt,
-                        entity_type='order',
+                        entity_type=entity_type,
                         entity_id=bill_ref_number,
                         created_by=None
                     )
                 
-                # Try to match with a sale
-                sale = Sales.objects.filter(sale_id=bill_ref_number).first()
-                if sale:
-                    return self.process_mpesa_payment(
-                        phone_number=phone,
-                        amount=amount,
-                        reference_id=bill_ref_number,
-                        mpesa_receipt=mpesa_receipt,
-                        entity_type='pos_sale',
-                        entity_id=bill_ref_number,
-                        created_by=None
-                    )
-                
-                # Try to match with an invoice
-                from finance.payment.models import BillingDocument
-                invoice = BillingDocument.objects.filter(document_number=bill_ref_number).first()
-                if invoice:
-                    return self.process_mpesa_payment(
-                        phone_number=phone,
-                        amount=amount,
-                        reference_id=bill_ref_number,
-                        mpesa_receipt=mpesa_receipt,
-                        entity_type='invoice',
-                        entity_id=bill_ref_number,
-                        created_by=None
-                    )
-                
-                # Try to match with a purchase
-                try:
-                    from procurement.purchases.models import Purchase
-                    purchase = Purchase.objects.filter(purchase_id=bill_ref_number).first()
-                    if purchase:
-                        return self.process_mpesa_payment(
-                            phone_number=phone,
-                            amount=amount,
-                            reference_id=bill_ref_number,
-                            mpesa_receipt=mpesa_receipt,
-                            entity_type='purchase',
-                            entity_id=bill_ref_number,
-                            created_by=None
-                        )
-                except:
-                    pass
-                
-                # Try to match with employee entities
-                # Employee Advance
-                try:
-                    from hrm.payroll.models import Advances
-                    advance = Advances.objects.filter(id=bill_ref_number).first()
-                    if advance:
-                        return self.process_mpesa_payment(
-                            phone_number=phone,
-                            amount=amount,
-                            reference_id=bill_ref_number,
-                            mpesa_receipt=mpesa_receipt,
-                            entity_type='employee_advance',
-                            entity_id=bill_ref_number,
-                            created_by=None
-                        )
-                except:
-                    pass
-                    
-                # Employee Loan
-                try:
-                    from hrm.payroll.models import EmployeLoans
-                    loan = EmployeLoans.objects.filter(id=bill_ref_number).first()
-                    if loan:
-                        return self.process_mpesa_payment(
-                            phone_number=phone,
-                            amount=amount,
-                            reference_id=bill_ref_number,
-                            mpesa_receipt=mpesa_receipt,
-                            entity_type='employee_loan',
-                            entity_id=bill_ref_number,
-                            created_by=None
-                        )
-                except:
-                    pass
-                    
-                # Employee Expense
-                try:
-                    from hrm.payroll.models import ExpenseClaims
-                    expense = ExpenseClaims.objects.filter(id=bill_ref_number).first()
-                    if expense:
-                        return self.process_mpesa_payment(
-                            phone_number=phone,
-                            amount=amount,
-                            reference_id=bill_ref_number,
-                            mpesa_receipt=mpesa_receipt,
-                            entity_type='employee_expense',
-                            entity_id=bill_ref_number,
-                            created_by=None
-                        )
-                except:
-                    pass
-                
                 # No matching entity found
                 return False, f"No matching order, sale, invoice, purchase, or employee entity found for reference: {bill_ref_number}", None
                 
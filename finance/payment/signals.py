@@ -0,0 +1,57 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .references import PAYABLE_SOURCES, register_payable, unregister_payable
+
+
+def _remember_reference(field):
+    """post_init receiver noting the reference a document was loaded with"""
+    def receiver(sender, instance, **kwargs):
+        # __dict__, so a deferred reference field is not fetched
+        instance._payable_reference = instance.__dict__.get(field)
+    return receiver
+
+
+def _register_saved(entity_type, field):
+    """post_save receiver registering a new document's reference, or re-registering a changed one"""
+    def receiver(sender, instance, created, raw=False, update_fields=None, **kwargs):
+        if raw:
+            return
+        if field == 'pk':
+            if created:
+                register_payable(entity_type, instance.pk, instance.pk)
+            return
+        reference = getattr(instance, field)
+        if created:
+            register_payable(entity_type, reference, instance.pk)
+        elif (update_fields is None or field in update_fields) and reference != instance._payable_reference:
+            unregister_payable(entity_type, instance.pk, keep=reference)
+            register_payable(entity_type, reference, instance.pk)
+        else:
+            return
+        instance._payable_reference = reference
+    return receiver
+
+
+def _unregister_deleted(entity_type):
+    """post_delete receiver dropping a deleted document's references"""
+    def receiver(sender, instance, **kwargs):
+        unregister_payable(entity_type, instance.pk)
+    return receiver
+
+
+for _entity_type, (_label, _field) in PAYABLE_SOURCES.items():
+    _model = apps.get_model(_label)
+    if _field != 'pk':
+        post_init.connect(
+            _remember_reference(_model._meta.get_field(_field).attname), sender=_model,
+            weak=False, dispatch_uid=f'payable_reference_init_{_entity_type}',
+        )
+    post_save.connect(
+        _register_saved(_entity_type, _field), sender=_model,
+        weak=False, dispatch_uid=f'payable_reference_{_entity_type}',
+    )
+    post_delete.connect(
+        _unregister_deleted(_entity_type), sender=_model,
+        weak=False, dispatch_uid=f'payable_reference_delete_{_entity_type}',
+    )
@@ -0,0 +1,40 @@
+"""
+Celery tasks for payments.
+"""
+from datetime import timedelta
+import logging
+
+from celery import shared_task
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Callbacks still 'received' after this long were never queued (or their worker died)
+PENDING_CALLBACK_GRACE = timedelta(minutes=2)
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=30)
+def process_mpesa_callback(self, callback_id):
+    """Apply one stored M-Pesa callback; failures are retried with backoff"""
+    from finance.payment.references import process_callback
+
+    status = process_callback(callback_id)
+    if status == 'failed':
+        raise self.retry(countdown=30 * (2 ** self.request.retries))
+    return {'callback': callback_id, 'status': status}
+
+
+@shared_task
+def retry_pending_mpesa_callbacks(limit=500):
+    """Queue callbacks that were stored but never processed"""
+    from finance.payment.models import MpesaCallback
+
+    pending = list(
+        MpesaCallback.objects.filter(status='received', created_at__lt=timezone.now() - PENDING_CALLBACK_GRACE)
+        .order_by('created_at').values_list('pk', flat=True)[:limit]
+    )
+    for callback_id in pending:
+        process_mpesa_callback.delay(callback_id)
+    if pending:
+        logger.info(f"Re-queued {len(pending)} pending M-Pesa callbacks")
+    return {'queued': len(pending)}
@@ -1,3 +1,7 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
@@ -5,7 +9,9 @@ from rest_framework.test import APITestCase, APIClient
 from business.models import Bussiness, Branch, BusinessLocation
 from crm.contacts.models import Contact
 from django.contrib.auth import get_user_model
-from finance.payment.models import Payment
+from ecommerce.order.models import Order
+from finance.payment.models import MpesaCallback, PayableReference, Payment
+from finance.payment.references import process_callback, resolve_payable
 from finance.accounts.models import PaymentAccounts, Transaction
 
 
@@ -53,3 +59,50 @@ class PaymentTransactionTests(APITestCase):
         balance = serializer.data.get('balance')
         # opening_balance was 0, two incoming payments -> balance should be 2000
         self.assertEqual(str(balance), '2000.00')
+
+
+class MpesaCallbackTests(TestCase):
+    def test_registry_resolves_references_in_one_query(self):
+        order = Order.objects.create(order_number='ORD-REG-1', total=Decimal('500.00'), balance_due=Decimal('500.00'))
+        self.assertTrue(PayableReference.objects.filter(reference=order.order_id, entity_type='order').exists())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(resolve_payable(order.order_id), ('order', order.pk))
+
+        # Unregistered (pre-registry) data is probed once, then served from the registry
+        PayableReference.objects.all().delete()
+        self.assertEqual(resolve_payable(order.order_id), ('order', order.pk))
+        with self.assertNumQueries(1):
+            resolve_payable(order.order_id)
+        self.assertIsNone(resolve_payable('NO-SUCH-REF'))
+
+    def test_registry_follows_renumbered_and_deleted_documents(self):
+        order = Order.objects.create(order_number='ORD-REG-2', total=Decimal('500.00'), balance_due=Decimal('500.00'))
+        old_reference = order.order_id
+        order = Order.objects.get(pk=order.pk)
+        order.order_id = 'ORD-RENAMED'
+        order.save()
+
+        self.assertEqual(
+            list(PayableReference.objects.filter(entity_type='order').values_list('reference', flat=True)), ['ORD-RENAMED']
+        )
+        self.assertIsNone(resolve_payable(old_reference))
+        order.delete()
+        self.assertFalse(PayableReference.objects.exists())
+
+    def test_callbacks_are_acknowledged_queued_and_deduplicated(self):
+        payload = {'ResultCode': 0, 'MpesaReceiptNumber': 'QKL7ABC123', 'Amount': 100, 'PhoneNumber': '254700000000', 'BillRefNumber': 'UNKNOWN-1'}
+        with mock.patch('finance.payment.tasks.process_mpesa_callback.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/v1/finance/payment/mpesa/callback/', payload, content_type='application/json')
+            self.assertEqual(response.json(), {'ResultCode': 0, 'ResultDesc': 'Accepted'})
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/v1/finance/payment/mpesa/callback/', payload, content_type='application/json')
+
+        callback = MpesaCallback.objects.get()
+        delay.assert_called_once_with(callback.pk)
+        self.assertEqual(process_callback(callback.pk), 'unmatched')
+        # Already settled: re-running is a no-op
+        self.assertEqual(process_callback(callback.pk), 'unmatched')
+        callback.refresh_from_db()
+        self.assertEqual((callback.attempts, callback.amount), (1, Decimal('100.00')))
@@ -452,38 +452,20 @@ class MpesaCallbackView(APIView):
     permission_classes = []  # No authentication for callbacks
     
     def post(self, request, format=None):
-        """Process M-Pesa callback data"""
+        """Store the callback and acknowledge at once; finance.payment.tasks applies it"""
         try:
-            # Get callback data from request
-            callback_data = request.data
-            
-            # Process callback through payment service
-            payment_service = get_payment_service()
-            success, message, payment = payment_service.verify_mpesa_callback(callback_data)
-            
-            if success:
-                # Successful processing
-                return Response({
-                    "ResultCode": 0,
-                    "ResultDesc": "Accepted"
-                }, status=status.HTTP_200_OK)
-            else:
-                # Failed processing but still return OK to M-Pesa
-                return Response({
-                    "ResultCode": 0,
-                    "ResultDesc": "Accepted"
-                }, status=status.HTTP_200_OK)
-                
+            from .references import ingest_mpesa_callback
+            callback, created = ingest_mpesa_callback(request.data)
+            if not created:
+                logger.info(f"M-Pesa callback {callback.receipt_number} already received ({callback.status})")
         except Exception as e:
             # Log error but still return OK to M-Pesa
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error processing M-Pesa callback: {str(e)}")
-            
-            return Response({
-                "ResultCode": 0,
-                "ResultDesc": "Accepted"
-            }, status=status.HTTP_200_OK)
+            logger.error(f"Error storing M-Pesa callback: {str(e)}", exc_info=True)
+
+        return Response({
+            "ResultCode": 0,
+            "ResultDesc": "Accepted"
+        }, status=status.HTTP_200_OK)
 
 
 # Airtel Money support removed per business requirements
@@ -5,6 +5,7 @@ Endpoints for generating and exporting professional financial statements:
 - Profit & Loss Statement
 - Balance Sheet
 - Cash Flow Statement
+- Receivables Aging
 
 All reports support multi-format export (CSV, PDF, Excel) with professional formatting.
 """
@@ -228,3 +229,49 @@ def financial_statements_suite(request):
             {'error': str(e), 'message': 'Failed to generate complete financial statement suite'},
             status=http_status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def receivables_aging_report(request):
+    """
+    Generate Receivables Aging (open invoice balances by days past due).
+    
+    Query Parameters:
+    - as_of_date: Aging date (YYYY-MM-DD, default: today)
+    - business_id: Business ID (optional)
+    - branch_id: Branch ID (optional)
+    - customer_id: Customer contact ID (optional)
+    - export: Export format (csv, pdf, xlsx)
+    
+    Returns:
+    - Current/1-30/31-60/61-90/91-120/120+ balances per customer and branch, with totals
+    """
+    try:
+        from finance.invoicing.services.aging import aging_export_rows, receivables_aging
+
+        as_of_date = _parse_date(request.query_params.get('as_of_date')) if request.query_params.get('as_of_date') else None
+        report = receivables_aging(
+            as_of=as_of_date,
+            business_id=request.query_params.get('business_id'),
+            branch_id=request.query_params.get('branch_id'),
+            customer_id=request.query_params.get('customer_id'),
+        )
+        report_data = {
+            'title': 'Receivables Aging',
+            'as_of_date': report['as_of'],
+            'buckets': report['buckets'],
+            'rows': report['rows'],
+            'totals': report['totals'],
+        }
+        if request.query_params.get('export'):
+            report_data['data'] = list(aging_export_rows(report))
+        
+        return _handle_finance_report_export(request, report_data, 'Receivables Aging', f"receivables_aging_{report['as_of']}")
+        
+    except Exception as e:
+        logger.error(f"Error in Receivables Aging endpoint: {str(e)}", exc_info=True)
+        return Response(
+            {'error': str(e), 'report_type': 'Receivables Aging'},
+            status=http_status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taxes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taxperiod',
+            name='vat_breakdown',
+            field=models.JSONField(blank=True, default=dict, verbose_name='VAT Breakdown'),
+        ),
+        migrations.AddField(
+            model_name='taxperiod',
+            name='vat_computed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='VAT Computed At'),
+        ),
+    ]
@@ -161,6 +161,9 @@ class TaxPeriod(models.Model):
     notes = models.TextField(_('Notes'), blank=True, null=True)
     total_collected = models.DecimalField(_('Total Tax Collected'), max_digits=15, decimal_places=2, default=Decimal('0.00'))
     total_paid = models.DecimalField(_('Total Tax Paid'), max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    # Per-rate VAT breakdown from finance.taxes.services.vat, with its per-source watermarks
+    vat_breakdown = models.JSONField(_('VAT Breakdown'), default=dict, blank=True)
+    vat_computed_at = models.DateTimeField(_('VAT Computed At'), blank=True, null=True)
     kra_filing_reference = models.CharField(_('KRA Filing Reference'), max_length=100, blank=True, null=True)
     filed_at = models.DateTimeField(_('Filed At'), blank=True, null=True)
     # KRA/eTIMS integration tracking
@@ -39,3 +39,15 @@ class TaxPeriodSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaxPeriod
         fields = '__all__'
+        read_only_fields = ['vat_breakdown', 'vat_computed_at']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        breakdown = data.get('vat_breakdown')
+        if breakdown and 'sources' in breakdown:
+            # The counted document ids are bookkeeping for incremental runs, not API output
+            data['vat_breakdown'] = {**breakdown, 'sources': {
+                source: {key: value for key, value in state.items() if key != 'ids'}
+                for source, state in breakdown['sources'].items()
+            }}
+        return data
@@ -0,0 +1,284 @@
+"""
+VAT computation for a TaxPeriod.
+
+Output VAT comes from finalised invoices (less issued credit notes) and POS
+sales lines; input VAT from received purchases and expenses carrying a tax
+rate. Each source is streamed once as flat value rows (no model instances),
+and every document is folded into a breakdown keyed by direction, rate and
+the TaxGroup holding a VAT tax at that rate.
+
+The breakdown is stored on TaxPeriod.vat_breakdown together with the ids of
+the documents counted per source, so documents that arrive late (including
+drafts created before the last run and finalised after it) can be folded in
+incrementally; edits or voids of documents already counted need a full
+recomputation. The same stream backs the filing dataset (one row per
+document) used for the VAT return export.
+
+    engine = VatEngine(period)
+    engine.recalculate()                  # full
+    engine.recalculate(incremental=True)  # only documents not counted by the last run
+"""
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from business.models import TaxRates
+from ecommerce.pos.models import salesItems
+from finance.expenses.models import Expense
+from finance.invoicing.models import CreditNote, Invoice
+from finance.taxes.models import Tax, TaxGroupItem, TaxPeriod
+from procurement.purchases.models import Purchase
+
+logger = logging.getLogger(__name__)
+
+OUTPUT = 'output'
+INPUT = 'input'
+SOURCES = ('invoice', 'credit_note', 'pos_sale', 'purchase', 'expense')
+EXCLUDED_INVOICE_STATUSES = ('draft', 'cancelled', 'void')
+ZERO = Decimal('0.00')
+CENTS = Decimal('0.01')
+CHUNK_SIZE = 2000
+# A rate derived from amounts snaps to a configured VAT rate this close to it
+RATE_TOLERANCE = Decimal('0.05')
+
+VatDocument = namedtuple('VatDocument', [
+    'source', 'direction', 'document_id', 'number', 'date', 'counterparty', 'counterparty_pin',
+    'rate', 'taxable', 'vat',
+])
+
+
+def _money(value):
+    return Decimal(value or 0).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+class VatEngine:
+    def __init__(self, period):
+        self.period = period
+        self.business_id = period.business_id
+        self.start_date = period.start_date
+        self.end_date = period.end_date
+        # DateTimeField sources are bounded by local midnights
+        self.start_at = timezone.make_aware(datetime.combine(period.start_date, time.min))
+        self.end_at = timezone.make_aware(datetime.combine(period.end_date + timedelta(days=1), time.min))
+
+        self.rates = sorted(
+            {Decimal(rate) for rate in TaxRates.objects.filter(business_id=self.business_id).values_list('percentage', flat=True)}
+            | {Decimal(rate) for rate in Tax.objects.filter(
+                business_id=self.business_id, is_vat=True, calculation_type='percentage'
+            ).values_list('rate', flat=True)}
+        )
+        self.groups = {}
+        for rate, group_id, group_name in TaxGroupItem.objects.filter(
+            tax_group__business_id=self.business_id, tax_group__is_active=True,
+            tax__is_vat=True, tax__calculation_type='percentage',
+        ).order_by('tax_group_id').values_list('tax__rate', 'tax_group_id', 'tax_group__name'):
+            self.groups.setdefault(self._rate_key(rate), (group_id, group_name))
+
+    @staticmethod
+    def _rate_key(rate):
+        return str(Decimal(rate).quantize(CENTS))
+
+    def resolve_rate(self, rate=None, taxable=None, vat=None):
+        """The document's VAT rate: as recorded, else derived from its amounts and snapped to a known rate"""
+        if rate is None:
+            if not taxable or vat is None:
+                return ZERO
+            rate = Decimal(vat) * 100 / Decimal(taxable)
+            nearest = min(self.rates, key=lambda known: abs(known - rate), default=None)
+            if nearest is not None and abs(nearest - rate) <= RATE_TOLERANCE:
+                rate = nearest
+        return Decimal(rate).quantize(CENTS)
+
+    # Sources: a queryset of the period's documents, and a reader yielding VatDocuments from it in id order
+
+    def _invoice_rows(self):
+        return Invoice.objects.filter(
+            branch__business_id=self.business_id, invoice_date__gte=self.start_date, invoice_date__lte=self.end_date,
+        ).exclude(status__in=EXCLUDED_INVOICE_STATUSES)
+
+    def _invoices(self, rows):
+        rows = rows.order_by('pk').values_list(
+            'pk', 'invoice_number', 'invoice_date', 'customer__business_name', 'customer__tax_number',
+            'subtotal', 'discount_amount', 'tax_amount', 'tax_mode', 'tax_rate',
+        )
+        for pk, number, day, customer, pin, subtotal, discount, vat, tax_mode, rate in rows.iterator(chunk_size=CHUNK_SIZE):
+            taxable = _money(subtotal) - _money(discount)
+            rate = self.resolve_rate(rate if tax_mode == 'on_total' else None, taxable, vat)
+            yield VatDocument('invoice', OUTPUT, pk, number, day, customer, pin, rate, taxable, _money(vat))
+
+    def _credit_note_rows(self):
+        return CreditNote.objects.filter(
+            branch__business_id=self.business_id, credit_note_date__gte=self.start_date,
+            credit_note_date__lte=self.end_date, status__in=('issued', 'applied'),
+        )
+
+    def _credit_notes(self, rows):
+        rows = rows.order_by('pk').values_list(
+            'pk', 'credit_note_number', 'credit_note_date', 'customer__business_name', 'customer__tax_number',
+            'subtotal', 'discount_amount', 'tax_amount', 'tax_mode', 'tax_rate',
+        )
+        for pk, number, day, customer, pin, subtotal, discount, vat, tax_mode, rate in rows.iterator(chunk_size=CHUNK_SIZE):
+            taxable = _money(subtotal) - _money(discount)
+            rate = self.resolve_rate(rate if tax_mode == 'on_total' else None, taxable, vat)
+            yield VatDocument('credit_note', OUTPUT, pk, number, day, customer, pin, rate, -taxable, -_money(vat))
+
+    def _pos_sale_rows(self):
+        return salesItems.objects.filter(
+            sale__register__branch__business_id=self.business_id, sale__date_added__gte=self.start_at,
+            sale__date_added__lt=self.end_at, sale__status='Final', sale__delete_status=False,
+        )
+
+    def _pos_sales(self, rows):
+        rows = rows.order_by('pk').values_list(
+            'pk', 'sale__sale_id', 'sale__date_added', 'sale__customer__business_name', 'sale__customer__tax_number',
+            'sub_total', 'discount_amount', 'tax_amount', 'stock_item__applicable_tax__percentage',
+        )
+        for pk, number, added, customer, pin, subtotal, discount, vat, rate in rows.iterator(chunk_size=CHUNK_SIZE):
+            taxable = _money(subtotal) - _money(discount)
+            yield VatDocument(
+                'pos_sale', OUTPUT, pk, number, timezone.localtime(added).date(), customer, pin,
+                self.resolve_rate(rate, taxable, vat), taxable, _money(vat),
+            )
+
+    def _purchase_rows(self):
+        return Purchase.objects.filter(
+            branch__business_id=self.business_id, date_added__gte=self.start_at, date_added__lt=self.end_at,
+            purchase_status='received', delete_status=False,
+        )
+
+    def _purchases(self, rows):
+        rows = rows.order_by('pk').values_list(
+            'pk', 'purchase_id', 'date_added', 'supplier__business_name', 'supplier__tax_number', 'sub_total', 'purchase_tax',
+        )
+        for pk, number, added, supplier, pin, subtotal, rate in rows.iterator(chunk_size=CHUNK_SIZE):
+            taxable = _money(subtotal)
+            # purchase_tax is a percentage on the subtotal (Purchase.update_totals)
+            yield VatDocument(
+                'purchase', INPUT, pk, number, timezone.localtime(added).date(), supplier, pin,
+                self.resolve_rate(rate), taxable, _money(taxable * Decimal(rate or 0) / 100),
+            )
+
+    def _expense_rows(self):
+        return Expense.objects.filter(
+            branch__business_id=self.business_id, date_added__gte=self.start_date, date_added__lte=self.end_date,
+            applicable_tax__isnull=False, is_refund=False,
+        )
+
+    def _expenses(self, rows):
+        rows = rows.order_by('pk').values_list(
+            'pk', 'reference_no', 'date_added', 'expense_for_contact__business_name', 'expense_for_contact__tax_number',
+            'total_amount', 'applicable_tax__percentage',
+        )
+        for pk, number, day, contact, pin, total, rate in rows.iterator(chunk_size=CHUNK_SIZE):
+            # Expense totals are recorded VAT-inclusive
+            rate = self.resolve_rate(rate)
+            vat = _money(Decimal(total) * rate / (100 + rate))
+            yield VatDocument('expense', INPUT, pk, number, day, contact, pin, rate, _money(total) - vat, vat)
+
+    def documents(self, counted=None):
+        """
+        Stream every VAT document of the period, source by source. With counted
+        (source -> ids already counted), only the other documents are read.
+        """
+        streams = {
+            'invoice': (self._invoice_rows, self._invoices),
+            'credit_note': (self._credit_note_rows, self._credit_notes),
+            'pos_sale': (self._pos_sale_rows, self._pos_sales),
+            'purchase': (self._purchase_rows, self._purchases),
+            'expense': (self._expense_rows, self._expenses),
+        }
+        for source in SOURCES:
+            rows, read = streams[source]
+            rows = rows()
+            if counted is None:
+                yield from read(rows)
+                continue
+            # Ids are cheap to list; only documents missing from the last run are read in full
+            pending = sorted(set(rows.values_list('pk', flat=True)) - set(counted.get(source, ())))
+            for start in range(0, len(pending), CHUNK_SIZE):
+                yield from read(rows.filter(pk__in=pending[start:start + CHUNK_SIZE]))
+
+    def compute(self, previous=None):
+        """
+        Fold the period's documents into a breakdown. With previous (a stored
+        vat_breakdown), only documents it has not counted yet are added.
+        """
+        buckets, sources = {}, {source: {'ids': [], 'documents': 0} for source in SOURCES}
+        if previous and any('ids' not in state for state in previous.get('sources', {}).values()):
+            # Breakdowns stored before ids were tracked cannot be extended safely
+            previous = None
+        if previous:
+            for row in previous.get('rates', []):
+                buckets[(row['direction'], row['rate'], row['tax_group'])] = {
+                    **row, 'taxable': Decimal(row['taxable']), 'vat': Decimal(row['vat']),
+                }
+            for source, state in previous.get('sources', {}).items():
+                sources[source] = {**state, 'ids': list(state['ids'])}
+
+        counted = {source: state['ids'] for source, state in sources.items()} if previous else None
+        for document in self.documents(counted):
+            rate = self._rate_key(document.rate)
+            group_id, group_name = self.groups.get(rate, (None, None))
+            key = (document.direction, rate, group_id)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {
+                    'direction': document.direction, 'rate': rate, 'tax_group': group_id,
+                    'tax_group_name': group_name, 'taxable': ZERO, 'vat': ZERO, 'documents': 0,
+                }
+            bucket['taxable'] += document.taxable
+            bucket['vat'] += document.vat
+            bucket['documents'] += 1
+            state = sources[document.source]
+            state['ids'].append(document.document_id)
+            state['documents'] += 1
+
+        for state in sources.values():
+            state['ids'].sort()
+
+        rates = sorted(buckets.values(), key=lambda row: (row['direction'] != OUTPUT, -Decimal(row['rate'])))
+        output_vat = sum((row['vat'] for row in rates if row['direction'] == OUTPUT), ZERO)
+        input_vat = sum((row['vat'] for row in rates if row['direction'] == INPUT), ZERO)
+        return {
+            'rates': [{**row, 'taxable': str(row['taxable']), 'vat': str(row['vat'])} for row in rates],
+            'sources': sources,
+            'output_vat': str(output_vat),
+            'input_vat': str(input_vat),
+            'net_vat': str(output_vat - input_vat),
+        }
+
+    def recalculate(self, incremental=False):
+        """Compute and store the breakdown and totals on the period; returns the breakdown"""
+        with transaction.atomic():
+            period = TaxPeriod.objects.select_for_update().get(pk=self.period.pk)
+            breakdown = self.compute(period.vat_breakdown if incremental and period.vat_breakdown else None)
+            period.vat_breakdown = breakdown
+            period.total_collected = Decimal(breakdown['output_vat'])
+            period.total_paid = Decimal(breakdown['input_vat'])
+            period.vat_computed_at = timezone.now()
+            period.save(update_fields=['vat_breakdown', 'total_collected', 'total_paid', 'vat_computed_at', 'updated_at'])
+        self.period = period
+        logger.info(
+            f"VAT for period {period.pk} ({'incremental' if incremental else 'full'}): "
+            f"output {breakdown['output_vat']}, input {breakdown['input_vat']}"
+        )
+        return breakdown
+
+    def filing_rows(self):
+        """One flat row per document, ready for the VAT return export"""
+        for document in self.documents():
+            yield {
+                'Direction': document.direction,
+                'Source': document.source,
+                'Document': document.number,
+                'Date': document.date,
+                'Counterparty': document.counterparty or '',
+                'PIN': document.counterparty_pin or '',
+                'Rate (%)': document.rate,
+                'Taxable Amount': document.taxable,
+                'VAT': document.vat,
+            }
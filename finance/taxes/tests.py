@@ -1,3 +1,104 @@
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from business.models import Branch, BusinessLocation, Bussiness, TaxRates
+from crm.contacts.models import Contact
+from finance.expenses.models import Expense, ExpenseCategory
+from finance.invoicing.models import CreditNote, Invoice
+from finance.taxes.models import Tax, TaxCategory, TaxGroup, TaxGroupItem, TaxPeriod
+from finance.taxes.services.vat import VatEngine
+from procurement.purchases.models import Purchase
+
+User = get_user_model()
+
+
+class VatEngineTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='vat', email='vat@example.com', password='pass')
+        location = BusinessLocation.objects.create(city='Nairobi')
+        self.business = Bussiness.objects.create(name='VAT Biz', owner=user, location=location)
+        self.branch = Branch.objects.create(name='HQ', business=self.business, location=location, branch_code='VAT01')
+        self.customer = Contact.objects.create(contact_id='C1', user=user, business_name='Acme', tax_number='P051')
+        self.standard = TaxRates.objects.create(business=self.business, tax_number='VAT16', percentage=Decimal('16'))
+        TaxRates.objects.create(business=self.business, tax_number='VAT8', percentage=Decimal('8'))
+        category = TaxCategory.objects.create(name='VAT', business=self.business)
+        vat = Tax.objects.create(name='VAT 16%', category=category, business=self.business, rate=Decimal('16'), is_vat=True)
+        self.group = TaxGroup.objects.create(name='Standard rated', business=self.business)
+        TaxGroupItem.objects.create(tax_group=self.group, tax=vat)
+        self.period = TaxPeriod.objects.create(
+            business=self.business, name='Jan 2026', period_type='monthly',
+            start_date=date(2026, 1, 1), end_date=date(2026, 1, 31), due_date=date(2026, 2, 20),
+        )
+
+    def invoice(self, day, subtotal, tax, status='sent', **fields):
+        return Invoice.objects.create(
+            branch=self.branch, customer=self.customer, invoice_date=day, status=status,
+            subtotal=subtotal, tax_amount=tax, total=subtotal + tax, **fields,
+        )
+
+    def test_breakdown_by_rate_and_direction(self):
+        on_total = self.invoice(date(2026, 1, 5), Decimal('1000'), Decimal('160'), tax_mode='on_total', tax_rate=Decimal('16'))
+        self.invoice(date(2026, 1, 6), Decimal('500'), Decimal('40.01'))  # line items, derived rate snaps to 8%
+        self.invoice(date(2026, 1, 7), Decimal('900'), Decimal('144'), status='cancelled')
+        self.invoice(date(2026, 2, 1), Decimal('900'), Decimal('144'))
+        CreditNote.objects.create(
+            branch=self.branch, customer=self.customer, source_invoice=on_total, credit_note_date=date(2026, 1, 9),
+            status='issued', subtotal=Decimal('100'), tax_amount=Decimal('16'), reason='Return',
+        )
+        purchase = Purchase.objects.create(
+            branch=self.branch, purchase_id='PO-1', purchase_status='received',
+            sub_total=Decimal('300'), purchase_tax=Decimal('16'), grand_total=Decimal('348'),
+        )
+        Purchase.objects.filter(pk=purchase.pk).update(date_added=datetime(2026, 1, 8, 10, tzinfo=dt_timezone.utc))
+        Expense.objects.create(
+            branch=self.branch, category=ExpenseCategory.objects.create(name='Fuel'), reference_no='EXP-1',
+            date_added=date(2026, 1, 10), applicable_tax=self.standard, total_amount=Decimal('116'),
+        )
+
+        breakdown = VatEngine(self.period).recalculate()
+        rates = {(row['direction'], row['rate']): row for row in breakdown['rates']}
+        self.assertEqual(rates[('output', '16.00')]['vat'], '144.00')
+        self.assertEqual(rates[('output', '16.00')]['tax_group'], self.group.id)
+        self.assertEqual(rates[('output', '8.00')]['vat'], '40.01')
+        self.assertEqual((rates[('input', '16.00')]['vat'], rates[('input', '16.00')]['documents']), ('64.00', 2))
+        self.period.refresh_from_db()
+        self.assertEqual((self.period.total_collected, self.period.total_paid), (Decimal('184.01'), Decimal('64.00')))
+
+        rows = list(VatEngine(self.period).filing_rows())
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['PIN'], 'P051')
+
+    def test_incremental_run_adds_only_new_documents(self):
+        self.invoice(date(2026, 1, 5), Decimal('1000'), Decimal('160'))
+        VatEngine(self.period).recalculate()
+        self.invoice(date(2026, 1, 20), Decimal('250'), Decimal('40'))
+
+        with self.assertNumQueries(13):
+            breakdown = VatEngine(self.period).recalculate(incremental=True)
+        self.assertEqual(breakdown['output_vat'], '200.00')
+        self.assertEqual(breakdown['sources']['invoice']['documents'], 2)
+        self.assertEqual(breakdown, VatEngine(self.period).compute())
+
+    def test_incremental_run_counts_late_finalised_documents(self):
+        draft = self.invoice(date(2026, 1, 3), Decimal('500'), Decimal('80'), status='draft')
+        self.invoice(date(2026, 1, 5), Decimal('1000'), Decimal('160'))
+        VatEngine(self.period).recalculate()
+        Invoice.objects.filter(pk=draft.pk).update(status='sent')
+
+        breakdown = VatEngine(self.period).recalculate(incremental=True)
+        self.assertEqual(breakdown['output_vat'], '240.00')
+        self.assertEqual(breakdown['sources']['invoice']['documents'], 2)
+        self.assertEqual(breakdown, VatEngine(self.period).compute())
+
+    def test_api_output_omits_counted_document_ids(self):
+        from finance.taxes.serializers import TaxPeriodSerializer
+        self.invoice(date(2026, 1, 5), Decimal('1000'), Decimal('160'))
+        VatEngine(self.period).recalculate()
+        self.period.refresh_from_db()
+
+        sources = TaxPeriodSerializer(self.period).data['vat_breakdown']['sources']
+        self.assertEqual(sources['invoice'], {'documents': 1})
+        self.assertEqual(len(self.period.vat_breakdown['sources']['invoice']['ids']), 1)
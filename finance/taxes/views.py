@@ -13,6 +13,8 @@ from .serializers import TaxCategorySerializer, TaxSerializer, TaxGroupSerialize
 from core.base_viewsets import BaseModelViewSet
 from core.response import APIResponse, get_correlation_id
 from core.audit import AuditTrail
+from core.modules.report_export import export_report_to_csv
+from .services.vat import VatEngine
 import logging
 
 logger = logging.getLogger(__name__)
@@ -227,27 +229,33 @@ class TaxPeriodViewSet(BaseModelViewSet):
     
     @action(detail=True, methods=['post'])
     def calculate_totals(self, request, pk=None):
-        """Calculate total taxes collected and paid for this period"""
+        """
+        Compute VAT collected and paid for this period from invoices, credit notes,
+        POS sales, purchases and expenses. ?incremental=true only folds in documents
+        not counted by the last computation.
+        """
         try:
             correlation_id = get_correlation_id(request)
             tax_period = self.get_object()
-            
-            # Here you would normally implement logic to calculate taxes
-            # from invoices, expenses, and other financial records
-            # For demonstration, we'll just update with the provided values
-            
-            collected = request.data.get('total_collected')
-            paid = request.data.get('total_paid')
-            
-            if collected is not None:
-                tax_period.total_collected = collected
-                
-            if paid is not None:
-                tax_period.total_paid = paid
-                
-            tax_period.save()
-            
-            serializer = self.get_serializer(tax_period)
+            if tax_period.status in ('filed', 'paid'):
+                return APIResponse.bad_request(
+                    message=f'Cannot recalculate a {tax_period.status} tax period',
+                    error_id='tax_period_locked',
+                    correlation_id=correlation_id
+                )
+
+            incremental = str(request.query_params.get('incremental', request.data.get('incremental', ''))).lower() in ('1', 'true', 'yes')
+            previous = {'total_collected': str(tax_period.total_collected), 'total_paid': str(tax_period.total_paid)}
+            engine = VatEngine(tax_period)
+            breakdown = engine.recalculate(incremental=incremental)
+            AuditTrail.log(
+                operation=AuditTrail.UPDATE, module='finance', entity_type='TaxPeriod', entity_id=tax_period.id,
+                user=request.user, changes={'before': previous, 'after': {
+                    'total_collected': breakdown['output_vat'], 'total_paid': breakdown['input_vat'],
+                }}, reason='VAT totals calculated', request=request
+            )
+
+            serializer = self.get_serializer(engine.period)
             return APIResponse.success(
                 data=serializer.data,
                 message='Tax period totals calculated successfully',
@@ -261,6 +269,31 @@ class TaxPeriodViewSet(BaseModelViewSet):
                 correlation_id=get_correlation_id(request)
             )
 
+    @action(detail=True, methods=['get'], url_path='vat-return')
+    def vat_return(self, request, pk=None):
+        """Stream the period's VAT return dataset (one row per document) as CSV"""
+        try:
+            tax_period = self.get_object()
+            engine = VatEngine(tax_period)
+            summary = tax_period.vat_breakdown or {}
+            return export_report_to_csv(
+                engine.filing_rows(),
+                filename=f'vat_return_{tax_period.start_date}_{tax_period.end_date}.csv',
+                include_summary=bool(summary),
+                summary_data={
+                    'Output VAT': summary.get('output_vat'),
+                    'Input VAT': summary.get('input_vat'),
+                    'Net VAT': summary.get('net_vat'),
+                } if summary else None,
+            )
+        except Exception as e:
+            logger.error(f'Error exporting VAT return: {str(e)}', exc_info=True)
+            return APIResponse.server_error(
+                message='Error exporting VAT return',
+                error_id=str(e),
+                correlation_id=get_correlation_id(request)
+            )
+
     @action(detail=True, methods=['post'])
     def file_vat(self, request, pk=None):
         """Mark VAT filed for this period with a KRA reference and timestamp."""
@@ -7,7 +7,8 @@ from .services.reports_views import (
     profit_and_loss_report,
     balance_sheet_report,
     cash_flow_report,
-    financial_statements_suite
+    financial_statements_suite,
+    receivables_aging_report
 )
 
 urlpatterns = [
@@ -21,6 +22,7 @@ urlpatterns = [
     path('reports/balance-sheet/', balance_sheet_report, name='finance-balance-sheet'),
     path('reports/cash-flow/', cash_flow_report, name='finance-cash-flow'),
     path('reports/statements-suite/', financial_statements_suite, name='finance-statements-suite'),
+    path('reports/receivables-aging/', receivables_aging_report, name='finance-receivables-aging'),
     
     # Include submodule URLs
     path('accounts/', include('finance.accounts.urls')),
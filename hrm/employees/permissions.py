@@ -5,6 +5,8 @@ Implements row-level security for staff users.
 from rest_framework import permissions
 from django.db.models import Q
 
+from core.rbac import user_can
+
 
 class IsOwnerOrElevated(permissions.BasePermission):
     """
@@ -22,11 +24,8 @@ class IsOwnerOrElevated(permissions.BasePermission):
             return True
         
         # Users with change or delete permissions can access all records
-        model_name = obj.__class__.__name__.lower()
-        app_label = obj._meta.app_label
-        
-        has_change = request.user.has_perm(f'{app_label}.change_{model_name}')
-        has_delete = request.user.has_perm(f'{app_label}.delete_{model_name}')
+        has_change = user_can(request.user, obj, 'change')
+        has_delete = user_can(request.user, obj, 'delete')
         
         if has_change or has_delete:
             return True
@@ -66,13 +65,11 @@ class CanViewSensitiveModule(permissions.BasePermission):
             return True  # Allow if no queryset defined
         
         model = view.queryset.model
-        model_name = model.__name__.lower()
-        app_label = model._meta.app_label
         
         # Check for elevated permissions
-        has_change = request.user.has_perm(f'{app_label}.change_{model_name}')
-        has_delete = request.user.has_perm(f'{app_label}.delete_{model_name}')
-        has_add = request.user.has_perm(f'{app_label}.add_{model_name}')
+        has_change = user_can(request.user, model, 'change')
+        has_delete = user_can(request.user, model, 'delete')
+        has_add = user_can(request.user, model, 'add')
         
         # If user has change or delete permission, grant access
         if has_change or has_delete:
@@ -124,12 +121,10 @@ class StaffDataFilterMixin:
         
         # Get model info
         model = queryset.model
-        model_name = model.__name__.lower()
-        app_label = model._meta.app_label
         
         # Check for elevated permissions
-        has_change = user.has_perm(f'{app_label}.change_{model_name}')
-        has_delete = user.has_perm(f'{app_label}.delete_{model_name}')
+        has_change = user_can(user, model, 'change')
+        has_delete = user_can(user, model, 'delete')
         
         # Users with change or delete permissions see all records
         if has_change or has_delete:
@@ -0,0 +1,431 @@
+"""
+Bulk employee import engine.
+
+Runs on the shared streaming import framework (core.modules.data_import):
+each chunk of the roster is validated column-wise with pandas, every lookup
+table (groups, banks, bank branches, regions, departments, job titles) is
+resolved with one query per table, and rows are written with
+bulk_create/bulk_update instead of a chain of update_or_create calls per row. Password hashing and
+welcome emails for new accounts are left to a separate post-step
+(see hrm.employees.tasks.finalize_imported_accounts).
+"""
+import logging
+from datetime import datetime
+from decimal import Decimal
+from itertools import count
+
+import numpy as np
+import pandas as pd
+from celery import group
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from authmanagement.backends import revoke_user_tokens_on_commit
+from authmanagement.models import CustomUser
+from business.models import Branch
+from core.models import BankBranches, BankInstitution, Departments, Regions
+from core.modules.data_import import (
+    EMAIL_PATTERN, ChunkedImporter, resolve_lookup, unique_usernames, upsert_one_per_parent,
+)
+from core.rbac import bump_version
+from hrm.attendance.models import WorkShift
+from hrm.employees.models import (
+    ContactDetails, Contract, Employee, EmployeeBankAccount, HRDetails, JobTitle, NextOfKin, SalaryDetails,
+)
+from hrm.employees.utils import EmployeeDataImport
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = 500
+DEFAULT_PASSWORD = "ChangeMe123!"
+ACCOUNT_BATCH_SIZE = 50
+WORKING_DAYS_IN_MONTH = 22
+WORK_HOURS = 8
+
+ROSTER_COLUMNS = (
+    'Name', 'Email', 'Email(Personal)', 'ID', 'PIN', 'NHIF', 'NSSF', 'Phone', 'Gender', 'Date of Birth',
+    'Emp. Date', 'Emp. Duration', 'Contract Exp.(Days)', 'Basic Pay', 'Bank', 'Bank Code', 'Bank Branch',
+    'Bank Acc', 'Type', 'Dept.', 'Region', 'Job Title', 'Staff No',
+)
+
+# is_staff/is_active are only set on new accounts; existing ones keep their flags
+USER_UPDATE_FIELDS = ['first_name', 'middle_name', 'last_name']
+EMPLOYEE_UPDATE_FIELDS = [
+    'organisation', 'gender', 'date_of_birth', 'residential_status', 'national_id',
+    'pin_no', 'shif_or_nhif_number', 'nssf_no', 'allow_ess',
+]
+BANK_ACCOUNT_UPDATE_FIELDS = ['bank_branch', 'account_name', 'account_type', 'is_primary', 'status', 'is_verified']
+
+
+class EmployeeBulkImport(ChunkedImporter, EmployeeDataImport):
+    """
+    Chunked, bulk-upserting replacement for EmployeeDataImport.import_employee_data.
+
+    run() returns a report with per-row errors instead of aborting on the first
+    bad row; valid rows are still imported.
+    """
+    columns = {column: [] for column in ROSTER_COLUMNS}
+    required_columns = ('Name',)
+    chunk_size = IMPORT_CHUNK_SIZE
+
+    def __init__(self, path, business, user=None, **kwargs):
+        ChunkedImporter.__init__(self, path, business, user=user, **kwargs)
+        self.organisation = business
+        self.request = None
+        self.new_user_ids = []
+        self._seen = {'email': set(), 'personal_email': set(), 'national_id': set()}
+        self.work_shift = None
+        self.main_branch = None
+
+    # ------------------------------------------------------------------ #
+    # Validation / normalisation
+    # ------------------------------------------------------------------ #
+    def _duplicated(self, values, key):
+        """Duplicates within this chunk or of a value seen in an earlier chunk"""
+        return values.duplicated() | values.isin(self._seen[key])
+
+    def _contract_end(self, emp_date, start, duration, days):
+        """Emp. Date + Emp. Duration (years/months, clamped to month end), else start + Contract Exp.(Days)"""
+        extracted = duration.str.extract(r'^(?:(\d+)\s*y)?\s*(?:(\d+)\s*m)?')
+        years = pd.to_numeric(extracted[0], errors='coerce').fillna(0).astype(int)
+        months = pd.to_numeric(extracted[1], errors='coerce').fillna(0).astype(int)
+        total_months = start.dt.year * 12 + start.dt.month - 1 + years * 12 + months
+        month_start = pd.to_datetime(pd.DataFrame({'year': total_months // 12, 'month': total_months % 12 + 1, 'day': 1}))
+        day = np.minimum(start.dt.day, month_start.dt.days_in_month)
+        by_duration = month_start + pd.to_timedelta(day - 1, unit='D')
+        by_days = start + pd.to_timedelta(days, unit='D')
+        return by_duration.where(emp_date.notna() & ((years + months) > 0), by_days)
+
+    def prepare(self, df):
+        """Normalise one roster chunk into import-ready columns and record per-row errors"""
+        frame = pd.DataFrame({'row': df['row']}, index=df.index)
+
+        name = self.text(df, 'Name')
+        parts = name.str.split()
+        part_count = parts.str.len().fillna(0)
+        frame['first_name'] = parts.str[0].fillna('')
+        frame['middle_name'] = parts.str[1].where(part_count >= 3).fillna('')
+        frame['last_name'] = parts.str[2].where(part_count >= 3, parts.str[1]).fillna('')
+
+        email = self.text(df, 'Email').str.lower()
+        frame['email'] = email.mask(email == '', name.str.lower().str.replace(r'\s+', '', regex=True) + '@example.com')
+        personal_email = self.text(df, 'Email(Personal)').str.lower()
+        frame['personal_email'] = personal_email.mask(personal_email == '', frame['email'])
+
+        pin = self.text(df, 'PIN')
+        national_id = self.text(df, 'ID')
+        frame['national_id'] = national_id.mask(national_id == '', pin)
+        frame['pin_no'] = pin
+        frame['nhif'] = self.text(df, 'NHIF', 'N/A')
+        frame['nssf'] = self.text(df, 'NSSF', 'N/A')
+        gender = self.text(df, 'Gender', 'other').str.lower()
+        frame['gender'] = gender.where(gender.isin(['male', 'female', 'other']), 'other')
+
+        now = pd.Timestamp(datetime.now()).normalize()
+        dob = pd.to_datetime(self.text(df, 'Date of Birth'), errors='coerce')
+        frame['date_of_birth'] = dob.fillna(now - pd.Timedelta(days=24 * 365)).dt.date
+
+        emp_date = pd.to_datetime(self.text(df, 'Emp. Date'), format='%d/%m/%Y', errors='coerce')
+        start = emp_date.fillna(now)
+        exp_days = pd.to_numeric(self.text(df, 'Contract Exp.(Days)', '0'), errors='coerce').fillna(0).astype(int)
+        duration = self.text(df, 'Emp. Duration', '3m').str.lower()
+        end = self._contract_end(emp_date, start, duration, exp_days)
+        frame['contract_start'] = start.dt.date
+        frame['contract_end'] = end.dt.date
+        frame['contract_duration'] = (end - start).dt.days
+        frame['contract_status'] = np.where(end > pd.Timestamp(datetime.now()), 'active', 'expired')
+
+        frame['basic_pay'] = pd.to_numeric(
+            self.text(df, 'Basic Pay', '0').str.replace(',', ''), errors='coerce'
+        ).fillna(0.0).round(2)
+        types = self.text(df, 'Type')
+        frame['employment_type'] = types.map({value: self.map_employment_type(value) for value in types.unique()})
+
+        digits = self.text(df, 'Phone', '+254700000001').str.replace(r'\D', '', regex=True)
+        digits = digits.mask(digits.str.startswith('0'), '254' + digits.str[1:])
+        digits = digits.mask(~digits.str.startswith('254'), '254' + digits)
+        frame['phone'] = '+' + digits
+
+        frame['staff_no'] = self.text(df, 'Staff No').str.replace(r'[^\w\s]', '', regex=True)
+        frame['job_title'] = self.text(df, 'Job Title', 'Staff')
+        frame['role_group'] = frame['job_title'].map(
+            {title: self.map_role_group_by_job_title(title) for title in frame['job_title'].unique()}
+        )
+        frame['department'] = self.text(df, 'Dept.', 'General')
+        frame['region'] = self.text(df, 'Region', 'Head Office')
+
+        bank_name = self.text(df, 'Bank')
+        bank_code = self.text(df, 'Bank Code')
+        sequence = (df['row'] - 1).astype(str)
+        derived = bank_code.str[:3].str.upper()
+        derived = derived.mask(derived == '', bank_name.str.replace(r'[^A-Za-z0-9]', '', regex=True).str[:3].str.upper())
+        frame['bank_code'] = derived.mask(derived == '', 'BNK' + sequence.str.zfill(3))
+        frame['bank_name'] = bank_name.mask(bank_name == '', 'Bank ' + frame['bank_code'])
+        frame['bank_swift'] = bank_name.str[:4].mask(bank_name == '', frame['bank_code'].str[:4]).str.upper() + 'KENA'
+        frame['bank_email_domain'] = bank_name.str.lower().str.replace(' ', '', regex=False).mask(bank_name == '', 'bank')
+        frame['branch_code'] = bank_code.str[-2:].mask(bank_code.str.len() < 2, sequence.str.zfill(2))
+        frame['branch_name'] = self.text(df, 'Bank Branch', 'Main')
+        frame['account_number'] = self.text(df, 'Bank Acc').str.replace(r'\D', '', regex=True)
+
+        checks = [
+            ((frame['first_name'] == '') | (frame['last_name'] == ''), 'Name', 'Name must include a first and last name'),
+            (~frame['email'].str.match(EMAIL_PATTERN), 'Email', 'Invalid email address'),
+            (self._duplicated(frame['email'], 'email'), 'Email', 'Duplicate email in file'),
+            (~frame['personal_email'].str.match(EMAIL_PATTERN), 'Email(Personal)', 'Invalid personal email address'),
+            (self._duplicated(frame['personal_email'], 'personal_email'), 'Email(Personal)', 'Duplicate personal email in file'),
+            (frame['national_id'] == '', 'ID', 'National ID (or PIN) is required'),
+            (self._duplicated(frame['national_id'], 'national_id') & (frame['national_id'] != ''), 'ID', 'Duplicate national ID in file'),
+            (digits.str.len() != 12, 'Phone', 'Invalid phone number'),
+            (frame['employment_type'].isna(), 'Type', 'Missing or unrecognised employment type'),
+        ]
+        invalid = pd.Series(False, index=frame.index)
+        for mask, column, message in checks:
+            self.flag(frame, mask, column, message)
+            invalid |= mask
+        for key in self._seen:
+            self._seen[key].update(frame[key])
+
+        invalid |= self._check_existing(frame[~invalid])
+        return frame[~invalid]
+
+    def _check_existing(self, frame):
+        """Reject rows whose national ID or personal email already belongs to another user"""
+        invalid = pd.Series(False, index=frame.index)
+        owners = dict(
+            Employee.objects.filter(national_id__in=frame['national_id'].unique().tolist())
+            .values_list('national_id', Lower('user__email'))
+        )
+        mask = frame['national_id'].map(owners).notna() & (frame['national_id'].map(owners) != frame['email'])
+        self.flag(frame, mask, 'ID', 'National ID already belongs to another employee')
+        invalid |= mask
+
+        owners = dict(
+            ContactDetails.objects.filter(personal_email__in=frame['personal_email'].unique().tolist())
+            .values_list('personal_email', Lower('employee__user__email'))
+        )
+        mask = frame['personal_email'].map(owners).notna() & (frame['personal_email'].map(owners) != frame['email'])
+        self.flag(frame, mask, 'Email(Personal)', 'Personal email already belongs to another employee')
+        return invalid | mask
+
+    @staticmethod
+    def _free_codes(model):
+        """'00n' codes not yet taken in the table (row counts repeat codes once rows are deleted); queried on first use"""
+        taken = set(model.objects.values_list('code', flat=True))
+        for n in count(1):
+            if f"00{n}" not in taken:
+                yield f"00{n}"
+
+    # Lookups: one query per table per chunk, missing values created in bulk
+    def resolve_lookups(self, frame):
+        group_names = set(frame['role_group']) | {'staff', 'Staff'}
+        self.groups = resolve_lookup(Group, 'name', group_names, lambda name: Group(name=name))
+
+        region_codes = self._free_codes(Regions)
+        self.regions = resolve_lookup(
+            Regions, 'name', frame['region'], lambda name: Regions(name=name, code=next(region_codes))
+        )
+        department_codes = self._free_codes(Departments)
+        self.departments = resolve_lookup(
+            Departments, 'title', frame['department'],
+            lambda title: Departments(title=title, code=next(department_codes)),
+        )
+        self.job_titles = resolve_lookup(JobTitle, 'title', frame['job_title'], lambda title: JobTitle(title=title))
+
+        banks = frame.drop_duplicates('bank_code').set_index('bank_code')
+        self.banks = resolve_lookup(
+            BankInstitution, 'code', banks.index,
+            lambda code: BankInstitution(
+                code=code, short_code=code, name=banks.at[code, 'bank_name'],
+                swift_code=banks.at[code, 'bank_swift'], country='Kenya', is_active=True,
+            ),
+        )
+        self.bank_branches = self._resolve_bank_branches(frame)
+
+        if self.work_shift is None:
+            self.work_shift = WorkShift.objects.get_or_create(
+                name='Regular Shift', defaults={'grace_minutes': 15, 'total_hours_per_week': 40.00}
+            )[0]
+            branches = Branch.objects.filter(business=self.organisation)
+            self.main_branch = branches.filter(is_main_branch=True).first() or branches.order_by('id').first()
+
+    def _resolve_bank_branches(self, frame):
+        wanted = {}
+        for code, branch_code, name, domain in frame[['bank_code', 'branch_code', 'branch_name', 'bank_email_domain']].itertuples(index=False):
+            if code in self.banks:
+                wanted.setdefault((self.banks[code], branch_code), (name, domain))
+
+        def fetch(keys):
+            bank_ids = {bank_id for bank_id, _ in keys}
+            codes = {branch_code for _, branch_code in keys}
+            return {
+                (bank_id, code): pk for pk, bank_id, code in
+                BankBranches.objects.filter(bank_id__in=bank_ids, code__in=codes).values_list('pk', 'bank_id', 'code')
+                if (bank_id, code) in keys
+            }
+
+        found = fetch(set(wanted))
+        missing = [key for key in wanted if key not in found]
+        if missing:
+            BankBranches.objects.bulk_create([
+                BankBranches(
+                    bank_id=bank_id, code=code, name=wanted[(bank_id, code)][0], address="Nairobi CBD",
+                    phone="+254700000000", email=f"nairobi@{wanted[(bank_id, code)][1]}.com", is_active=True,
+                )
+                for bank_id, code in missing
+            ], ignore_conflicts=True)
+            found.update(fetch(set(missing)))
+        return found
+
+    # ------------------------------------------------------------------ #
+    # Chunk writers
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _set_salary_rates(salary):
+        """Mirror SalaryDetails.save() rate calculation for new rows"""
+        if salary.monthly_salary:
+            salary.daily_rate = round(salary.monthly_salary / WORKING_DAYS_IN_MONTH)
+        if salary.daily_rate and salary.work_hours > 0:
+            salary.hourly_rate = round(salary.daily_rate / salary.work_hours)
+
+    def write(self, frame):
+        """Upsert one chunk of validated rows"""
+        self.resolve_lookups(frame)
+        rows = frame.to_dict('records')
+        emails = [row['email'] for row in rows]
+        # Emails are lowercased in prepare; reuse the stored spelling so the upsert hits existing accounts
+        stored_emails = dict(
+            CustomUser.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails)
+            .values_list('email_lower', 'email')
+        )
+        existing_users = set(stored_emails)
+        usernames = unique_usernames([email for email in emails if email not in existing_users])
+        unusable_password = make_password(None)  # Real password is hashed by the post-step
+
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                email=stored_emails.get(row['email'], row['email']), username=usernames.get(row['email']),
+                first_name=row['first_name'], middle_name=row['middle_name'], last_name=row['last_name'],
+                is_staff=True, is_active=True, password=unusable_password,
+            )
+            for row in rows
+        ], update_conflicts=True, unique_fields=['email'], update_fields=USER_UPDATE_FIELDS)
+        user_ids = {
+            email.lower(): user_id for email, user_id in
+            CustomUser.objects.filter(email__in=[stored_emails.get(email, email) for email in emails])
+            .values_list('email', 'id')
+        }
+
+        existing_employees = set(Employee.objects.filter(user_id__in=user_ids.values()).values_list('user_id', flat=True))
+        Employee.objects.bulk_create([
+            Employee(
+                user_id=user_ids[row['email']], organisation=self.organisation, gender=row['gender'],
+                date_of_birth=row['date_of_birth'], residential_status='Resident', national_id=row['national_id'],
+                pin_no=row['pin_no'], shif_or_nhif_number=row['nhif'], nssf_no=row['nssf'], allow_ess=True,
+            )
+            for row in rows
+        ], update_conflicts=True, unique_fields=['user'], update_fields=EMPLOYEE_UPDATE_FIELDS)
+        employee_ids = dict(Employee.objects.filter(user_id__in=user_ids.values()).values_list('user_id', 'id'))
+        for row in rows:
+            row['employee_id'] = employee_ids[user_ids[row['email']]]
+        # Bulk writes skip the Employee post_save signals, so replay their effects here
+        Employee.objects.filter(
+            id__in=employee_ids.values(), allow_ess=True, ess_activated_at__isnull=True
+        ).update(ess_activated_at=timezone.now())
+
+        UserGroups = CustomUser.groups.through
+        links = []
+        for row in rows:
+            user_id = user_ids[row['email']]
+            names = {'staff', row['role_group']}
+            if user_id not in existing_employees:
+                names.add('Staff')
+            links += [UserGroups(customuser_id=user_id, group_id=self.groups[name]) for name in names]
+        UserGroups.objects.bulk_create(links, ignore_conflicts=True)
+        # Bulk writes skip m2m_changed and post_save too: retire the RBAC index and the cached principals
+        transaction.on_commit(bump_version)
+        revoke_user_tokens_on_commit(user_ids.values())
+
+        today = datetime.now().date()
+        EmployeeBankAccount.objects.filter(employee_id__in=employee_ids.values(), is_primary=True).update(is_primary=False)
+        EmployeeBankAccount.objects.bulk_create([
+            EmployeeBankAccount(
+                employee_id=row['employee_id'], bank_institution_id=self.banks[row['bank_code']],
+                bank_branch_id=self.bank_branches.get((self.banks[row['bank_code']], row['branch_code'])),
+                account_number=row['account_number'], account_name=f"{row['first_name']} {row['last_name']}",
+                account_type='savings', is_primary=True, status='active', is_verified=True, opened_date=today,
+            )
+            for row in rows
+        ], update_conflicts=True, unique_fields=['employee', 'account_number', 'bank_institution'],
+            update_fields=BANK_ACCOUNT_UPDATE_FIELDS)
+        accounts = {
+            (employee_id, bank_id, number): pk for pk, employee_id, bank_id, number in
+            EmployeeBankAccount.objects.filter(employee_id__in=employee_ids.values(), is_primary=True)
+            .values_list('pk', 'employee_id', 'bank_institution_id', 'account_number')
+        }
+
+        upsert_one_per_parent(SalaryDetails, 'employee_id', {
+            row['employee_id']: {
+                'employment_type': row['employment_type'], 'monthly_salary': Decimal(str(row['basic_pay'])),
+                'pay_type': 'gross', 'work_hours': WORK_HOURS, 'work_shift': self.work_shift,
+                'income_tax': 'primary', 'deduct_nssf': True, 'tax_excemption_amount': None, 'payment_type': 'bank',
+                'bank_account_id': accounts.get((row['employee_id'], self.banks[row['bank_code']], row['account_number'])),
+                'mobile_number': row['phone'],
+            }
+            for row in rows
+        }, on_create=self._set_salary_rates)
+        upsert_one_per_parent(HRDetails, 'employee_id', {
+            row['employee_id']: {
+                'job_or_staff_number': row['staff_no'], 'job_title_id': self.job_titles[row['job_title']],
+                'department_id': self.departments[row['department']], 'region_id': self.regions[row['region']],
+                'branch': self.main_branch, 'date_of_employment': row['contract_start'], 'board_director': False,
+            }
+            for row in rows
+        })
+        upsert_one_per_parent(Contract, 'employee_id', {
+            row['employee_id']: {
+                'status': row['contract_status'], 'contract_start_date': row['contract_start'],
+                'contract_end_date': row['contract_end'], 'salary': Decimal(str(row['basic_pay'])), 'pay_type': 'gross',
+                'contract_duration': Decimal(f"{row['contract_duration']:.2f}"),
+            }
+            for row in rows
+        })
+        upsert_one_per_parent(ContactDetails, 'employee_id', {
+            row['employee_id']: {
+                'personal_email': row['personal_email'], 'country': 'KE', 'county': row['region'],
+                'city': row['region'], 'zip': '00100', 'address': '1234 street',
+                'mobile_phone': row['phone'], 'official_phone': row['phone'],
+            }
+            for row in rows
+        })
+
+        with_kin = set(NextOfKin.objects.filter(employee_id__in=employee_ids.values()).values_list('employee_id', flat=True))
+        NextOfKin.objects.bulk_create([
+            NextOfKin(
+                employee_id=row['employee_id'], name=f"kin {row['row']}", relation='relation',
+                phone="+254700000001", email=f"kin{row['employee_id']}@example.com",
+            )
+            for row in rows if row['employee_id'] not in with_kin
+        ], ignore_conflicts=True)
+
+        self.new_user_ids += [user_ids[email] for email in emails if email not in existing_users]
+
+    def get_state(self):
+        return {'new_user_ids': self.new_user_ids, 'seen': {key: sorted(values) for key, values in self._seen.items()}}
+
+    def set_state(self, state):
+        self.new_user_ids = list(state.get('new_user_ids', []))
+        for key, values in state.get('seen', {}).items():
+            self._seen[key] = set(values)
+
+    def on_complete(self):
+        """Hash temporary passwords and send welcome emails for new accounts in parallel batches"""
+        from hrm.employees.tasks import finalize_imported_accounts
+
+        if self.new_user_ids:
+            group(
+                finalize_imported_accounts.s(self.new_user_ids[start:start + ACCOUNT_BATCH_SIZE])
+                for start in range(0, len(self.new_user_ids), ACCOUNT_BATCH_SIZE)
+            ).apply_async()
@@ -0,0 +1,38 @@
+"""
+Background tasks for employee data
+"""
+import logging
+
+from celery import shared_task
+
+from authmanagement.models import CustomUser
+from .models import Employee
+from .services.employee_import import DEFAULT_PASSWORD
+from .services.ess_utils import send_welcome_email
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def finalize_imported_accounts(user_ids):
+    """
+    Post-import step for newly created accounts: set the temporary password,
+    force a password change on first login and send the welcome email.
+    Runs as a group of small batches so hashing and mail delivery fan out
+    across workers instead of blocking the import.
+    """
+    users = list(CustomUser.objects.filter(id__in=user_ids))
+    for user in users:
+        user.set_password(DEFAULT_PASSWORD)
+        if not user.is_superuser:
+            user.must_change_password = True
+    CustomUser.objects.bulk_update(users, ['password', 'must_change_password'])
+
+    sent = 0
+    for employee in Employee.objects.filter(user_id__in=user_ids).select_related('user', 'organisation'):
+        try:
+            if send_welcome_email(employee, DEFAULT_PASSWORD):
+                sent += 1
+        except Exception as e:
+            logger.error(f"Error sending welcome email to {employee.user.email}: {e}")
+    return {'accounts': len(users), 'emails_sent': sent}
@@ -1,6 +1,7 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+import json
 from decimal import Decimal
 from datetime import date, datetime
 from unittest.mock import patch, MagicMock
@@ -319,3 +320,153 @@ class EmployeePayrollIntegrationTestCase(TestCase):
         if salary_details:
             self.assertEqual(salary_details.employee, self.employee)
             self.assertEqual(salary_details.employee.user, self.user)
+
+
+class EmployeeBulkImportTestCase(TestCase):
+    """Test cases for the bulk employee import engine."""
+
+    HEADER = "Name,Email,Email(Personal),ID,PIN,NHIF,NSSF,Phone,Gender,Date of Birth,Emp. Date,Emp. Duration,Contract Exp.(Days),Basic Pay,Bank,Bank Code,Bank Branch,Bank Acc,Type,Dept.,Region,Job Title,Staff No\n"
+    ROWS = [
+        "Jane Wanjiru Doe,jane@example.com,,12345678,A001,N1,S1,0712345678,Female,1990-01-15,15/01/2024,1y6m,0,\"60,000\",KCB,01123,Moi Avenue,1100223344,Regular (Fixed Term),Finance,Nairobi,Accountant,EMP-001\n",
+        "John Otieno,john@example.com,,87654321,A002,N2,S2,+254722000111,Male,1988-05-02,31/01/2024,1m,0,45000,KCB,01123,Moi Avenue,5566778899,Casual,Finance,Nairobi,HR Manager,EMP-002\n",
+        "Bad Phone,bad@example.com,,11112222,A003,N3,S3,12,Male,1988-05-02,01/02/2024,6m,0,30000,Equity,06800,Main,123,Casual,Sales,Mombasa,Driver,EMP-003\n",
+    ]
+
+    def setUp(self):
+        import tempfile
+        from business.models import Bussiness, BusinessLocation
+
+        self.owner = User.objects.create_user(username='owner', email='owner@example.com', password='testpass123')
+        location = BusinessLocation.objects.create(city='Nairobi', county='Nairobi', state='KE')
+        self.organisation = Bussiness.objects.create(name='Acme', owner=self.owner, location=location)
+        handle = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False)
+        handle.write(self.HEADER + ''.join(self.ROWS))
+        handle.close()
+        self.path = handle.name
+
+    def tearDown(self):
+        import os
+        os.unlink(self.path)
+
+    def _run(self, **kwargs):
+        from hrm.employees.services.employee_import import EmployeeBulkImport
+        importer = EmployeeBulkImport(self.path, self.organisation, **kwargs)
+        return importer, importer.run()
+
+    def test_import_reports_invalid_rows_and_imports_the_rest(self):
+        progress = []
+        importer, report = self._run(chunk_size=1, progress_callback=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(report['total_rows'], 3)
+        self.assertEqual(report['imported'], 2)
+        self.assertEqual(report['failed'], 1)
+        self.assertEqual(report['errors'][0]['row'], 4)
+        self.assertEqual(report['errors'][0]['column'], 'Phone')
+        self.assertEqual(progress[-1], (3, 3))
+
+        jane = Employee.objects.get(user__email='jane@example.com')
+        self.assertEqual(jane.user.middle_name, 'Wanjiru')
+        self.assertEqual(jane.national_id, '12345678')
+        self.assertIsNotNone(jane.ess_activated_at)
+        salary = SalaryDetails.objects.get(employee=jane)
+        self.assertEqual(salary.monthly_salary, Decimal('60000.00'))
+        self.assertEqual(salary.daily_rate, Decimal('2727'))
+        contract = jane.contracts.get()
+        self.assertEqual(contract.contract_end_date, date(2025, 7, 15))
+        self.assertEqual(contract.contract_duration, Decimal('547'))
+        self.assertEqual(HRDetails.objects.get(employee=jane).job_or_staff_number, 'EMP001')
+        self.assertEqual(jane.bank_accounts.get().bank_institution.code, '011')
+        self.assertTrue(jane.user.groups.filter(name='accountant').exists())
+        # Month-end clamping: 31 Jan + 1 month
+        self.assertEqual(Employee.objects.get(user__email='john@example.com').contracts.get().contract_end_date, date(2024, 2, 29))
+        self.assertEqual(len(importer.new_user_ids), 2)
+
+    def test_reimport_updates_instead_of_duplicating(self):
+        self._run()
+        importer, report = self._run()
+
+        self.assertEqual(report['imported'], 2)
+        self.assertEqual(importer.new_user_ids, [])
+        self.assertEqual(Employee.objects.filter(organisation=self.organisation).count(), 2)
+        self.assertEqual(SalaryDetails.objects.count(), 2)
+        self.assertEqual(HRDetails.objects.count(), 2)
+
+    def test_existing_emails_match_case_insensitively_and_resumes_keep_duplicate_checks(self):
+        User.objects.create_user(username='jane', email='Jane@Example.com', password='testpass123')
+        importer, _ = self._run(chunk_size=1)
+
+        self.assertEqual(User.objects.filter(email__iexact='jane@example.com').count(), 1)
+        self.assertEqual(len(importer.new_user_ids), 1)
+        # Rows already seen before the checkpoint are still duplicates after resuming
+        _, report = self._run(state=json.loads(json.dumps(importer.get_state())))
+        self.assertEqual((report['imported'], report['failed']), (0, 3))
+
+    def test_reimport_keeps_account_flags_and_codes_skip_taken_ones(self):
+        from core.models import Regions
+        Regions.objects.create(name='Old', code='001')
+        Regions.objects.create(name='Coast', code='002')
+        Regions.objects.filter(name='Old').delete()  # a row count now points at the taken '002'
+        self._run()
+        User.objects.filter(email='jane@example.com').update(is_active=False, is_staff=False)
+        self._run()
+
+        jane = User.objects.get(email='jane@example.com')
+        self.assertEqual((jane.is_active, jane.is_staff), (False, False))
+        self.assertEqual(dict(Regions.objects.values_list('name', 'code')), {'Coast': '002', 'Nairobi': '001'})
+
+    @patch('hrm.employees.services.employee_import.revoke_user_tokens_on_commit')
+    @patch('hrm.employees.services.employee_import.bump_version')
+    def test_group_links_retire_rbac_index_and_principals(self, bump_version, revoke_user_tokens):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._run()
+
+        bump_version.assert_called()
+        revoked = {user_id for call in revoke_user_tokens.call_args_list for user_id in call.args[0]}
+        self.assertEqual(revoked, set(User.objects.filter(email__in=['jane@example.com', 'john@example.com']).values_list('id', flat=True)))
+
+    @patch('hrm.employees.tasks.send_welcome_email', return_value=True)
+    def test_finalize_sets_temporary_password(self, send_email):
+        from hrm.employees.tasks import finalize_imported_accounts
+        importer, _ = self._run()
+
+        result = finalize_imported_accounts(importer.new_user_ids)
+
+        self.assertEqual(result, {'accounts': 2, 'emails_sent': 2})
+        user = User.objects.get(email='jane@example.com')
+        self.assertTrue(user.check_password('ChangeMe123!'))
+        self.assertTrue(user.must_change_password)
+
+    @patch('hrm.employees.tasks.send_welcome_email', return_value=True)
+    def test_import_task_records_report_and_removes_file(self, send_email):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from core.tasks import import_data_file
+        from task_management.models import Task, TaskStatus
+
+        with open(self.path) as handle:
+            file_name = default_storage.save('employee-import-test.csv', ContentFile(handle.read().encode()))
+
+        import_data_file.apply(args=['employees', file_name, self.organisation.id, self.owner.id], task_id='import-test')
+
+        task = Task.objects.get(task_id='import-test')
+        self.assertEqual(task.status, TaskStatus.COMPLETED)
+        self.assertEqual((task.output_data['imported'], task.output_data['failed']), (2, 1))
+        self.assertEqual(task.processed_items, 3)
+        self.assertFalse(default_storage.exists(file_name))
+        self.assertTrue(User.objects.get(email='john@example.com').check_password('ChangeMe123!'))
+
+    def test_import_task_fails_bad_file_without_retrying(self):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from core.tasks import import_data_file
+        from task_management.models import Task, TaskStatus
+
+        file_name = default_storage.save('employee-import-bad.csv', ContentFile(b'Colour,Size\nred,1\n'))
+        with patch.object(import_data_file, 'retry', side_effect=AssertionError('retried')) as retry:
+            import_data_file.apply(args=['employees', file_name, self.organisation.id, self.owner.id], task_id='import-bad')
+
+        retry.assert_not_called()
+        task = Task.objects.get(task_id='import-bad')
+        self.assertEqual(task.status, TaskStatus.FAILED)
+        self.assertIn('Missing required column', task.error_message)
+        self.assertFalse(default_storage.exists(file_name))
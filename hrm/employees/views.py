@@ -3,8 +3,6 @@ from rest_framework import viewsets, filters
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 
-from crm.contacts.utils import ImportContacts
-from ecommerce.product.functions import ImportProducts
 from .serializers import *
 from hrm.payroll_settings.serializers import *
 from hrm.payroll_settings.models import *
@@ -20,7 +18,9 @@ from rest_framework.response import Response
 from django.views.decorators.csrf import csrf_exempt
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-from .utils import EmployeeDataImport
+from core.tasks import import_data_file
+from task_management.models import TaskType
+from task_management.tasks import create_task
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from datetime import datetime, timedelta
@@ -33,6 +33,7 @@ from core.base_viewsets import BaseModelViewSet
 from core.response import APIResponse, get_correlation_id
 from core.audit import AuditTrail
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -82,21 +83,26 @@ class UploadEmployData(APIView):
             file_obj = request.FILES['file']
             fileType = request.data.get('fileType')
             
-            # Save the uploaded file temporarily
+            # Save the uploaded file; the import task removes it when it is done
             file_name = default_storage.save(file_obj.name, ContentFile(file_obj.read()))
-            path = default_storage.path(file_name)
-            
-            # Process the file based on fileType
-            if fileType == 'products':
-                import_response = ImportProducts(request, path, organisation).save_product()
-            elif fileType == 'contacts':
-                import_response = ImportContacts(request, path, organisation).save_contact()
-            else:
-                # Default to employee import
-                import_response = EmployeeDataImport(request=request, path=path, organisation=organisation).import_employee_data()
-            
-            return Response({'message': import_response}, status=status.HTTP_201_CREATED)
-        
+            file_type = fileType if fileType in ('products', 'contacts') else 'employees'
+            task_id = str(uuid.uuid4())
+            create_task(
+                task_id=task_id,
+                task_type=TaskType.DATA_IMPORT,
+                title=f"Import {file_type}",
+                description=f"Importing {file_type} from {file_obj.name}",
+                module='core',
+                user_id=request.user.id,
+                input_data={'file_type': file_type, 'file_name': file_name, 'business_id': organisation.id},
+            )
+            import_data_file.apply_async(args=[file_type, file_name, organisation.id, request.user.id], task_id=task_id)
+            file_name = None
+            return Response(
+                {'message': f"{file_type.capitalize()} import started", 'task_id': task_id},
+                status=status.HTTP_202_ACCEPTED,
+            )
+
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
@@ -106,9 +112,8 @@ class UploadEmployData(APIView):
                 try:
                     if default_storage.exists(file_name):
                         default_storage.delete(file_name)
-                        print(f"✓ Cleaned up uploaded file: {file_name}")
                 except Exception as cleanup_error:
-                    print(f"Warning: Failed to delete uploaded file {file_name}: {cleanup_error}")
+                    logger.warning(f"Failed to delete uploaded file {file_name}: {cleanup_error}")
 
 class EmployeeViewSet(BaseModelViewSet):#cruds
     queryset = Employee.objects.all()
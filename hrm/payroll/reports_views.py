@@ -7,14 +7,14 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status as http_status
 from django.utils import timezone
-from datetime import datetime
+from datetime import date, datetime
 import logging
 
 from .services.reports_service import PayrollReportsService
 from core.utils import get_branch_id_from_request
 from core.modules.report_export import (
     export_report_to_csv, export_report_to_pdf, export_report_to_xlsx,
-    get_company_details_from_request
+    get_company_details_from_request, queue_report_export
 )
 from rest_framework import viewsets
 from .models import Payslip
@@ -22,6 +22,8 @@ from .serializers import *
 
 logger = logging.getLogger(__name__)
 
+DATE_FILTERS = ('payment_period', 'current_period', 'previous_period')
+
 
 def _handle_report_export(request, report_data, report_type, filename_base):
     """
@@ -62,6 +64,36 @@ def _handle_report_export(request, report_data, report_type, filename_base):
         return Response({'error': f'Export failed: {str(e)}'}, status=http_status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def build_payroll_report(method, filters, *args):
+    """Entry point for queued exports: runs a PayrollReportsService report from serialised filters"""
+    for key in DATE_FILTERS:
+        if filters.get(key):
+            filters[key] = date.fromisoformat(filters[key])
+    return getattr(PayrollReportsService(), method)(filters, *args)
+
+
+def _queue_report_export(request, filters, method, report_type, filename_base, *args):
+    """
+    Queue a CSV/XLSX export when the request asks for it with ?async=true.
+    Returns the 202 response, or None to export inline.
+    """
+    export_fmt = request.query_params.get('export', '').lower()
+    if export_fmt not in ('csv', 'xlsx') or request.query_params.get('async', '').lower() not in ('1', 'true', 'yes'):
+        return None
+    
+    serialised = {key: value.isoformat() if isinstance(value, date) else value for key, value in filters.items()}
+    result = queue_report_export(
+        'hrm.payroll.reports_views.build_payroll_report', [method, serialised, *args], export_fmt,
+        f"{filename_base}.{export_fmt}", title=report_type,
+        company=get_company_details_from_request(request), user_id=request.user.id
+    )
+    return Response({
+        'task_id': result.id,
+        'status': 'queued',
+        'message': f'{report_type} export queued; the download link is sent when it is ready'
+    }, status=http_status.HTTP_202_ACCEPTED)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def p9_tax_report(request):
@@ -79,6 +111,9 @@ def p9_tax_report(request):
     """
     try:
         filters = _extract_filters(request)
+        queued = _queue_report_export(request, filters, 'generate_p9_report', 'P9 Tax Deduction Card', 'p9_report')
+        if queued:
+            return queued
         reports_service = PayrollReportsService()
         report_data = reports_service.generate_p9_report(filters)
         
@@ -110,6 +145,9 @@ def p10a_employer_return(request):
     """
     try:
         filters = _extract_filters(request)
+        queued = _queue_report_export(request, filters, 'generate_p10a_report', 'P10A Employer Return', 'p10a_report')
+        if queued:
+            return queued
         reports_service = PayrollReportsService()
         report_data = reports_service.generate_p10a_report(filters)
         
@@ -142,6 +180,9 @@ def statutory_deductions_report(request):
     try:
         filters = _extract_filters(request)
         deduction = filters.get('deduction_type', 'nssf')
+        queued = _queue_report_export(request, filters, 'generate_statutory_deductions_report', f'{deduction.upper()} Deductions', f'{deduction}_report', deduction)
+        if queued:
+            return queued
         reports_service = PayrollReportsService()
         report_data = reports_service.generate_statutory_deductions_report(filters, deduction)
         
@@ -171,6 +212,9 @@ def bank_net_pay_report(request):
     """
     try:
         filters = _extract_filters(request)
+        queued = _queue_report_export(request, filters, 'generate_bank_net_pay_report', 'Bank Net Pay Report', 'bank_net_pay')
+        if queued:
+            return queued
         reports_service = PayrollReportsService()
         report_data = reports_service.generate_bank_net_pay_report(filters)
         
@@ -199,6 +243,9 @@ def muster_roll_report(request):
     """
     try:
         filters = _extract_filters(request)
+        queued = _queue_report_export(request, filters, 'generate_muster_roll_report', 'Muster Roll Report', 'muster_roll')
+        if queued:
+            return queued
         reports_service = PayrollReportsService()
         report_data = reports_service.generate_muster_roll_report(filters)
         
@@ -227,6 +274,9 @@ def withholding_tax_report(request):
     """
     try:
         filters = _extract_filters(request)
+        queued = _queue_report_export(request, filters, 'generate_withholding_tax_report', 'Withholding Tax Report', 'withholding_tax')
+        if queued:
+            return queued
         reports_service = PayrollReportsService()
         report_data = reports_service.generate_withholding_tax_report(filters)
         
@@ -256,6 +306,9 @@ def variance_report(request):
     """
     try:
         filters = _extract_filters(request)
+        queued = _queue_report_export(request, filters, 'generate_variance_report', 'Variance Report', 'variance_report')
+        if queued:
+            return queued
         reports_service = PayrollReportsService()
         report_data = reports_service.generate_variance_report(filters)
         
@@ -20,8 +20,33 @@ logger = logging.getLogger('ditapi_logger')
 from task_management.tasks import create_task, update_task_progress, complete_task, fail_task, emit_websocket_event
 from error_handling.handlers import handle_error
 
+def _report_batch_progress(batch_task_id, batch_total, user_id):
+    """
+    Roll a finished payslip into its batch's progress. The counter lives in the
+    cache so every worker adds to the same total; the progress event itself is
+    coalesced by emit_websocket_event.
+    """
+    if not batch_task_id:
+        return
+    try:
+        key = f'payroll_batch_{batch_task_id}_processed'
+        cache.add(key, 0, timeout=60 * 60 * 24)
+        processed = cache.incr(key)
+        emit_websocket_event('payroll_processing_progress', {
+            'task_id': batch_task_id,
+            'processed_items': processed,
+            'total_items': batch_total,
+            'progress': int(processed * 100 / batch_total) if batch_total else None,
+            'message': f'Processed {processed} of {batch_total} payslips',
+            'module': 'hrm.payroll'
+        }, user_id=user_id, task_id=batch_task_id)
+    except Exception as e:
+        # Progress reporting must never fail the payslip itself
+        logger.warning(f"Could not report progress for payroll batch {batch_task_id}: {e}")
+
 @shared_task(bind=True)
-def process_single_payslip(self, employee_id, payment_period, recover_advances, command, user_id=None):
+def process_single_payslip(self, employee_id, payment_period, recover_advances, command, user_id=None,
+                           batch_task_id=None, batch_total=None):
     """
     Process a single employee's payslip asynchronously.
     
@@ -31,12 +56,16 @@ def process_single_payslip(self, employee_id, payment_period, recover_advances,
         recover_advances: Whether to recover advances
         command: Command type (process, queue, rerun)
         user_id: Optional user ID for audit trails
+        batch_task_id: Parent batch task; per-payslip events then stay on the
+            payslip's own task group and roll up into the batch's progress
+        batch_total: Number of payslips in the parent batch
     
     Returns:
         Dictionary with payslip data or error information
     """
     task_id = self.request.id
     task = None
+    broadcast = batch_task_id is None
     
     try:
         # Get employee for task creation
@@ -52,7 +81,8 @@ def process_single_payslip(self, employee_id, payment_period, recover_advances,
                 title=f"Process payslip for {employee_name}",
                 description=f"Processing payslip for employee {employee_name} for period {payment_period}",
                 module='hrm.payroll',
-                user_id=user_id
+                user_id=user_id,
+                broadcast=broadcast
             )
         
         # Mark as started
@@ -68,7 +98,7 @@ def process_single_payslip(self, employee_id, payment_period, recover_advances,
                 'message': f'Starting payslip processing for employee {employee_name}',
                 'employee_id': employee_id,
                 'command': command
-            }, user_id=user_id, task_id=task_id)
+            }, user_id=user_id, task_id=task_id, broadcast=broadcast)
         
         # Cache key for this specific payslip calculation
         cache_key = f"payslip_calculation_{employee_id}_{payment_period}_{command}"
@@ -87,8 +117,9 @@ def process_single_payslip(self, employee_id, payment_period, recover_advances,
                     'message': f'Payslip processing completed (cached) for employee {employee_id}',
                     'employee_id': employee_id,
                     'cached': True
-                }, user_id=user_id, task_id=task_id)
+                }, user_id=user_id, task_id=task_id, broadcast=broadcast)
             
+            _report_batch_progress(batch_task_id, batch_total, user_id)
             return cached_result
         
         # If not in cache or rerunning, process the payslip
@@ -133,8 +164,9 @@ def process_single_payslip(self, employee_id, payment_period, recover_advances,
                     'message': f'Payslip processing completed for employee {employee_id}',
                     'employee_id': employee_id,
                     'payslip_id': payroll_result.id
-                }, user_id=user_id, task_id=task_id)
+                }, user_id=user_id, task_id=task_id, broadcast=broadcast)
             
+            _report_batch_progress(batch_task_id, batch_total, user_id)
             return serialized_data
         else:
             # If it's an error or message, cache that too
@@ -148,8 +180,9 @@ def process_single_payslip(self, employee_id, payment_period, recover_advances,
                     'result': payroll_result,
                     'message': f'Payslip processing completed for employee {employee_id}',
                     'employee_id': employee_id
-                }, user_id=user_id, task_id=task_id)
+                }, user_id=user_id, task_id=task_id, broadcast=broadcast)
             
+            _report_batch_progress(batch_task_id, batch_total, user_id)
             return payroll_result
     
     except Exception as e:
@@ -164,8 +197,9 @@ def process_single_payslip(self, employee_id, payment_period, recover_advances,
                 'error': error_msg,
                 'message': f'Payslip processing failed for employee {employee_id}',
                 'employee_id': employee_id
-            }, user_id=user_id, task_id=task_id)
+            }, user_id=user_id, task_id=task_id, broadcast=broadcast)
         
+        _report_batch_progress(batch_task_id, batch_total, user_id)
         return {"employee_id": employee_id, "success": False, "detail": error_msg}
 
 @shared_task(bind=True)
@@ -225,7 +259,10 @@ def batch_process_payslips(self, employee_ids, payment_period, recover_advances,
         tasks = []
         for emp_id in employee_ids:
             tasks.append(
-                process_single_payslip.s(emp_id, payment_period, recover_advances, command, user_id)
+                process_single_payslip.s(
+                    emp_id, payment_period, recover_advances, command, user_id,
+                    batch_task_id=task_id, batch_total=len(employee_ids)
+                )
             )
         
         # Use a chord so we can emit completion events when all subtasks finish
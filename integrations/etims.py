@@ -0,0 +1,304 @@
+"""
+eTIMS fiscalization outbox.
+
+Issuing an invoice or finalising a POS sale writes an EtimsSubmission row
+in the same transaction as the document (integrations.signals), so a
+document is never fiscalized twice or silently skipped. submit_batch claims
+due rows with SELECT ... FOR UPDATE SKIP LOCKED and a lease, like the
+webhook dispatcher. It builds payloads with one query per document type
+and posts them over the pooled KRA session with bounded concurrency,
+reusing a single token. The lease covers a whole batch at worst-case KRA
+latency, and results are only written while it is still held. Failures are
+retried with backoff through next_attempt_at; a retry first asks KRA for
+the document's status (a timed out POST may still have been fiscalized)
+and every POST carries a stable idempotency key, so a document never gets
+two fiscal receipts. Requests KRA rejects outright (4xx other than auth,
+conflict or throttling) fail at once.
+
+The returned control number and QR data are stored on the submission and
+copied to the document: Invoice.tax_reference/etims_qr_data or
+Sales.etims_control_number/etims_qr_data.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import math
+
+from django.db import transaction
+from django.utils import timezone
+
+from .kra import STATUS_TIMEOUT, SUBMIT_TIMEOUT, KRAError, KRAService
+from .models import EtimsSubmission
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+CONCURRENCY = 8
+MAX_ATTEMPTS = 10
+# Retry delays double from RETRY_BASE up to RETRY_MAX seconds
+RETRY_BASE = 60
+RETRY_MAX = 60 * 60 * 2
+# Claimed rows stay invisible to other runs for a whole batch at worst-case
+# KRA latency (status check plus POST on every row), plus a margin
+LEASE = timedelta(seconds=math.ceil(BATCH_SIZE / CONCURRENCY) * (STATUS_TIMEOUT + SUBMIT_TIMEOUT) + 60)
+DUE_STATUSES = ('pending', 'retrying')
+# 4xx responses worth retrying; any other 4xx means the payload itself is rejected
+RETRYABLE_CLIENT_ERRORS = (401, 403, 408, 409, 425, 429)
+UNFISCALIZED_INVOICE_STATUSES = ('draft', 'cancelled', 'void')
+CONTROL_NUMBER_KEYS = ('control_number', 'controlNumber', 'cu_invoice_number', 'cuInvcNo', 'rcptNo')
+QR_KEYS = ('qr_code', 'qrCode', 'qr_url', 'qrUrl', 'qr_data')
+RESULT_FIELDS = [
+    'status', 'attempts', 'next_attempt_at', 'last_error', 'control_number', 'qr_data',
+    'response_payload', 'submitted_at', 'updated_at',
+]
+
+
+def enqueue_document(document_type, object_id, document_number=None):
+    """Queue a document for fiscalization (no-op when it is already queued)"""
+    EtimsSubmission.objects.bulk_create(
+        [EtimsSubmission(document_type=document_type, object_id=object_id, document_number=document_number)],
+        ignore_conflicts=True,
+    )
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE * 2 ** max(attempts - 1, 0), RETRY_MAX)
+
+
+def claim_due_submissions(limit=BATCH_SIZE):
+    now = timezone.now()
+    with transaction.atomic():
+        due = list(
+            EtimsSubmission.objects.select_for_update(skip_locked=True)
+            .filter(status__in=DUE_STATUSES, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:limit]
+        )
+        if due:
+            EtimsSubmission.objects.filter(pk__in=[submission.pk for submission in due]).update(next_attempt_at=now + LEASE)
+            for submission in due:
+                submission.next_attempt_at = now + LEASE
+    return due
+
+
+def _still_leased(leases):
+    """Ids of submissions whose lease ({id: lease end}) is still the one taken at claim time, locked until the caller's transaction ends"""
+    return {
+        pk for pk, lease in EtimsSubmission.objects.select_for_update()
+        .filter(pk__in=leases.keys()).values_list('pk', 'next_attempt_at')
+        if lease == leases[pk]
+    }
+
+
+def _money(value):
+    return float(value or 0)
+
+
+def invoice_payload(invoice):
+    customer = invoice.customer
+    return {
+        'invoice_number': invoice.invoice_number,
+        'issue_date': str(invoice.invoice_date),
+        'customer': {
+            'name': (customer.business_name or str(customer)) if customer else '',
+            'kra_pin': (customer.tax_number or '') if customer else '',
+        },
+        'totals': {
+            'subtotal': _money(invoice.subtotal),
+            'tax_amount': _money(invoice.tax_amount),
+            'total': _money(invoice.total),
+        },
+        'items': [
+            {
+                'description': item.name,
+                'quantity': float(item.quantity),
+                'unit_price': _money(item.unit_price),
+                'total': _money(item.total_price),
+            }
+            for item in invoice.items.all()
+        ],
+    }
+
+
+def pos_sale_payload(sale):
+    customer = sale.customer
+    return {
+        'invoice_number': sale.sale_id,
+        'issue_date': str(timezone.localdate(sale.date_added)),
+        'customer': {
+            'name': (customer.business_name or str(customer)) if customer else '',
+            'kra_pin': (customer.tax_number or '') if customer else '',
+        },
+        'totals': {
+            'subtotal': _money(sale.sub_total),
+            'tax_amount': _money(sale.sale_tax),
+            'total': _money(sale.grand_total),
+        },
+        'items': [
+            {
+                'description': item.stock_item.product.title,
+                'quantity': float(item.qty),
+                'unit_price': _money(item.unit_price),
+                'tax_amount': _money(item.tax_amount),
+                'total': _money(item.sub_total),
+            }
+            for item in sale.salesitems.all()
+        ],
+    }
+
+
+def _documents(submissions):
+    """{(document type, object id): document} with items prefetched, one query set per type"""
+    from ecommerce.pos.models import Sales
+    from finance.invoicing.models import Invoice
+
+    ids = {}
+    for submission in submissions:
+        ids.setdefault(submission.document_type, []).append(submission.object_id)
+    documents = {}
+    if ids.get('invoice'):
+        for invoice in Invoice.objects.filter(pk__in=ids['invoice']).select_related('customer').prefetch_related('items'):
+            documents[('invoice', invoice.pk)] = invoice
+    if ids.get('pos_sale'):
+        sales = Sales.objects.filter(pk__in=ids['pos_sale']).select_related('customer').prefetch_related('salesitems__stock_item__product')
+        for sale in sales:
+            documents[('pos_sale', sale.pk)] = sale
+    return documents
+
+
+def fiscal_fields(result):
+    """(control number, QR data) from a KRA response, flat or under 'data'"""
+    if not isinstance(result, dict):
+        return None, None
+    body = {**result, **result['data']} if isinstance(result.get('data'), dict) else result
+    control_number = next((str(body[key]) for key in CONTROL_NUMBER_KEYS if body.get(key)), None)
+    qr_data = next((str(body[key]) for key in QR_KEYS if body.get(key)), None)
+    return control_number, qr_data
+
+
+def _rejected(error):
+    status_code = getattr(error, 'status_code', None)
+    return status_code is not None and 400 <= status_code < 500 and status_code not in RETRYABLE_CLIENT_ERRORS
+
+
+def _submit(kra, submission, payload):
+    """POST one document; a retry is only posted once KRA confirms it has no receipt for it"""
+    reference = payload['invoice_number']
+    if submission.attempts:
+        ok, result = kra.get_invoice_status(reference)
+        if ok and fiscal_fields(result)[0]:
+            return True, result
+        if not ok and getattr(result, 'status_code', None) != 404:
+            return False, KRAError(f"Status check failed: {result}")
+    return kra.submit_invoice(payload, idempotency_key=f"etims-{submission.document_type}-{submission.object_id}")
+
+
+def _fail(submission, error, now):
+    submission.attempts += 1
+    submission.last_error = str(error)[:1000]
+    if submission.attempts >= MAX_ATTEMPTS or _rejected(error):
+        submission.status = 'failed'
+    else:
+        submission.status = 'retrying'
+        submission.next_attempt_at = now + timedelta(seconds=retry_delay(submission.attempts))
+
+
+def _store_on_documents(submitted, documents, now):
+    from ecommerce.pos.models import Sales
+    from finance.invoicing.models import Invoice
+
+    invoices, sales = [], []
+    for submission in submitted:
+        document = documents[(submission.document_type, submission.object_id)]
+        document.fiscalized_at = now
+        if submission.document_type == 'invoice':
+            document.tax_reference = submission.control_number
+            document.kra_compliance = True
+            document.etims_qr_data = submission.qr_data
+            invoices.append(document)
+        else:
+            document.etims_control_number = submission.control_number
+            document.etims_qr_data = submission.qr_data
+            sales.append(document)
+    # bulk_update skips save(), so no signal re-queues these documents
+    if invoices:
+        Invoice.objects.bulk_update(invoices, ['tax_reference', 'kra_compliance', 'etims_qr_data', 'fiscalized_at'])
+    if sales:
+        Sales.objects.bulk_update(sales, ['etims_control_number', 'etims_qr_data', 'fiscalized_at'])
+
+
+def submit_batch(limit=BATCH_SIZE, concurrency=CONCURRENCY, kra=None):
+    """Submit one batch of due documents; returns counts"""
+    kra = kra or KRAService()
+    stats = {'claimed': 0, 'submitted': 0, 'retrying': 0, 'failed': 0}
+    if not kra.settings:
+        logger.warning("eTIMS outbox not processed: KRA settings not configured")
+        return stats
+    submissions = claim_due_submissions(limit)
+    stats['claimed'] = len(submissions)
+    if not submissions:
+        return stats
+
+    leases = {submission.pk: submission.next_attempt_at for submission in submissions}
+    now = timezone.now()
+    documents = _documents(submissions)
+    payloads = {}
+    for submission in submissions:
+        document = documents.get((submission.document_type, submission.object_id))
+        if document is None:
+            submission.status, submission.last_error = 'failed', 'Document no longer exists'
+        else:
+            payloads[submission.pk] = invoice_payload(document) if submission.document_type == 'invoice' else pos_sale_payload(document)
+
+    # Fetch (or reuse) the shared token here so the submit threads never touch the database
+    ok, token_or_error = kra.get_access_token()
+    sendable = [submission for submission in submissions if submission.pk in payloads]
+    if not ok:
+        for submission in sendable:
+            _fail(submission, token_or_error, now)
+        results = []
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(sendable)))) as pool:
+            results = list(pool.map(lambda submission: _submit(kra, submission, payloads[submission.pk]), sendable))
+
+    now = timezone.now()
+    submitted = []
+    for submission, (ok, result) in zip(sendable, results):
+        if ok:
+            submission.attempts += 1
+            submission.status = 'submitted'
+            submission.control_number, submission.qr_data = fiscal_fields(result)
+            submission.response_payload = result
+            submission.submitted_at = now
+            submission.last_error = ''
+            submitted.append(submission)
+        else:
+            _fail(submission, result, now)
+    for submission in submissions:
+        submission.updated_at = now
+
+    with transaction.atomic():
+        # A run that outlived its lease must not overwrite the run that re-claimed its rows
+        held = _still_leased(leases)
+        if len(held) < len(submissions):
+            logger.warning(f"eTIMS outbox: lease lost on {len(submissions) - len(held)} submissions before their results were written")
+        submissions = [submission for submission in submissions if submission.pk in held]
+        EtimsSubmission.objects.bulk_update(submissions, RESULT_FIELDS)
+        _store_on_documents([submission for submission in submitted if submission.pk in held], documents, now)
+    for submission in submissions:
+        stats[submission.status] += 1
+    return stats
+
+
+def submit_pending(max_batches=25, concurrency=CONCURRENCY):
+    """Drain the outbox batch by batch; returns totals"""
+    kra = KRAService()
+    totals = {'claimed': 0, 'submitted': 0, 'retrying': 0, 'failed': 0}
+    for _ in range(max_batches):
+        stats = submit_batch(concurrency=concurrency, kra=kra)
+        for key in totals:
+            totals[key] += stats[key]
+        if stats['claimed'] < BATCH_SIZE:
+            break
+    if totals['claimed']:
+        logger.info(f"eTIMS outbox: {totals}")
+    return totals
@@ -0,0 +1,176 @@
+"""
+Shared HTTP client layer for payment and KRA gateways.
+
+get_session(name) returns a keep-alive requests.Session per gateway and
+process, with a bounded connection pool and a retry policy: connection
+failures are retried for every method, 429/5xx responses only for
+idempotent ones so an STK push or invoice submission is never sent twice.
+
+get_token(key, fetch) caches OAuth tokens in the shared cache until shortly
+before they expire. Within REFRESH_AHEAD seconds of expiry one worker
+(elected with cache.add) fetches a replacement while the rest keep using
+the current token; when no usable token exists the others wait briefly for
+that worker instead of stampeding the token endpoint. Threads of one
+process also share a single refresh, so this holds when the cache is down.
+Callers that get a 401 call invalidate_token and fetch again.
+"""
+from hashlib import sha256
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+POOL_MAXSIZE = getattr(settings, 'GATEWAY_POOL_MAXSIZE', 20)
+RETRY_TOTAL = getattr(settings, 'GATEWAY_RETRY_TOTAL', 3)
+RETRY_BACKOFF = getattr(settings, 'GATEWAY_RETRY_BACKOFF', 0.5)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Seconds before expiry at which a token is refreshed
+REFRESH_AHEAD = 60
+# Used when a token endpoint does not say how long its token lives
+DEFAULT_TOKEN_TTL = 3600
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5.0
+LOCK_POLL = 0.1
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+# Per-process copy of cached tokens: key -> (token, expires_at)
+_tokens = {}
+_token_locks = {}
+
+
+def _retry_policy():
+    return Retry(
+        total=RETRY_TOTAL,
+        connect=RETRY_TOTAL,
+        read=RETRY_TOTAL,
+        status=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, max_retries=_retry_policy())
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(name):
+    """Pooled keep-alive session for a gateway (one per process, so forked workers never share sockets)"""
+    key = (name, os.getpid())
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _sessions[key] = build_session()
+    return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def token_key(integration, *identity):
+    """Cache key for a token, distinct per credential set so config changes never reuse an old token"""
+    digest = sha256('|'.join(str(part) for part in identity).encode()).hexdigest()[:16]
+    return f"gateway:token:{integration}:{digest}"
+
+
+def invalidate_token(key):
+    _tokens.pop(key, None)
+    cache.delete(key)
+
+
+def _store(key, token, expires_in):
+    try:
+        expires_in = int(expires_in or DEFAULT_TOKEN_TTL)
+    except (TypeError, ValueError):
+        expires_in = DEFAULT_TOKEN_TTL
+    entry = (token, time.time() + expires_in)
+    _tokens[key] = entry
+    cache.set(key, entry, max(1, expires_in))
+    return entry
+
+
+def _fetch(key, fetch):
+    token, expires_in = fetch()
+    if not token:
+        raise ValueError('Token endpoint returned no access_token')
+    return _store(key, token, expires_in)[0]
+
+
+def _current(key):
+    """The process copy of a token, re-read from the shared cache once it is due for refresh"""
+    entry = _tokens.get(key)
+    if entry is None or entry[1] - time.time() <= REFRESH_AHEAD:
+        shared = cache.get(key)
+        if shared:
+            entry = _tokens[key] = shared
+    return entry
+
+
+def _local_lock(key):
+    with _sessions_lock:
+        return _token_locks.setdefault(key, threading.Lock())
+
+
+def _refresh(key, fetch, entry):
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return _fetch(key, fetch)
+        finally:
+            cache.delete(lock_key)
+
+    # Another worker is refreshing: keep using a token that has not expired yet
+    if entry and entry[1] > time.time():
+        return entry[0]
+    # Otherwise wait for its token; an absent lock means it finished or the cache is unreachable
+    deadline = time.time() + LOCK_WAIT
+    while time.time() < deadline and cache.get(lock_key):
+        time.sleep(LOCK_POLL)
+        shared = cache.get(key)
+        if shared and shared[1] > time.time():
+            _tokens[key] = shared
+            return shared[0]
+    return _fetch(key, fetch)
+
+
+def get_token(key, fetch):
+    """
+    Cached access token for key. fetch() requests a new one and returns
+    (token, expires_in seconds); its exceptions propagate to the caller.
+    """
+    entry = _current(key)
+    if entry and entry[1] - time.time() > REFRESH_AHEAD:
+        return entry[0]
+    usable = bool(entry and entry[1] > time.time())
+    lock = _local_lock(key)
+    # Threads of this process share one refresh; with a usable token the others do not wait for it
+    if not lock.acquire(blocking=not usable):
+        return entry[0]
+    try:
+        entry = _current(key)
+        if entry and entry[1] - time.time() > REFRESH_AHEAD:
+            return entry[0]
+        return _refresh(key, fetch, entry)
+    finally:
+        lock.release()
@@ -0,0 +1,240 @@
+"""
+KRA eTIMS client.
+
+Kept out of services.py: the integrations/services/ package shadows that
+module, so `from integrations.services import KRAService` resolves here via
+the package's re-export.
+"""
+
+from .gateway import get_session, get_token, token_key
+from .models import KRASettings, KRACertificateRequest, KRAComplianceCheck
+from .utils import Crypto
+
+SUBMIT_TIMEOUT = 60
+STATUS_TIMEOUT = 30
+
+
+class KRAError(str):
+    """Error message from a KRA call, carrying the HTTP status when the API answered"""
+
+    def __new__(cls, message, status_code=None):
+        error = super().__new__(cls, message)
+        error.status_code = status_code
+        return error
+
+    @classmethod
+    def from_exception(cls, exc):
+        return cls(str(exc), getattr(getattr(exc, 'response', None), 'status_code', None))
+
+
+class KRAService:
+    """
+    Minimal KRA eTIMS client.
+    Implements token retrieval and invoice submission hooks.
+    """
+
+    def __init__(self):
+        self.settings = KRASettings.objects.order_by('-updated_at').first()
+        self._credentials = None
+
+    def _get_base_url(self) -> str:
+        if not self.settings:
+            return 'https://api.sandbox.kra.go.ke'
+        return self.settings.base_url
+
+    def _decrypt(self, value) -> str:
+        val = value or ''
+        return Crypto(val, 'decrypt').decrypt() if isinstance(val, str) and 'gAAAAA' in val else val
+
+    def get_access_token(self) -> tuple[bool, str]:
+        if not self.settings:
+            return False, 'KRA settings not configured'
+
+        # Decrypting costs a query per value, so do it once per instance (batch submitters reuse one)
+        if self._credentials is None:
+            self._credentials = (
+                self._decrypt(self.settings.client_id),
+                self._decrypt(self.settings.client_secret),
+                self.settings.username or '',
+                self._decrypt(self.settings.password or ''),
+            )
+        client_id, client_secret, username, password = self._credentials
+
+        url = f"{self._get_base_url()}{self.settings.token_path}"
+
+        def fetch():
+            data = {
+                'grant_type': 'password',
+                'client_id': client_id,
+                'client_secret': client_secret,
+                'username': username,
+                'password': password,
+            }
+            resp = get_session('kra').post(url, data=data, timeout=30)
+            resp.raise_for_status()
+            body = resp.json()
+            return body.get('access_token'), body.get('expires_in')
+
+        try:
+            # Shared across workers until shortly before expiry (integrations.gateway)
+            token = get_token(token_key('kra', url, client_id, client_secret, username, password), fetch)
+            return True, str(token)
+        except ValueError:
+            return False, 'Missing access_token in response'
+        except Exception as exc:
+            return False, str(exc)
+
+    def submit_invoice(self, invoice_payload: dict, idempotency_key: str | None = None) -> tuple[bool, dict | str]:
+        """
+        Submit invoice to eTIMS. The payload should already be mapped to the KRA schema
+        by the caller. A stable idempotency_key lets KRA drop a resubmission of a
+        document it already fiscalized.
+        """
+        ok, token_or_err = self.get_access_token()
+        if not ok:
+            return False, token_or_err
+
+        if not self.settings:
+            return False, 'KRA settings not configured'
+        url = f"{self._get_base_url()}{self.settings.invoice_path}"
+        headers = {
+            'Authorization': f"Bearer {token_or_err}",
+            'Content-Type': 'application/json'
+        }
+        if idempotency_key:
+            headers['Idempotency-Key'] = idempotency_key
+        try:
+            resp = get_session('kra').post(url, json=invoice_payload, headers=headers, timeout=SUBMIT_TIMEOUT)
+            resp.raise_for_status()
+            return True, resp.json()
+        except Exception as exc:
+            return False, KRAError.from_exception(exc)
+
+    def get_invoice_status(self, reference: str) -> tuple[bool, dict | str]:
+        ok, token_or_err = self.get_access_token()
+        if not ok:
+            return False, token_or_err
+
+        if not self.settings:
+            return False, 'KRA settings not configured'
+        url = f"{self._get_base_url()}{self.settings.invoice_status_path}"
+        headers = {'Authorization': f"Bearer {token_or_err}"}
+        try:
+            resp = get_session('kra').get(url, params={'ref': reference}, headers=headers, timeout=STATUS_TIMEOUT)
+            resp.raise_for_status()
+            return True, resp.json()
+        except Exception as exc:
+            return False, KRAError.from_exception(exc)
+
+    def validate_pin(self, kra_pin: str) -> tuple[bool, dict | str]:
+        """Basic placeholder for PIN validation endpoint if exposed by KRA. Uses token and calls a hypothetical validate path."""
+        ok, token_or_err = self.get_access_token()
+        if not ok:
+            return False, token_or_err
+        # If KRA exposes a PIN validation endpoint, wire here; else perform basic format check
+        try:
+            # Simple format sanity: starts with P and has digits
+            import re
+            if not re.match(r'^P[0-9A-Z]{9,12}$', kra_pin.upper()):
+                return False, 'Invalid PIN format'
+            # If there is a remote endpoint, one could do:
+            # url = f"{self._get_base_url()}/etims/v1/pin/validate"
+            # headers = {'Authorization': f"Bearer {token_or_err}"}
+            # resp = requests.get(url, params={'pin': kra_pin}, headers=headers, timeout=30)
+            # resp.raise_for_status()
+            # return True, resp.json()
+            return True, {'valid': True, 'pin': kra_pin.upper()}
+        except Exception as exc:
+            return False, str(exc)
+
+    def get_tax_certificate(self, tax_type: str, period: str) -> tuple[bool, dict | str]:
+        ok, token_or_err = self.get_access_token()
+        if not ok:
+            return False, token_or_err
+        if not self.settings:
+            return False, 'KRA settings not configured'
+        url = f"{self._get_base_url()}{getattr(self.settings, 'certificate_path', '/etims/v1/certificates')}"
+        headers = {'Authorization': f"Bearer {token_or_err}"}
+        payload = {'type': tax_type, 'period': period}
+        req_log = None
+        try:
+            # Create request log
+            try:
+                req_log = KRACertificateRequest.objects.create(
+                    cert_type=tax_type,
+                    period=period,
+                    status='requested',
+                )
+            except Exception:
+                req_log = None
+            resp = get_session('kra').get(url, params=payload, headers=headers, timeout=60)
+            resp.raise_for_status()
+            data = resp.json()
+            # Update log
+            if req_log:
+                try:
+                    req_log.status = 'completed'
+                    req_log.response_payload = data
+                    req_log.save(update_fields=['status', 'response_payload'])
+                except Exception:
+                    pass
+            return True, data
+        except Exception as exc:
+            if req_log:
+                try:
+                    req_log.status = 'failed'
+                    # store error as string to avoid type issues on strict backends
+                    req_log.response_payload = {'error': str(exc)}  # type: ignore[assignment]
+                    req_log.save(update_fields=['status', 'response_payload'])
+                except Exception:
+                    pass
+            return False, str(exc)
+
+    def check_compliance(self, kra_pin: str) -> tuple[bool, dict | str]:
+        ok, token_or_err = self.get_access_token()
+        if not ok:
+            return False, token_or_err
+        if not self.settings:
+            return False, 'KRA settings not configured'
+        url = f"{self._get_base_url()}{getattr(self.settings, 'compliance_path', '/etims/v1/compliance')}"
+        headers = {'Authorization': f"Bearer {token_or_err}"}
+        try:
+            resp = get_session('kra').get(url, params={'pin': kra_pin}, headers=headers, timeout=30)
+            resp.raise_for_status()
+            data = resp.json()
+            is_compliant = bool(data.get('compliant')) if isinstance(data, dict) else False
+            # Log compliance check
+            try:
+                KRAComplianceCheck.objects.create(
+                    kra_pin=kra_pin,
+                    is_compliant=is_compliant,
+                    response_payload=data
+                )
+            except Exception:
+                pass
+            return True, data
+        except Exception as exc:
+            try:
+                KRAComplianceCheck.objects.create(
+                    kra_pin=kra_pin,
+                    is_compliant=False,
+                    response_payload={'error': str(exc)}
+                )
+            except Exception:
+                pass
+            return False, str(exc)
+
+    def sync_tax_data(self, start_date: str, end_date: str) -> tuple[bool, dict | str]:
+        ok, token_or_err = self.get_access_token()
+        if not ok:
+            return False, token_or_err
+        if not self.settings:
+            return False, 'KRA settings not configured'
+        url = f"{self._get_base_url()}{getattr(self.settings, 'sync_path', '/etims/v1/sync')}"
+        headers = {'Authorization': f"Bearer {token_or_err}", 'Content-Type': 'application/json'}
+        try:
+            resp = get_session('kra').post(url, json={'start_date': start_date, 'end_date': end_date}, headers=headers, timeout=60)
+            resp.raise_for_status()
+            return True, resp.json()
+        except Exception as exc:
+            return False, str(exc)
@@ -0,0 +1,87 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+import requests
+
+from ecommerce.pos.models import Sales
+from integrations import etims
+from integrations.gateway import close_sessions
+from integrations.kra import KRAService
+from integrations.mock_gateway import start_mock_gateway
+from integrations.models import EtimsSubmission, KRASettings
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_submit(settings, payload):
+    """What a per-document submission used to cost: a fresh token and two new connections"""
+    token = requests.post(f"{settings.base_url}{settings.token_path}", data={'grant_type': 'password'}, timeout=30).json()['access_token']
+    resp = requests.post(
+        f"{settings.base_url}{settings.invoice_path}", json=payload, headers={'Authorization': f'Bearer {token}'}, timeout=60,
+    )
+    return resp.ok
+
+
+class Command(BaseCommand):
+    help = 'eTIMS submission throughput against the local KRA stand-in: per-document calls vs the batched outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=etims.CONCURRENCY)
+        parser.add_argument('--latency-ms', type=float, default=50.0, help='Simulated KRA round trip')
+
+    def handle(self, *args, **options):
+        server = start_mock_gateway(latency=options['latency_ms'] / 1000)
+        try:
+            with transaction.atomic():
+                self._run(server, options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            server.shutdown()
+
+    def _run(self, server, options):
+        total = options['documents']
+        KRASettings.objects.all().delete()
+        settings = KRASettings.objects.create(base_url=server.base_url, username='bench')
+        prefix = uuid.uuid4().hex[:6]
+        Sales.objects.bulk_create([
+            Sales(sale_id=f'BENCH-{prefix}-{index}', sub_total=100, sale_tax=16, grand_total=116) for index in range(total)
+        ])
+        sales = list(Sales.objects.filter(sale_id__startswith=f'BENCH-{prefix}-').prefetch_related('salesitems'))
+        close_sessions()
+        self.stdout.write(
+            f"{total} receipts, {options['concurrency']} concurrent, {options['latency_ms']:.0f} ms simulated latency"
+        )
+        self.stdout.write(f"{'pipeline':<28} {'ok':>6} {'docs/s':>9} {'tokens':>7} {'connections':>12}")
+
+        server.counts.clear()
+        server.clients.clear()
+        started = time.perf_counter()
+        ok = sum(legacy_submit(settings, etims.pos_sale_payload(sale)) for sale in sales)
+        self._report('per-document calls', server, ok, total, time.perf_counter() - started)
+
+        EtimsSubmission.objects.bulk_create([
+            EtimsSubmission(document_type='pos_sale', object_id=sale.pk, document_number=sale.sale_id) for sale in sales
+        ], ignore_conflicts=True)
+        server.counts.clear()
+        server.clients.clear()
+        started = time.perf_counter()
+        totals = {'submitted': 0}
+        kra = KRAService()
+        while True:
+            stats = etims.submit_batch(concurrency=options['concurrency'], kra=kra)
+            totals['submitted'] += stats['submitted']
+            if stats['claimed'] < etims.BATCH_SIZE:
+                break
+        self._report('batched outbox', server, totals['submitted'], total, time.perf_counter() - started)
+
+    def _report(self, label, server, ok, total, elapsed):
+        self.stdout.write(
+            f"{label:<28} {ok:>6} {total / elapsed:>9.1f} {server.counts.get('/oauth/token', 0):>7} {len(server.clients):>12}"
+        )
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.core.management.base import BaseCommand
+import requests
+
+from integrations.gateway import close_sessions, invalidate_token
+from integrations.mock_gateway import start_mock_gateway
+from integrations.payments.mpesa_payment import MpesaPaymentService
+
+
+def legacy_stk_push(config, payload):
+    """What every push used to cost: a fresh token and two new connections"""
+    auth_resp = requests.get(
+        f"{config['base_url']}/oauth/v1/generate?grant_type=client_credentials",
+        auth=(config['consumer_key'], config['consumer_secret']), timeout=20,
+    )
+    headers = {"Authorization": f"Bearer {auth_resp.json().get('access_token')}"}
+    resp = requests.post(f"{config['base_url']}/mpesa/stkpush/v1/processrequest", json=payload, headers=headers, timeout=30)
+    return resp.ok
+
+
+class Command(BaseCommand):
+    help = 'STK push throughput against the local mock gateway: per-call tokens and connections vs the gateway client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--latency-ms', type=float, default=20.0, help='Simulated gateway round trip')
+
+    def _run(self, server, push, total, concurrency):
+        server.counts.clear()
+        server.clients.clear()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda index: push(index), range(total)))
+        elapsed = time.perf_counter() - started
+        return {
+            'ok': sum(1 for result in results if result),
+            'per_second': total / elapsed,
+            'tokens': server.counts.get('/oauth/v1/generate', 0),
+            'connections': len(server.clients),
+        }
+
+    def handle(self, *args, **options):
+        server = start_mock_gateway(latency=options['latency_ms'] / 1000)
+        config = {
+            'base_url': server.base_url, 'consumer_key': 'bench-key', 'consumer_secret': 'bench-secret',
+            'short_code': '174379', 'passkey': 'bench-passkey', 'callback_base_url': 'http://localhost/callback',
+        }
+        payload = {'BusinessShortCode': config['short_code'], 'Amount': 1, 'AccountReference': 'BENCH'}
+        total, concurrency = options['requests'], options['concurrency']
+        invalidate_token(MpesaPaymentService._token_key(config))
+        close_sessions()
+
+        runs = (
+            ('per-call token + connection', lambda index: legacy_stk_push(config, payload)),
+            ('gateway client', lambda index: MpesaPaymentService.initiate_stk_push(
+                '254700000000', 1, f'BENCH-{index}', config=config)[0]),
+        )
+        self.stdout.write(
+            f'{total} STK pushes, {concurrency} concurrent, {options["latency_ms"]:.0f} ms simulated latency'
+        )
+        self.stdout.write(f"{'client':<30} {'ok':>6} {'push/s':>9} {'tokens':>7} {'connections':>12}")
+        for label, push in runs:
+            result = self._run(server, push, total, concurrency)
+            self.stdout.write(
+                f"{label:<30} {result['ok']:>6} {result['per_second']:>9.1f} {result['tokens']:>7} {result['connections']:>12}"
+            )
+        server.shutdown()
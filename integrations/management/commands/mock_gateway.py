@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from integrations.mock_gateway import start_mock_gateway
+
+
+class Command(BaseCommand):
+    help = 'Run a local mock of the M-Pesa, PayPal and KRA gateway endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument('--latency-ms', type=float, default=0.0, help='Delay added to every response')
+        parser.add_argument('--token-ttl', type=int, default=3599)
+
+    def handle(self, *args, **options):
+        server = start_mock_gateway(
+            options['host'], options['port'], options['latency_ms'] / 1000, options['token_ttl'],
+        )
+        self.stdout.write(f'Mock gateway on {server.base_url} (Ctrl+C to stop)')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+            self.stdout.write(f'Requests served: {server.counts}')
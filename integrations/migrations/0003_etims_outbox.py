@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0002_webhook_dispatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EtimsSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document_type', models.CharField(choices=[('invoice', 'Invoice'), ('pos_sale', 'POS Sale')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('document_number', models.CharField(blank=True, max_length=100, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('retrying', 'Retrying'), ('submitted', 'Submitted'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('control_number', models.CharField(blank=True, help_text='Control unit invoice number returned by KRA', max_length=100, null=True)),
+                ('qr_data', models.TextField(blank=True, help_text='Verification QR content/URL returned by KRA', null=True)),
+                ('response_payload', models.JSONField(blank=True, null=True)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'eTIMS Submission',
+                'verbose_name_plural': 'eTIMS Submissions',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='etims_submission_due_idx'), models.Index(fields=['control_number'], name='integration_control_677574_idx')],
+                'constraints': [models.UniqueConstraint(fields=('document_type', 'object_id'), name='uniq_etims_submission_document')],
+            },
+        ),
+    ]
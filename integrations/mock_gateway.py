@@ -0,0 +1,86 @@
+"""
+Local stand-in for the M-Pesa, PayPal and KRA eTIMS endpoints the gateway
+clients call, for benchmarks and manual testing without sandbox
+credentials. Serves HTTP/1.1 keep-alive so pooled sessions reuse
+connections, with an optional per-request latency to mimic the real round
+trip.
+
+    python manage.py mock_gateway --port 8089
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import uuid
+
+
+class MockGatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, delayed ACKs stall keep-alive connections
+    disable_nagle_algorithm = True
+
+    TOKEN_PATHS = ('/oauth/v1/generate', '/v1/oauth2/token', '/oauth/token')
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        server = self.server
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        if server.latency:
+            time.sleep(server.latency)
+        path = self.path.split('?', 1)[0]
+        with server.lock:
+            server.counts[path] = server.counts.get(path, 0) + 1
+            # One client address per TCP connection, so len(clients) counts connections opened
+            server.clients.add(self.client_address)
+        if path in self.TOKEN_PATHS:
+            token = uuid.uuid4().hex
+            server.tokens.add(token)
+            return self._reply(200, {'access_token': token, 'expires_in': str(server.token_ttl)})
+        if (self.headers.get('Authorization') or '').removeprefix('Bearer ') not in server.tokens:
+            return self._reply(401, {'errorMessage': 'Invalid Access Token'})
+        if path == '/mpesa/stkpush/v1/processrequest':
+            return self._reply(200, {
+                'MerchantRequestID': uuid.uuid4().hex[:12],
+                'CheckoutRequestID': f"ws_CO_{uuid.uuid4().hex[:16]}",
+                'ResponseCode': '0',
+                'ResponseDescription': 'Success. Request accepted for processing',
+            })
+        if path == '/etims/v1/invoices':
+            control_number = f"KRACU{uuid.uuid4().hex[:12].upper()}"
+            return self._reply(200, {
+                'control_number': control_number,
+                'qr_code': f"https://etims.kra.go.ke/common/link/etims/receipt/indexEtimsReceiptData?Data={control_number}",
+            })
+        if path == '/mpesa/stkpushquery/v1/query':
+            return self._reply(200, {'ResponseCode': '0', 'ResultCode': '0', 'ResultDesc': 'The service request is processed successfully.'})
+        return self._reply(200, {'status': 'ok'})
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_mock_gateway(host='127.0.0.1', port=0, latency=0.0, token_ttl=3599):
+    """Serve the mock gateway on a daemon thread; returns the server (server.base_url, server.counts)"""
+    server = ThreadingHTTPServer((host, port), MockGatewayHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.token_ttl = token_ttl
+    server.counts = {}
+    server.clients = set()
+    server.tokens = set()
+    server.lock = threading.Lock()
+    server.base_url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
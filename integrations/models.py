@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from .utils import Crypto
 from datetime import time as _time
 from decimal import Decimal as _Decimal
@@ -322,6 +323,50 @@ class KRAComplianceCheck(models.Model):
             models.Index(fields=['created_at']),
         ]
 
+
+class EtimsSubmission(models.Model):
+    """
+    eTIMS fiscalization outbox: one row per invoice or POS receipt, written
+    with the document and submitted in batches by integrations.etims.
+    """
+    DOCUMENT_TYPES = [
+        ('invoice', 'Invoice'),
+        ('pos_sale', 'POS Sale'),
+    ]
+    STATUSES = [
+        ('pending', 'Pending'),
+        ('retrying', 'Retrying'),
+        ('submitted', 'Submitted'),
+        ('failed', 'Failed'),
+    ]
+    document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPES)
+    object_id = models.PositiveIntegerField()
+    document_number = models.CharField(max_length=100, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUSES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    control_number = models.CharField(max_length=100, blank=True, null=True, help_text="Control unit invoice number returned by KRA")
+    qr_data = models.TextField(blank=True, null=True, help_text="Verification QR content/URL returned by KRA")
+    response_payload = models.JSONField(null=True, blank=True)
+    submitted_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.get_document_type_display()} {self.document_number or self.object_id} ({self.status})"
+
+    class Meta:
+        verbose_name = 'eTIMS Submission'
+        verbose_name_plural = 'eTIMS Submissions'
+        constraints = [
+            models.UniqueConstraint(fields=['document_type', 'object_id'], name='uniq_etims_submission_document'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='etims_submission_due_idx'),
+            models.Index(fields=['control_number']),
+        ]
+
 # ---------------------------
 # Webhook System
 # ---------------------------
@@ -359,6 +404,11 @@ class WebhookEvent(models.Model):
     status = models.CharField(max_length=20, choices=EVENT_STATUSES, default='pending')
     attempts = models.PositiveIntegerField(default=0)
     last_error = models.TextField(blank=True, null=True)
+    # When the dispatcher may next try this event (integrations.webhooks)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    response_status = models.PositiveIntegerField(blank=True, null=True)
+    latency_ms = models.PositiveIntegerField(blank=True, null=True, help_text="Duration of the last delivery attempt")
+    delivered_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -372,6 +422,7 @@ class WebhookEvent(models.Model):
             models.Index(fields=['event_type']),
             models.Index(fields=['status']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['status', 'next_attempt_at'], name='webhook_event_due_idx'),
         ]
 
 
@@ -1,8 +1,8 @@
 from django.utils import timezone
 from decimal import Decimal
-import requests
 import logging
 
+from ..gateway import get_session, get_token, invalidate_token, token_key
 from ..models import Integrations, MpesaSettings
 from ..utils import Crypto
 from ..services.config_service import IntegrationConfigService
@@ -29,25 +29,43 @@ class MpesaPaymentService:
         return MpesaSettings.objects.filter(integration=integration).first()
 
     @classmethod
-    def initiate_stk_push(cls, phone, amount, account_reference, description="Payment"):
+    def get_access_token(cls, config):
+        """OAuth token for the configured credentials, cached until shortly before it expires"""
+        def fetch():
+            auth_resp = get_session('mpesa').get(
+                f"{config['base_url']}/oauth/v1/generate?grant_type=client_credentials",
+                auth=(config['consumer_key'], config['consumer_secret']),
+                timeout=20,
+            )
+            auth_resp.raise_for_status()
+            data = auth_resp.json()
+            return data.get('access_token'), data.get('expires_in')
+
+        return get_token(cls._token_key(config), fetch)
+
+    @staticmethod
+    def _token_key(config):
+        return token_key('mpesa', config['base_url'], config['consumer_key'], config['consumer_secret'])
+
+    @classmethod
+    def _post(cls, config, path, payload):
+        """POST with a cached token, fetching a new one once if the gateway rejects it"""
+        for attempt in range(2):
+            headers = {"Authorization": f"Bearer {cls.get_access_token(config)}"}
+            resp = get_session('mpesa').post(f"{config['base_url']}{path}", json=payload, headers=headers, timeout=30)
+            if resp.status_code != 401 or attempt:
+                return resp
+            invalidate_token(cls._token_key(config))
+
+    @classmethod
+    def initiate_stk_push(cls, phone, amount, account_reference, description="Payment", config=None):
         # Use centralized config service for decryption and defaults
-        config = IntegrationConfigService.get_mpesa_config(decrypt_secrets=True)
+        config = config or IntegrationConfigService.get_mpesa_config(decrypt_secrets=True)
         if not config.get('consumer_key') or not config.get('consumer_secret') or not config.get('short_code'):
             return False, "Mpesa settings not configured", None
-        consumer_key = config['consumer_key']
-        consumer_secret = config['consumer_secret']
         passkey = config['passkey']
 
         try:
-            # get token
-            auth_resp = requests.get(
-                f"{config['base_url']}/oauth/v1/generate?grant_type=client_credentials",
-                auth=(consumer_key, consumer_secret),
-                timeout=20,
-            )
-            auth_resp.raise_for_status()
-            access_token = auth_resp.json().get('access_token')
-
             # password/timestamp
             from datetime import datetime
             timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
@@ -67,8 +85,7 @@ class MpesaPaymentService:
                 "AccountReference": account_reference,
                 "TransactionDesc": description,
             }
-            headers = {"Authorization": f"Bearer {access_token}"}
-            resp = requests.post(f"{config['base_url']}/mpesa/stkpush/v1/processrequest", json=payload, headers=headers, timeout=30)
+            resp = cls._post(config, "/mpesa/stkpush/v1/processrequest", payload)
             data = resp.json()
             if resp.ok and data.get('ResponseCode') == '0':
                 return True, "STK Push initiated", {
@@ -88,23 +105,13 @@ class MpesaPaymentService:
         if not config.get('consumer_key') or not config.get('consumer_secret'):
             return False, "Mpesa settings not configured", None
         try:
-            # token
-            consumer_key = config['consumer_key']
-            consumer_secret = config['consumer_secret']
-            auth_resp = requests.get(
-                f"{config['base_url']}/oauth/v1/generate?grant_type=client_credentials",
-                auth=(consumer_key, consumer_secret),
-                timeout=20,
-            )
-            access_token = auth_resp.json().get('access_token')
             payload = {
                 "BusinessShortCode": config['short_code'],
                 "Password": password,
                 "Timestamp": timestamp,
                 "CheckoutRequestID": checkout_id,
             }
-            headers = {"Authorization": f"Bearer {access_token}"}
-            resp = requests.post(f"{config['base_url']}/mpesa/stkpushquery/v1/query", json=payload, headers=headers, timeout=30)
+            resp = cls._post(config, "/mpesa/stkpushquery/v1/query", payload)
             data = resp.json()
             return resp.ok, None if resp.ok else data.get('errorMessage'), data
         except Exception as e:
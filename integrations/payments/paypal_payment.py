@@ -1,10 +1,10 @@
-import requests
 import json
 import base64
 import logging
 from decimal import Decimal
 from django.utils import timezone
 import uuid
+from ..gateway import get_session, get_token, token_key
 from ..models import Integrations
 from ..utils import Crypto
 
@@ -111,28 +111,27 @@ class PayPalPaymentService:
         try:
             # Get settings from database
             _, config = cls.get_settings()
-            
-            url = f"{config['base_url']}/v1/oauth2/token"
-            
-            # Create auth string (Basic auth with client ID and secret)
-            auth_string = f"{config['client_id']}:{config['client_secret']}"
-            encoded_auth = base64.b64encode(auth_string.encode()).decode()
-            
-            headers = {
-                "Authorization": f"Basic {encoded_auth}",
-                "Content-Type": "application/x-www-form-urlencoded",
-            }
-            
-            data = "grant_type=client_credentials"
-            
-            response = requests.post(url, headers=headers, data=data)
-            
-            if response.status_code == 200:
-                return response.json().get("access_token")
-            else:
-                logger.error(f"Failed to get PayPal access token: {response.text}")
-                return None
-                
+
+            def fetch():
+                # Basic auth with client ID and secret
+                auth_string = f"{config['client_id']}:{config['client_secret']}"
+                encoded_auth = base64.b64encode(auth_string.encode()).decode()
+                headers = {
+                    "Authorization": f"Basic {encoded_auth}",
+                    "Content-Type": "application/x-www-form-urlencoded",
+                }
+                response = get_session('paypal').post(
+                    f"{config['base_url']}/v1/oauth2/token", headers=headers,
+                    data="grant_type=client_credentials", timeout=30,
+                )
+                if response.status_code != 200:
+                    raise ValueError(f"Failed to get PayPal access token: {response.text}")
+                data = response.json()
+                return data.get("access_token"), data.get("expires_in")
+
+            # Cached until shortly before PayPal expires it (typically 9 hours)
+            return get_token(token_key('paypal', config['base_url'], config['client_id'], config['client_secret']), fetch)
+
         except Exception as e:
             logger.error(f"PayPal access token error: {str(e)}")
             return None
@@ -213,7 +212,7 @@ class PayPalPaymentService:
                         }
                     })
             
-            response = requests.post(url, headers=headers, data=json.dumps(payload))
+            response = get_session('paypal').post(url, headers=headers, data=json.dumps(payload), timeout=30)
             
             if response.status_code in (200, 201):
                 data = response.json()
@@ -273,7 +272,7 @@ class PayPalPaymentService:
                 "Content-Type": "application/json",
             }
             
-            response = requests.post(url, headers=headers)
+            response = get_session('paypal').post(url, headers=headers, timeout=30)
             
             if response.status_code in (200, 201):
                 data = response.json()
@@ -337,7 +336,7 @@ class PayPalPaymentService:
                 "Content-Type": "application/json",
             }
             
-            response = requests.get(url, headers=headers)
+            response = get_session('paypal').get(url, headers=headers, timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
@@ -408,7 +407,7 @@ class PayPalPaymentService:
             if reason:
                 payload["note_to_payer"] = reason
                 
-            response = requests.post(url, headers=headers, data=json.dumps(payload) if payload else "")
+            response = get_session('paypal').post(url, headers=headers, data=json.dumps(payload) if payload else "", timeout=30)
             
             if response.status_code in (200, 201):
                 data = response.json()
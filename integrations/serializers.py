@@ -152,4 +152,8 @@ class WebhookEventSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = WebhookEvent
-        fields = ['id', 'endpoint', 'endpoint_id', 'event_type', 'payload', 'status', 'attempts', 'last_error', 'created_at', 'updated_at']
+        fields = [
+            'id', 'endpoint', 'endpoint_id', 'event_type', 'payload', 'status', 'attempts', 'last_error',
+            'next_attempt_at', 'response_status', 'latency_ms', 'delivered_at', 'created_at', 'updated_at',
+        ]
+        read_only_fields = ['next_attempt_at', 'response_status', 'latency_ms', 'delivered_at']
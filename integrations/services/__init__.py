@@ -1,2 +1,10 @@
 # Typo file; keep for backward compatibility but prefer 'services.py' and concrete modules.
+# This package shadows integrations/services.py, so names callers import from
+# `integrations.services` are re-exported here lazily.
 
+
+def __getattr__(name):
+    if name == 'KRAService':
+        from integrations.kra import KRAService
+        return KRAService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
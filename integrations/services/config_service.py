@@ -6,11 +6,20 @@ Provides unified access to all integration settings with:
 - Default values when DB settings not configured
 - Type-safe configuration access
 - Health check capabilities
+
+Configs are snapshotted per process, secrets decrypted once and held only
+in memory - nothing but a version number goes to the shared cache. Saving
+or deleting any integration/notification settings row bumps that version
+(integrations.signals); each process re-checks it at most every
+VERSION_CHECK_INTERVAL seconds and reloads lazily, so steady-state reads
+cost no queries and no decryption.
 """
 from typing import Dict, Any, Optional, Tuple
 from django.core.cache import cache
 from decimal import Decimal
 import logging
+import threading
+import time
 
 from integrations.models import (
     Integrations, MpesaSettings, CardPaymentSettings, 
@@ -24,6 +33,44 @@ from integrations.utils import Crypto
 
 logger = logging.getLogger(__name__)
 
+CONFIG_VERSION_KEY = 'integrations:config:version'
+VERSION_CHECK_INTERVAL = 5.0
+# Keys the pre-snapshot implementation kept in the shared cache (with decrypted secrets)
+LEGACY_CACHE_KEYS = [
+    'mpesa_config_decrypted', 'mpesa_config_raw',
+    'kra_config_decrypted', 'kra_config_raw',
+    'sms_config_decrypted', 'sms_config_raw',
+    'email_config_decrypted', 'email_config_raw',
+    'card_config_decrypted', 'card_config_raw',
+]
+
+_snapshot_lock = threading.Lock()
+_snapshot = {'version': None, 'checked_at': 0.0, 'configs': {}}
+
+
+def _snapshot_configs() -> Dict[str, Dict[str, Any]]:
+    """This process's loaded configs, emptied when another process bumped the version"""
+    now = time.monotonic()
+    if now - _snapshot['checked_at'] >= VERSION_CHECK_INTERVAL:
+        version = cache.get(CONFIG_VERSION_KEY) or 0
+        with _snapshot_lock:
+            if version != _snapshot['version']:
+                _snapshot['configs'] = {}
+                _snapshot['version'] = version
+            _snapshot['checked_at'] = now
+    return _snapshot['configs']
+
+
+def bump_config_version():
+    """Invalidate config snapshots in every process (this one immediately)"""
+    try:
+        cache.incr(CONFIG_VERSION_KEY)
+    except ValueError:
+        cache.set(CONFIG_VERSION_KEY, 1, None)
+    with _snapshot_lock:
+        _snapshot['configs'] = {}
+        _snapshot['checked_at'] = 0.0
+
 
 class IntegrationConfigService:
     """
@@ -96,47 +143,38 @@ class IntegrationConfigService:
         Get M-Pesa configuration with optional decryption.
         Returns defaults if not configured in DB.
         """
-        cache_key = 'mpesa_config_decrypted' if decrypt_secrets else 'mpesa_config_raw'
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        return cls._cached_config('mpesa', decrypt_secrets, cls._load_mpesa_config, cls.DEFAULT_MPESA_CONFIG, 'M-Pesa')
+    
+    @classmethod
+    def _load_mpesa_config(cls, decrypt_secrets: bool) -> Dict[str, Any]:
+        integration = Integrations.objects.filter(
+            integration_type='PAYMENT',
+            is_active=True,
+            name='MPESA'
+        ).first()
         
-        try:
-            integration = Integrations.objects.filter(
-                integration_type='PAYMENT',
-                is_active=True,
-                name='MPESA'
-            ).first()
-            
-            if not integration:
-                logger.warning("M-Pesa integration not found, using defaults")
-                cache.set(cache_key, cls.DEFAULT_MPESA_CONFIG, timeout=300)
-                return cls.DEFAULT_MPESA_CONFIG
-            
-            settings = MpesaSettings.objects.filter(integration=integration).first()
-            if not settings:
-                logger.warning("M-Pesa settings not found, using defaults")
-                cache.set(cache_key, cls.DEFAULT_MPESA_CONFIG, timeout=300)
-                return cls.DEFAULT_MPESA_CONFIG
-            
-            config = {
-                'consumer_key': cls._decrypt_if_needed(settings.consumer_key) if decrypt_secrets else settings.consumer_key,
-                'consumer_secret': cls._decrypt_if_needed(settings.consumer_secret) if decrypt_secrets else settings.consumer_secret,
-                'passkey': cls._decrypt_if_needed(settings.passkey) if decrypt_secrets else settings.passkey,
-                'security_credential': cls._decrypt_if_needed(settings.security_credential) if decrypt_secrets else settings.security_credential,
-                'short_code': settings.short_code or '',
-                'base_url': settings.base_url,
-                'callback_base_url': settings.callback_base_url or '',
-                'initiator_name': settings.initiator_name or '',
-                'initiator_password': cls._decrypt_if_needed(settings.initiator_password) if decrypt_secrets else settings.initiator_password,
-            }
-            
-            cache.set(cache_key, config, timeout=300)
-            return config
-            
-        except Exception as e:
-            logger.error(f"Error getting M-Pesa config: {str(e)}")
+        if not integration:
+            logger.warning("M-Pesa integration not found, using defaults")
+            return cls.DEFAULT_MPESA_CONFIG
+        
+        settings = MpesaSettings.objects.filter(integration=integration).first()
+        if not settings:
+            logger.warning("M-Pesa settings not found, using defaults")
             return cls.DEFAULT_MPESA_CONFIG
+        
+        config = {
+            'consumer_key': cls._decrypt_if_needed(settings.consumer_key) if decrypt_secrets else settings.consumer_key,
+            'consumer_secret': cls._decrypt_if_needed(settings.consumer_secret) if decrypt_secrets else settings.consumer_secret,
+            'passkey': cls._decrypt_if_needed(settings.passkey) if decrypt_secrets else settings.passkey,
+            'security_credential': cls._decrypt_if_needed(settings.security_credential) if decrypt_secrets else settings.security_credential,
+            'short_code': settings.short_code or '',
+            'base_url': settings.base_url,
+            'callback_base_url': settings.callback_base_url or '',
+            'initiator_name': settings.initiator_name or '',
+            'initiator_password': cls._decrypt_if_needed(settings.initiator_password) if decrypt_secrets else settings.initiator_password,
+        }
+        
+        return config
     
     @classmethod
     def get_kra_config(cls, decrypt_secrets: bool = True) -> Dict[str, Any]:
@@ -144,42 +182,34 @@ class IntegrationConfigService:
         Get KRA eTIMS configuration with optional decryption.
         Returns defaults if not configured in DB.
         """
-        cache_key = 'kra_config_decrypted' if decrypt_secrets else 'kra_config_raw'
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        return cls._cached_config('kra', decrypt_secrets, cls._load_kra_config, cls.DEFAULT_KRA_CONFIG, 'KRA')
+    
+    @classmethod
+    def _load_kra_config(cls, decrypt_secrets: bool) -> Dict[str, Any]:
+        settings = KRASettings.objects.order_by('-updated_at').first()
         
-        try:
-            settings = KRASettings.objects.order_by('-updated_at').first()
-            
-            if not settings:
-                logger.warning("KRA settings not found, using defaults")
-                cache.set(cache_key, cls.DEFAULT_KRA_CONFIG, timeout=300)
-                return cls.DEFAULT_KRA_CONFIG
-            
-            config = {
-                'mode': settings.mode,
-                'base_url': settings.base_url,
-                'kra_pin': settings.kra_pin or '',
-                'branch_code': settings.branch_code or '',
-                'client_id': cls._decrypt_if_needed(settings.client_id) if decrypt_secrets else settings.client_id,
-                'client_secret': cls._decrypt_if_needed(settings.client_secret) if decrypt_secrets else settings.client_secret,
-                'username': settings.username or '',
-                'password': cls._decrypt_if_needed(settings.password) if decrypt_secrets else settings.password,
-                'token_path': settings.token_path,
-                'invoice_path': settings.invoice_path,
-                'invoice_status_path': settings.invoice_status_path,
-                'certificate_path': settings.certificate_path,
-                'compliance_path': settings.compliance_path,
-                'sync_path': settings.sync_path,
-            }
-            
-            cache.set(cache_key, config, timeout=300)
-            return config
-            
-        except Exception as e:
-            logger.error(f"Error getting KRA config: {str(e)}")
+        if not settings:
+            logger.warning("KRA settings not found, using defaults")
             return cls.DEFAULT_KRA_CONFIG
+        
+        config = {
+            'mode': settings.mode,
+            'base_url': settings.base_url,
+            'kra_pin': settings.kra_pin or '',
+            'branch_code': settings.branch_code or '',
+            'client_id': cls._decrypt_if_needed(settings.client_id) if decrypt_secrets else settings.client_id,
+            'client_secret': cls._decrypt_if_needed(settings.client_secret) if decrypt_secrets else settings.client_secret,
+            'username': settings.username or '',
+            'password': cls._decrypt_if_needed(settings.password) if decrypt_secrets else settings.password,
+            'token_path': settings.token_path,
+            'invoice_path': settings.invoice_path,
+            'invoice_status_path': settings.invoice_status_path,
+            'certificate_path': settings.certificate_path,
+            'compliance_path': settings.compliance_path,
+            'sync_path': settings.sync_path,
+        }
+        
+        return config
     
     @classmethod
     def get_sms_config(cls, decrypt_secrets: bool = True) -> Dict[str, Any]:
@@ -187,47 +217,38 @@ class IntegrationConfigService:
         Get SMS configuration with optional decryption.
         Returns defaults if not configured in DB.
         """
-        cache_key = 'sms_config_decrypted' if decrypt_secrets else 'sms_config_raw'
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        return cls._cached_config('sms', decrypt_secrets, cls._load_sms_config, cls.DEFAULT_SMS_CONFIG, 'SMS')
+    
+    @classmethod
+    def _load_sms_config(cls, decrypt_secrets: bool) -> Dict[str, Any]:
+        integration = NotificationIntegration.objects.filter(
+            integration_type='SMS',
+            is_active=True,
+            is_default=True
+        ).first()
         
-        try:
-            integration = NotificationIntegration.objects.filter(
-                integration_type='SMS',
-                is_active=True,
-                is_default=True
-            ).first()
-            
-            if not integration:
-                logger.warning("SMS integration not found, using defaults")
-                cache.set(cache_key, cls.DEFAULT_SMS_CONFIG, timeout=300)
-                return cls.DEFAULT_SMS_CONFIG
-            
-            settings = SMSConfiguration.objects.filter(integration=integration).first()
-            if not settings:
-                logger.warning("SMS settings not found, using defaults")
-                cache.set(cache_key, cls.DEFAULT_SMS_CONFIG, timeout=300)
-                return cls.DEFAULT_SMS_CONFIG
-            
-            config = {
-                'provider': settings.provider,
-                'api_key': cls._decrypt_if_needed(settings.api_key) if decrypt_secrets else settings.api_key,
-                'api_username': settings.api_username or 'sandbox',
-                'auth_token': cls._decrypt_if_needed(settings.auth_token) if decrypt_secrets else settings.auth_token,
-                'account_sid': cls._decrypt_if_needed(settings.account_sid) if decrypt_secrets else settings.account_sid,
-                'from_number': settings.from_number or '',
-                'aws_access_key': cls._decrypt_if_needed(settings.aws_access_key) if decrypt_secrets else settings.aws_access_key,
-                'aws_secret_key': cls._decrypt_if_needed(settings.aws_secret_key) if decrypt_secrets else settings.aws_secret_key,
-                'aws_region': settings.aws_region or 'us-east-1',
-            }
-            
-            cache.set(cache_key, config, timeout=300)
-            return config
-            
-        except Exception as e:
-            logger.error(f"Error getting SMS config: {str(e)}")
+        if not integration:
+            logger.warning("SMS integration not found, using defaults")
+            return cls.DEFAULT_SMS_CONFIG
+        
+        settings = SMSConfiguration.objects.filter(integration=integration).first()
+        if not settings:
+            logger.warning("SMS settings not found, using defaults")
             return cls.DEFAULT_SMS_CONFIG
+        
+        config = {
+            'provider': settings.provider,
+            'api_key': cls._decrypt_if_needed(settings.api_key) if decrypt_secrets else settings.api_key,
+            'api_username': settings.api_username or 'sandbox',
+            'auth_token': cls._decrypt_if_needed(settings.auth_token) if decrypt_secrets else settings.auth_token,
+            'account_sid': cls._decrypt_if_needed(settings.account_sid) if decrypt_secrets else settings.account_sid,
+            'from_number': settings.from_number or '',
+            'aws_access_key': cls._decrypt_if_needed(settings.aws_access_key) if decrypt_secrets else settings.aws_access_key,
+            'aws_secret_key': cls._decrypt_if_needed(settings.aws_secret_key) if decrypt_secrets else settings.aws_secret_key,
+            'aws_region': settings.aws_region or 'us-east-1',
+        }
+        
+        return config
     
     @classmethod
     def get_email_config(cls, decrypt_secrets: bool = True) -> Dict[str, Any]:
@@ -235,50 +256,41 @@ class IntegrationConfigService:
         Get Email configuration with optional decryption.
         Returns defaults if not configured in DB.
         """
-        cache_key = 'email_config_decrypted' if decrypt_secrets else 'email_config_raw'
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        return cls._cached_config('email', decrypt_secrets, cls._load_email_config, cls.DEFAULT_EMAIL_CONFIG, 'Email')
+    
+    @classmethod
+    def _load_email_config(cls, decrypt_secrets: bool) -> Dict[str, Any]:
+        integration = NotificationIntegration.objects.filter(
+            integration_type='EMAIL',
+            is_active=True,
+            is_default=True
+        ).first()
         
-        try:
-            integration = NotificationIntegration.objects.filter(
-                integration_type='EMAIL',
-                is_active=True,
-                is_default=True
-            ).first()
-            
-            if not integration:
-                logger.warning("Email integration not found, using defaults")
-                cache.set(cache_key, cls.DEFAULT_EMAIL_CONFIG, timeout=300)
-                return cls.DEFAULT_EMAIL_CONFIG
-            
-            settings = EmailConfiguration.objects.filter(integration=integration).first()
-            if not settings:
-                logger.warning("Email settings not found, using defaults")
-                cache.set(cache_key, cls.DEFAULT_EMAIL_CONFIG, timeout=300)
-                return cls.DEFAULT_EMAIL_CONFIG
-            
-            config = {
-                'provider': settings.provider,
-                'from_email': settings.from_email,
-                'from_name': settings.from_name,
-                'smtp_host': settings.smtp_host,
-                'smtp_port': settings.smtp_port,
-                'smtp_username': settings.smtp_username or '',
-                'smtp_password': cls._decrypt_if_needed(settings.smtp_password) if decrypt_secrets else settings.smtp_password,
-                'use_tls': settings.use_tls,
-                'use_ssl': settings.use_ssl,
-                'api_key': cls._decrypt_if_needed(settings.api_key) if decrypt_secrets else settings.api_key,
-                'api_secret': cls._decrypt_if_needed(settings.api_secret) if decrypt_secrets else settings.api_secret,
-                'api_url': settings.api_url or '',
-            }
-            
-            cache.set(cache_key, config, timeout=300)
-            return config
-            
-        except Exception as e:
-            logger.error(f"Error getting Email config: {str(e)}")
+        if not integration:
+            logger.warning("Email integration not found, using defaults")
+            return cls.DEFAULT_EMAIL_CONFIG
+        
+        settings = EmailConfiguration.objects.filter(integration=integration).first()
+        if not settings:
+            logger.warning("Email settings not found, using defaults")
             return cls.DEFAULT_EMAIL_CONFIG
+        
+        config = {
+            'provider': settings.provider,
+            'from_email': settings.from_email,
+            'from_name': settings.from_name,
+            'smtp_host': settings.smtp_host,
+            'smtp_port': settings.smtp_port,
+            'smtp_username': settings.smtp_username or '',
+            'smtp_password': cls._decrypt_if_needed(settings.smtp_password) if decrypt_secrets else settings.smtp_password,
+            'use_tls': settings.use_tls,
+            'use_ssl': settings.use_ssl,
+            'api_key': cls._decrypt_if_needed(settings.api_key) if decrypt_secrets else settings.api_key,
+            'api_secret': cls._decrypt_if_needed(settings.api_secret) if decrypt_secrets else settings.api_secret,
+            'api_url': settings.api_url or '',
+        }
+        
+        return config
     
     @classmethod
     def get_card_payment_config(cls, decrypt_secrets: bool = True) -> Dict[str, Any]:
@@ -286,49 +298,56 @@ class IntegrationConfigService:
         Get Card Payment configuration with optional decryption.
         Returns defaults if not configured in DB.
         """
-        cache_key = 'card_config_decrypted' if decrypt_secrets else 'card_config_raw'
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        return cls._cached_config('card_payment', decrypt_secrets, cls._load_card_payment_config, cls.DEFAULT_CARD_CONFIG, 'Card Payment')
+    
+    @classmethod
+    def _load_card_payment_config(cls, decrypt_secrets: bool) -> Dict[str, Any]:
+        integration = Integrations.objects.filter(
+            integration_type='PAYMENT',
+            is_active=True,
+            name='CARD'
+        ).first()
         
-        try:
-            integration = Integrations.objects.filter(
-                integration_type='PAYMENT',
-                is_active=True,
-                name='CARD'
-            ).first()
-            
-            if not integration:
-                logger.warning("Card payment integration not found, using defaults")
-                cache.set(cache_key, cls.DEFAULT_CARD_CONFIG, timeout=300)
-                return cls.DEFAULT_CARD_CONFIG
-            
-            settings = CardPaymentSettings.objects.filter(integration=integration).first()
-            if not settings:
-                logger.warning("Card payment settings not found, using defaults")
-                cache.set(cache_key, cls.DEFAULT_CARD_CONFIG, timeout=300)
-                return cls.DEFAULT_CARD_CONFIG
-            
-            config = {
-                'provider': settings.provider,
-                'is_test_mode': settings.is_test_mode,
-                'api_key': cls._decrypt_if_needed(settings.api_key) if decrypt_secrets else settings.api_key,
-                'public_key': settings.public_key,
-                'webhook_secret': cls._decrypt_if_needed(settings.webhook_secret) if decrypt_secrets else settings.webhook_secret,
-                'base_url': settings.base_url,
-                'webhook_url': settings.webhook_url,
-                'success_url': settings.success_url,
-                'cancel_url': settings.cancel_url,
-                'default_currency': settings.default_currency,
-                'business_name': settings.business_name,
-            }
-            
-            cache.set(cache_key, config, timeout=300)
-            return config
-            
-        except Exception as e:
-            logger.error(f"Error getting Card Payment config: {str(e)}")
+        if not integration:
+            logger.warning("Card payment integration not found, using defaults")
+            return cls.DEFAULT_CARD_CONFIG
+        
+        settings = CardPaymentSettings.objects.filter(integration=integration).first()
+        if not settings:
+            logger.warning("Card payment settings not found, using defaults")
             return cls.DEFAULT_CARD_CONFIG
+        
+        config = {
+            'provider': settings.provider,
+            'is_test_mode': settings.is_test_mode,
+            'api_key': cls._decrypt_if_needed(settings.api_key) if decrypt_secrets else settings.api_key,
+            'public_key': settings.public_key,
+            'webhook_secret': cls._decrypt_if_needed(settings.webhook_secret) if decrypt_secrets else settings.webhook_secret,
+            'base_url': settings.base_url,
+            'webhook_url': settings.webhook_url,
+            'success_url': settings.success_url,
+            'cancel_url': settings.cancel_url,
+            'default_currency': settings.default_currency,
+            'business_name': settings.business_name,
+        }
+        
+        return config
+    
+    @classmethod
+    def _cached_config(cls, name, decrypt_secrets, loader, default, label) -> Dict[str, Any]:
+        """A copy of the process snapshot of a config, loading it on first use after a change"""
+        configs = _snapshot_configs()
+        key = f"{name}:{'decrypted' if decrypt_secrets else 'raw'}"
+        config = configs.get(key)
+        if config is None:
+            try:
+                config = loader(decrypt_secrets)
+            except Exception as e:
+                # Not snapshotted, so the next call retries the database
+                logger.error(f"Error getting {label} config: {str(e)}")
+                return dict(default)
+            configs[key] = config
+        return dict(config)
     
     @classmethod
     def _decrypt_if_needed(cls, value: Optional[str]) -> str:
@@ -558,15 +577,8 @@ class IntegrationConfigService:
     @classmethod
     def clear_config_cache(cls):
         """Clear all integration configuration caches."""
-        cache_keys = [
-            'mpesa_config_decrypted', 'mpesa_config_raw',
-            'kra_config_decrypted', 'kra_config_raw',
-            'sms_config_decrypted', 'sms_config_raw',
-            'email_config_decrypted', 'email_config_raw',
-            'card_config_decrypted', 'card_config_raw',
-        ]
-        for key in cache_keys:
-            cache.delete(key)
+        bump_config_version()
+        cache.delete_many(LEGACY_CACHE_KEYS)
         
         logger.info("Integration configuration cache cleared")
         return True
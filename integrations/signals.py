@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .etims import UNFISCALIZED_INVOICE_STATUSES, enqueue_document
+from .services.config_service import bump_config_version
+
+# Models IntegrationConfigService reads; any change invalidates every process's config snapshot
+CONFIG_MODELS = [
+    'integrations.Integrations', 'integrations.MpesaSettings', 'integrations.CardPaymentSettings',
+    'integrations.PayPalSettings', 'integrations.KRASettings',
+    'notifications.NotificationIntegration', 'notifications.EmailConfiguration',
+    'notifications.SMSConfiguration', 'notifications.PushConfiguration',
+]
+
+
+def _status_may_have_changed(kwargs):
+    update_fields = kwargs.get('update_fields')
+    return update_fields is None or 'status' in update_fields
+
+
+@receiver(post_save, sender='invoicing.Invoice', dispatch_uid='etims_outbox_invoice')
+def queue_issued_invoice(sender, instance, raw=False, **kwargs):
+    """Queue an invoice for fiscalization once it leaves draft (same transaction as the save)"""
+    if raw or not _status_may_have_changed(kwargs) or instance.status in UNFISCALIZED_INVOICE_STATUSES:
+        return
+    enqueue_document('invoice', instance.pk, instance.invoice_number)
+
+
+@receiver(post_save, sender='pos.Sales', dispatch_uid='etims_outbox_pos_sale')
+def queue_final_sale(sender, instance, raw=False, **kwargs):
+    if raw or not _status_may_have_changed(kwargs) or instance.status != 'Final' or instance.delete_status:
+        return
+    enqueue_document('pos_sale', instance.pk, instance.sale_id)
+
+
+def invalidate_config_snapshots(sender, **kwargs):
+    # After commit, so no process reloads the old row before the change is visible
+    transaction.on_commit(bump_config_version)
+
+
+for model in CONFIG_MODELS:
+    post_save.connect(invalidate_config_snapshots, sender=model, dispatch_uid=f'config_snapshot_save_{model}')
+    post_delete.connect(invalidate_config_snapshots, sender=model, dispatch_uid=f'config_snapshot_delete_{model}')
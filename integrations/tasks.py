@@ -0,0 +1,24 @@
+"""
+Celery tasks for integrations.
+"""
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def dispatch_webhooks(max_batches=50):
+    """Deliver due webhook events (new ones and scheduled retries)"""
+    from integrations.webhooks import dispatch_pending
+
+    return dispatch_pending(max_batches)
+
+
+@shared_task
+def submit_etims_outbox(max_batches=25):
+    """Fiscalize queued invoices and POS receipts with KRA eTIMS"""
+    from integrations.etims import submit_pending
+
+    return submit_pending(max_batches)
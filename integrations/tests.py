@@ -1,3 +1,303 @@
-from django.test import TestCase
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
 
-# Create your tests here.
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from business.models import Branch, BusinessLocation, Bussiness
+from crm.contacts.models import Contact
+from ecommerce.pos.models import Sales
+from finance.invoicing.models import Invoice
+from integrations import etims, gateway, webhooks
+from integrations.kra import KRAError, KRAService
+from integrations.mock_gateway import start_mock_gateway
+from integrations.models import EtimsSubmission, Integrations, KRASettings, MpesaSettings, WebhookEndpoint, WebhookEvent
+from integrations.payments.mpesa_payment import MpesaPaymentService
+from integrations.services import config_service
+from integrations.services.config_service import IntegrationConfigService
+
+User = get_user_model()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class GatewayTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        gateway._tokens.clear()
+        self.fetches = []
+
+    def fetch(self):
+        self.fetches.append(1)
+        return f'token-{len(self.fetches)}', 3600
+
+    def test_token_cached_and_refreshed_ahead_by_one_worker(self):
+        key = gateway.token_key('kra', 'https://kra', 'client')
+        self.assertEqual([gateway.get_token(key, self.fetch) for _ in range(3)], ['token-1'] * 3)
+        self.assertEqual(len(self.fetches), 1)
+
+        # Near expiry while another worker holds the refresh lock: keep the current token
+        cache.set(key, ('token-1', time.time() + 30))
+        gateway._tokens.clear()
+        cache.add(f'{key}:lock', 1)
+        self.assertEqual(gateway.get_token(key, self.fetch), 'token-1')
+        cache.delete(f'{key}:lock')
+        self.assertEqual(gateway.get_token(key, self.fetch), 'token-2')
+
+        gateway.invalidate_token(key)
+        self.assertEqual(gateway.get_token(key, self.fetch), 'token-3')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MpesaGatewayClientTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        gateway._tokens.clear()
+        gateway.close_sessions()
+        self.server = start_mock_gateway()
+        self.addCleanup(self.server.shutdown)
+        self.config = {
+            'base_url': self.server.base_url, 'consumer_key': 'key', 'consumer_secret': 'secret',
+            'short_code': '174379', 'passkey': 'passkey', 'callback_base_url': 'http://localhost/callback',
+        }
+
+    def test_pushes_share_one_token_and_connection(self):
+        for reference in ('INV-1', 'INV-2', 'INV-3'):
+            ok, message, data = MpesaPaymentService.initiate_stk_push('254700000000', 10, reference, config=self.config)
+            self.assertTrue(ok, message)
+            self.assertTrue(data['checkout_id'].startswith('ws_CO_'))
+        self.assertEqual(self.server.counts['/oauth/v1/generate'], 1)
+        self.assertEqual(self.server.counts['/mpesa/stkpush/v1/processrequest'], 3)
+        self.assertEqual(len(self.server.clients), 1)
+
+    def test_rejected_token_is_replaced_once(self):
+        key = MpesaPaymentService._token_key(self.config)
+        cache.set(key, ('revoked', time.time() + 3600))
+
+        ok, message, _ = MpesaPaymentService.initiate_stk_push('254700000000', 10, 'INV-1', config=self.config)
+        self.assertTrue(ok, message)
+        self.assertEqual(self.server.counts['/mpesa/stkpush/v1/processrequest'], 2)
+        self.assertEqual(self.server.counts['/oauth/v1/generate'], 1)
+
+
+class WebhookReceiver(BaseHTTPRequestHandler):
+    """200 on /ok, 503 anywhere else; records the signature headers it saw"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.received.append((self.path, self.headers.get('X-Webhook-Timestamp'), self.headers.get('X-Webhook-Signature'), body))
+        self.send_response(200 if self.path == '/ok' else 503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class WebhookDispatcherTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        server = ThreadingHTTPServer(('127.0.0.1', 0), WebhookReceiver)
+        server.received = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        self.server = server
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        self.ok = WebhookEndpoint.objects.create(name='ok', url=f'{base}/ok', secret='s3cret')
+        self.down = WebhookEndpoint.objects.create(name='down', url=f'{base}/down')
+
+    def events(self, endpoint, count):
+        return [WebhookEvent.objects.create(endpoint=endpoint, event_type='invoice.paid', payload={'n': n}) for n in range(count)]
+
+    def test_batch_delivers_concurrently_and_schedules_retries(self):
+        self.events(self.ok, 3)
+        failing = self.events(self.down, 2)
+
+        stats = webhooks.dispatch_batch()
+        self.assertEqual((stats['claimed'], stats['delivered'], stats['retrying']), (5, 3, 2))
+        self.assertIsNotNone(stats['latency_ms']['p99'])
+        event = WebhookEvent.objects.get(pk=failing[0].pk)
+        self.assertEqual((event.status, event.attempts, event.response_status), ('retrying', 1, 503))
+        self.assertGreater(event.next_attempt_at, timezone.now() + timedelta(seconds=25))
+        # Retries are not due yet, so nothing is claimed (and no worker sleeps waiting for them)
+        self.assertEqual(webhooks.dispatch_batch()['claimed'], 0)
+
+        _, timestamp, signature, body = next(hit for hit in self.server.received if hit[0] == '/ok')
+        self.assertEqual(signature, webhooks.sign_payload('s3cret', json.loads(body), timestamp))
+        report = webhooks.delivery_stats()
+        self.assertEqual([(row['endpoint'], row['events'], row['delivered']) for row in report['endpoints']], [('down', 2, 0), ('ok', 3, 3)])
+
+    def test_results_are_not_written_once_the_lease_is_lost(self):
+        kept, reclaimed = self.events(self.ok, 2)
+        deliver_all = webhooks._deliver_all
+
+        def overrun(events):
+            # Another dispatcher re-claims one event while this batch is still posting
+            WebhookEvent.objects.filter(pk=reclaimed.pk).update(next_attempt_at=timezone.now() + webhooks.LEASE * 2)
+            return deliver_all(events)
+
+        with mock.patch.object(webhooks, '_deliver_all', overrun):
+            webhooks.dispatch_batch()
+        self.assertEqual(WebhookEvent.objects.get(pk=kept.pk).status, 'delivered')
+        self.assertEqual((WebhookEvent.objects.get(pk=reclaimed.pk).status, WebhookEvent.objects.get(pk=reclaimed.pk).attempts), ('pending', 0))
+        self.assertGreater(webhooks.LEASE.total_seconds(), webhooks.BATCH_SIZE / webhooks.ENDPOINT_CONCURRENCY * webhooks.TIMEOUT)
+
+    def test_open_circuit_defers_without_spending_attempts(self):
+        self.events(self.down, webhooks.BREAKER_THRESHOLD)
+        webhooks.dispatch_batch()
+        self.assertIsNotNone(webhooks.breaker_open_until(self.down.pk))
+
+        WebhookEvent.objects.update(next_attempt_at=timezone.now())
+        stats = webhooks.dispatch_batch()
+        self.assertEqual((stats['deferred'], stats['retrying']), (webhooks.BREAKER_THRESHOLD, 0))
+        self.assertEqual(set(WebhookEvent.objects.values_list('attempts', flat=True)), {1})
+        self.assertEqual(len(self.server.received), webhooks.BREAKER_THRESHOLD)
+        self.assertFalse(webhooks.claim_due_events())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class EtimsOutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        gateway._tokens.clear()
+        gateway.close_sessions()
+        self.server = start_mock_gateway()
+        self.addCleanup(self.server.shutdown)
+        self.settings = KRASettings.objects.create(base_url=self.server.base_url, username='etims')
+        user = User.objects.create_user(username='etims', email='etims@example.com', password='pass')
+        location = BusinessLocation.objects.create(city='Nairobi')
+        business = Bussiness.objects.create(name='eTIMS Biz', owner=user, location=location)
+        self.branch = Branch.objects.create(name='HQ', business=business, location=location, branch_code='ETM01')
+        self.customer = Contact.objects.create(contact_id='C1', user=user, business_name='Acme', tax_number='P051')
+
+    def invoice(self, status):
+        return Invoice.objects.create(
+            branch=self.branch, customer=self.customer, invoice_date=timezone.localdate(), status=status,
+            subtotal=Decimal('100'), tax_amount=Decimal('16'), total=Decimal('116'),
+        )
+
+    def test_issued_documents_are_queued_once(self):
+        invoice = self.invoice('draft')
+        Sales.objects.create(sale_id='POS-1', status='Draft')
+        self.assertFalse(EtimsSubmission.objects.exists())
+
+        invoice.status = 'sent'
+        invoice.save()
+        invoice.save()
+        sale = Sales.objects.create(sale_id='POS-2', grand_total=Decimal('58'))
+        self.assertEqual(
+            sorted(EtimsSubmission.objects.values_list('document_type', 'object_id', 'document_number')),
+            [('invoice', invoice.pk, invoice.invoice_number), ('pos_sale', sale.pk, 'POS-2')],
+        )
+
+    def test_batch_submits_with_one_token_and_stores_control_numbers(self):
+        invoice = self.invoice('sent')
+        sale = Sales.objects.create(sale_id='POS-1', grand_total=Decimal('58'))
+        EtimsSubmission.objects.create(document_type='pos_sale', object_id=sale.pk + 1000)
+
+        stats = etims.submit_batch()
+        self.assertEqual((stats['submitted'], stats['failed']), (2, 1))
+        self.assertEqual((self.server.counts['/oauth/token'], self.server.counts['/etims/v1/invoices']), (1, 2))
+        invoice.refresh_from_db()
+        sale.refresh_from_db()
+        submission = EtimsSubmission.objects.get(document_type='invoice')
+        self.assertTrue(invoice.kra_compliance)
+        self.assertEqual(invoice.tax_reference, submission.control_number)
+        self.assertIn(submission.control_number, invoice.etims_qr_data)
+        self.assertTrue(sale.etims_control_number.startswith('KRACU'))
+        self.assertEqual(etims.submit_batch()['claimed'], 0)
+
+    def test_token_failure_reschedules_without_submitting(self):
+        self.settings.token_path = '/no-token'
+        self.settings.save()
+        self.invoice('sent')
+
+        self.assertEqual(etims.submit_batch()['retrying'], 1)
+        submission = EtimsSubmission.objects.get()
+        self.assertEqual((submission.status, submission.attempts), ('retrying', 1))
+        self.assertGreater(submission.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        self.assertNotIn('/etims/v1/invoices', self.server.counts)
+
+    def test_retry_checks_status_before_posting_again(self):
+        self.invoice('sent')
+        EtimsSubmission.objects.update(status='retrying', attempts=1)
+        fiscalized = (True, {'data': {'control_number': 'KRACU1', 'qr_code': 'qr'}})
+        with mock.patch.object(KRAService, 'get_invoice_status', return_value=fiscalized) as status:
+            self.assertEqual(etims.submit_batch()['submitted'], 1)
+        status.assert_called_once()
+        self.assertEqual(EtimsSubmission.objects.get().control_number, 'KRACU1')
+        self.assertNotIn('/etims/v1/invoices', self.server.counts)
+
+    def test_results_are_not_written_once_the_lease_is_lost(self):
+        self.invoice('sent')
+        get_access_token = KRAService.get_access_token
+
+        def overrun(kra):
+            # Another run re-claims the row while this one is still working on it
+            if threading.current_thread() is threading.main_thread():
+                EtimsSubmission.objects.update(next_attempt_at=timezone.now() + etims.LEASE * 2)
+            return get_access_token(kra)
+
+        with mock.patch.object(KRAService, 'get_access_token', overrun):
+            self.assertEqual(etims.submit_batch()['submitted'], 0)
+        submission = EtimsSubmission.objects.get()
+        self.assertEqual((submission.status, submission.attempts), ('pending', 0))
+        self.assertGreater(etims.LEASE.total_seconds(), etims.BATCH_SIZE / etims.CONCURRENCY * 90)
+
+    def test_rejected_payload_fails_without_retrying(self):
+        self.invoice('sent')
+        rejected = (False, KRAError('400 Client Error: Bad Request', 400))
+        with mock.patch.object(KRAService, 'submit_invoice', return_value=rejected):
+            self.assertEqual(etims.submit_batch()['failed'], 1)
+        submission = EtimsSubmission.objects.get()
+        self.assertEqual((submission.status, submission.attempts), ('failed', 1))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ConfigSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        config_service.bump_config_version()
+        integration = Integrations.objects.create(name='MPESA', integration_type='PAYMENT', is_active=True)
+        self.settings = MpesaSettings.objects.create(integration=integration, short_code='174379', consumer_key='key')
+        decrypt = mock.patch.object(IntegrationConfigService, '_decrypt_if_needed', side_effect=lambda value: f'plain:{value}')
+        self.decrypt = decrypt.start()
+        self.addCleanup(decrypt.stop)
+
+    def test_hot_reads_skip_database_and_decryption(self):
+        first = IntegrationConfigService.get_mpesa_config()
+        decrypted = self.decrypt.call_count
+        self.assertGreater(decrypted, 0)
+        with self.assertNumQueries(0):
+            second = IntegrationConfigService.get_mpesa_config()
+        self.assertEqual(second, first)
+        self.assertEqual(self.decrypt.call_count, decrypted)
+
+        # Callers get copies, and nothing decrypted reaches the shared cache
+        second['short_code'] = 'changed'
+        self.assertEqual(IntegrationConfigService.get_mpesa_config()['short_code'], '174379')
+        self.assertEqual(list(cache._cache), [cache.make_key(config_service.CONFIG_VERSION_KEY)])
+
+    def test_settings_save_invalidates_after_commit(self):
+        IntegrationConfigService.get_mpesa_config()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.settings.short_code = '600000'
+            self.settings.save()
+        self.assertEqual(IntegrationConfigService.get_mpesa_config()['short_code'], '600000')
+
+    def test_other_process_bump_is_seen_after_check_interval(self):
+        IntegrationConfigService.get_mpesa_config()
+        MpesaSettings.objects.filter(pk=self.settings.pk).update(short_code='600000')
+        cache.incr(config_service.CONFIG_VERSION_KEY)
+        self.assertEqual(IntegrationConfigService.get_mpesa_config()['short_code'], '174379')
+
+        config_service._snapshot['checked_at'] -= config_service.VERSION_CHECK_INTERVAL
+        self.assertEqual(IntegrationConfigService.get_mpesa_config()['short_code'], '600000')
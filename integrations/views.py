@@ -109,13 +109,25 @@ class WebhookEventViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def deliver(self, request, pk=None):
         try:
-            from integrations.services import WebhookDeliveryService  # type: ignore
+            from integrations.webhooks import schedule_delivery
             event = self.get_object()
-            job_id = WebhookDeliveryService.schedule_delivery(event.pk)
+            job_id = schedule_delivery(event)
             return Response({'success': True, 'message': 'Delivery scheduled', 'job_id': job_id})
         except Exception as exc:
             return Response({'success': False, 'error': str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Delivery latency percentiles and circuit state per endpoint (last hour unless ?hours=)."""
+        from integrations.webhooks import delivery_stats
+        try:
+            hours = float(request.query_params.get('hours', 1))
+        except ValueError:
+            return Response({'detail': 'hours must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(delivery_stats(
+            since=timezone.now() - timedelta(hours=hours), endpoint_id=request.query_params.get('endpoint'),
+        ))
+
     @action(detail=False, methods=['post'])
     def certificate(self, request):
         """Retrieve a KRA tax certificate for a given type and period."""
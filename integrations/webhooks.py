@@ -0,0 +1,266 @@
+"""
+Webhook dispatcher.
+
+Due WebhookEvent rows (pending/retrying with next_attempt_at reached) are
+claimed in batches with SELECT ... FOR UPDATE SKIP LOCKED and leased by
+pushing next_attempt_at forward, so concurrent dispatchers never pick the
+same event and a crashed one's events come due again once the lease ends.
+Row locks are released before any HTTP is sent. The lease outlasts the
+slowest possible batch, and results are only written for events whose lease
+is still the one this run took, so a run that overran never overwrites the
+attempt of a dispatcher that re-claimed its events.
+
+A batch is posted concurrently on one httpx.AsyncClient, capped overall and
+per endpoint. Failures are rescheduled with exponential backoff through
+next_attempt_at rather than sleeping in the worker, and are marked failed
+after MAX_ATTEMPTS. Each endpoint has a circuit breaker in the shared
+cache: after BREAKER_THRESHOLD consecutive failures its events are deferred
+for BREAKER_COOLDOWN without being attempted.
+
+dispatch_pending runs from Celery beat (integrations.tasks); delivery_stats
+reports latency percentiles per endpoint.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone as dt_timezone
+import hashlib
+import hmac
+import json
+import logging
+import math
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+import httpx
+
+from .models import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+CONCURRENCY = 32
+ENDPOINT_CONCURRENCY = 4
+TIMEOUT = 15
+MAX_ATTEMPTS = 8
+# Retry delays double from RETRY_BASE up to RETRY_MAX seconds (about an hour of retries in all)
+RETRY_BASE = 30
+RETRY_MAX = 60 * 60
+# Claimed events stay invisible to other dispatchers this long: a whole batch
+# queued behind one endpoint's concurrency cap, plus a margin
+LEASE = timedelta(seconds=math.ceil(BATCH_SIZE / ENDPOINT_CONCURRENCY) * TIMEOUT + 60)
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 300
+DUE_STATUSES = ('pending', 'retrying')
+RESULT_FIELDS = ['status', 'attempts', 'last_error', 'response_status', 'latency_ms', 'next_attempt_at', 'delivered_at', 'updated_at']
+STATS_WINDOW = timedelta(hours=1)
+
+
+def sign_payload(secret, payload, timestamp):
+    if not secret:
+        return ''
+    body = json.dumps({'timestamp': timestamp, 'payload': payload}, separators=(',', ':'), ensure_ascii=False)
+    return hmac.new(secret.encode('utf-8'), body.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the given number of failed attempts"""
+    return min(RETRY_BASE * 2 ** max(attempts - 1, 0), RETRY_MAX)
+
+
+def _breaker_key(endpoint_id):
+    return f"webhooks:breaker:{endpoint_id}"
+
+
+def breaker_open_until(endpoint_id):
+    """Epoch seconds until which an endpoint's breaker is open, or None when closed"""
+    state = cache.get(_breaker_key(endpoint_id))
+    if state and state['open_until'] > time.time():
+        return state['open_until']
+    return None
+
+
+def _record_outcome(endpoint_id, ok):
+    key = _breaker_key(endpoint_id)
+    if ok:
+        cache.delete(key)
+        return
+    state = cache.get(key) or {'failures': 0, 'open_until': 0}
+    state['failures'] += 1
+    # Half-open after the cooldown: one more failure reopens it straight away
+    if state['failures'] >= BREAKER_THRESHOLD:
+        state['open_until'] = time.time() + BREAKER_COOLDOWN
+        logger.warning(f"Webhook endpoint {endpoint_id} circuit open after {state['failures']} failures")
+    cache.set(key, state, BREAKER_COOLDOWN * 4)
+
+
+def claim_due_events(limit=BATCH_SIZE, event_ids=None):
+    """
+    Lock, lease and return up to limit due events, skipping rows another
+    dispatcher holds. Each event's next_attempt_at is left at the lease end,
+    which identifies the claim (see _still_leased).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = (
+            WebhookEvent.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('endpoint')
+            .filter(status__in=DUE_STATUSES, next_attempt_at__lte=now, endpoint__is_active=True)
+        )
+        if event_ids is not None:
+            due = due.filter(pk__in=event_ids)
+        events = list(due.order_by('next_attempt_at', 'pk')[:limit])
+        if events:
+            WebhookEvent.objects.filter(pk__in=[event.pk for event in events]).update(next_attempt_at=now + LEASE)
+            for event in events:
+                event.next_attempt_at = now + LEASE
+    return events
+
+
+def _still_leased(leases):
+    """Ids of events whose lease ({id: lease end}) is still the one taken at claim time, locked until the caller's transaction ends"""
+    return {
+        pk for pk, lease in WebhookEvent.objects.select_for_update()
+        .filter(pk__in=leases.keys()).values_list('pk', 'next_attempt_at')
+        if lease == leases[pk]
+    }
+
+
+async def _post(client, event):
+    """(HTTP status or None, error, latency ms) of one delivery attempt"""
+    payload = event.payload or {}
+    timestamp = timezone.now().isoformat()
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Webhook-Timestamp': timestamp,
+        'X-Webhook-Signature': sign_payload(event.endpoint.secret or '', payload, timestamp),
+        'X-Webhook-Event': event.event_type,
+    }
+    started = time.perf_counter()
+    try:
+        resp = await client.post(event.endpoint.url, json=payload, headers=headers)
+        status, error = resp.status_code, '' if 200 <= resp.status_code < 300 else f"HTTP {resp.status_code}: {resp.text[:500]}"
+    except httpx.HTTPError as exc:
+        status, error = None, (str(exc) or exc.__class__.__name__)[:500]
+    return status, error, int((time.perf_counter() - started) * 1000)
+
+
+async def _deliver_all(events):
+    overall = asyncio.Semaphore(CONCURRENCY)
+    per_endpoint = {}
+
+    async with httpx.AsyncClient(timeout=TIMEOUT, limits=httpx.Limits(max_connections=CONCURRENCY)) as client:
+        async def deliver(event):
+            endpoint_limit = per_endpoint.setdefault(event.endpoint_id, asyncio.Semaphore(ENDPOINT_CONCURRENCY))
+            async with endpoint_limit, overall:
+                return await _post(client, event)
+
+        return await asyncio.gather(*(deliver(event) for event in events))
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """Nearest-rank percentiles of values as {'p50': ..., ...} (None when empty)"""
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        result[f'p{point}'] = ordered[max(math.ceil(point / 100 * len(ordered)) - 1, 0)] if ordered else None
+    return result
+
+
+def dispatch_batch(limit=BATCH_SIZE, event_ids=None):
+    """Deliver one batch of due events; returns counts and the batch's latency percentiles"""
+    events = claim_due_events(limit, event_ids)
+    stats = {'claimed': len(events), 'delivered': 0, 'retrying': 0, 'failed': 0, 'deferred': 0}
+    if not events:
+        return stats
+
+    # Open breakers: push the endpoint's events past the cooldown without spending an attempt
+    sendable, deferred = [], []
+    for event in events:
+        open_until = breaker_open_until(event.endpoint_id)
+        if open_until:
+            event.next_attempt_at = datetime.fromtimestamp(open_until, tz=dt_timezone.utc)
+            deferred.append(event)
+        else:
+            sendable.append(event)
+    if deferred:
+        WebhookEvent.objects.bulk_update(deferred, ['next_attempt_at'])
+        stats['deferred'] = len(deferred)
+
+    results = asyncio.run(_deliver_all(sendable)) if sendable else []
+    leases = {event.pk: event.next_attempt_at for event in sendable}
+    now = timezone.now()
+    for event, (status, error, latency) in zip(sendable, results):
+        ok = status is not None and 200 <= status < 300
+        event.attempts = (event.attempts or 0) + 1
+        event.response_status = status
+        event.latency_ms = latency
+        event.last_error = error
+        event.updated_at = now
+        if ok:
+            event.status = 'delivered'
+            event.delivered_at = now
+        elif event.attempts >= MAX_ATTEMPTS:
+            event.status = 'failed'
+        else:
+            event.status = 'retrying'
+            event.next_attempt_at = now + timedelta(seconds=retry_delay(event.attempts))
+        stats[event.status] += 1
+        _record_outcome(event.endpoint_id, ok)
+    if sendable:
+        with transaction.atomic():
+            held = _still_leased(leases)
+            if len(held) < len(sendable):
+                logger.warning(f"Webhook dispatch: lease lost on {len(sendable) - len(held)} events before their results were written")
+            WebhookEvent.objects.bulk_update([event for event in sendable if event.pk in held], RESULT_FIELDS)
+    stats['latency_ms'] = percentiles([latency for _, _, latency in results])
+    return stats
+
+
+def dispatch_pending(max_batches=50):
+    """Deliver due events batch by batch until none are left (or max_batches); returns totals"""
+    totals = {'claimed': 0, 'delivered': 0, 'retrying': 0, 'failed': 0, 'deferred': 0}
+    for _ in range(max_batches):
+        stats = dispatch_batch()
+        for key in totals:
+            totals[key] += stats[key]
+        if stats['claimed'] < BATCH_SIZE:
+            break
+    if totals['claimed']:
+        logger.info(f"Webhook dispatch: {totals}")
+    return totals
+
+
+def schedule_delivery(event):
+    """Make an event due now (a failed one gets one more attempt) and deliver it in the background"""
+    from core.background_jobs import submit_threaded_task
+
+    if event.status != 'delivered':
+        WebhookEvent.objects.filter(pk=event.pk).update(
+            status='retrying' if event.attempts else 'pending', next_attempt_at=timezone.now(), updated_at=timezone.now(),
+        )
+    return str(submit_threaded_task('webhooks', dispatch_batch, 1, [event.pk]))
+
+
+def delivery_stats(since=None, endpoint_id=None):
+    """Per-endpoint attempt counts, latency percentiles and breaker state for attempts since (default: last hour)"""
+    since = since or timezone.now() - STATS_WINDOW
+    attempts = WebhookEvent.objects.filter(updated_at__gte=since, latency_ms__isnull=False)
+    if endpoint_id:
+        attempts = attempts.filter(endpoint_id=endpoint_id)
+    by_endpoint = {}
+    for endpoint, name, status, latency in attempts.values_list('endpoint_id', 'endpoint__name', 'status', 'latency_ms').iterator():
+        row = by_endpoint.setdefault(endpoint, {'endpoint_id': endpoint, 'endpoint': name, 'events': 0, 'delivered': 0, 'latencies': []})
+        row['events'] += 1
+        row['delivered'] += status == 'delivered'
+        row['latencies'].append(latency)
+    rows = []
+    for row in by_endpoint.values():
+        latencies = row.pop('latencies')
+        open_until = breaker_open_until(row['endpoint_id'])
+        rows.append({
+            **row,
+            'latency_ms': percentiles(latencies),
+            'circuit_open_until': datetime.fromtimestamp(open_until, tz=dt_timezone.utc) if open_until else None,
+        })
+    return {'since': since, 'endpoints': sorted(rows, key=lambda row: row['endpoint'] or '')}
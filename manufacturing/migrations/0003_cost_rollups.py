@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:14
+
+from collections import defaultdict
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_cost_rollups(apps, schema_editor):
+    ProductFormula = apps.get_model('manufacturing', 'ProductFormula')
+    FormulaIngredient = apps.get_model('manufacturing', 'FormulaIngredient')
+    ProductionBatch = apps.get_model('manufacturing', 'ProductionBatch')
+    BatchRawMaterial = apps.get_model('manufacturing', 'BatchRawMaterial')
+
+    batch_costs = BatchRawMaterial.objects.filter(batch=OuterRef('pk')).values('batch').annotate(total=Sum('cost')).values('total')
+    ProductionBatch.objects.update(raw_material_cost=Coalesce(Subquery(batch_costs), Value(Decimal('0'))))
+
+    formulas = {}
+    by_product = {}
+    for pk, product_id, output, active in ProductFormula.objects.order_by('version', 'id').values_list(
+        'id', 'final_product_id', 'expected_output_quantity', 'is_active'
+    ):
+        formulas[pk] = output
+        if active:
+            by_product[product_id] = pk
+    ingredients = defaultdict(list)
+    for formula_id, product_id, price, quantity in FormulaIngredient.objects.values_list(
+        'formula_id', 'raw_material__product_id', 'raw_material__buying_price', 'quantity'
+    ):
+        ingredients[formula_id].append((by_product.get(product_id), price or Decimal('0'), quantity))
+
+    costs = {}
+
+    def cost_of(formula_id, path):
+        if formula_id not in costs:
+            total = Decimal('0')
+            for sub, price, quantity in ingredients[formula_id]:
+                if sub is not None and sub not in path and formulas[sub]:
+                    price = cost_of(sub, path | {formula_id}) / formulas[sub]
+                total += price * quantity
+            costs[formula_id] = total.quantize(Decimal('0.0001'))
+        return costs[formula_id]
+
+    ProductFormula.objects.bulk_update(
+        [ProductFormula(id=pk, raw_material_cost=cost_of(pk, frozenset({pk}))) for pk in formulas],
+        ['raw_material_cost'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manufacturing', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productformula',
+            name='raw_material_cost',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0.0000'), editable=False, help_text='Rolled-up cost of the ingredients, maintained by manufacturing.services.costing', max_digits=18, verbose_name='Raw Material Cost'),
+        ),
+        migrations.AddField(
+            model_name='productionbatch',
+            name='raw_material_cost',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0.0000'), editable=False, help_text="Sum of the batch's raw material costs, maintained as they change", max_digits=18, verbose_name='Raw Material Cost'),
+        ),
+        migrations.RunPython(populate_cost_rollups, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from ecommerce.product.models import Products
@@ -6,7 +6,7 @@ from ecommerce.stockinventory.models import StockInventory, Unit
 from business.models import Branch
 from django.utils import timezone
 import uuid
-from django.db.models import Sum
+from django.db.models import Count, F, Q, Sum
 from decimal import Decimal
 
 User = get_user_model()
@@ -76,6 +76,14 @@ class ProductFormula(models.Model):
     created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
     updated_at = models.DateTimeField(_("Updated At"), auto_now=True)
     version = models.PositiveIntegerField(_("Version"), default=1)
+    raw_material_cost = models.DecimalField(
+        _("Raw Material Cost"),
+        max_digits=18,
+        decimal_places=4,
+        default=Decimal('0.0000'),
+        editable=False,
+        help_text=_("Rolled-up cost of the ingredients, maintained by manufacturing.services.costing")
+    )
     
     def __str__(self):
         return f"{self.name} - v{self.version}"
@@ -96,12 +104,8 @@ class ProductFormula(models.Model):
         ]
     
     def get_raw_material_cost(self):
-        """Calculate the total cost of raw materials for this formula"""
-        total_cost = sum(
-            ingredient.raw_material.buying_price * ingredient.quantity 
-            for ingredient in self.ingredients.all()
-        )
-        return total_cost
+        """Total cost of raw materials for this formula, sub-assemblies costed through their own formulas"""
+        return self.raw_material_cost
     
     def get_suggested_selling_price(self, markup_percentage=30):
         """
@@ -234,6 +238,14 @@ class ProductionBatch(models.Model):
         decimal_places=4, 
         default=Decimal('0.0000')
     )
+    raw_material_cost = models.DecimalField(
+        _("Raw Material Cost"),
+        max_digits=18,
+        decimal_places=4,
+        default=Decimal('0.0000'),
+        editable=False,
+        help_text=_("Sum of the batch's raw material costs, maintained as they change")
+    )
     notes = models.TextField(_("Notes"), blank=True, null=True)
     created_by = models.ForeignKey(
         User, 
@@ -289,8 +301,14 @@ class ProductionBatch(models.Model):
         super().save(*args, **kwargs)
     
     def get_raw_material_cost(self):
-        """Calculate the total cost of raw materials used in this batch"""
-        return sum(material.cost for material in self.raw_materials.all())
+        """Total cost of raw materials used in this batch"""
+        return self.raw_material_cost
+    
+    def refresh_raw_material_cost(self):
+        """Recompute the stored raw material cost from the batch's materials"""
+        self.raw_material_cost = self.raw_materials.aggregate(total=Sum('cost'))['total'] or Decimal('0.0000')
+        ProductionBatch.objects.filter(pk=self.pk).update(raw_material_cost=self.raw_material_cost)
+        return self.raw_material_cost
     
     def get_total_cost(self):
         """Calculate the total cost of the batch including labor and overhead"""
@@ -312,14 +330,18 @@ class ProductionBatch(models.Model):
         unit_cost = self.get_unit_cost()
         return unit_cost * (1 + Decimal(markup_percentage) / 100)
     
+    def _required_materials(self):
+        """(ingredient, required quantity) for this batch, stock rows loaded in the same query"""
+        batch_ratio = Decimal(self.planned_quantity) / Decimal(self.formula.expected_output_quantity)
+        return [
+            (ingredient, ingredient.quantity * batch_ratio)
+            for ingredient in self.formula.ingredients.select_related('raw_material__product')
+        ]
+    
     def check_material_availability(self):
         """Check if all raw materials are available in sufficient quantity"""
-        formula = self.formula
-        batch_ratio = self.planned_quantity / formula.expected_output_quantity
-        
         missing_materials = []
-        for ingredient in formula.ingredients.all():
-            required_quantity = ingredient.quantity * batch_ratio
+        for ingredient, required_quantity in self._required_materials():
             stock_level = ingredient.raw_material.stock_level
             
             if stock_level < required_quantity:
@@ -332,36 +354,55 @@ class ProductionBatch(models.Model):
         
         return missing_materials
     
+    def plan_materials(self):
+        """
+        Multi-level requirements of this batch: shortages of purchased materials
+        and sub-assemblies to produce first (see manufacturing.services.mrp)
+        """
+        from .services.mrp import MRPPlanner
+        return MRPPlanner().plan_batches([self])
+    
     def start_production(self):
         """Start the production process"""
-        missing_materials = self.check_material_availability()
-        if missing_materials:
-            materials_list = ", ".join([f"{item['material']} (short by {item['shortage']})" for item in missing_materials])
-            raise ValueError(f"Cannot start production due to insufficient materials: {materials_list}")
-        
-        self.status = 'in_progress'
-        self.start_date = timezone.now()
-        self.save()
-        
-        # Reserve materials
-        formula = self.formula
-        batch_ratio = Decimal(self.planned_quantity) / Decimal(formula.expected_output_quantity)
-        
-        for ingredient in formula.ingredients.all():
-            required_quantity = ingredient.quantity * batch_ratio
-            
-            # Create batch material record
-            BatchRawMaterial.objects.create(
-                batch=self,
-                raw_material=ingredient.raw_material,
-                planned_quantity=required_quantity,
-                unit=ingredient.unit,
-                cost=ingredient.raw_material.buying_price * required_quantity
+        with transaction.atomic():
+            materials = self._required_materials()
+            # Lock the stock rows so concurrent batches cannot both consume the same stock
+            locked = dict(
+                StockInventory.objects.select_for_update()
+                .filter(id__in=[ingredient.raw_material_id for ingredient, _ in materials])
+                .values_list('id', 'stock_level')
             )
+            missing_materials = [
+                f"{ingredient.raw_material} (short by {required_quantity - locked.get(ingredient.raw_material_id, 0)})"
+                for ingredient, required_quantity in materials
+                if locked.get(ingredient.raw_material_id, 0) < required_quantity
+            ]
+            if missing_materials:
+                raise ValueError(f"Cannot start production due to insufficient materials: {', '.join(missing_materials)}")
+            
+            # Reserve materials
+            batch_materials = [
+                BatchRawMaterial(
+                    batch=self,
+                    raw_material_id=ingredient.raw_material_id,
+                    planned_quantity=required_quantity,
+                    unit_id=ingredient.unit_id,
+                    cost=ingredient.raw_material.buying_price * required_quantity
+                )
+                for ingredient, required_quantity in materials
+            ]
+            
+            self.status = 'in_progress'
+            self.start_date = timezone.now()
+            self.raw_material_cost = sum((material.cost for material in batch_materials), Decimal('0.0000'))
+            self.save()
+            BatchRawMaterial.objects.bulk_create(batch_materials)
             
             # Update inventory
-            ingredient.raw_material.stock_level -= required_quantity
-            ingredient.raw_material.save()
+            for ingredient, required_quantity in materials:
+                StockInventory.objects.filter(id=ingredient.raw_material_id).update(
+                    stock_level=F('stock_level') - required_quantity
+                )
     
     def complete_production(self, actual_quantity):
         """Complete the production process"""
@@ -373,24 +414,24 @@ class ProductionBatch(models.Model):
         self.end_date = timezone.now()
         self.save()
         
-        # Update raw material actual usage
-        for batch_material in self.raw_materials.all():
-            batch_material.actual_quantity = batch_material.planned_quantity
-            batch_material.save()
+        # Update raw material actual usage (costs are unchanged, so the rollup stands)
+        self.raw_materials.update(actual_quantity=F('planned_quantity'))
         
         # get final product
         final_product = self.formula.final_product
         final_product.save()
         
         # Create usage records
-        for batch_material in self.raw_materials.all():            
-            RawMaterialUsage.objects.create(
+        RawMaterialUsage.objects.bulk_create([
+            RawMaterialUsage(
                 finished_product=final_product,
-                raw_material=batch_material.raw_material,
-                quantity_used=batch_material.actual_quantity,
+                raw_material_id=raw_material_id,
+                quantity_used=actual_quantity,
                 transaction_type='production',
                 notes=f"Used in Batch #{self.batch_number}"
             )
+            for raw_material_id, actual_quantity in self.raw_materials.values_list('raw_material_id', 'actual_quantity')
+        ])
     
     def cancel_production(self, reason=""):
         """Cancel the production batch"""
@@ -401,9 +442,10 @@ class ProductionBatch(models.Model):
         
         # If production was in progress, return materials to inventory
         if old_status == 'in_progress':
-            for batch_material in self.raw_materials.all():
-                batch_material.raw_material.stock_level += batch_material.planned_quantity
-                batch_material.raw_material.save()
+            for raw_material_id, planned_quantity in self.raw_materials.values_list('raw_material_id', 'planned_quantity'):
+                StockInventory.objects.filter(id=raw_material_id).update(
+                    stock_level=F('stock_level') + planned_quantity
+                )
 
 
 class BatchRawMaterial(models.Model):
@@ -550,32 +592,22 @@ class ManufacturingAnalytics(models.Model):
     @classmethod
     def update_for_date(cls, date):
         """Update analytics for a specific date"""
-        date_start = timezone.datetime.combine(date, timezone.datetime.min.time())
-        date_end = timezone.datetime.combine(date, timezone.datetime.max.time())
-        
-        batches = ProductionBatch.objects.filter(
-            created_at__range=(date_start, date_end)
+        completed = Q(status='completed')
+        totals = ProductionBatch.objects.filter(
+            created_at__date=date
+        ).aggregate(
+            total_batches=Count('id'),
+            completed_batches=Count('id', filter=completed),
+            failed_batches=Count('id', filter=Q(status='failed')),
+            total_production_quantity=Sum('actual_quantity', filter=completed),
+            total_raw_material_cost=Sum('raw_material_cost', filter=completed),
+            total_labor_cost=Sum('labor_cost', filter=completed),
+            total_overhead_cost=Sum('overhead_cost', filter=completed),
         )
         
         analytics, created = cls.objects.get_or_create(date=date)
-        analytics.total_batches = batches.count()
-        analytics.completed_batches = batches.filter(status='completed').count()
-        analytics.failed_batches = batches.filter(status='failed').count()
-        
-        completed_batches = batches.filter(status='completed')
-        analytics.total_production_quantity = completed_batches.aggregate(
-            total=Sum('actual_quantity')
-        )['total'] or 0
-        
-        analytics.total_raw_material_cost = sum(
-            batch.get_raw_material_cost() for batch in completed_batches
-        )
-        analytics.total_labor_cost = completed_batches.aggregate(
-            total=Sum('labor_cost')
-        )['total'] or 0
-        analytics.total_overhead_cost = completed_batches.aggregate(
-            total=Sum('overhead_cost')
-        )['total'] or 0
+        for field, value in totals.items():
+            setattr(analytics, field, value or 0)
         
         analytics.save()
         return analytics
@@ -0,0 +1,146 @@
+"""
+Materialised raw material cost rollups for product formulas.
+
+ProductFormula.raw_material_cost holds the cost of a formula's ingredients:
+purchased materials at their buying price, sub-assemblies at the unit cost
+of the formula that produces them. It is recomputed only for the formulas
+affected by a change - an ingredient added, edited or removed, a formula's
+output quantity or status changing, or a stock item's buying price changing
+- and the change is propagated up to every formula that consumes their
+output (see manufacturing.signals). Only those formulas and the
+sub-assemblies they use are loaded.
+
+Changes made within a transaction are collected in a per-thread pending set
+and rolled up once, on commit. Bulk writes that bypass signals can call
+recompute_formula_costs directly; with no arguments it rebuilds every formula.
+"""
+from collections import defaultdict
+from decimal import Decimal
+import logging
+import threading
+
+from django.db import transaction
+
+from ecommerce.stockinventory.models import StockInventory
+from manufacturing.models import FormulaIngredient, ProductFormula
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+COST_PLACES = Decimal('0.0001')
+
+_pending = threading.local()
+
+
+def _active_formulas(product_ids):
+    """{product id: (formula id, output, cost)} for each product's latest active formula"""
+    active = {}
+    for product_id, formula_id, output, cost in ProductFormula.objects.filter(
+        final_product_id__in=product_ids, is_active=True
+    ).order_by('version', 'id').values_list('final_product_id', 'id', 'expected_output_quantity', 'raw_material_cost'):
+        active[product_id] = (formula_id, output, cost)
+    return active
+
+
+def _affected_formulas(formula_ids, stock_ids):
+    """The given formulas, formulas using the given stock items, and every formula consuming their output"""
+    affected = set()
+    pending = set(ProductFormula.objects.filter(id__in=formula_ids).values_list('id', flat=True))
+    pending |= set(FormulaIngredient.objects.filter(raw_material_id__in=stock_ids).values_list('formula_id', flat=True))
+    while pending:
+        affected |= pending
+        active = _active_formulas(ProductFormula.objects.filter(id__in=pending).values('final_product_id'))
+        # Only the active formula for a product costs it as a sub-assembly
+        products = [product_id for product_id, (formula_id, _, _) in active.items() if formula_id in pending]
+        pending = set(FormulaIngredient.objects.filter(
+            raw_material__product_id__in=products
+        ).values_list('formula_id', flat=True)) - affected
+    return affected
+
+
+def recompute_formula_costs(formula_ids=(), stock_ids=()):
+    """
+    Recompute the cost of the given formulas, of formulas using the given stock
+    items, and of every formula above them. Returns the number of formulas updated.
+    """
+    if not formula_ids and not stock_ids:
+        affected = set(ProductFormula.objects.values_list('id', flat=True))
+    else:
+        affected = _affected_formulas(formula_ids, stock_ids)
+    if not affected:
+        return 0
+
+    formulas = {
+        formula_id: (output, cost) for formula_id, output, cost in ProductFormula.objects.filter(
+            id__in=affected
+        ).values_list('id', 'expected_output_quantity', 'raw_material_cost')
+    }
+    ingredients = defaultdict(list)  # formula id -> [(stock id, product id, quantity)]
+    for formula_id, stock_id, product_id, quantity in FormulaIngredient.objects.filter(
+        formula_id__in=affected
+    ).values_list('formula_id', 'raw_material_id', 'raw_material__product_id', 'quantity'):
+        ingredients[formula_id].append((stock_id, product_id, quantity))
+    # Ingredients produced in-house cost what their product's active formula does
+    subassemblies = {}
+    for product_id, (formula_id, output, cost) in _active_formulas(
+        {product_id for rows in ingredients.values() for _, product_id, _ in rows}
+    ).items():
+        subassemblies[product_id] = formula_id
+        formulas.setdefault(formula_id, (output, cost))
+    prices = dict(StockInventory.objects.filter(
+        id__in={stock_id for rows in ingredients.values() for stock_id, _, _ in rows}
+    ).values_list('id', 'buying_price'))
+    costs = {}
+
+    def unit_cost(formula_id, path):
+        output, stored = formulas[formula_id]
+        total = cost_of(formula_id, path) if formula_id in affected else stored
+        return total / output if output else ZERO
+
+    def cost_of(formula_id, path):
+        if formula_id not in costs:
+            path = path | {formula_id}
+            total = ZERO
+            for stock_id, product_id, quantity in ingredients[formula_id]:
+                sub = subassemblies.get(product_id)
+                if sub is not None and sub not in path:
+                    total += unit_cost(sub, path) * quantity
+                else:
+                    total += (prices.get(stock_id) or ZERO) * quantity
+            costs[formula_id] = total.quantize(COST_PLACES)
+        return costs[formula_id]
+
+    changed = []
+    for formula_id in affected:
+        cost = cost_of(formula_id, frozenset())
+        if cost != formulas[formula_id][1]:
+            changed.append(ProductFormula(id=formula_id, raw_material_cost=cost))
+    ProductFormula.objects.bulk_update(changed, ['raw_material_cost'], batch_size=500)
+    logger.debug(f"Formula cost rollup: {len(affected)} formulas checked, {len(changed)} updated")
+    return len(changed)
+
+
+def schedule_cost_rollup(formula_ids=(), stock_ids=()):
+    """Queue formulas/stock items for one rollup when the current transaction commits"""
+    if not formula_ids and not stock_ids:
+        return
+    state = getattr(_pending, 'state', None)
+    if state is None:
+        _pending.state = state = {'formula_ids': set(), 'stock_ids': set()}
+    # Queue first: outside a transaction on_commit runs the rollup immediately
+    state['formula_ids'].update(formula_ids)
+    state['stock_ids'].update(stock_ids)
+    # Every change queues the drain, so a rolled-back savepoint cannot strand ids;
+    # the first callback to run takes the whole set and the rest find it empty
+    transaction.on_commit(_run_pending)
+
+
+def _run_pending():
+    state = getattr(_pending, 'state', None)
+    _pending.state = None
+    # Nothing queued is a no-op, never the full rebuild recompute_formula_costs() does without arguments
+    if state and (state['formula_ids'] or state['stock_ids']):
+        try:
+            recompute_formula_costs(state['formula_ids'], state['stock_ids'])
+        except Exception as e:
+            logger.error(f"Error rolling up formula costs: {e}")
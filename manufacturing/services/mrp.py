@@ -0,0 +1,224 @@
+"""
+Material requirements planning for production batches.
+
+A formula ingredient is either a purchased material or a sub-assembly: a
+stock item whose product is itself the output of an active formula. The
+planner explodes formula trees level by level (low-level coding), so each
+item's gross requirement from every planned batch is known before it is
+netted against stock, and only the net shortfall of a sub-assembly is
+exploded into its own ingredients.
+
+All active formulas, their ingredients and the stock rows involved are
+loaded in a handful of queries per plan; per-formula requirements are
+memoised on the BomIndex, which can be reused across plans.
+
+    plan = MRPPlanner().plan_batches(ProductionBatch.objects.filter(status='planned'))
+    plan['shortages']          # purchased materials to buy
+    plan['subassemblies']      # sub-assemblies to produce first
+    create_purchase_requisition(plan, requester=user)
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal, ROUND_CEILING
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from ecommerce.stockinventory.models import StockInventory
+from manufacturing.models import FormulaIngredient, ProductFormula, ProductionBatch
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+QUANTITY_PLACES = Decimal('0.0001')
+
+
+class BomIndex:
+    """
+    Formulas and their ingredients, loaded once. Only active formulas are
+    loaded unless active_only is False; sub-assemblies always resolve to the
+    latest active formula for their product.
+    """
+
+    def __init__(self, active_only=True):
+        self.formulas = {}  # formula id -> {'product_id', 'output', 'cost'}
+        self.by_product = {}  # product id -> formula id (latest active version)
+        self.ingredients = defaultdict(list)  # formula id -> [(stock id, quantity)]
+        self.stock_products = {}  # stock id -> product id
+        self._per_unit = {}
+
+        formulas = ProductFormula.objects.all()
+        if active_only:
+            formulas = formulas.filter(is_active=True)
+        for formula in formulas.order_by('version', 'id').values(
+            'id', 'final_product_id', 'expected_output_quantity', 'raw_material_cost', 'is_active'
+        ):
+            self.formulas[formula['id']] = {
+                'product_id': formula['final_product_id'], 'output': formula['expected_output_quantity'],
+                'cost': formula['raw_material_cost'],
+            }
+            if formula['is_active']:
+                self.by_product[formula['final_product_id']] = formula['id']
+
+        for formula_id, stock_id, product_id, quantity in FormulaIngredient.objects.filter(
+            formula_id__in=self.formulas
+        ).values_list('formula_id', 'raw_material_id', 'raw_material__product_id', 'quantity'):
+            self.ingredients[formula_id].append((stock_id, quantity))
+            self.stock_products[stock_id] = product_id
+
+    def subassembly_formula(self, stock_id):
+        """Formula producing this stock item's product, or None for a purchased material"""
+        return self.by_product.get(self.stock_products.get(stock_id))
+
+    def per_unit(self, formula_id):
+        """{stock id: quantity} needed for one unit of the formula's output (memoised)"""
+        requirements = self._per_unit.get(formula_id)
+        if requirements is None:
+            output = self.formulas[formula_id]['output']
+            if not output:
+                raise ValueError(f"Formula {formula_id} has no expected output quantity")
+            requirements = defaultdict(lambda: ZERO)
+            for stock_id, quantity in self.ingredients[formula_id]:
+                requirements[stock_id] += quantity / output
+            self._per_unit[formula_id] = requirements = dict(requirements)
+        return requirements
+
+    def low_level_codes(self, formula_ids):
+        """
+        {stock id: deepest level at which it appears} below the given formulas.
+        Raises ValueError if a formula (indirectly) consumes its own output.
+        """
+        levels = {}
+        limit = len(self.formulas) + 1
+        stack = [(formula_id, 0, ()) for formula_id in set(formula_ids)]
+        while stack:
+            formula_id, level, path = stack.pop()
+            if formula_id in path or level > limit:
+                raise ValueError(f"Formula {formula_id} consumes its own output")
+            for stock_id in self.per_unit(formula_id):
+                if levels.get(stock_id, -1) >= level + 1:
+                    continue
+                levels[stock_id] = level + 1
+                child = self.subassembly_formula(stock_id)
+                if child is not None:
+                    stack.append((child, level + 1, path + (formula_id,)))
+        return levels
+
+
+class MRPPlanner:
+    def __init__(self, index=None):
+        self.index = index or BomIndex()
+
+    def plan(self, demands):
+        """
+        Net the multi-level requirements of [(formula id, output quantity)] against stock.
+
+        Returns {'requirements': [...], 'shortages': [...], 'subassemblies': [...]} where
+        each entry carries gross, available, allocated and net quantities for a stock item;
+        shortages are purchased materials and subassemblies are intermediate products
+        that must be produced before the planned batches can run.
+        """
+        index = self.index
+        demands = [(formula_id, Decimal(quantity)) for formula_id, quantity in demands if formula_id in index.formulas]
+        levels = index.low_level_codes(formula_id for formula_id, _ in demands)
+        stock = {
+            row['id']: row for row in StockInventory.objects.filter(id__in=levels).values(
+                'id', 'product_id', 'product__title', 'branch_id', 'stock_level', 'buying_price', 'supplier_id',
+            )
+        }
+
+        gross = defaultdict(lambda: ZERO)
+        for formula_id, quantity in demands:
+            for stock_id, per_unit in index.per_unit(formula_id).items():
+                gross[stock_id] += per_unit * quantity
+
+        requirements, shortages, subassemblies = [], [], []
+        for stock_id in sorted(levels, key=levels.get):
+            if stock_id not in gross:
+                continue
+            row = stock.get(stock_id) or {}
+            available = max(Decimal(row.get('stock_level') or 0), ZERO)
+            allocated = min(gross[stock_id], available)
+            net = gross[stock_id] - allocated
+            formula_id = index.subassembly_formula(stock_id)
+            entry = {
+                'stock_id': stock_id,
+                'product_id': row.get('product_id'),
+                'material': row.get('product__title'),
+                'branch_id': row.get('branch_id'),
+                'level': levels[stock_id],
+                'formula_id': formula_id,
+                'gross': gross[stock_id].quantize(QUANTITY_PLACES),
+                'available': available,
+                'allocated': allocated.quantize(QUANTITY_PLACES),
+                'net': net.quantize(QUANTITY_PLACES),
+                'unit_cost': row.get('buying_price') or ZERO,
+                'supplier_id': row.get('supplier_id'),
+            }
+            requirements.append(entry)
+            if net <= 0:
+                continue
+            if formula_id is None:
+                shortages.append(entry)
+            else:
+                # Only the shortfall of a sub-assembly has to be made, and so exploded
+                subassemblies.append(entry)
+                for child_id, per_unit in index.per_unit(formula_id).items():
+                    gross[child_id] += per_unit * net
+        return {'requirements': requirements, 'shortages': shortages, 'subassemblies': subassemblies}
+
+    def plan_batches(self, batches):
+        """Plan a queryset or list of ProductionBatch across all batches at once"""
+        demands = defaultdict(lambda: ZERO)
+        for formula_id, quantity in _batch_values(batches):
+            demands[formula_id] += quantity
+        return self.plan(demands.items())
+
+    def plan_period(self, start=None, days=30, branch_id=None):
+        """Plan every batch still planned for the next `days` days from start"""
+        start = start or timezone.now()
+        batches = ProductionBatch.objects.filter(
+            status='planned', scheduled_date__gte=start, scheduled_date__lt=start + timedelta(days=days)
+        )
+        if branch_id:
+            batches = batches.filter(branch_id=branch_id)
+        return self.plan_batches(batches)
+
+
+def _batch_values(batches):
+    if hasattr(batches, 'values_list'):
+        return batches.values_list('formula_id', 'planned_quantity')
+    return [(batch.formula_id, batch.planned_quantity) for batch in batches]
+
+
+def create_purchase_requisition(plan, requester, required_by=None, purpose=None):
+    """
+    Raise one draft inventory ProcurementRequest covering the plan's shortages.
+    Quantities are rounded up to whole units. Returns the request, or None if nothing is short.
+    """
+    from procurement.requisitions.models import ProcurementRequest, RequestItem
+
+    shortages = plan['shortages']
+    if not shortages:
+        return None
+    with transaction.atomic():
+        request = ProcurementRequest.objects.create(
+            requester=requester,
+            request_type='inventory',
+            purpose=purpose or 'Material shortages for planned production',
+            priority='high',
+            required_by_date=required_by or (timezone.now() + timedelta(days=7)).date(),
+            status='draft',
+            notes='Generated by the MRP planner',
+        )
+        RequestItem.objects.bulk_create([
+            RequestItem(
+                request=request, item_type='inventory', stock_item_id=entry['stock_id'],
+                quantity=int(entry['net'].to_integral_value(rounding=ROUND_CEILING)),
+                estimated_price=entry['unit_cost'], supplier_id=entry['supplier_id'],
+            )
+            for entry in shortages
+        ])
+    logger.info(f"MRP requisition {request.reference_number} raised for {len(shortages)} materials")
+    return request
@@ -1,11 +1,17 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.db import transaction
 
-from .models import ProductionBatch, ManufacturingAnalytics, QualityCheck, RawMaterialUsage
+from .models import (
+    BatchRawMaterial, FormulaIngredient, ManufacturingAnalytics, ProductFormula, ProductionBatch, QualityCheck,
+    RawMaterialUsage,
+)
+from .services.costing import schedule_cost_rollup
 from ecommerce.stockinventory.models import StockInventory
 
+FORMULA_COST_FIELDS = {'expected_output_quantity', 'is_active', 'final_product'}
+
 
 @receiver(post_save, sender=ProductionBatch)
 def update_analytics_on_batch_change(sender, instance, created, **kwargs):
@@ -14,7 +20,7 @@ def update_analytics_on_batch_change(sender, instance, created, **kwargs):
     """
     if created or instance.status in ['completed', 'failed']:
         # Get or create analytics for today
-        date = timezone.now().date()
+        date = timezone.localdate()
         ManufacturingAnalytics.update_for_date(date)
 
 
@@ -89,3 +95,42 @@ def update_stock_on_batch_complete(sender, instance, **kwargs):
                         
         except ProductionBatch.DoesNotExist:
             pass  # This is a new instance
+
+
+# Cost rollups (see manufacturing.services.costing)
+@receiver(post_save, sender=FormulaIngredient)
+@receiver(post_delete, sender=FormulaIngredient)
+def roll_up_cost_on_ingredient_change(sender, instance, **kwargs):
+    schedule_cost_rollup(formula_ids=[instance.formula_id])
+
+
+@receiver(post_save, sender=ProductFormula)
+def roll_up_cost_on_formula_change(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or FORMULA_COST_FIELDS & set(update_fields):
+        schedule_cost_rollup(formula_ids=[instance.pk])
+
+
+@receiver(pre_save, sender=StockInventory)
+def detect_formula_price_change(sender, instance, update_fields=None, **kwargs):
+    """Flag buying price changes of stock used in formulas; other stock saves cost one indexed lookup"""
+    if not instance.pk or (update_fields is not None and 'buying_price' not in update_fields):
+        return
+    old_price = StockInventory.objects.filter(
+        pk=instance.pk, formula_usages__isnull=False
+    ).values_list('buying_price', flat=True).first()
+    instance._formula_price_changed = old_price is not None and old_price != instance.buying_price
+
+
+@receiver(post_save, sender=StockInventory)
+def roll_up_cost_on_price_change(sender, instance, **kwargs):
+    if getattr(instance, '_formula_price_changed', False):
+        instance._formula_price_changed = False
+        schedule_cost_rollup(stock_ids=[instance.pk])
+
+
+@receiver(post_save, sender=BatchRawMaterial)
+@receiver(post_delete, sender=BatchRawMaterial)
+def refresh_batch_cost(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'cost' not in update_fields:
+        return
+    ProductionBatch(pk=instance.batch_id).refresh_raw_material_cost()
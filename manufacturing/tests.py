@@ -0,0 +1,146 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from business.models import Branch, BusinessLocation, Bussiness, ProductSettings
+from ecommerce.product.models import Products
+from ecommerce.stockinventory.models import StockInventory
+from manufacturing.models import FormulaIngredient, ManufacturingAnalytics, ProductFormula, ProductionBatch
+from manufacturing.services.mrp import BomIndex, MRPPlanner, create_purchase_requisition
+
+User = get_user_model()
+
+
+class MRPPlannerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='mrp', email='mrp@example.com', password='pass')
+        location = BusinessLocation.objects.create(city='Nakuru')
+        self.business = Bussiness.objects.create(name='MRP Biz', owner=self.user, location=location)
+        ProductSettings.objects.get_or_create(business=self.business)
+        self.branch = Branch.objects.create(name='Plant', business=self.business, location=location, branch_code='MRP01')
+        # Juice (10 per batch) = 5 syrup + 2 bottles; syrup (1 per batch) = 2 sugar + 1 water
+        self.sugar = self.stock('Sugar', 3)
+        self.water = self.stock('Water', 100)
+        self.bottle = self.stock('Bottle', 20)
+        self.syrup = self.stock('Syrup', 4)
+        self.juice = self.stock('Juice', 0)
+        self.syrup_formula = self.formula('Syrup', self.syrup, 1, [(self.sugar, 2), (self.water, 1)])
+        self.juice_formula = self.formula('Juice', self.juice, 10, [(self.syrup, 5), (self.bottle, 2)])
+
+    def stock(self, title, level):
+        product = Products.objects.create(title=title, business=self.business)
+        return StockInventory.objects.create(product=product, branch=self.branch, stock_level=level, buying_price=2, selling_price=3)
+
+    def formula(self, name, output, quantity, ingredients):
+        with self.captureOnCommitCallbacks(execute=True):
+            formula = ProductFormula.objects.create(name=name, final_product=output.product, expected_output_quantity=quantity)
+            for stock, amount in ingredients:
+                FormulaIngredient.objects.create(formula=formula, raw_material=stock, quantity=amount)
+        return formula
+
+    def batch(self, quantity):
+        return ProductionBatch.objects.create(
+            formula=self.juice_formula, branch=self.branch, planned_quantity=quantity, scheduled_date=timezone.now(),
+        )
+
+    def test_explodes_only_the_net_shortfall_of_subassemblies_across_batches(self):
+        self.batch(10)
+        self.batch(10)
+        planner = MRPPlanner(BomIndex())
+        with self.assertNumQueries(2):
+            plan = planner.plan_batches(ProductionBatch.objects.filter(status='planned'))
+        by_stock = {entry['stock_id']: entry for entry in plan['requirements']}
+        # 20 juice need 10 syrup (4 on hand) and 4 bottles; 6 syrup need 12 sugar (3 on hand) and 6 water
+        self.assertEqual(by_stock[self.syrup.id]['net'], Decimal('6'))
+        self.assertEqual(by_stock[self.sugar.id]['gross'], Decimal('12'))
+        self.assertEqual([entry['stock_id'] for entry in plan['subassemblies']], [self.syrup.id])
+        self.assertEqual([(entry['stock_id'], entry['net']) for entry in plan['shortages']], [(self.sugar.id, Decimal('9'))])
+
+        requisition = create_purchase_requisition(plan, requester=self.user)
+        self.assertEqual(list(requisition.items.values_list('stock_item_id', 'quantity')), [(self.sugar.id, 9)])
+
+    def test_formula_cycles_are_rejected(self):
+        FormulaIngredient.objects.create(formula=self.syrup_formula, raw_material=self.juice, quantity=1)
+        with self.assertRaises(ValueError):
+            MRPPlanner().plan([(self.juice_formula.id, 10)])
+
+    def test_start_and_cancel_production_adjust_stock_in_place(self):
+        batch = self.batch(4)
+        batch.start_production()
+        self.assertEqual(StockInventory.objects.get(pk=self.syrup.pk).stock_level, 2)
+        self.assertEqual(batch.raw_materials.count(), 2)
+        batch.cancel_production('test')
+        self.assertEqual(StockInventory.objects.get(pk=self.syrup.pk).stock_level, 4)
+
+        with self.assertRaises(ValueError):
+            self.batch(100).start_production()
+
+    def test_cost_rollups_propagate_through_nested_formulas(self):
+        # Syrup: 2 sugar + 1 water at 2 each = 6; juice: 5 syrup at 6 + 2 bottles at 2 = 34
+        self.juice_formula.refresh_from_db()
+        self.assertEqual(self.juice_formula.get_raw_material_cost(), Decimal('34'))
+
+        self.sugar.buying_price = Decimal('5')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sugar.save()
+        self.syrup_formula.refresh_from_db()
+        self.juice_formula.refresh_from_db()
+        self.assertEqual((self.syrup_formula.raw_material_cost, self.juice_formula.raw_material_cost), (Decimal('12'), Decimal('64')))
+
+        # Saves that leave the price alone do not schedule a rollup
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.water.stock_level = 50
+            self.water.save()
+        self.assertEqual(callbacks, [])
+
+    def test_rollup_runs_once_per_transaction_and_never_empty(self):
+        from unittest import mock
+        from manufacturing.services import costing
+
+        with mock.patch.object(costing, 'recompute_formula_costs', wraps=costing.recompute_formula_costs) as recompute, \
+                self.captureOnCommitCallbacks(execute=True):
+            for stock in (self.sugar, self.water):
+                stock.buying_price = Decimal('4')
+                stock.save()
+        recompute.assert_called_once_with(set(), {self.sugar.id, self.water.id})
+        self.syrup_formula.refresh_from_db()
+        self.assertEqual(self.syrup_formula.raw_material_cost, Decimal('12'))
+
+        with mock.patch.object(costing, 'recompute_formula_costs') as recompute:
+            costing._run_pending()
+            costing.schedule_cost_rollup()
+        recompute.assert_not_called()
+
+    def test_rollup_survives_a_rolled_back_savepoint(self):
+        from django.db import IntegrityError, transaction
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.sugar.buying_price = Decimal('7')
+                    self.sugar.save()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+            self.water.buying_price = Decimal('9')
+            self.water.save()
+        self.syrup_formula.refresh_from_db()
+        # 2 sugar at 2 (the rolled-back 7 never landed) + 1 water at 9
+        self.assertEqual(self.syrup_formula.raw_material_cost, Decimal('13'))
+
+    def test_batch_cost_is_stored_and_analytics_aggregate_it(self):
+        batch = self.batch(2)
+        batch.start_production()
+        batch.refresh_from_db()
+        # 1 syrup at 2 + 0.4 bottles at 2
+        self.assertEqual(batch.get_raw_material_cost(), Decimal('2.8'))
+        batch.raw_materials.filter(raw_material=self.bottle).delete()
+        batch.refresh_from_db()
+        self.assertEqual(batch.raw_material_cost, Decimal('2'))
+
+        ProductionBatch.objects.filter(pk=batch.pk).update(status='completed', actual_quantity=2)
+        with self.assertNumQueries(3):
+            analytics = ManufacturingAnalytics.update_for_date(timezone.localdate())
+        self.assertEqual((analytics.completed_batches, analytics.total_raw_material_cost), (1, Decimal('2')))
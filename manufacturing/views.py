@@ -20,6 +20,7 @@ from .serializers import *
 from core.base_viewsets import BaseModelViewSet
 from core.response import APIResponse, get_correlation_id
 from core.audit import AuditTrail
+from .services.mrp import MRPPlanner, create_purchase_requisition
 from django.db import transaction
 import logging
 
@@ -294,20 +295,20 @@ class ProductionBatchViewSet(BaseModelViewSet):
                 return APIResponse.bad_request(message='formula and quantity parameters are required', error_id='missing_params', correlation_id=correlation_id)
             
             formula = ProductFormula.objects.get(id=formula_id)
-            batch_ratio = Decimal(quantity) / Decimal(formula.expected_output_quantity)
+            plan = MRPPlanner().plan([(formula.id, Decimal(quantity))])
             
-            missing_materials = []
-            for ingredient in formula.ingredients.all():
-                required_quantity = ingredient.quantity * batch_ratio
-                stock_level = ingredient.raw_material.stock_level
-                
-                if stock_level < required_quantity:
-                    missing_materials.append({
-                        'material': ingredient.raw_material.product.title,
-                        'required': required_quantity,
-                        'available': stock_level,
-                        'shortage': required_quantity - stock_level
-                    })
+            # Shortages across every level: sub-assemblies to produce and materials to buy
+            missing_materials = [
+                {
+                    'material': entry['material'],
+                    'required': entry['gross'],
+                    'available': entry['available'],
+                    'shortage': entry['net'],
+                    'level': entry['level'],
+                    'type': 'subassembly' if entry['formula_id'] else 'material',
+                }
+                for entry in plan['subassemblies'] + plan['shortages']
+            ]
             
             return APIResponse.success(data=missing_materials, message='Material availability checked', correlation_id=correlation_id)
         except ProductFormula.DoesNotExist:
@@ -316,6 +317,45 @@ class ProductionBatchViewSet(BaseModelViewSet):
             logger.error(f'Error checking material availability: {str(e)}', exc_info=True)
             return APIResponse.server_error(message='Error checking material availability', error_id=str(e), correlation_id=get_correlation_id(request))
 
+    
+    @action(detail=False, methods=['get', 'post'])
+    def mrp(self, request):
+        """
+        Material requirements of all planned batches in a window, netted against stock.
+        
+        Query Parameters:
+        - start: YYYY-MM-DD (default: today)
+        - days: planning horizon in days (default: 30)
+        - branch_id: Branch ID (optional, defaults to the X-Branch-ID header)
+        POST with create_requisition=true also raises a draft procurement request for the shortages.
+        """
+        try:
+            correlation_id = get_correlation_id(request)
+            params = request.query_params
+            start = params.get('start')
+            start = timezone.make_aware(datetime.strptime(start, '%Y-%m-%d')) if start else timezone.now()
+            days = int(params.get('days', 30))
+            try:
+                from core.utils import get_branch_id_from_request
+                branch_id = params.get('branch_id') or get_branch_id_from_request(request)
+            except Exception:
+                branch_id = None
+            
+            plan = MRPPlanner().plan_period(start=start, days=days, branch_id=branch_id)
+            data = {**plan, 'start': start.date(), 'days': days}
+            
+            if request.method == 'POST' and str(request.data.get('create_requisition', '')).lower() in ('1', 'true', 'yes'):
+                requisition = create_purchase_requisition(plan, requester=request.user, required_by=start.date())
+                data['requisition'] = requisition.reference_number if requisition else None
+                if requisition:
+                    AuditTrail.log(operation=AuditTrail.CREATE, module='manufacturing', entity_type='ProcurementRequest', entity_id=requisition.id, user=request.user, reason='MRP shortages requisitioned', request=request)
+            
+            return APIResponse.success(data=data, message='Material requirements planned', correlation_id=correlation_id)
+        except ValueError as e:
+            return APIResponse.bad_request(message='Cannot plan material requirements', error_id=str(e), correlation_id=get_correlation_id(request))
+        except Exception as e:
+            logger.error(f'Error planning material requirements: {str(e)}', exc_info=True)
+            return APIResponse.server_error(message='Error planning material requirements', error_id=str(e), correlation_id=get_correlation_id(request))
 
 class QualityCheckViewSet(viewsets.ModelViewSet):
     queryset = QualityCheck.objects.all()
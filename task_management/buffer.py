@@ -0,0 +1,140 @@
+"""
+Write-behind buffer for task bookkeeping.
+
+Bulk jobs report progress and log lines far more often than anyone reads
+them; writing each one synchronously made task bookkeeping a large share of
+a payroll run's database writes. Progress updates and TaskLog rows are held
+per process instead and written together - one bulk_update for the Task rows
+and one bulk_create for the logs - every FLUSH_INTERVAL seconds, once
+MAX_PENDING_LOGS accumulate, when a task completes or fails, and after every
+Celery task (see task_management.tasks).
+
+Only Celery worker processes buffer (enabled by the worker_process_init and
+worker_init signals): a web process has no later task run to flush on, so
+there every update is written straight away, and anything still pending is
+written when the request finishes.
+
+The live view of a task does not depend on the flush: websocket events and
+the cached task snapshot are updated immediately.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+
+from .models import Task, TaskLog
+
+logger = logging.getLogger('ditapi_logger')
+
+FLUSH_INTERVAL = getattr(settings, 'TASK_BUFFER_FLUSH_INTERVAL', 2.0)
+MAX_PENDING_LOGS = getattr(settings, 'TASK_BUFFER_MAX_LOGS', 500)
+MAX_TRACKED_TASKS = 10000
+PROGRESS_FIELDS = ('progress', 'processed_items', 'total_items')
+
+
+class TaskWriteBuffer:
+    def __init__(self, flush_interval=FLUSH_INTERVAL, max_pending_logs=MAX_PENDING_LOGS):
+        self.flush_interval = flush_interval
+        self.max_pending_logs = max_pending_logs
+        self._lock = threading.RLock()
+        self._states = {}  # task_id -> {'pk', 'created_by_id', progress fields}
+        self._dirty = {}  # task_id -> progress fields changed since the last flush
+        self._logs = []  # (task_id, level, message, data)
+        self._last_flush = time.monotonic()
+        self.enabled = False
+
+    def remember(self, task):
+        """Track a task whose row was just loaded or created, saving the lookup later"""
+        with self._lock:
+            if len(self._states) >= MAX_TRACKED_TASKS and not self._dirty and not self._logs:
+                self._states.clear()
+            self._states[task.task_id] = {
+                'pk': task.pk, 'created_by_id': task.created_by_id,
+                **{field: getattr(task, field) for field in PROGRESS_FIELDS},
+            }
+
+    def forget(self, task_id):
+        with self._lock:
+            self._states.pop(task_id, None)
+
+    def state(self, task_id):
+        """Known state of a task (buffered values included), or None if the task does not exist"""
+        with self._lock:
+            state = self._states.get(task_id)
+        if state is None:
+            task = Task.objects.filter(task_id=task_id).only('id', 'task_id', 'created_by_id', *PROGRESS_FIELDS).first()
+            if task is None:
+                return None
+            self.remember(task)
+            with self._lock:
+                state = self._states[task_id]
+        return state
+
+    def update_progress(self, task_id, **fields):
+        """Buffer progress fields; returns the task's merged state, or None if the task does not exist"""
+        state = self.state(task_id)
+        if state is None:
+            return None
+        with self._lock:
+            state.update(fields)
+            self._dirty.setdefault(task_id, {}).update(fields)
+        self.flush_if_due()
+        return state
+
+    def log(self, task_id, level, message, data=None):
+        with self._lock:
+            self._logs.append((task_id, level, message, data or {}))
+            due = len(self._logs) >= self.max_pending_logs
+        if due:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        if not self.enabled or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write all pending progress updates and logs"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            logs, self._logs = self._logs, []
+            self._last_flush = time.monotonic()
+            if not dirty and not logs:
+                return
+            states = {task_id: self._states.get(task_id) for task_id in set(dirty) | {entry[0] for entry in logs}}
+        try:
+            missing = [task_id for task_id, state in states.items() if state is None]
+            if missing:
+                for task in Task.objects.filter(task_id__in=missing).only('id', 'task_id', 'created_by_id', *PROGRESS_FIELDS):
+                    self.remember(task)
+                    states[task.task_id] = self._states[task.task_id]
+
+            # bulk_update writes the same columns for every row, so group by the fields changed
+            by_fields = {}
+            for task_id, fields in dirty.items():
+                if states.get(task_id):
+                    by_fields.setdefault(tuple(sorted(fields)), []).append(Task(pk=states[task_id]['pk'], **fields))
+            for fields, tasks in by_fields.items():
+                Task.objects.bulk_update(tasks, list(fields))
+
+            TaskLog.objects.bulk_create([
+                TaskLog(task_id=states[task_id]['pk'], level=level, message=message, data=data)
+                for task_id, level, message, data in logs if states.get(task_id)
+            ])
+        except Exception as e:
+            logger.error(f"Error flushing task bookkeeping ({len(dirty)} tasks, {len(logs)} logs): {e}")
+
+
+task_buffer = TaskWriteBuffer()
+atexit.register(task_buffer.flush)
+
+
+def flush_after_request(**kwargs):
+    task_buffer.flush()
+
+
+request_finished.connect(flush_after_request, dispatch_uid='task_buffer_flush_after_request')
@@ -8,6 +8,8 @@ import logging
 
 logger = logging.getLogger('ditapi_logger')
 
+MAX_SNAPSHOTS_ON_CONNECT = 20
+
 
 class TaskConsumer(AsyncWebsocketConsumer):
     """
@@ -18,13 +20,8 @@ class TaskConsumer(AsyncWebsocketConsumer):
         self.user = self.scope["user"]
         self.user_id = str(self.user.id) if self.user.is_authenticated else None
 
-        # Join general task updates group
-        await self.channel_layer.group_add(
-            'task_updates',
-            self.channel_name
-        )
-
-        # Join user-specific group if authenticated
+        # Clients only receive events for groups they belong to: their own
+        # tasks here, plus tasks/modules they subscribe to explicitly
         if self.user_id:
             await self.channel_layer.group_add(
                 f'task_user_{self.user_id}',
@@ -32,15 +29,14 @@ class TaskConsumer(AsyncWebsocketConsumer):
             )
         
         await self.accept()
-        logger.info(f"WebSocket connected for user {self.user_id or 'anonymous'} to task_updates")
+        logger.info(f"WebSocket connected for user {self.user_id or 'anonymous'}")
+
+        # Current state of the user's unfinished tasks instead of an event replay
+        if self.user_id:
+            for snapshot in await self.get_active_task_snapshots():
+                await self.send_snapshot(snapshot)
 
     async def disconnect(self, close_code):
-        # Leave general task updates group
-        await self.channel_layer.group_discard(
-            'task_updates',
-            self.channel_name
-        )
-        
         # Leave user-specific group
         if self.user_id:
             await self.channel_layer.group_discard(
@@ -50,6 +46,23 @@ class TaskConsumer(AsyncWebsocketConsumer):
         
         logger.info(f"WebSocket disconnected for user {self.user_id or 'anonymous'}")
 
+    @database_sync_to_async
+    def get_active_task_snapshots(self):
+        from .models import Task, TaskStatus
+        from .tasks import get_task_snapshot
+        task_ids = Task.objects.filter(
+            created_by_id=self.user_id, status__in=[TaskStatus.PENDING, TaskStatus.RUNNING]
+        ).order_by('-created_at').values_list('task_id', flat=True)[:MAX_SNAPSHOTS_ON_CONNECT]
+        return [snapshot for snapshot in map(get_task_snapshot, task_ids) if snapshot]
+
+    @database_sync_to_async
+    def get_task_snapshot(self, task_id):
+        from .tasks import get_task_snapshot
+        return get_task_snapshot(task_id)
+
+    async def send_snapshot(self, snapshot):
+        await self.send(text_data=json.dumps({'type': 'task_snapshot', **snapshot}, default=str))
+
     async def receive(self, text_data):
         try:
             data = json.loads(text_data)
@@ -63,6 +76,9 @@ class TaskConsumer(AsyncWebsocketConsumer):
                     self.channel_name
                 )
                 logger.info(f"User {self.user_id} subscribed to task {task_id}")
+                snapshot = await self.get_task_snapshot(task_id)
+                if snapshot:
+                    await self.send_snapshot(snapshot)
                 
             elif message_type == 'unsubscribe_task' and task_id:
                 await self.channel_layer.group_discard(
@@ -84,6 +84,7 @@ class Task(models.Model):
             models.Index(fields=['module']),
             models.Index(fields=['created_by']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['status', 'completed_at']),
         ]
 
     def __str__(self):
@@ -169,6 +170,7 @@ class TaskLog(models.Model):
         indexes = [
             models.Index(fields=['task', 'timestamp']),
             models.Index(fields=['level']),
+            models.Index(fields=['timestamp']),
         ]
 
     def __str__(self):
@@ -2,14 +2,19 @@
 Centralized task management for all ERP modules
 """
 from celery import shared_task
+from celery.signals import task_postrun, worker_init, worker_process_init
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 import logging
+import time
 from datetime import datetime
 from typing import Dict, Any, Optional
 
+from .buffer import task_buffer
 from .models import Task, TaskLog, TaskStatus, TaskType, TaskPriority
 
 User = get_user_model()
@@ -17,57 +22,126 @@ User = get_user_model()
 logger = logging.getLogger('ditapi_logger')
 
 
-def emit_websocket_event(event_type: str, data: Dict[str, Any], user_id: Optional[int] = None, task_id: Optional[str] = None):
+# Progress-style events are coalesced per task; lifecycle events always go out
+COALESCED_EVENTS = {'task_progress', 'payroll_processing_progress'}
+PROGRESS_EVENTS_PER_SECOND = getattr(settings, 'TASK_PROGRESS_EVENTS_PER_SECOND', 2)
+SNAPSHOT_TTL = 60 * 60 * 24
+
+_last_progress_sent = {}
+
+# Retention (see cleanup_old_tasks)
+RETENTION_BATCH_SIZE = 1000
+TASK_LOG_RETENTION_DAYS = getattr(settings, 'TASK_LOG_RETENTION_DAYS', 14)
+
+
+@worker_init.connect
+@worker_process_init.connect
+def enable_task_buffer(**kwargs):
+    """Progress and logs are written behind only inside Celery workers"""
+    task_buffer.enabled = True
+
+
+@task_postrun.connect
+def flush_task_buffer(**kwargs):
+    """Buffered task progress and logs are written before a worker picks up its next job"""
+    task_buffer.flush()
+
+
+def _snapshot_key(task_id: str) -> str:
+    return f'task_snapshot:{task_id}'
+
+
+def save_task_snapshot(task_id: str, event_type: str, data: Dict[str, Any]):
+    """Persist the latest state of a task so (re)connecting clients get it without replay"""
+    snapshot = cache.get(_snapshot_key(task_id)) or {}
+    snapshot.update({key: value for key, value in data.items() if key not in ('result', 'employee_ids')})
+    snapshot['last_event'] = event_type
+    cache.set(_snapshot_key(task_id), snapshot, SNAPSHOT_TTL)
+
+
+def get_task_snapshot(task_id: str) -> Optional[Dict[str, Any]]:
+    """Latest known state of a task: the persisted snapshot, else the Task row"""
+    snapshot = cache.get(_snapshot_key(task_id))
+    if snapshot:
+        return snapshot
+    task = Task.objects.filter(task_id=task_id).first()
+    if task is None:
+        return None
+    return {
+        'task_id': task.task_id,
+        'task_type': task.task_type,
+        'title': task.title,
+        'module': task.module,
+        'status': task.status,
+        'progress': task.progress,
+        'processed_items': task.processed_items,
+        'total_items': task.total_items,
+        'error_message': task.error_message,
+    }
+
+
+def _progress_due(task_id: str) -> bool:
+    """
+    Leading-edge throttle: at most PROGRESS_EVENTS_PER_SECOND progress events
+    per task across all workers. Skipped updates are still in the snapshot and
+    the terminal event carries the final state.
+    """
+    interval = 1.0 / PROGRESS_EVENTS_PER_SECOND
+    now = time.monotonic()
+    if now - _last_progress_sent.get(task_id, float('-inf')) < interval:
+        return False
+    # Shared across worker processes; None means the cache is down, so only the local throttle applies
+    if cache.add(f'task_progress_throttle:{task_id}', 1, interval) is False:
+        return False
+    if len(_last_progress_sent) > 10000:
+        _last_progress_sent.clear()
+    _last_progress_sent[task_id] = now
+    return True
+
+
+def emit_websocket_event(event_type: str, data: Dict[str, Any], user_id: Optional[int] = None, task_id: Optional[str] = None,
+                         broadcast: bool = True):
     """
     Emit WebSocket event to notify frontend of task status changes
     Centralized for all ERP modules
+
+    The event goes to the subscribed groups only (task, user, module), in a
+    single hop through the channel layer; broadcast=False limits it to the
+    task's own group. Progress events are coalesced per task and every event
+    updates the task's persisted snapshot.
     """
     try:
+        # Add timestamp to all events
+        data['timestamp'] = datetime.now().isoformat()
+
+        if task_id:
+            save_task_snapshot(task_id, event_type, data)
+            if event_type in COALESCED_EVENTS and not _progress_due(task_id):
+                return
+            if event_type not in COALESCED_EVENTS:
+                _last_progress_sent.pop(task_id, None)
+
         channel_layer = get_channel_layer()
         if not channel_layer:
             return
 
-        # Add timestamp to all events
-        data['timestamp'] = datetime.now().isoformat()
+        groups = []
+        if task_id:
+            groups.append(f'task_{task_id}')
+        if broadcast and user_id:
+            groups.append(f'task_user_{user_id}')
+        if broadcast and 'module' in data:
+            groups.append(f'task_module_{data["module"]}')
+        if not groups:
+            return
 
-        # Send to general task updates group
-        async_to_sync(channel_layer.group_send)(
-            'task_updates',
-            {
-                'type': event_type,
-                **data
-            }
-        )
+        message = {'type': event_type, **data}
 
-        # Send to user-specific group if user_id provided
-        if user_id:
-            async_to_sync(channel_layer.group_send)(
-                f'task_user_{user_id}',
-                {
-                    'type': event_type,
-                    **data
-                }
-            )
-
-        # Send to task-specific group if task_id provided
-        if task_id:
-            async_to_sync(channel_layer.group_send)(
-                f'task_{task_id}',
-                {
-                    'type': event_type,
-                    **data
-                }
-            )
-
-        # Send to module-specific group
-        if 'module' in data:
-            async_to_sync(channel_layer.group_send)(
-                f'task_module_{data["module"]}',
-                {
-                    'type': event_type,
-                    **data
-                }
-            )
+        async def send_all():
+            for group_name in groups:
+                await channel_layer.group_send(group_name, message)
+
+        async_to_sync(send_all)()
 
     except Exception as e:
         logger.error(f"Error emitting WebSocket event {event_type}: {e}")
@@ -75,32 +149,29 @@ def emit_websocket_event(event_type: str, data: Dict[str, Any], user_id: Optiona
 
 def create_task(task_id: str, task_type: str, title: str, description: str = "", 
                 module: str = "core", user_id: int = None, priority: str = TaskPriority.NORMAL,
-                input_data: Dict = None, metadata: Dict = None) -> Task:
+                input_data: Dict = None, metadata: Dict = None, broadcast: bool = True) -> Task:
     """
     Create a new task record
+
+    Sub-tasks of a batch pass broadcast=False so their events reach only
+    clients subscribed to the sub-task, not the user's or module's feed.
     """
     try:
-        user = User.objects.get(id=user_id) if user_id else None
-        
         task = Task.objects.create(
             task_id=task_id,
             task_type=task_type,
             title=title,
             description=description,
             module=module,
-            created_by=user,
+            created_by_id=user_id,
             priority=priority,
             input_data=input_data or {},
             metadata=metadata or {}
         )
+        task_buffer.remember(task)
         
         # Log task creation
-        TaskLog.objects.create(
-            task=task,
-            level='info',
-            message=f"Task created: {title}",
-            data={'task_type': task_type, 'module': module}
-        )
+        task_buffer.log(task_id, 'info', f"Task created: {title}", {'task_type': task_type, 'module': module})
         
         # Emit WebSocket event
         emit_websocket_event('task_created', {
@@ -110,7 +181,7 @@ def create_task(task_id: str, task_type: str, title: str, description: str = "",
             'module': module,
             'status': task.status,
             'message': f'Task "{title}" has been created'
-        }, user_id=user_id, task_id=task_id)
+        }, user_id=user_id, task_id=task_id, broadcast=broadcast)
         
         return task
         
@@ -123,38 +194,39 @@ def update_task_progress(task_id: str, progress: int = None, processed_items: in
                         total_items: int = None, message: str = None):
     """
     Update task progress
+
+    The Task row and log line are written behind (see task_management.buffer);
+    the websocket event and snapshot reflect the update immediately.
     """
     try:
-        task = Task.objects.get(task_id=task_id)
-        
+        fields = {}
         if progress is not None:
-            task.progress = min(100, max(0, progress))
+            fields['progress'] = min(100, max(0, progress))
         
         if processed_items is not None:
-            task.processed_items = processed_items
+            fields['processed_items'] = processed_items
         
         if total_items is not None:
-            task.total_items = total_items
+            fields['total_items'] = total_items
         
-        task.save(update_fields=['progress', 'processed_items', 'total_items'])
+        state = task_buffer.update_progress(task_id, **fields)
+        if state is None:
+            raise Task.DoesNotExist
         
         # Log progress update
         if message:
-            TaskLog.objects.create(
-                task=task,
-                level='info',
-                message=message,
-                data={'progress': task.progress, 'processed_items': task.processed_items}
-            )
+            task_buffer.log(task_id, 'info', message, {
+                'progress': state['progress'], 'processed_items': state['processed_items']
+            })
         
         # Emit WebSocket event
         emit_websocket_event('task_progress', {
             'task_id': task_id,
-            'progress': task.progress,
-            'processed_items': task.processed_items,
-            'total_items': task.total_items,
-            'message': message or f'Progress: {task.progress}%'
-        }, user_id=task.created_by.id if task.created_by else None, task_id=task_id)
+            'progress': state['progress'],
+            'processed_items': state['processed_items'],
+            'total_items': state['total_items'],
+            'message': message or f'Progress: {state["progress"]}%'
+        }, user_id=state['created_by_id'], task_id=task_id)
         
     except Task.DoesNotExist:
         logger.error(f"Task {task_id} not found for progress update")
@@ -167,16 +239,15 @@ def complete_task(task_id: str, output_data: Dict = None, message: str = None):
     Mark task as completed
     """
     try:
+        # Buffered progress lands before the final state
+        task_buffer.flush()
         task = Task.objects.get(task_id=task_id)
         task.mark_completed(output_data)
         
         # Log completion
-        TaskLog.objects.create(
-            task=task,
-            level='info',
-            message=message or f"Task completed successfully",
-            data={'output_data': output_data}
-        )
+        task_buffer.log(task_id, 'info', message or f"Task completed successfully", {'output_data': output_data})
+        task_buffer.flush()
+        task_buffer.forget(task_id)
         
         # Emit WebSocket event
         emit_websocket_event('task_completed', {
@@ -187,7 +258,7 @@ def complete_task(task_id: str, output_data: Dict = None, message: str = None):
             'status': task.status,
             'duration': str(task.duration) if task.duration else None,
             'message': message or f'Task "{task.title}" completed successfully'
-        }, user_id=task.created_by.id if task.created_by else None, task_id=task_id)
+        }, user_id=task.created_by_id, task_id=task_id)
         
     except Task.DoesNotExist:
         logger.error(f"Task {task_id} not found for completion")
@@ -200,16 +271,14 @@ def fail_task(task_id: str, error_message: str, error_traceback: str = None):
     Mark task as failed
     """
     try:
+        task_buffer.flush()
         task = Task.objects.get(task_id=task_id)
         task.mark_failed(error_message, error_traceback)
         
         # Log failure
-        TaskLog.objects.create(
-            task=task,
-            level='error',
-            message=f"Task failed: {error_message}",
-            data={'error_traceback': error_traceback}
-        )
+        task_buffer.log(task_id, 'error', f"Task failed: {error_message}", {'error_traceback': error_traceback})
+        task_buffer.flush()
+        task_buffer.forget(task_id)
         
         # Emit WebSocket event
         emit_websocket_event('task_failed', {
@@ -220,7 +289,7 @@ def fail_task(task_id: str, error_message: str, error_traceback: str = None):
             'status': task.status,
             'error_message': error_message,
             'message': f'Task "{task.title}" failed: {error_message}'
-        }, user_id=task.created_by.id if task.created_by else None, task_id=task_id)
+        }, user_id=task.created_by_id, task_id=task_id)
         
     except Task.DoesNotExist:
         logger.error(f"Task {task_id} not found for failure")
@@ -288,25 +357,48 @@ def generic_task_wrapper(self, task_id: str, task_type: str, title: str,
         raise
 
 
+def _delete_in_batches(queryset, batch_size: int = RETENTION_BATCH_SIZE) -> int:
+    """Delete a queryset's rows a batch of primary keys at a time, keeping each transaction short"""
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=ids).delete()[0]
+
+
 @shared_task
-def cleanup_old_tasks(days_old: int = 30):
+def cleanup_old_tasks(days_old: int = 30, log_days_old: int = None):
     """
-    Cleanup old completed/failed tasks
+    Cleanup old completed/failed tasks and prune task logs
+
+    Rows are deleted in primary-key batches rather than one DELETE ... CASCADE,
+    so a backlog of history never holds long locks on the task tables. Logs of
+    tasks that are kept are pruned after TASK_LOG_RETENTION_DAYS.
     """
     try:
         from datetime import timedelta
-        cutoff_date = timezone.now() - timedelta(days=days_old)
+        now = timezone.now()
+        cutoff_date = now - timedelta(days=days_old)
+        log_cutoff = now - timedelta(days=log_days_old if log_days_old is not None else TASK_LOG_RETENTION_DAYS)
         
+        count = 0
         old_tasks = Task.objects.filter(
             status__in=[TaskStatus.COMPLETED, TaskStatus.FAILED],
             completed_at__lt=cutoff_date
         )
+        while True:
+            ids = list(old_tasks.values_list('pk', flat=True)[:RETENTION_BATCH_SIZE])
+            if not ids:
+                break
+            _delete_in_batches(TaskLog.objects.filter(task_id__in=ids))
+            count += len(ids)
+            Task.objects.filter(pk__in=ids).delete()
         
-        count = old_tasks.count()
-        old_tasks.delete()
+        log_count = _delete_in_batches(TaskLog.objects.filter(timestamp__lt=log_cutoff))
         
-        logger.info(f"Cleaned up {count} old tasks")
-        return f"Cleaned up {count} old tasks"
+        logger.info(f"Cleaned up {count} old tasks and {log_count} old task logs")
+        return f"Cleaned up {count} old tasks and {log_count} old task logs"
         
     except Exception as e:
         logger.error(f"Error cleaning up old tasks: {e}")
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from task_management import tasks
+from task_management.models import Task, TaskLog, TaskStatus, TaskType
+from task_management.tasks import (
+    cleanup_old_tasks, complete_task, create_task, emit_websocket_event, get_task_snapshot, update_task_progress,
+)
+
+User = get_user_model()
+
+
+class FakeChannelLayer:
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, message):
+        self.sent.append((group, message['type']))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TaskEventTests(TestCase):
+    def setUp(self):
+        tasks._last_progress_sent.clear()
+        self.user = User.objects.create_user(username='tasks', email='tasks@example.com', password='pass')
+        self.layer = FakeChannelLayer()
+        patcher = mock.patch('task_management.tasks.get_channel_layer', return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(tasks.task_buffer.flush)
+
+    def test_events_go_to_subscribed_groups_only(self):
+        create_task('t-1', TaskType.CUSTOM, 'Job', module='core', user_id=self.user.id)
+        self.assertEqual(
+            sorted(group for group, _ in self.layer.sent),
+            ['task_module_core', 'task_t-1', f'task_user_{self.user.id}'],
+        )
+        self.layer.sent.clear()
+        create_task('t-2', TaskType.CUSTOM, 'Sub job', module='core', user_id=self.user.id, broadcast=False)
+        self.assertEqual(self.layer.sent, [('task_t-2', 'task_created')])
+
+    def test_progress_is_coalesced_but_snapshot_stays_current(self):
+        create_task('t-3', TaskType.CUSTOM, 'Job', module='core', user_id=self.user.id)
+        self.layer.sent.clear()
+        for processed in range(1, 101):
+            update_task_progress('t-3', progress=processed, processed_items=processed, total_items=100)
+        progress_events = [group for group, event in self.layer.sent if event == 'task_progress']
+        # One leading event per group; the rest fall inside the throttle window
+        self.assertEqual(len(progress_events), 2)
+        snapshot = get_task_snapshot('t-3')
+        self.assertEqual((snapshot['processed_items'], snapshot['title']), (100, 'Job'))
+
+        self.layer.sent.clear()
+        emit_websocket_event('task_completed', {'task_id': 't-3', 'status': 'completed'}, user_id=self.user.id, task_id='t-3')
+        self.assertEqual(len(self.layer.sent), 2)
+        self.assertEqual(get_task_snapshot('t-3')['last_event'], 'task_completed')
+
+    @mock.patch.object(tasks.task_buffer, 'enabled', True)
+    def test_progress_and_logs_are_written_behind(self):
+        create_task('t-4', TaskType.CUSTOM, 'Job', module='core', user_id=self.user.id)
+        tasks.task_buffer.flush()
+        with self.assertNumQueries(0):
+            for processed in range(1, 51):
+                update_task_progress('t-4', progress=processed * 2, processed_items=processed, total_items=50, message='step')
+        self.assertEqual(Task.objects.get(task_id='t-4').processed_items, 0)
+
+        complete_task('t-4', {'ok': True})
+        task = Task.objects.get(task_id='t-4')
+        self.assertEqual((task.status, task.processed_items, task.progress), (TaskStatus.COMPLETED, 50, 100))
+        # creation + 50 progress messages + completion
+        self.assertEqual(task.logs.count(), 52)
+
+    def test_progress_is_written_straight_away_outside_workers(self):
+        create_task('t-5', TaskType.CUSTOM, 'Job', module='core', user_id=self.user.id)
+        update_task_progress('t-5', progress=40, processed_items=2, total_items=5, message='step')
+        self.assertEqual(Task.objects.get(task_id='t-5').processed_items, 2)
+        self.assertEqual(TaskLog.objects.filter(task__task_id='t-5').count(), 2)
+
+        with mock.patch.object(tasks.task_buffer, 'enabled', True):
+            update_task_progress('t-5', progress=60, processed_items=3, total_items=5)
+            self.assertEqual(Task.objects.get(task_id='t-5').processed_items, 2)
+            request_finished.send(sender=self.__class__)
+        self.assertEqual(Task.objects.get(task_id='t-5').processed_items, 3)
+
+
+class TaskRetentionTests(TestCase):
+    def test_cleanup_removes_old_tasks_and_prunes_logs(self):
+        user = User.objects.create_user(username='retention', email='retention@example.com', password='pass')
+        old = timezone.now() - timedelta(days=40)
+        for index, status in enumerate([TaskStatus.COMPLETED, TaskStatus.FAILED, TaskStatus.RUNNING]):
+            task = Task.objects.create(task_id=f'old-{index}', task_type=TaskType.CUSTOM, title='Old', status=status, created_by=user)
+            Task.objects.filter(pk=task.pk).update(completed_at=old)
+            TaskLog.objects.create(task=task, level='info', message='old')
+        recent = Task.objects.create(task_id='recent', task_type=TaskType.CUSTOM, title='Recent', created_by=user)
+        stale_log = TaskLog.objects.create(task=recent, level='info', message='stale')
+        TaskLog.objects.filter(pk=stale_log.pk).update(timestamp=old)
+        TaskLog.objects.create(task=recent, level='info', message='fresh')
+
+        with mock.patch.object(tasks, 'RETENTION_BATCH_SIZE', 1):
+            result = cleanup_old_tasks(days_old=30, log_days_old=14)
+
+        self.assertEqual(result, 'Cleaned up 2 old tasks and 1 old task logs')
+        self.assertEqual(sorted(Task.objects.values_list('task_id', flat=True)), ['old-2', 'recent'])
+        self.assertEqual(list(TaskLog.objects.filter(task=recent).values_list('message', flat=True)), ['fresh'])